@@ -0,0 +1,1664 @@
+# Import necessary packages
+import hashlib
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from decimal import Decimal
+from multiprocessing.managers import BaseManager
+from cypher_builder import (
+    count_nodes_query,
+    count_relationships_query,
+    create_nodes_query,
+    create_relationship_index_query,
+    create_relationships_query,
+    create_unique_constraint_query,
+    delete_node_range_query,
+    delete_nodes_query,
+    delete_relationships_query,
+    merge_nodes_query,
+    merge_relationships_query,
+    read_nodes_query,
+    read_relationships_query,
+)
+
+try:
+    import pyodbc
+except ImportError:
+    pyodbc = None
+
+try:
+    from pymongo.errors import BulkWriteError
+except ImportError:
+    BulkWriteError = None
+
+try:
+    from pymongo import DeleteOne, ReplaceOne
+except ImportError:
+    DeleteOne = None
+    ReplaceOne = None
+
+# T-SQL constructs that are rewritten for SQLite
+top_pattern = re.compile(
+    r"^\s*SELECT\s+TOP\s*\((\d+)\)\s+(.*)$", re.IGNORECASE | re.DOTALL
+)
+create_table_pattern = re.compile(r"^\s*CREATE\s+TABLE\b", re.IGNORECASE)
+trailing_comma_pattern = re.compile(r",\s*\)")
+information_schema_columns_pattern = re.compile(
+    r"\bFROM\s+INFORMATION_SCHEMA\.COLUMNS\b", re.IGNORECASE
+)
+add_foreign_key_pattern = re.compile(
+    r"^\s*ALTER\s+TABLE\s+\w+\s+(WITH\s+\w+\s+)?ADD\s+CONSTRAINT\s+\w+\s+FOREIGN\s+KEY\b",
+    re.IGNORECASE,
+)
+drop_constraint_pattern = re.compile(
+    r"^\s*ALTER\s+TABLE\s+\w+\s+DROP\s+CONSTRAINT\b", re.IGNORECASE
+)
+drop_index_pattern = re.compile(
+    r"^\s*DROP\s+INDEX\s+(\w+)\s+ON\s+\w+\s*;?\s*$", re.IGNORECASE
+)
+# Guard of the idempotent DDL, e.g. IF OBJECT_ID(N'Customer', N'U') IS NULL CREATE ...
+if_null_pattern = re.compile(
+    r"^\s*IF\s+.+?\s+IS\s+NULL\s+((CREATE\s+(TABLE|INDEX)\b|ALTER\b).*)$",
+    re.IGNORECASE | re.DOTALL,
+)
+# Length of VARCHAR(MAX) in the casts of delta_sync.create_checksum_query
+max_length_pattern = re.compile(r"\(\s*MAX\s*\)", re.IGNORECASE)
+# Conversion of a value to text in delta_sync.create_row_text_expression
+convert_text_pattern = re.compile(
+    r"CONVERT\(NVARCHAR, (CAST\(\w+ AS \w+\)|\w+)(, \d+)?\)", re.IGNORECASE
+)
+# Slice of a row hash in delta_sync.create_checksum_query
+hash_slice_pattern = re.compile(
+    r"CAST\(CAST\(SUBSTRING\((\w+), (\d+), 4\) AS INT\) AS BIGINT\)",
+    re.IGNORECASE,
+)
+
+
+# Relational backends
+class OdbcBackend:
+    """Relational database on a SQL Server instance (pyodbc)."""
+
+    def __init__(self, connection_string: str, master_connection_string=None):
+        """Initializes the backend. No connection is opened yet.
+        Args:
+            connection_string (str): The connection string of the database.
+            master_connection_string (str, optional): The connection string of
+            the master database (needed by create_database). Defaults to None.
+        Raises:
+            ImportError: Is thrown if pyodbc is not installed.
+        """
+        if pyodbc is None:
+            raise ImportError("OdbcBackend requires pyodbc!")
+
+        self.name = connection_string
+        self.connection_string = connection_string
+        self.master_connection_string = master_connection_string
+
+    def connect(self):
+        """Opens a connection to the database.
+        Returns:
+            _type_: The pyodbc connection.
+        """
+        return pyodbc.connect(self.connection_string)
+
+    def create_database(self, db_name: str, if_not_exists=False):
+        """Creates the database on the server.
+        Args:
+            db_name (str): The database name.
+            if_not_exists (bool, optional): If True, an existing database
+            is kept. Defaults to False.
+        Raises:
+            ValueError: Is thrown if no master connection string is set.
+        """
+        if self.master_connection_string is None:
+            raise ValueError("create_database requires a master connection string!")
+
+        master_conn = pyodbc.connect(self.master_connection_string, autocommit=True)
+        query = f"CREATE DATABASE {db_name}"
+
+        if if_not_exists:
+            query = f"IF DB_ID(N'{db_name}') IS NULL {query}"
+
+        try:
+            master_conn.cursor().execute(query)
+        finally:
+            master_conn.close()
+
+
+class SqliteBackend:
+    """Relational database in a local SQLite file. Stand-in for
+    SQL Server that needs no running service."""
+
+    def __init__(self, path: str, timeout=60):
+        """Initializes the backend. No connection is opened yet.
+        Args:
+            path (str): The path of the SQLite file.
+            timeout (int, optional): Seconds a connection waits for the
+            write lock of another connection. Defaults to 60.
+        """
+        self.name = path
+        self.path = path
+        self.timeout = timeout
+
+    def connect(self):
+        """Opens a connection to the database.
+        Returns:
+            SqliteConnection: The connection.
+        """
+        return SqliteConnection(self.path, self.timeout)
+
+    def create_database(self, db_name: str, if_not_exists=False):
+        """Does nothing, the file is created by the first connection.
+        Args:
+            db_name (str): The database name.
+            if_not_exists (bool, optional): See OdbcBackend.create_database.
+        """
+
+
+def register_sqlite_types():
+    """Registers the conversions of the SQL Server column types
+    that SQLite does not support natively."""
+    sqlite3.register_adapter(Decimal, str)
+    sqlite3.register_adapter(datetime, lambda val: val.isoformat(" "))
+    sqlite3.register_converter("DECIMAL", lambda val: Decimal(val.decode()))
+    sqlite3.register_converter(
+        "DATETIME", lambda val: datetime.fromisoformat(val.decode())
+    )
+
+
+def hash_bytes(algorithm: str, text):
+    """Computes a hash like HASHBYTES of SQL Server, of the UTF-16 bytes
+    of a NVARCHAR value.
+    Args:
+        algorithm (str): The algorithm, only SHA2_256 is supported.
+        text (_type_): The text or None.
+    Raises:
+        ValueError: Is thrown if the algorithm is not supported.
+    Returns:
+        bytes: The digest, or None if the text is None.
+    """
+    if algorithm.upper() != "SHA2_256":
+        raise ValueError(f"The hash algorithm {algorithm} is not supported!")
+
+    if text is None:
+        return None
+
+    return hashlib.sha256(str(text).encode("utf-16-le")).digest()
+
+
+def get_data_length(value):
+    """Gets the amount of bytes of a value like DATALENGTH of SQL Server
+    (strings count as NVARCHAR).
+    Args:
+        value (_type_): The value.
+    Returns:
+        int: The amount of bytes, or None if the value is None.
+    """
+    if value is None:
+        return None
+
+    if isinstance(value, bytes):
+        return len(value)
+
+    return len(str(value).encode("utf-16-le"))
+
+
+def concat(*values):
+    """Concatenates values like CONCAT of SQL Server (null values are skipped).
+    Args:
+        values (_type_): The values.
+    Returns:
+        str: The text.
+    """
+    return "".join(str(el) for el in values if el is not None)
+
+
+def get_hash_int(digest: bytes, start: int):
+    """Gets 4 bytes of a hash as signed integer, like
+    CAST(CAST(SUBSTRING(digest, start, 4) AS INT) AS BIGINT) of SQL Server.
+    Args:
+        digest (bytes): The hash.
+        start (int): The 1-based position of the first byte.
+    Returns:
+        int: The integer, or None if the hash is None.
+    """
+    if digest is None:
+        return None
+
+    return int.from_bytes(digest[start - 1 : start + 3], "big", signed=True)
+
+
+def translate_query(query: str):
+    """Rewrites the T-SQL constructs used by the migration for SQLite.
+    E.g. SELECT TOP (10) a FROM t -> SELECT a FROM t LIMIT 10
+    Args:
+        query (str): The T-SQL query.
+    Returns:
+        str: The SQLite query.
+    """
+    match = top_pattern.match(query)
+
+    if match is not None:
+        return f"SELECT {match.group(2)} LIMIT {match.group(1)}"
+
+    match = if_null_pattern.match(query)
+
+    if match is not None:
+        # CREATE ... IF NOT EXISTS is the SQLite form of the guarded DDL
+        statement = match.group(1)
+
+        if add_foreign_key_pattern.match(statement) is not None:
+            return "SELECT 1"
+
+        return translate_query(
+            re.sub(
+                r"^CREATE\s+(TABLE|INDEX)\b",
+                r"CREATE \1 IF NOT EXISTS",
+                statement,
+                flags=re.IGNORECASE,
+            )
+        )
+
+    if information_schema_columns_pattern.search(query) is not None:
+        # The columns of all tables (see migration_plan.schema_query)
+        return (
+            "SELECT m.name, p.name, p.type FROM sqlite_master m "
+            "JOIN pragma_table_info(m.name) p WHERE m.type = 'table' "
+            "ORDER BY m.name, p.cid"
+        )
+
+    if add_foreign_key_pattern.match(query) is not None:
+        # SQLite can not add constraints to existing tables (and does not enforce
+        # foreign keys by default), the rows are validated by a query instead
+        return "SELECT 1"
+
+    if drop_constraint_pattern.match(query) is not None:
+        # The foreign keys were never added (see above)
+        return "SELECT 1"
+
+    match = drop_index_pattern.match(query)
+
+    if match is not None:
+        # SQLite index names are unique per database
+        return f"DROP INDEX {match.group(1)}"
+
+    if create_table_pattern.match(query) is not None:
+        # T-SQL accepts a comma after the last column definition
+        return trailing_comma_pattern.sub(")", query)
+
+    if "HASHBYTES" in query:
+        # SQLite has no length limits, CAST(x AS VARCHAR(MAX)) -> CAST(x AS VARCHAR),
+        # no CONVERT styles and no casts of binary values to integers
+        query = max_length_pattern.sub("", query)
+        query = convert_text_pattern.sub(r"CAST(\1 AS TEXT)", query)
+        return hash_slice_pattern.sub(r"HASH_INT(\1, \2)", query)
+
+    return query
+
+
+class CatalogRow:
+    """Row of a catalog function (see SqliteCursor.columns)."""
+
+    def __init__(self, column_name: str, type_name: str):
+        """Initializes the row.
+        Args:
+            column_name (str): The column name.
+            type_name (str): The type name without length or precision.
+        """
+        self.column_name = column_name
+        self.type_name = type_name
+
+
+class CatalogResult:
+    """Result of a catalog function (see SqliteCursor.columns)."""
+
+    def __init__(self, rows: list):
+        """Initializes the result.
+        Args:
+            rows (list): The catalog rows.
+        """
+        self.rows = rows
+
+    def fetchall(self):
+        """Gets all rows.
+        Returns:
+            list: The catalog rows.
+        """
+        return self.rows
+
+
+class SqliteCursor:
+    """SQLite cursor with the subset of the pyodbc cursor interface
+    that is used by the migration."""
+
+    def __init__(self, cursor):
+        """Initializes the cursor.
+        Args:
+            cursor (_type_): The sqlite3 cursor.
+        """
+        self.cursor = cursor
+        # Accepted for get_bulk_cursor, SQLite always binds in-process
+        self.fast_executemany = False
+
+    def execute(self, query: str, parameters=None):
+        """Executes a query.
+        Args:
+            query (str): The T-SQL query (see translate_query).
+            parameters (list, optional): The query parameters. Defaults to None.
+        Returns:
+            SqliteCursor: The cursor.
+        """
+        self.cursor.execute(translate_query(query), parameters or [])
+        return self
+
+    def executemany(self, query: str, parameters: list):
+        """Executes a query for every parameter list.
+        Args:
+            query (str): The T-SQL query (see translate_query).
+            parameters (list): The parameter lists.
+        """
+        self.cursor.executemany(translate_query(query), parameters)
+
+    def fetchone(self):
+        """Gets the next row.
+        Returns:
+            tuple: The row or None.
+        """
+        return self.cursor.fetchone()
+
+    def fetchmany(self, size: int):
+        """Gets the next rows.
+        Args:
+            size (int): The maximal amount of rows.
+        Returns:
+            list: The rows.
+        """
+        return self.cursor.fetchmany(size)
+
+    def fetchall(self):
+        """Gets the remaining rows.
+        Returns:
+            list: The rows.
+        """
+        return self.cursor.fetchall()
+
+    def get_table_info(self, table: str):
+        """Gets the columns of a table ordered by their position.
+        Args:
+            table (str): The table name.
+        Returns:
+            list: The PRAGMA table_info rows.
+        """
+        return self.cursor.execute(f"PRAGMA table_info({table})").fetchall()
+
+    def columns(self, table: str):
+        """Gets the columns of a table (like pyodbc's cursor.columns).
+        Args:
+            table (str): The table name.
+        Returns:
+            CatalogResult: The columns in table order.
+        """
+        return CatalogResult(
+            [
+                CatalogRow(el[1], el[2].split("(")[0].strip().lower())
+                for el in self.get_table_info(table)
+            ]
+        )
+
+    def primaryKeys(self, table: str):
+        """Gets the primary key columns of a table (like pyodbc's cursor.primaryKeys).
+        Args:
+            table (str): The table name.
+        Returns:
+            CatalogResult: The primary key columns in key order.
+        """
+        info = sorted(
+            (el for el in self.get_table_info(table) if el[5] > 0),
+            key=lambda el: el[5],
+        )
+        return CatalogResult(
+            [CatalogRow(el[1], el[2].split("(")[0].strip().lower()) for el in info]
+        )
+
+    def close(self):
+        """Closes the cursor."""
+        self.cursor.close()
+
+
+class SqliteConnection:
+    """SQLite connection with the subset of the pyodbc connection interface
+    that is used by the migration."""
+
+    def __init__(self, path: str, timeout=60):
+        """Opens the connection.
+        Args:
+            path (str): The path of the SQLite file.
+            timeout (int, optional): Seconds to wait for the write lock
+            of another connection. Defaults to 60.
+        """
+        register_sqlite_types()
+        # ThreadConnections commits the connections of all workers from the main thread
+        self.connection = sqlite3.connect(
+            path,
+            timeout=timeout,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+        )
+        # Server-side checksums of delta_sync.create_checksum_query
+        for name, arguments, function in [
+            ("HASHBYTES", 2, hash_bytes),
+            ("DATALENGTH", 1, get_data_length),
+            ("CONCAT", -1, concat),
+            ("HASH_INT", 2, get_hash_int),
+        ]:
+            self.connection.create_function(
+                name, arguments, function, deterministic=True
+            )
+
+    def cursor(self):
+        """Creates a cursor.
+        Returns:
+            SqliteCursor: The cursor.
+        """
+        return SqliteCursor(self.connection.cursor())
+
+    def commit(self):
+        """Commits the connection."""
+        self.connection.commit()
+
+    def rollback(self):
+        """Rollbacks the connection."""
+        self.connection.rollback()
+
+    def close(self):
+        """Closes the connection."""
+        self.connection.close()
+
+
+# Graph stores
+def get_nodes_query(node_name: str, merge_key=None):
+    """Gets the query that writes the nodes of the parameter $rows.
+    Args:
+        node_name (str): The node name.
+        merge_key (str, optional): See Neo4jGraph.write_nodes. Defaults to None.
+    Returns:
+        str: The query.
+    """
+    if merge_key is None:
+        return create_nodes_query(node_name)
+
+    return merge_nodes_query(node_name, merge_key)
+
+
+def get_relationships_query(mn_information: dict, merge=False):
+    """Gets the query that writes the relationships of the parameter $rows.
+    Args:
+        mn_information (dict): See migration.create_neo4j_m_to_n_dict.
+        merge (bool, optional): See Neo4jGraph.write_relationships.
+        Defaults to False.
+    Returns:
+        str: The query.
+    """
+    arguments = [
+        mn_information["fromEntity"],
+        mn_information["fromAttribute"],
+        mn_information["toEntity"],
+        mn_information["toAttribute"],
+        mn_information["relationshipName"],
+    ]
+
+    if merge:
+        return merge_relationships_query(
+            *arguments, mn_information["primaryKeyAttribute"]
+        )
+
+    return create_relationships_query(*arguments)
+
+
+def get_delete_relationships_query(mn_information: dict):
+    """Gets the query that deletes the relationships of the parameter $rows.
+    Args:
+        mn_information (dict): See migration.create_neo4j_m_to_n_dict.
+    Returns:
+        str: The query.
+    """
+    return delete_relationships_query(
+        mn_information["fromEntity"],
+        mn_information["fromAttribute"],
+        mn_information["toEntity"],
+        mn_information["toAttribute"],
+        mn_information["relationshipName"],
+        mn_information["primaryKeyAttribute"],
+    )
+
+
+def get_read_relationships_query(mn_information: dict):
+    """Gets the query that reads the relationships of a key range.
+    Args:
+        mn_information (dict): See migration.create_neo4j_m_to_n_dict.
+    Returns:
+        str: The query.
+    """
+    return read_relationships_query(
+        mn_information["fromEntity"],
+        mn_information["fromAttribute"],
+        mn_information["toEntity"],
+        mn_information["toAttribute"],
+        mn_information["relationshipName"],
+        mn_information["primaryKeyAttribute"],
+    )
+
+
+class Neo4jGraph:
+    """Graph store on a Neo4j instance. Every write is sent as a
+    single parameterized query in its own write transaction."""
+
+    def __init__(self, driver):
+        """Initializes the graph store.
+        Args:
+            driver (Neo4jDriver): The Neo4j driver.
+        """
+        self.name = "Neo4j driver"
+        self.driver = driver
+
+    def execute_write(self, query: str, parameters=None):
+        """Runs a query in a write transaction.
+        Args:
+            query (str): The query.
+            parameters (dict, optional): The query parameters. Defaults to None.
+        """
+        with self.driver.session() as session:
+            session.execute_write(lambda tx: tx.run(query, parameters).consume())
+
+    def execute_auto_commit(self, query: str, parameters=None):
+        """Runs a query in an implicit transaction, e.g. a query that
+        commits its own transactions (CALL { ... } IN TRANSACTIONS).
+        Args:
+            query (str): The query.
+            parameters (dict, optional): The query parameters. Defaults to None.
+        """
+        with self.driver.session() as session:
+            session.run(query, parameters).consume()
+
+    def execute_read(self, query: str, parameters=None):
+        """Runs a query in a read transaction.
+        Args:
+            query (str): The query.
+            parameters (dict, optional): The query parameters. Defaults to None.
+        Returns:
+            list: The records as dictionaries.
+        """
+        with self.driver.session() as session:
+            return session.execute_read(
+                lambda tx: [record.data() for record in tx.run(query, parameters)]
+            )
+
+    def create_unique_constraint(self, node_name: str, attribute: str):
+        """Creates a uniqueness constraint on a node attribute
+        if it does not exist yet.
+        Args:
+            node_name (str): The node name.
+            attribute (str): The attribute that has to be unique.
+        """
+        self.execute_write(create_unique_constraint_query(node_name, attribute))
+
+    def create_relationship_index(self, relationship_name: str, attribute: str):
+        """Creates a range index on a relationship property
+        if it does not exist yet.
+        Args:
+            relationship_name (str): The name of the relationship.
+            attribute (str): The indexed property.
+        """
+        query = create_relationship_index_query(relationship_name, attribute)
+        self.execute_write(query)
+
+    def write_nodes(self, node_name: str, rows: list, merge_key=None):
+        """Creates a node for every parameter map.
+        Args:
+            node_name (str): The node name.
+            rows (list): The parameter maps.
+            merge_key (str, optional): If set, existing nodes with the same
+            value of this attribute are updated instead. Defaults to None.
+        """
+        self.execute_write(get_nodes_query(node_name, merge_key), {"rows": rows})
+
+    def write_relationships(self, mn_information: dict, rows: list, merge=False):
+        """Creates a relationship for every {fromKey, toKey, props} map.
+        Args:
+            mn_information (dict): See migration.create_neo4j_m_to_n_dict.
+            rows (list): The {fromKey, toKey, props} maps.
+            merge (bool, optional): If True, existing relationships between
+            the same nodes with the same primary key (primaryKeyAttribute)
+            are updated instead. Defaults to False.
+        """
+        query = get_relationships_query(mn_information, merge)
+        self.execute_write(query, {"rows": rows})
+
+    def delete_nodes(self, node_name: str, key_attribute: str, keys: list):
+        """Deletes the nodes (and their relationships) with the given keys.
+        Args:
+            node_name (str): The node name.
+            key_attribute (str): The attribute that identifies a node.
+            keys (list): The key attribute values.
+        """
+        self.execute_write(delete_nodes_query(node_name, key_attribute), {"keys": keys})
+
+    def delete_node_range(
+        self, node_name: str, key_attribute: str, first, last, batch_size: int
+    ):
+        """Deletes the nodes (and their relationships) whose key is in a range
+        in transactions of batch_size nodes.
+        Args:
+            node_name (str): The node name.
+            key_attribute (str): The attribute that identifies a node.
+            first (_type_): The first key of the range.
+            last (_type_): The last key of the range.
+            batch_size (int): The amount of nodes per transaction.
+        """
+        self.execute_auto_commit(
+            delete_node_range_query(node_name, key_attribute, batch_size),
+            {"first": first, "last": last},
+        )
+
+    def delete_relationships(self, mn_information: dict, rows: list):
+        """Deletes the relationship of every {fromKey, toKey, key} map
+        (the relationship between the nodes with the primary key).
+        Args:
+            mn_information (dict): See migration.create_neo4j_m_to_n_dict.
+            rows (list): The {fromKey, toKey, key} maps.
+        """
+        query = get_delete_relationships_query(mn_information)
+        self.execute_write(query, {"rows": rows})
+
+    def count_nodes(self, node_name: str):
+        """Counts the nodes of a node name.
+        Args:
+            node_name (str): The node name.
+        Returns:
+            int: The amount of nodes.
+        """
+        return self.execute_read(count_nodes_query(node_name))[0]["amount"]
+
+    def count_relationships(self, relationship_name: str):
+        """Counts the relationships of a relationship name.
+        Args:
+            relationship_name (str): The relationship name.
+        Returns:
+            int: The amount of relationships.
+        """
+        return self.execute_read(count_relationships_query(relationship_name))[0][
+            "amount"
+        ]
+
+    def read_nodes(self, node_name: str, key_attribute: str, start: int, end: int):
+        """Reads the properties of the nodes whose key is in a range.
+        Args:
+            node_name (str): The node name.
+            key_attribute (str): The attribute that identifies a node.
+            start (int): The first key of the range.
+            end (int): The key after the range.
+        Returns:
+            list: The properties of the nodes.
+        """
+        records = self.execute_read(
+            read_nodes_query(node_name, key_attribute), {"start": start, "end": end}
+        )
+        return [record["props"] for record in records]
+
+    def read_relationships(self, mn_information: dict, start: int, end: int):
+        """Reads the relationships whose key (primaryKeyAttribute) is in a range.
+        Args:
+            mn_information (dict): See migration.create_neo4j_m_to_n_dict.
+            start (int): The first key of the range.
+            end (int): The key after the range.
+        Returns:
+            list: The {fromKey, toKey, props} maps.
+        """
+        return self.execute_read(
+            get_read_relationships_query(mn_information), {"start": start, "end": end}
+        )
+
+    def close(self):
+        """Closes the driver."""
+        self.driver.close()
+
+
+async def run_async_query(tx, query: str, parameters=None):
+    """Runs a query in an async Neo4j transaction and consumes its result.
+    Args:
+        tx (_type_): An async Neo4j transaction.
+        query (str): The query.
+        parameters (dict, optional): The query parameters. Defaults to None.
+    """
+    result = await tx.run(query, parameters)
+    await result.consume()
+
+
+class AsyncNeo4jGraph:
+    """Graph store on a Neo4j instance for asyncio (async Neo4j driver).
+    Sends the same queries as Neo4jGraph, every method is a coroutine,
+    so many write transactions can be in flight at the same time."""
+
+    def __init__(self, driver):
+        """Initializes the graph store.
+        Args:
+            driver (AsyncDriver): The async Neo4j driver.
+        """
+        self.name = "Neo4j async driver"
+        self.driver = driver
+
+    async def execute_write(self, query: str, parameters=None):
+        """Runs a query in a write transaction.
+        Args:
+            query (str): The query.
+            parameters (dict, optional): The query parameters. Defaults to None.
+        """
+        async with self.driver.session() as session:
+            await session.execute_write(run_async_query, query, parameters)
+
+    async def create_unique_constraint(self, node_name: str, attribute: str):
+        """See Neo4jGraph.create_unique_constraint."""
+        await self.execute_write(create_unique_constraint_query(node_name, attribute))
+
+    async def create_relationship_index(self, relationship_name: str, attribute: str):
+        """See Neo4jGraph.create_relationship_index."""
+        query = create_relationship_index_query(relationship_name, attribute)
+        await self.execute_write(query)
+
+    async def write_nodes(self, node_name: str, rows: list, merge_key=None):
+        """See Neo4jGraph.write_nodes."""
+        await self.execute_write(get_nodes_query(node_name, merge_key), {"rows": rows})
+
+    async def write_relationships(self, mn_information: dict, rows: list, merge=False):
+        """See Neo4jGraph.write_relationships."""
+        query = get_relationships_query(mn_information, merge)
+        await self.execute_write(query, {"rows": rows})
+
+    async def delete_nodes(self, node_name: str, key_attribute: str, keys: list):
+        """See Neo4jGraph.delete_nodes."""
+        query = delete_nodes_query(node_name, key_attribute)
+        await self.execute_write(query, {"keys": keys})
+
+    async def delete_relationships(self, mn_information: dict, rows: list):
+        """See Neo4jGraph.delete_relationships."""
+        query = get_delete_relationships_query(mn_information)
+        await self.execute_write(query, {"rows": rows})
+
+    async def close(self):
+        """Closes the driver."""
+        await self.driver.close()
+
+
+class InMemoryGraph:
+    """Property graph held in memory. Stand-in for Neo4j that implements
+    the writes of Neo4jGraph with the semantics of their Cypher queries."""
+
+    def __init__(self):
+        """Initializes an empty graph."""
+        self.name = "In-memory graph"
+        self.lock = threading.Lock()
+        # {<node name>: {<node id>: <properties>}}
+        self.nodes = dict()
+        # {<relationship name>: {(<from node id>, <to node id>): [<properties>, ...]}}
+        self.relationships = dict()
+        # {(<node name>, <attribute>): {<value>: {<node id>, ...}}}
+        self.indexes = dict()
+        # {(<relationship name>, <property>): {<value>: [(<from node id>,
+        # <to node id>, <properties>), ...]}}, dropped by every relationship write
+        self.relationship_indexes = dict()
+        self.constraints = set()
+        self.next_id = 0
+
+    def get_index(self, node_name: str, attribute: str):
+        """Gets (and builds) the index of a node attribute.
+        Args:
+            node_name (str): The node name.
+            attribute (str): The attribute.
+        Returns:
+            dict: Dictionary of the format {<value>: {<node id>, ...}}.
+        """
+        index = self.indexes.get((node_name, attribute))
+
+        if index is None:
+            index = dict()
+
+            for node_id, properties in self.nodes.get(node_name, {}).items():
+                if attribute in properties:
+                    index.setdefault(properties[attribute], set()).add(node_id)
+
+            self.indexes[(node_name, attribute)] = index
+
+        return index
+
+    def index_node(self, node_name: str, node_id: int, properties: dict, add: bool):
+        """Adds a node to (or removes it from) the indexes of its node name.
+        Args:
+            node_name (str): The node name.
+            node_id (int): The node id.
+            properties (dict): The properties of the node.
+            add (bool): True to add the node, False to remove it.
+        """
+        for (indexed_name, attribute), index in self.indexes.items():
+            if indexed_name != node_name or attribute not in properties:
+                continue
+
+            value = properties[attribute]
+
+            if add:
+                index.setdefault(value, set()).add(node_id)
+                continue
+
+            index[value].discard(node_id)
+
+            if len(index[value]) == 0:
+                del index[value]
+
+    def check_constraints(self, node_name: str, properties: dict, node_id=None):
+        """Checks the uniqueness constraints of a node.
+        Args:
+            node_name (str): The node name.
+            properties (dict): The properties of the node.
+            node_id (int, optional): The id of the node if it exists already.
+            Defaults to None.
+        Raises:
+            ValueError: Is thrown if another node has the same value
+            of a unique attribute.
+        """
+        for constrained_name, attribute in self.constraints:
+            if constrained_name != node_name or attribute not in properties:
+                continue
+
+            owners = self.get_index(node_name, attribute).get(properties[attribute], set())
+
+            if len(owners - {node_id}) > 0:
+                raise ValueError(
+                    f"Node {node_name} with {attribute} = "
+                    f"{properties[attribute]} already exists!"
+                )
+
+    def create_unique_constraint(self, node_name: str, attribute: str):
+        """Creates a uniqueness constraint on a node attribute
+        if it does not exist yet.
+        Args:
+            node_name (str): The node name.
+            attribute (str): The attribute that has to be unique.
+        Raises:
+            ValueError: Is thrown if existing nodes violate the constraint.
+        """
+        with self.lock:
+            index = self.get_index(node_name, attribute)
+
+            if any(len(node_ids) > 1 for node_ids in index.values()):
+                raise ValueError(
+                    f"The nodes {node_name} violate the uniqueness of {attribute}!"
+                )
+
+            self.constraints.add((node_name, attribute))
+
+    def create_relationship_index(self, relationship_name: str, attribute: str):
+        """Does nothing, the relationship indexes are built when
+        they are read (see get_relationship_index).
+        Args:
+            relationship_name (str): The name of the relationship.
+            attribute (str): The indexed property.
+        """
+
+    def get_relationship_index(self, relationship_name: str, attribute: str):
+        """Gets (and builds) the index of a relationship property.
+        Args:
+            relationship_name (str): The name of the relationship.
+            attribute (str): The property.
+        Returns:
+            dict: Dictionary of the format {<value>: [(<from node id>,
+            <to node id>, <properties>), ...]}.
+        """
+        index = self.relationship_indexes.get((relationship_name, attribute))
+
+        if index is None:
+            index = dict()
+
+            for pair, relationships in self.relationships.get(
+                relationship_name, {}
+            ).items():
+                for props in relationships:
+                    if attribute in props:
+                        index.setdefault(props[attribute], []).append((*pair, props))
+
+            self.relationship_indexes[(relationship_name, attribute)] = index
+
+        return index
+
+    def write_nodes(self, node_name: str, rows: list, merge_key=None):
+        """Creates a node for every parameter map.
+        Args:
+            node_name (str): The node name.
+            rows (list): The parameter maps.
+            merge_key (str, optional): If set, existing nodes with the same
+            value of this attribute are updated instead. Defaults to None.
+        Raises:
+            ValueError: Is thrown if a uniqueness constraint is violated.
+        """
+        with self.lock:
+            nodes = self.nodes.setdefault(node_name, dict())
+
+            for row in rows:
+                node_ids = set()
+
+                if merge_key is not None:
+                    node_ids = self.get_index(node_name, merge_key).get(
+                        row[merge_key], set()
+                    )
+
+                if len(node_ids) == 0:
+                    self.check_constraints(node_name, row)
+                    node_id = self.next_id
+                    self.next_id += 1
+                    nodes[node_id] = dict(row)
+                    self.index_node(node_name, node_id, nodes[node_id], True)
+                    continue
+
+                for node_id in list(node_ids):
+                    self.check_constraints(node_name, row, node_id)
+                    self.index_node(node_name, node_id, nodes[node_id], False)
+                    nodes[node_id] = dict(row)
+                    self.index_node(node_name, node_id, nodes[node_id], True)
+
+    def match_pairs(self, mn_information: dict, row: dict):
+        """Gets the node id pairs that are matched by a {fromKey, toKey} map.
+        Args:
+            mn_information (dict): See migration.create_neo4j_m_to_n_dict.
+            row (dict): The {fromKey, toKey} map.
+        Returns:
+            list: List of (from node id, to node id) tuples.
+        """
+        from_ids = self.get_index(
+            mn_information["fromEntity"], mn_information["fromAttribute"]
+        ).get(row["fromKey"], set())
+        to_ids = self.get_index(
+            mn_information["toEntity"], mn_information["toAttribute"]
+        ).get(row["toKey"], set())
+        return [(from_id, to_id) for from_id in from_ids for to_id in to_ids]
+
+    def write_relationships(self, mn_information: dict, rows: list, merge=False):
+        """Creates a relationship for every {fromKey, toKey, props} map.
+        Maps whose nodes do not exist are skipped (like MATCH).
+        Args:
+            mn_information (dict): See migration.create_neo4j_m_to_n_dict.
+            rows (list): The {fromKey, toKey, props} maps.
+            merge (bool, optional): If True, existing relationships between
+            the same nodes with the same primary key (primaryKeyAttribute)
+            are updated instead. Defaults to False.
+        """
+        key_attribute = mn_information["primaryKeyAttribute"]
+
+        with self.lock:
+            self.relationship_indexes.clear()
+            relationships = self.relationships.setdefault(
+                mn_information["relationshipName"], dict()
+            )
+
+            for row in rows:
+                key = row["props"].get(key_attribute)
+
+                for pair in self.match_pairs(mn_information, row):
+                    existing = relationships.setdefault(pair, [])
+                    matched = [
+                        index
+                        for index, props in enumerate(existing)
+                        if merge and props.get(key_attribute) == key
+                    ]
+
+                    for index in matched:
+                        existing[index] = dict(row["props"])
+
+                    if len(matched) == 0:
+                        existing.append(dict(row["props"]))
+
+    def delete_nodes(self, node_name: str, key_attribute: str, keys: list):
+        """Deletes the nodes (and their relationships) with the given keys.
+        Args:
+            node_name (str): The node name.
+            key_attribute (str): The attribute that identifies a node.
+            keys (list): The key attribute values.
+        """
+        with self.lock:
+            index = self.get_index(node_name, key_attribute)
+            node_ids = set()
+
+            for key in keys:
+                node_ids.update(index.get(key, set()))
+
+            if len(node_ids) == 0:
+                return
+
+            nodes = self.nodes[node_name]
+            self.relationship_indexes.clear()
+
+            for node_id in node_ids:
+                self.index_node(node_name, node_id, nodes[node_id], False)
+                del nodes[node_id]
+
+            for name, relationships in self.relationships.items():
+                self.relationships[name] = {
+                    pair: props
+                    for pair, props in relationships.items()
+                    if pair[0] not in node_ids and pair[1] not in node_ids
+                }
+
+    def delete_node_range(
+        self, node_name: str, key_attribute: str, first, last, batch_size: int
+    ):
+        """Deletes the nodes (and their relationships) whose key is in a range.
+        Args:
+            node_name (str): The node name.
+            key_attribute (str): The attribute that identifies a node.
+            first (_type_): The first key of the range.
+            last (_type_): The last key of the range.
+            batch_size (int): Ignored, the nodes are deleted at once.
+        """
+        with self.lock:
+            keys = [
+                key
+                for key in self.get_index(node_name, key_attribute).keys()
+                if key is not None and first <= key <= last
+            ]
+
+        self.delete_nodes(node_name, key_attribute, keys)
+
+    def delete_relationships(self, mn_information: dict, rows: list):
+        """Deletes the relationship of every {fromKey, toKey, key} map
+        (the relationship between the nodes with the primary key).
+        Args:
+            mn_information (dict): See migration.create_neo4j_m_to_n_dict.
+            rows (list): The {fromKey, toKey, key} maps.
+        """
+        key_attribute = mn_information["primaryKeyAttribute"]
+
+        with self.lock:
+            self.relationship_indexes.clear()
+            relationships = self.relationships.get(
+                mn_information["relationshipName"], dict()
+            )
+
+            for row in rows:
+                for pair in self.match_pairs(mn_information, row):
+                    kept = [
+                        props
+                        for props in relationships.get(pair, [])
+                        if props.get(key_attribute) != row["key"]
+                    ]
+
+                    if len(kept) > 0:
+                        relationships[pair] = kept
+                    else:
+                        relationships.pop(pair, None)
+
+    def count_nodes(self, node_name: str):
+        """Counts the nodes of a node name.
+        Args:
+            node_name (str): The node name.
+        Returns:
+            int: The amount of nodes.
+        """
+        with self.lock:
+            return len(self.nodes.get(node_name, {}))
+
+    def count_relationships(self, relationship_name: str):
+        """Counts the relationships of a relationship name.
+        Args:
+            relationship_name (str): The relationship name.
+        Returns:
+            int: The amount of relationships.
+        """
+        with self.lock:
+            return sum(
+                len(props)
+                for props in self.relationships.get(relationship_name, {}).values()
+            )
+
+    def read_nodes(self, node_name: str, key_attribute: str, start: int, end: int):
+        """Reads the properties of the nodes whose integer key is in a range.
+        Args:
+            node_name (str): The node name.
+            key_attribute (str): The attribute that identifies a node.
+            start (int): The first key of the range.
+            end (int): The key after the range.
+        Returns:
+            list: The properties of the nodes.
+        """
+        with self.lock:
+            index = self.get_index(node_name, key_attribute)
+            nodes = self.nodes.get(node_name, {})
+            return [
+                dict(nodes[node_id])
+                for key in range(start, end)
+                for node_id in index.get(key, ())
+            ]
+
+    def read_relationships(self, mn_information: dict, start: int, end: int):
+        """Reads the relationships whose integer key (primaryKeyAttribute)
+        is in a range.
+        Args:
+            mn_information (dict): See migration.create_neo4j_m_to_n_dict.
+            start (int): The first key of the range.
+            end (int): The key after the range.
+        Returns:
+            list: The {fromKey, toKey, props} maps.
+        """
+        with self.lock:
+            index = self.get_relationship_index(
+                mn_information["relationshipName"],
+                mn_information["primaryKeyAttribute"],
+            )
+            from_nodes = self.nodes.get(mn_information["fromEntity"], {})
+            to_nodes = self.nodes.get(mn_information["toEntity"], {})
+            return [
+                {
+                    "fromKey": from_nodes[from_id].get(mn_information["fromAttribute"]),
+                    "toKey": to_nodes[to_id].get(mn_information["toAttribute"]),
+                    "props": dict(props),
+                }
+                for key in range(start, end)
+                for from_id, to_id, props in index.get(key, ())
+            ]
+
+    def close(self):
+        """Does nothing, the graph is kept until it is garbage collected."""
+
+
+class GraphManager(BaseManager):
+    """Manager process that holds in-memory graphs for other processes,
+    e.g. the shard worker processes. Every method call of a proxy is sent
+    to the manager process, like a Neo4j driver sends its queries to the server.
+    Start it with GraphManager().start() and create a graph with InMemoryGraph()."""
+
+
+GraphManager.register("InMemoryGraph", InMemoryGraph)
+
+
+def get_shared_graph(graph):
+    """Gets a graph that is shared between processes. Bound to a proxy of
+    GraphManager with functools.partial, it is a picklable graph factory
+    (see migration.init_shard_worker).
+    Args:
+        graph (_type_): The proxy of the graph.
+    Returns:
+        _type_: The proxy of the graph.
+    """
+    return graph
+
+
+class NullGraph:
+    """Graph store that discards the writes and only counts them. Lets the
+    benchmarks measure the row conversion and batching of the migration
+    without a graph, e.g. in the worker processes of the sharded mode."""
+
+    def __init__(self):
+        """Initializes the counters."""
+        self.name = "Null graph"
+        self.nodes = 0
+        self.relationships = 0
+
+    def create_unique_constraint(self, node_name: str, attribute: str):
+        """Does nothing."""
+
+    def create_relationship_index(self, relationship_name: str, attribute: str):
+        """Does nothing."""
+
+    def write_nodes(self, node_name: str, rows: list, merge_key=None):
+        """Counts the nodes.
+        Args:
+            node_name (str): The node name.
+            rows (list): The parameter maps.
+            merge_key (str, optional): Ignored. Defaults to None.
+        """
+        self.nodes += len(rows)
+
+    def write_relationships(self, mn_information: dict, rows: list, merge=False):
+        """Counts the relationships.
+        Args:
+            mn_information (dict): See migration.create_neo4j_m_to_n_dict.
+            rows (list): The {fromKey, toKey, props} maps.
+            merge (bool, optional): Ignored. Defaults to False.
+        """
+        self.relationships += len(rows)
+
+    def delete_nodes(self, node_name: str, key_attribute: str, keys: list):
+        """Does nothing."""
+
+    def delete_node_range(
+        self, node_name: str, key_attribute: str, first, last, batch_size: int
+    ):
+        """Does nothing."""
+
+    def delete_relationships(self, mn_information: dict, rows: list):
+        """Does nothing."""
+
+    def close(self):
+        """Does nothing."""
+
+
+# Document stores
+class InMemoryCollection:
+    """Collection of an InMemoryDocumentStore with the subset of the
+    pymongo collection interface that is used by the migration."""
+
+    def __init__(self, database, name: str):
+        """Initializes an empty collection.
+        Args:
+            database (InMemoryDatabase): The database of the collection.
+            name (str): The collection name.
+        """
+        self.database = database
+        self.name = name
+        self.documents = []
+        # {<index name>: (<fields>, <unique>, {<values>, ...})}
+        self.indexes = dict()
+
+    def create_index(self, keys, unique=False, name=None):
+        """Creates an index if it does not exist yet. Only unique
+        indexes are maintained, because they change the inserts.
+        Args:
+            keys (_type_): A field name or a list of (field name, direction) tuples.
+            unique (bool, optional): Whether the fields must be unique.
+            Defaults to False.
+            name (str, optional): The index name. Defaults to None
+            (derived from the fields).
+        Raises:
+            ValueError: Is thrown if existing documents violate a unique index.
+        Returns:
+            str: The index name.
+        """
+        if type(keys) == str:
+            keys = [(keys, 1)]
+
+        fields = tuple(field for field, _ in keys)
+        name = name if name is not None else "_".join(f"{k}_{d}" for k, d in keys)
+
+        with self.database.store.lock:
+            if name in self.indexes:
+                return name
+
+            values = set()
+
+            if unique:
+                for document in self.documents:
+                    value = tuple(document.get(field) for field in fields)
+
+                    if value in values:
+                        raise ValueError(f"Duplicate key {value} in {self.name}!")
+
+                    values.add(value)
+
+            self.indexes[name] = (fields, unique, values)
+            self.database.created.add(self.name)
+
+        return name
+
+    def insert_document(self, document: dict):
+        """Inserts a document and checks the unique indexes.
+        The caller must hold the lock of the store.
+        Args:
+            document (dict): The document. An _id is added if it is missing.
+        Raises:
+            ValueError: Is thrown if a unique index is violated.
+        """
+        if "_id" not in document:
+            document["_id"] = self.database.store.get_next_id()
+
+        unique_values = []
+
+        for fields, unique, values in self.indexes.values():
+            if not unique:
+                continue
+
+            value = tuple(document.get(field) for field in fields)
+
+            if value in values:
+                raise ValueError(f"Duplicate key {value} in {self.name}!")
+
+            unique_values.append((values, value))
+
+        for values, value in unique_values:
+            values.add(value)
+
+        self.documents.append(document)
+        self.database.created.add(self.name)
+
+    def insert_one(self, document: dict):
+        """Inserts a document.
+        Args:
+            document (dict): The document. An _id is added if it is missing.
+        Raises:
+            ValueError: Is thrown if a unique index is violated.
+        """
+        with self.database.store.lock:
+            self.insert_document(document)
+
+    def insert_many(self, documents, ordered=True):
+        """Inserts documents.
+        Args:
+            documents (_type_): Iterable of documents.
+            ordered (bool, optional): If True, the insert stops at the first
+            failing document, otherwise the failing documents are skipped.
+            Defaults to True.
+        Raises:
+            BulkWriteError: Is thrown if a unique index is violated
+            (after all other documents were inserted if ordered is False).
+            ValueError if pymongo is not installed.
+        """
+        errors = []
+        inserted = 0
+
+        with self.database.store.lock:
+            for i, document in enumerate(documents):
+                try:
+                    self.insert_document(document)
+                    inserted += 1
+                except ValueError as e:
+                    errors.append({"index": i, "code": 11000, "errmsg": str(e)})
+
+                    if ordered:
+                        break
+
+        if len(errors) == 0:
+            return
+
+        if BulkWriteError is None:
+            raise ValueError(
+                f"{len(errors)} documents were not inserted: {errors[0]['errmsg']}"
+            )
+
+        raise BulkWriteError({"writeErrors": errors, "nInserted": inserted})
+
+    def replace_document(self, document: dict, replacement: dict):
+        """Replaces the fields of a document (except its _id)
+        and checks the unique indexes. The caller must hold the lock of the store.
+        Args:
+            document (dict): The stored document.
+            replacement (dict): The new fields.
+        Raises:
+            ValueError: Is thrown if a unique index is violated.
+        """
+        changes = []
+
+        for fields, unique, values in self.indexes.values():
+            if not unique:
+                continue
+
+            old_value = tuple(document.get(field) for field in fields)
+            value = tuple(replacement.get(field) for field in fields)
+
+            if value != old_value and value in values:
+                raise ValueError(f"Duplicate key {value} in {self.name}!")
+
+            changes.append((values, old_value, value))
+
+        for values, old_value, value in changes:
+            values.discard(old_value)
+            values.add(value)
+
+        document_id = document["_id"]
+        document.clear()
+        document.update(replacement)
+        document["_id"] = document_id
+
+    def bulk_write(self, requests, ordered=True):
+        """Applies pymongo write operations in order, like bulk_write of pymongo.
+        ReplaceOne (with or without upsert) and DeleteOne are supported,
+        their filters compare fields with values.
+        Args:
+            requests (_type_): Iterable of pymongo.ReplaceOne and pymongo.DeleteOne.
+            ordered (bool, optional): If True, the writes stop at the first
+            failing operation, otherwise the failing operations are skipped.
+            Defaults to True.
+        Raises:
+            ValueError: Is thrown if pymongo is not installed
+            or if an operation is not supported.
+            BulkWriteError: Is thrown if a unique index is violated
+            (after all other operations were applied if ordered is False).
+        """
+        if ReplaceOne is None:
+            raise ValueError("bulk_write requires pymongo!")
+
+        # {<filter fields>: {<filter values>: <document>}}, built on first use
+        lookups = dict()
+        deleted = set()
+        errors = []
+        written = 0
+
+        def get_lookup(fields):
+            if fields not in lookups:
+                lookup = dict()
+
+                for document in self.documents:
+                    if id(document) not in deleted:
+                        key = tuple(document.get(field) for field in fields)
+                        lookup.setdefault(key, document)
+
+                lookups[fields] = lookup
+
+            return lookups[fields]
+
+        def unlink(document):
+            for lookup_fields, lookup in lookups.items():
+                lookup.pop(tuple(document.get(field) for field in lookup_fields), None)
+
+        def link(document):
+            for lookup_fields, lookup in lookups.items():
+                lookup.setdefault(
+                    tuple(document.get(field) for field in lookup_fields), document
+                )
+
+        with self.database.store.lock:
+            for i, request in enumerate(requests):
+                if not isinstance(request, (ReplaceOne, DeleteOne)):
+                    raise ValueError(
+                        f"Unsupported write operation {type(request).__name__}!"
+                    )
+
+                fields = tuple(sorted(request._filter.keys()))
+                key = tuple(request._filter[field] for field in fields)
+                document = get_lookup(fields).get(key)
+
+                if isinstance(request, DeleteOne):
+                    if document is not None:
+                        unlink(document)
+                        deleted.add(id(document))
+                        written += 1
+
+                        for index_fields, unique, values in self.indexes.values():
+                            if unique:
+                                values.discard(
+                                    tuple(document.get(field) for field in index_fields)
+                                )
+
+                    continue
+
+                if document is None and not request._upsert:
+                    continue
+
+                stored = document is not None
+
+                try:
+                    if stored:
+                        unlink(document)
+                        self.replace_document(document, request._doc)
+                    else:
+                        document = dict(request._doc)
+                        self.insert_document(document)
+                except ValueError as e:
+                    # A failed replacement keeps the stored document unchanged
+                    if stored:
+                        link(document)
+
+                    errors.append({"index": i, "code": 11000, "errmsg": str(e)})
+
+                    if ordered:
+                        break
+
+                    continue
+
+                link(document)
+                written += 1
+
+            if len(deleted) > 0:
+                self.documents = [
+                    el for el in self.documents if id(el) not in deleted
+                ]
+
+        if len(errors) > 0:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": written})
+
+    def find_one(self, filter=None, sort=None):
+        """Finds the first document whose fields equal the filter values.
+        Args:
+            filter (dict, optional): See find.
+            sort (list, optional): List of (field name, direction) tuples.
+            Defaults to None (insertion order).
+        Returns:
+            dict: The document or None.
+        """
+        documents = self.find(filter)
+
+        for field, direction in reversed(sort or []):
+            documents = sorted(
+                (el for el in documents if el.get(field) is not None),
+                key=lambda el: el[field],
+                reverse=direction < 0,
+            )
+
+        return documents[0] if len(documents) > 0 else None
+
+    def find(self, filter=None):
+        """Finds the documents whose fields equal the filter values.
+        Args:
+            filter (dict, optional): The filter. Defaults to None (all documents).
+        Returns:
+            list: The documents.
+        """
+        filter = filter if filter is not None else {}
+
+        with self.database.store.lock:
+            return [
+                document
+                for document in self.documents
+                if all(document.get(k) == v for k, v in filter.items())
+            ]
+
+    def count_documents(self, filter: dict):
+        """Counts the documents whose fields equal the filter values.
+        Args:
+            filter (dict): The filter.
+        Returns:
+            int: The amount of documents.
+        """
+        return len(self.find(filter))
+
+    def drop(self):
+        """Drops the collection."""
+        self.database.drop_collection(self.name)
+
+
+class InMemoryDatabase:
+    """Database of an InMemoryDocumentStore."""
+
+    def __init__(self, store, name: str):
+        """Initializes an empty database.
+        Args:
+            store (InMemoryDocumentStore): The store of the database.
+            name (str): The database name.
+        """
+        self.store = store
+        self.name = name
+        self.collections = dict()
+        # Like MongoDB, a collection is only created by its first write
+        self.created = set()
+
+    def __getitem__(self, collection_name: str):
+        """Gets a collection.
+        Args:
+            collection_name (str): The collection name.
+        Returns:
+            InMemoryCollection: The collection.
+        """
+        with self.store.lock:
+            if collection_name not in self.collections:
+                self.collections[collection_name] = InMemoryCollection(
+                    self, collection_name
+                )
+
+            return self.collections[collection_name]
+
+    def list_collection_names(self):
+        """Gets the names of the created collections.
+        Returns:
+            list: The collection names.
+        """
+        with self.store.lock:
+            return sorted(self.created)
+
+    def create_collection(self, collection_name: str):
+        """Creates an empty collection.
+        Args:
+            collection_name (str): The collection name.
+        Returns:
+            InMemoryCollection: The collection.
+        """
+        with self.store.lock:
+            self.created.add(collection_name)
+            return self[collection_name]
+
+    def drop_collection(self, collection_name: str):
+        """Drops a collection.
+        Args:
+            collection_name (str): The collection name.
+        """
+        with self.store.lock:
+            self.collections.pop(collection_name, None)
+            self.created.discard(collection_name)
+
+
+class InMemoryDocumentStore:
+    """Document store held in memory. Stand-in for MongoDB with the
+    subset of the pymongo client interface that is used by the migration."""
+
+    def __init__(self):
+        """Initializes an empty store."""
+        self.lock = threading.RLock()
+        self.databases = dict()
+        self.next_id = 0
+
+    def __getitem__(self, db_name: str):
+        """Gets a database.
+        Args:
+            db_name (str): The database name.
+        Returns:
+            InMemoryDatabase: The database.
+        """
+        with self.lock:
+            if db_name not in self.databases:
+                self.databases[db_name] = InMemoryDatabase(self, db_name)
+
+            return self.databases[db_name]
+
+    def get_next_id(self):
+        """Gets the next document id.
+        Returns:
+            int: The id.
+        """
+        with self.lock:
+            self.next_id += 1
+            return self.next_id
+
+    def drop_database(self, db_name: str):
+        """Drops a database.
+        Args:
+            db_name (str): The database name.
+        """
+        with self.lock:
+            self.databases.pop(db_name, None)
+
+    def close(self):
+        """Does nothing, the documents are kept until they are garbage collected."""
@@ -0,0 +1,782 @@
+# Import necessary packages
+import argparse
+import asyncio
+import inspect
+import time
+from concurrent.futures import ThreadPoolExecutor
+from neo4j import AsyncGraphDatabase
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError
+import migration
+from adapters import AsyncNeo4jGraph, OdbcBackend
+from checkpoint import (
+    TARGET_MONGODB,
+    TARGET_MSSQL,
+    TARGET_NEO4J,
+    CheckpointStore,
+    get_pending_rows,
+    get_resume_key,
+)
+from cypher_builder import to_neo4j_properties
+from delta_sync import SyncState, SyncStateRecorder
+from migration import (
+    apply_migration_plan,
+    chunks,
+    close,
+    compile_m_to_n_plan,
+    configure_logging,
+    create_deferred_constraints,
+    create_relationship_dicts,
+    create_table_progress,
+    create_target_tables,
+    get_inserted_documents,
+    get_m_to_n_constraints,
+    get_m_to_n_indexes,
+    get_mongodb_indexes,
+    get_neo4j_batch_size,
+    get_sync_checksums,
+    log,
+    mn_tables_dict,
+    mongodb_seed_collections,
+    mongodb_seeds,
+    mongodb_tables,
+    neo4j_tables,
+    sql_tables,
+    start_targets,
+)
+from migration_log import DEBUG, ERROR, log_levels
+from mssql_writer import create_insert_query, get_bulk_cursor, insert_rows
+from scheduler import get_dependency_order
+from source_reader import get_peak_rss, read_table
+
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except ImportError:
+    AsyncIOMotorClient = None
+
+
+async def resolve(value):
+    """Awaits the value if it is awaitable. Lets the engine use the
+    synchronous stand-ins (see adapters.InMemoryGraph) like the async clients.
+    Args:
+        value (_type_): The result of a store method.
+    Returns:
+        _type_: The awaited value.
+    """
+    if inspect.isawaitable(value):
+        return await value
+
+    return value
+
+
+async def create_mongodb_collection_async(client, db_name: str, collection_name: str):
+    """Creates a MongoDB collection (see migration.create_mongodb_collection).
+    Args:
+        client (_type_): The Motor client or a synchronous document store.
+        db_name (str): DB name.
+        collection_name (str): Collection name.
+    Returns:
+        bool: True if the collection was created.
+    """
+    db = client[db_name]
+    created = collection_name not in await resolve(db.list_collection_names())
+
+    if created:
+        await resolve(db.create_collection(collection_name))
+
+    collection = db[collection_name]
+
+    for field, unique, name in get_mongodb_indexes(collection_name):
+        await resolve(
+            collection.create_index([(field, ASCENDING)], unique=unique, name=name)
+        )
+
+    return created
+
+
+async def insert_documents_async(collection, documents: list):
+    """Inserts documents (see migration.insert_documents).
+    Args:
+        collection (_type_): The Motor collection or a synchronous collection.
+        documents (list): The documents.
+    Returns:
+        int: The amount of inserted documents.
+    """
+    try:
+        await resolve(collection.insert_many(documents, ordered=False))
+    except BulkWriteError as e:
+        return get_inserted_documents(e)
+
+    return len(documents)
+
+
+class AsyncMigration:
+    """Migration engine on an asyncio event loop. The MSSQL reads and
+    writes run in a thread pool, while the graph writes of many batches
+    are in flight at the same time. The progress is recorded in the same
+    checkpoint journal and sync state as the threaded engine."""
+
+    def __init__(
+        self,
+        source,
+        target,
+        graph,
+        documents,
+        checkpoints: CheckpointStore,
+        sync_state: SyncState,
+        max_in_flight: int,
+        max_workers: int,
+    ):
+        """Initializes the engine.
+        Args:
+            source (_type_): The backend of the old database (see adapters.OdbcBackend).
+            target (_type_): The backend of the new database (see adapters.OdbcBackend).
+            graph (_type_): The graph store (see adapters.AsyncNeo4jGraph).
+            documents (_type_): The document store (Motor client).
+            checkpoints (CheckpointStore): The checkpoint store.
+            sync_state (SyncState): The state of the sync passes.
+            max_in_flight (int): The maximal amount of graph writes in flight.
+            max_workers (int): The maximal amount of concurrently processed tables
+            and of threads for the MSSQL side.
+        Raises:
+            ValueError: Is thrown if max_in_flight or max_workers is not positive.
+        """
+        if max_in_flight <= 0 or max_workers <= 0:
+            raise ValueError("max_in_flight and max_workers must be positive!")
+
+        self.source = source
+        self.target = target
+        self.graph = graph
+        self.documents = documents
+        self.checkpoints = checkpoints
+        self.sync_state = sync_state
+        self.max_in_flight = max_in_flight
+        self.max_workers = max_workers
+        self.executor = None
+        # Created by run, they must belong to the running event loop
+        self.in_flight = None
+        self.table_slots = None
+
+    async def run_blocking(self, func, *inputs):
+        """Runs a blocking function in the thread pool.
+        Args:
+            func (_type_): The function.
+            inputs (_type_): The function inputs.
+        Returns:
+            _type_: The result of the function.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *inputs)
+
+    async def write_batches(self, write, batches: list):
+        """Writes batches concurrently, at most max_in_flight at a time.
+        Args:
+            write (_type_): Function that writes a batch.
+            batches (list): The batches.
+        """
+
+        async def write_batch(batch):
+            async with self.in_flight:
+                await resolve(write(batch))
+
+        await asyncio.gather(*[write_batch(batch) for batch in batches])
+
+    async def write_nodes(
+        self, table: str, columns: list, rows: list, merge_key, last_key
+    ):
+        """Writes the nodes of a chunk and records the checkpoint afterwards.
+        Args:
+            table (str): The table name.
+            columns (list): The column names.
+            rows (list): The rows.
+            merge_key (str): See migration.add_nodes.
+            last_key (_type_): The last primary key of the chunk.
+        Returns:
+            int: The amount of written nodes.
+        """
+        batches = [
+            [
+                to_neo4j_properties(columns, vals, migration.neo4j_decimal_policy)
+                for vals in batch
+            ]
+            for batch in chunks(rows, get_neo4j_batch_size(table))
+        ]
+        await self.write_batches(
+            lambda batch: self.graph.write_nodes(table, batch, merge_key), batches
+        )
+        self.checkpoints.save(table, TARGET_NEO4J, last_key)
+        return len(rows)
+
+    async def write_relationships(
+        self,
+        table: str,
+        chunk: list,
+        relationship_tuples: list,
+        merge: bool,
+        last_key,
+        recorder: SyncStateRecorder,
+    ):
+        """Writes the relationships of a chunk and records the checkpoint
+        and the rows in the sync state afterwards.
+        Args:
+            table (str): The m:n table name.
+            chunk (list): The rows of the chunk.
+            relationship_tuples (list): List of (fromKey, toKey, props) tuples.
+            merge (bool): See migration.create_relationships.
+            last_key (_type_): The last primary key of the chunk.
+            recorder (SyncStateRecorder): The recorder of the sync state.
+        Returns:
+            int: The amount of written relationships.
+        """
+        mn_information = mn_tables_dict[table]
+        batch_size = get_neo4j_batch_size(mn_information["relationshipName"])
+        batches = [
+            create_relationship_dicts(batch, migration.neo4j_decimal_policy)
+            for batch in chunks(relationship_tuples, batch_size)
+        ]
+        await self.write_batches(
+            lambda batch: self.graph.write_relationships(mn_information, batch, merge),
+            batches,
+        )
+        self.checkpoints.save(table, TARGET_NEO4J, last_key)
+        recorder.add(chunk)
+        return len(relationship_tuples)
+
+    async def migrate_table(self, table: str):
+        """Copies a table into the new MSSQL database and creates the
+        corresponding graph nodes (see migration.migrate_table). The graph
+        writes of a chunk overlap the reading and inserting of the next chunk.
+        Args:
+            table (str): The table name.
+        """
+        targets = [TARGET_MSSQL]
+
+        if table in neo4j_tables:
+            targets.append(TARGET_NEO4J)
+
+        progress = {target: self.checkpoints.get(table, target) for target in targets}
+
+        if all(self.checkpoints.is_finished(table, target) for target in targets):
+            log(f"Skipped {table} (already migrated).")
+            return
+
+        conn_old = None
+        conn_new = None
+        neo4j_task = None
+
+        try:
+            conn_old = await self.run_blocking(self.source.connect)
+            conn_new = await self.run_blocking(self.target.connect)
+            resume_key = get_resume_key(list(progress.values()))
+            columns, primary_key, row_chunks = await self.run_blocking(
+                read_table,
+                conn_old,
+                table,
+                migration.source_chunk_size,
+                migration.source_max_buffered_rows,
+                migration.source_read_mode,
+                resume_key,
+            )
+            log(
+                f"Executed SELECT from {table} in {migration.old_mssql_db_name}.",
+                DEBUG,
+            )
+            table_progress = await self.run_blocking(
+                create_table_progress, conn_old, table, primary_key, resume_key
+            )
+
+            if table in neo4j_tables and progress[TARGET_NEO4J] is not None:
+                # The batch after the checkpoint may have been committed already
+                await resolve(self.graph.create_unique_constraint(table, primary_key))
+
+            key_index = columns.index(primary_key)
+            cursor_new = get_bulk_cursor(conn_new, migration.mssql_fast_executemany)
+            insert_query = create_insert_query(table, tuple(columns))
+            merge = start_targets(self.checkpoints, table, progress)
+            start = time.perf_counter()
+            mssql_amount = 0
+            uncommitted = 0
+            amount = 0
+            last_key = None
+
+            while True:
+                chunk = await self.run_blocking(next, row_chunks, None)
+
+                if chunk is None:
+                    break
+
+                last_key = chunk[-1][key_index]
+                rows = get_pending_rows(chunk, key_index, progress[TARGET_MSSQL])
+                inserted = await self.run_blocking(
+                    insert_rows, cursor_new, insert_query, rows
+                )
+                mssql_amount += inserted
+                uncommitted += inserted
+                table_progress.count("mssql", inserted)
+                table_progress.add(len(chunk))
+
+                if (
+                    migration.mssql_commit_interval is not None
+                    and uncommitted >= migration.mssql_commit_interval
+                ):
+                    await self.run_blocking(conn_new.commit)
+                    self.checkpoints.save(table, TARGET_MSSQL, last_key)
+                    uncommitted = 0
+
+                if table not in neo4j_tables:
+                    continue
+
+                # The checkpoints of the chunks are recorded in order
+                if neo4j_task is not None:
+                    nodes = await neo4j_task
+                    amount += nodes
+                    table_progress.count("neo4j", nodes)
+
+                neo4j_task = asyncio.ensure_future(
+                    self.write_nodes(
+                        table,
+                        columns,
+                        get_pending_rows(chunk, key_index, progress[TARGET_NEO4J]),
+                        primary_key if merge else None,
+                        last_key,
+                    )
+                )
+                merge = False
+
+            if neo4j_task is not None:
+                nodes = await neo4j_task
+                amount += nodes
+                table_progress.count("neo4j", nodes)
+                neo4j_task = None
+
+            await self.run_blocking(conn_new.commit)
+            seconds = time.perf_counter() - start
+            log(
+                f"Executed INSERT of {mssql_amount} rows to {table} "
+                f"in {migration.mssql_db_name} in {seconds:.2f}s."
+            )
+
+            if table in neo4j_tables:
+                log(f"Created {amount} graph nodes for {table}.")
+                self.checkpoints.finish(table, TARGET_NEO4J, last_key)
+
+            self.checkpoints.finish(table, TARGET_MSSQL, last_key)
+        finally:
+            if neo4j_task is not None:
+                neo4j_task.cancel()
+
+            close(conn_old)
+            close(conn_new)
+
+    async def migrate_m_to_n_table(self, table: str):
+        """Stores a m:n table as relationships in the graph store
+        (see migration.migrate_m_to_n_table). The graph writes of a chunk
+        overlap the reading of the next chunk.
+        Args:
+            table (str): The table name.
+        """
+        progress = self.checkpoints.get(table, TARGET_NEO4J)
+
+        if self.checkpoints.is_finished(table, TARGET_NEO4J):
+            log(f"Skipped {table} (already migrated).")
+            return
+
+        conn_old = None
+        neo4j_task = None
+
+        try:
+            conn_old = await self.run_blocking(self.source.connect)
+            resume_key = get_resume_key([progress])
+            column_types, checksums = await self.run_blocking(
+                get_sync_checksums, conn_old, table, self.sync_state, progress
+            )
+            columns, primary_key, row_chunks = await self.run_blocking(
+                read_table,
+                conn_old,
+                table,
+                migration.source_chunk_size,
+                migration.source_max_buffered_rows,
+                migration.source_read_mode,
+                resume_key,
+            )
+            log(
+                f"Executed SELECT from {table} in {migration.old_mssql_db_name}.",
+                DEBUG,
+            )
+            table_progress = await self.run_blocking(
+                create_table_progress, conn_old, table, primary_key, resume_key
+            )
+
+            map_row = compile_m_to_n_plan(columns, mn_tables_dict[table])
+            key_index = columns.index(primary_key)
+            merge = start_targets(self.checkpoints, table, {TARGET_NEO4J: progress})
+            recorder = SyncStateRecorder(
+                self.sync_state,
+                table,
+                column_types,
+                columns,
+                primary_key,
+                checksums,
+                migration.sync_range_size,
+                (resume_key + 1 if resume_key is not None else None, None),
+            )
+            start = time.perf_counter()
+            amount = 0
+            last_key = None
+
+            while True:
+                chunk = await self.run_blocking(next, row_chunks, None)
+
+                if chunk is None:
+                    break
+
+                last_key = chunk[-1][key_index]
+                table_progress.add(len(chunk))
+
+                if neo4j_task is not None:
+                    relationships = await neo4j_task
+                    amount += relationships
+                    table_progress.count("neo4j", relationships)
+
+                neo4j_task = asyncio.ensure_future(
+                    self.write_relationships(
+                        table,
+                        chunk,
+                        list(map(map_row, chunk)),
+                        merge,
+                        last_key,
+                        recorder,
+                    )
+                )
+                merge = False
+
+            if neo4j_task is not None:
+                relationships = await neo4j_task
+                amount += relationships
+                table_progress.count("neo4j", relationships)
+                neo4j_task = None
+
+            recorder.finish()
+
+            seconds = time.perf_counter() - start
+            rows_per_second = amount / seconds if seconds > 0 else 0
+            log(
+                f"Created {amount} graph relationships for {table} in {seconds:.2f}s "
+                f"({rows_per_second:.0f} rows/s, "
+                f"old database {migration.old_mssql_db_name})."
+            )
+            self.checkpoints.finish(table, TARGET_NEO4J, last_key)
+        finally:
+            if neo4j_task is not None:
+                neo4j_task.cancel()
+
+            close(conn_old)
+
+    async def seed_collections(self):
+        """Seeds the collections with historical documents
+        (see migration.seed_mongodb_collections). The next chunk is read
+        while the documents of the current chunk are inserted."""
+        conn_old = None
+
+        try:
+            conn_old = await self.run_blocking(self.source.connect)
+
+            for collection_name in mongodb_seed_collections:
+                start = time.perf_counter()
+                collection = self.documents[migration.mongodb_db_name][collection_name]
+                chunks = mongodb_seeds[collection_name](
+                    conn_old, migration.mongodb_insert_batch_size
+                )
+                insert_task = None
+                inserted = 0
+
+                while True:
+                    documents = await self.run_blocking(next, chunks, None)
+
+                    if insert_task is not None:
+                        inserted += await insert_task
+                        insert_task = None
+
+                    if documents is None:
+                        break
+
+                    insert_task = asyncio.ensure_future(
+                        insert_documents_async(collection, documents)
+                    )
+
+                seconds = time.perf_counter() - start
+                log(
+                    f"Seeded {inserted} {collection_name} documents in {seconds:.2f}s "
+                    f"({inserted / seconds if seconds > 0 else 0:.0f} documents/s)."
+                )
+        finally:
+            close(conn_old)
+
+    async def run_in_dependency_order(self, tables: list, dependencies: dict, func):
+        """Runs the coroutine function func for every table as soon as it
+        has finished for all dependencies of the table
+        (see scheduler.run_in_dependency_order). At most max_workers
+        tables are processed at the same time.
+        Args:
+            tables (list): The table names.
+            dependencies (dict): See scheduler.get_table_dependencies.
+            func (_type_): Coroutine function that is called with the table name.
+        Raises:
+            ValueError: Is thrown if the dependencies contain a cycle.
+        """
+        tasks = dict()
+
+        async def run_table(table, parents):
+            await asyncio.gather(*parents)
+
+            async with self.table_slots:
+                await func(table)
+
+        for table in get_dependency_order(tables, dependencies):
+            parents = [
+                tasks[parent]
+                for parent in dependencies.get(table, set())
+                if parent in tasks
+            ]
+            tasks[table] = asyncio.ensure_future(run_table(table, parents))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+
+            raise
+
+    async def run(self):
+        """Runs the migration."""
+        self.in_flight = asyncio.Semaphore(self.max_in_flight)
+        self.table_slots = asyncio.Semaphore(self.max_workers)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        try:
+            dependencies = await self.run_blocking(
+                create_target_tables, self.target, self.checkpoints
+            )
+            await self.run_in_dependency_order(
+                sql_tables, dependencies, self.migrate_table
+            )
+
+            if migration.mssql_deferred_constraints:
+                await self.run_blocking(
+                    create_deferred_constraints, self.target, self.checkpoints
+                )
+
+            start = time.perf_counter()
+
+            for node_name, attribute in get_m_to_n_constraints(mn_tables_dict):
+                await resolve(self.graph.create_unique_constraint(node_name, attribute))
+                log(f"Created Neo4j uniqueness constraint on {node_name}.{attribute}.")
+
+            for relationship_name, attribute in get_m_to_n_indexes(mn_tables_dict):
+                await resolve(
+                    self.graph.create_relationship_index(relationship_name, attribute)
+                )
+                log(f"Created Neo4j index on {relationship_name}.{attribute}.")
+
+            constraint_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            await self.run_in_dependency_order(
+                list(mn_tables_dict.keys()), dict(), self.migrate_m_to_n_table
+            )
+            relationship_seconds = time.perf_counter() - start
+            log(
+                f"Neo4j m:n phase: constraint creation took {constraint_seconds:.2f}s, "
+                f"relationship load took {relationship_seconds:.2f}s."
+            )
+
+            for table in mongodb_tables:
+                if await create_mongodb_collection_async(
+                    self.documents, migration.mongodb_db_name, table
+                ):
+                    self.checkpoints.start(table, TARGET_MONGODB)
+                    self.checkpoints.finish(table, TARGET_MONGODB)
+
+                log(
+                    f"Created MongoDB collection for {table} "
+                    f"in database {migration.mongodb_db_name}."
+                )
+
+            await self.seed_collections()
+        finally:
+            self.executor.shutdown(wait=True)
+
+
+async def run_async_migration(
+    source,
+    target,
+    graph,
+    documents,
+    checkpoint_file: str,
+    resume=False,
+    max_in_flight=None,
+    max_workers=None,
+):
+    """Migrates the relational e commerce model to the polyglot persistence
+    model with the asyncio engine (see migration.run_migration).
+    Args:
+        source (_type_): The backend of the old database (see adapters.OdbcBackend).
+        target (_type_): The backend of the new database (see adapters.OdbcBackend).
+        graph (_type_): The graph store (see adapters.AsyncNeo4jGraph).
+        documents (_type_): The document store (Motor client).
+        checkpoint_file (str): The path of the checkpoint journal.
+        resume (bool, optional): Whether the recorded progress is continued.
+        Defaults to False.
+        max_in_flight (int, optional): The maximal amount of graph writes
+        in flight. Defaults to None (migration.async_max_in_flight).
+        max_workers (int, optional): The maximal amount of concurrently processed
+        tables and of threads for the MSSQL side.
+        Defaults to None (migration.migration_workers).
+    Returns:
+        bool: True if the migration completed.
+    """
+    if max_in_flight is None:
+        max_in_flight = migration.async_max_in_flight
+
+    if max_workers is None:
+        max_workers = migration.migration_workers
+
+    try:
+        checkpoints = None
+        sync_state = None
+        checkpoints = CheckpointStore(checkpoint_file)
+        sync_state = SyncState(migration.sync_state_path)
+
+        if not resume:
+            checkpoints.clear()
+        else:
+            checkpoints.begin_run()
+
+        engine = AsyncMigration(
+            source,
+            target,
+            graph,
+            documents,
+            checkpoints,
+            sync_state,
+            max_in_flight,
+            max_workers,
+        )
+        await engine.run()
+        close(checkpoints)
+        close(sync_state)
+        peak_rss = get_peak_rss()
+
+        if peak_rss is not None:
+            log(f"Peak RSS: {peak_rss:.1f} MiB.")
+
+        log("Script completed.")
+        return True
+    except Exception as e:
+        log("Error occurred: " + str(e), ERROR)
+        close(checkpoints)
+        close(sync_state)
+        log(
+            f"The committed progress is recorded in {checkpoint_file}. "
+            "Run the script with --resume to continue."
+        )
+        return False
+
+
+def get_async_backends():
+    """Gets the backends of the SQL Server, Neo4j and MongoDB instances
+    configured in migration.py for the asyncio engine.
+    Must be called in the running event loop.
+    Raises:
+        ImportError: Is thrown if motor is not installed.
+    Returns:
+        tuple: The backends of the old and the new database,
+        the graph store and the document store.
+    """
+    if AsyncIOMotorClient is None:
+        raise ImportError("The asyncio engine requires motor!")
+
+    source = OdbcBackend(migration.ecommerce_db_conn_str, migration.master_db_conn_str)
+    target = OdbcBackend(
+        migration.new_ecommerce_db_conn_str, migration.master_db_conn_str
+    )
+    connection = migration.neo4j_connection
+    driver = AsyncGraphDatabase.driver(
+        connection["URI"], auth=(connection["Username"], connection["Password"])
+    )
+    graph = AsyncNeo4jGraph(driver)
+    documents = AsyncIOMotorClient(migration.mongodb_connection["connectionString"])
+    return source, target, graph, documents
+
+
+async def migrate(resume: bool, max_in_flight: int):
+    """Runs the asyncio engine on the configured servers.
+    Args:
+        resume (bool): Whether the recorded progress is continued.
+        max_in_flight (int): The maximal amount of graph writes in flight.
+    """
+    source, target, graph, documents = get_async_backends()
+
+    try:
+        await run_async_migration(
+            source,
+            target,
+            graph,
+            documents,
+            migration.checkpoint_path,
+            resume,
+            max_in_flight,
+        )
+    finally:
+        await graph.close()
+        log(f"{graph.name} closed.")
+        close(documents, "MongoDB client closed.")
+
+
+def main():
+    """Migrates the relational e commerce model to the
+    polyglot persistence model with the asyncio engine."""
+    parser = argparse.ArgumentParser(
+        description="Migrates the relational e commerce model to the "
+        "polyglot persistence model with the asyncio engine."
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skips finished tables and continues partially migrated tables "
+        "after the last committed primary key recorded in "
+        f"{migration.checkpoint_path}.",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=migration.async_max_in_flight,
+        help="Maximal amount of Neo4j write transactions in flight.",
+    )
+    parser.add_argument(
+        "--plan",
+        metavar="PATH",
+        default=migration.plan_path,
+        help="Migrates the tables, relationships and collections of a declarative "
+        "plan file instead of the configured ones.",
+    )
+    parser.add_argument(
+        "--log-level", choices=list(log_levels.keys()), help="Minimal log level."
+    )
+    parser.add_argument(
+        "--log-json", action="store_true", help="Writes the log as JSON lines."
+    )
+    args = parser.parse_args()
+    configure_logging(args.log_level, True if args.log_json else None)
+
+    if args.plan is not None:
+        apply_migration_plan(
+            OdbcBackend(migration.ecommerce_db_conn_str, migration.master_db_conn_str),
+            args.plan,
+        )
+
+    asyncio.run(migrate(args.resume, args.max_in_flight))
+
+
+if __name__ == "__main__":
+    main()
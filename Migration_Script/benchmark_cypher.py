@@ -0,0 +1,335 @@
+# Import necessary packages
+import argparse
+import time
+import pyodbc
+from datetime import datetime
+from neo4j import Neo4jDriver
+from cypher_builder import (
+    create_node_query,
+    create_nodes_query,
+    create_relationship_query,
+    create_relationships_query,
+    to_neo4j_properties,
+    to_neo4j_value,
+)
+from migration import (
+    chunks,
+    close,
+    compile_m_to_n_plan,
+    create_dict,
+    ecommerce_db_conn_str,
+    get_neo4j_batch_size,
+    get_neo4j_driver,
+    log,
+    mn_tables_dict,
+    neo4j_connection,
+    neo4j_decimal_policy,
+    neo4j_tables,
+)
+
+
+# Literal Cypher generation (the previous implementation of migration.py)
+def convert_to_neo4j_datatype(val):
+    """Converts a random
+    database type of the value to a Neo4j type.
+    Args:
+        val (_type_): The value.
+    Returns:
+        _type_: The converted value.
+    """
+    if type(val) == str:
+        return f'"{val}"'
+
+    if type(val) == datetime:
+        return f'"{val}"'
+
+    return val
+
+
+def create_neo4j_properties_string(properties_dict: dict):
+    """Creates a properties string from properties dict.
+    E.g.: {"a": 2, "b": 3} -> a: 2, b: 3
+    Args:
+        properties_dict (dict): The dictionary with properties.
+    Returns:
+        str: The Neo4j properties string.
+    """
+    properties = ", ".join(
+        "{0}: {1}".format(k, convert_to_neo4j_datatype(v))
+        for k, v in properties_dict.items()
+    )
+    return properties
+
+
+def is_literal_safe(vals):
+    """Checks whether the values can be inlined as literal text.
+    Strings containing quotes or backslashes break the literal queries.
+    Args:
+        vals (list): The values.
+    Returns:
+        bool: True if every value can be inlined.
+    """
+    return not any(type(v) == str and ('"' in v or "\\" in v) for v in vals)
+
+
+# Benchmark
+def read_table(connection, table: str):
+    """Reads all rows of a table.
+    Args:
+        connection (_type_): The pyodbc connection.
+        table (str): The table name.
+    Returns:
+        tuple: The column names and the rows.
+    """
+    cursor = connection.cursor()
+    columns = [el.column_name for el in cursor.columns(table=table).fetchall()]
+    cursor.execute(f"SELECT * FROM {table}")
+    rows = [list(row) for row in cursor.fetchall()]
+    return columns, rows
+
+
+def run_literal_path(tx, node_data: dict, relationship_data: dict):
+    """Writes every node and relationship with its own literal query.
+    Rows that can not be inlined are skipped.
+    Args:
+        tx (_type_): A Neo4j transaction.
+        node_data (dict): {<label>: (columns, rows)}.
+        relationship_data (dict): {<table>: (mn_information, tuples)}.
+    Returns:
+        tuple: The amount of written and skipped rows.
+    """
+    written = 0
+    skipped = 0
+
+    for label, (columns, rows) in node_data.items():
+        for vals in rows:
+            if not is_literal_safe(vals):
+                skipped += 1
+                continue
+
+            properties = create_neo4j_properties_string(create_dict(columns, vals))
+            tx.run(f"CREATE (n:{label} {{ {properties} }})").consume()
+            written += 1
+
+    for mn_information, tuples in relationship_data.values():
+        for from_key, to_key, props in tuples:
+            from_properties = create_neo4j_properties_string(
+                {mn_information["fromAttribute"]: from_key}
+            )
+            to_properties = create_neo4j_properties_string(
+                {mn_information["toAttribute"]: to_key}
+            )
+            relationship_properties = create_neo4j_properties_string(props)
+            query = (
+                f"MATCH (a:{mn_information['fromEntity']}{{ {from_properties} }}),"
+                f"(b:{mn_information['toEntity']}{{ {to_properties} }}) "
+                f"CREATE (a)-[r:{mn_information['relationshipName']}"
+                f"{{ {relationship_properties} }}]->(b)"
+            )
+            tx.run(query).consume()
+            written += 1
+
+    return written, skipped
+
+
+def run_parameterized_path(tx, node_data: dict, relationship_data: dict):
+    """Writes every node and relationship with its own parameterized query.
+    Args:
+        tx (_type_): A Neo4j transaction.
+        node_data (dict): {<label>: (columns, rows)}.
+        relationship_data (dict): {<table>: (mn_information, tuples)}.
+    Returns:
+        tuple: The amount of written and skipped rows.
+    """
+    written = 0
+
+    for label, (columns, rows) in node_data.items():
+        query = create_node_query(label)
+
+        for vals in rows:
+            properties = to_neo4j_properties(columns, vals, neo4j_decimal_policy)
+            tx.run(query, {"props": properties}).consume()
+            written += 1
+
+    for mn_information, tuples in relationship_data.values():
+        query = create_relationship_query(
+            mn_information["fromEntity"],
+            mn_information["fromAttribute"],
+            mn_information["toEntity"],
+            mn_information["toAttribute"],
+            mn_information["relationshipName"],
+        )
+
+        for from_key, to_key, props in tuples:
+            parameters = {
+                "fromKey": to_neo4j_value(from_key, neo4j_decimal_policy),
+                "toKey": to_neo4j_value(to_key, neo4j_decimal_policy),
+                "props": to_neo4j_properties(
+                    list(props.keys()), list(props.values()), neo4j_decimal_policy
+                ),
+            }
+            tx.run(query, parameters).consume()
+            written += 1
+
+    return written, 0
+
+
+def run_batched_path(tx, node_data: dict, relationship_data: dict):
+    """Writes the nodes and relationships with parameterized UNWIND batches.
+    Args:
+        tx (_type_): A Neo4j transaction.
+        node_data (dict): {<label>: (columns, rows)}.
+        relationship_data (dict): {<table>: (mn_information, tuples)}.
+    Returns:
+        tuple: The amount of written and skipped rows.
+    """
+    written = 0
+
+    for label, (columns, rows) in node_data.items():
+        query = create_nodes_query(label)
+
+        for batch in chunks(rows, get_neo4j_batch_size(label)):
+            node_dicts = [
+                to_neo4j_properties(columns, vals, neo4j_decimal_policy)
+                for vals in batch
+            ]
+            tx.run(query, {"rows": node_dicts}).consume()
+            written += len(node_dicts)
+
+    for mn_information, tuples in relationship_data.values():
+        query = create_relationships_query(
+            mn_information["fromEntity"],
+            mn_information["fromAttribute"],
+            mn_information["toEntity"],
+            mn_information["toAttribute"],
+            mn_information["relationshipName"],
+        )
+        batch_size = get_neo4j_batch_size(mn_information["relationshipName"])
+
+        for batch in chunks(tuples, batch_size):
+            relationship_dicts = [
+                {
+                    "fromKey": to_neo4j_value(from_key, neo4j_decimal_policy),
+                    "toKey": to_neo4j_value(to_key, neo4j_decimal_policy),
+                    "props": to_neo4j_properties(
+                        list(props.keys()), list(props.values()), neo4j_decimal_policy
+                    ),
+                }
+                for from_key, to_key, props in batch
+            ]
+            tx.run(query, {"rows": relationship_dicts}).consume()
+            written += len(relationship_dicts)
+
+    return written, 0
+
+
+def measure(driver: Neo4jDriver, func, node_data: dict, relationship_data: dict):
+    """Runs a write path in one transaction that is rolled back afterwards,
+    so the graph is not modified by the benchmark.
+    Args:
+        driver (Neo4jDriver): The Neo4j driver.
+        func (_type_): The write path.
+        node_data (dict): {<label>: (columns, rows)}.
+        relationship_data (dict): {<table>: (mn_information, tuples)}.
+    Returns:
+        tuple: The seconds needed and the amount of written and skipped rows.
+    """
+    with driver.session() as session:
+        tx = session.begin_transaction()
+
+        try:
+            start = time.perf_counter()
+            written, skipped = func(tx, node_data, relationship_data)
+            seconds = time.perf_counter() - start
+        finally:
+            tx.rollback()
+
+    return seconds, written, skipped
+
+
+def prefix_mn_information(mn_information: dict, prefix: str):
+    """Prefixes the entities of a m:n information dictionary.
+    Args:
+        mn_information (dict): See migration.create_neo4j_m_to_n_dict.
+        prefix (str): The label prefix.
+    Returns:
+        dict: The prefixed copy of the dictionary.
+    """
+    result = dict(mn_information)
+    result["fromEntity"] = prefix + mn_information["fromEntity"]
+    result["toEntity"] = prefix + mn_information["toEntity"]
+    return result
+
+
+def main():
+    """Compares the literal and the parameterized Cypher
+    generation on the seed dataset."""
+    parser = argparse.ArgumentParser(
+        description="Compares literal and parameterized Cypher writes."
+    )
+    parser.add_argument(
+        "--label-prefix",
+        default="Benchmark",
+        help="Prefix of the labels written by the benchmark "
+        "(avoids clashes with the uniqueness constraints of a migrated graph).",
+    )
+    parser.add_argument(
+        "--repetitions", type=int, default=3, help="Runs per write path."
+    )
+    args = parser.parse_args()
+
+    conn_old = None
+    neo4j_driver = None
+
+    try:
+        conn_old = pyodbc.connect(ecommerce_db_conn_str)
+        log(f"Connected to {ecommerce_db_conn_str}.")
+        neo4j_driver = get_neo4j_driver(neo4j_connection)
+        node_data = {}
+
+        for table in neo4j_tables:
+            node_data[args.label_prefix + table] = read_table(conn_old, table)
+
+        relationship_data = {}
+
+        for table, mn_information in mn_tables_dict.items():
+            columns, rows = read_table(conn_old, table)
+            tuples = list(map(compile_m_to_n_plan(columns, mn_information), rows))
+            relationship_data[table] = (
+                prefix_mn_information(mn_information, args.label_prefix),
+                tuples,
+            )
+
+        log("Loaded the seed dataset.")
+        paths = [
+            ("literal", run_literal_path),
+            ("parameterized", run_parameterized_path),
+            ("parameterized UNWIND", run_batched_path),
+        ]
+        results = {}
+
+        for name, func in paths:
+            runs = [
+                measure(neo4j_driver, func, node_data, relationship_data)
+                for _ in range(args.repetitions)
+            ]
+            seconds = min(run[0] for run in runs)
+            results[name] = (seconds, runs[0][1], runs[0][2])
+            log(f"Measured the {name} path.")
+
+        literal_seconds = results["literal"][0]
+
+        for name, (seconds, written, skipped) in results.items():
+            rows_per_second = written / seconds if seconds > 0 else 0
+            speedup = literal_seconds / seconds if seconds > 0 else 0
+            log(
+                f"{name}: {seconds:.2f}s, {written} rows ({rows_per_second:.0f} rows/s), "
+                f"{skipped} rows not writable, {speedup:.1f}x vs. literal."
+            )
+    finally:
+        close(conn_old)
+        close(neo4j_driver)
+
+
+if __name__ == "__main__":
+    main()
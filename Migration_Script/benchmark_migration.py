@@ -0,0 +1,618 @@
+# Import necessary packages
+import argparse
+import asyncio
+import cProfile
+import functools
+import os
+import pstats
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+import migration
+import migration_log
+import migration_trace
+from adapters import (
+    GraphManager,
+    InMemoryDocumentStore,
+    InMemoryGraph,
+    NullGraph,
+    SqliteBackend,
+    get_shared_graph,
+)
+from async_engine import run_async_migration
+from csv_export import CsvGraphExport
+from migration import (
+    apply_migration_plan,
+    configure_logging,
+    log,
+    start_trace,
+    mn_tables_dict,
+    mongodb_db_name,
+    mongodb_tables,
+    get_m_to_n_constraints,
+    mssql_tables,
+    neo4j_tables,
+    run_migration,
+    sql_tables,
+    verify_migration,
+)
+from data_scaler import DatabaseOutput, scale_database
+from migration_log import ERROR
+from recommender import run_recommendations
+from scheduler import get_dependency_order
+from script_loader import get_script_database
+
+# m:n tables of the old database (see initial_database_sql_script.sql)
+mn_source_tables = [
+"""
+CREATE TABLE ProductToCategory
+(
+   ProductToCategoryId INT PRIMARY KEY,
+   CategoryId INT NOT NULL,
+   ProductId INT NOT NULL,
+   FOREIGN KEY (CategoryId) REFERENCES Category(CategoryId),
+   FOREIGN KEY (ProductId) REFERENCES Product(ProductId)
+);
+""",
+"""
+CREATE TABLE ProductToCart
+(
+  ProductToCartId INT PRIMARY KEY,
+  VendorToProductId INT NOT NULL,
+  CartId INT NOT NULL,
+  Amount INT NOT NULL,
+  FOREIGN KEY (VendorToProductId) REFERENCES VendorToProduct(VendorToProductId),
+  FOREIGN KEY (CartId) REFERENCES ShoppingCart(CartId)
+);
+""",
+]
+
+
+def create_value(type_name: str, column: str, row_id: int, rnd: random.Random):
+    """Creates a synthetic value of a column.
+    Args:
+        type_name (str): The declared column type (e.g. VARCHAR(100)).
+        column (str): The column name.
+        row_id (int): The primary key of the row.
+        rnd (random.Random): The random generator.
+    Returns:
+        _type_: The value.
+    """
+    base_type = type_name.split("(")[0].strip().upper()
+
+    if base_type == "INT":
+        return rnd.randint(1, 100)
+
+    if base_type == "BIT":
+        return rnd.randint(0, 1)
+
+    if base_type == "DECIMAL":
+        return Decimal(rnd.randint(100, 100000)) / 100
+
+    if base_type == "DATETIME":
+        return datetime(2023, 1, 1) + timedelta(minutes=rnd.randint(0, 525600))
+
+    if base_type == "TEXT":
+        return f"{column} {row_id} " + "lorem ipsum " * rnd.randint(5, 30)
+
+    length = int(type_name.split("(")[1].rstrip(")")) if "(" in type_name else 100
+    return f"{column}{row_id}"[:length]
+
+
+def create_source_database(source: SqliteBackend, rows: int, seed: int):
+    """Creates the tables of the old database and fills them with synthetic rows.
+    The foreign keys reference existing rows.
+    Args:
+        source (SqliteBackend): The backend of the old database.
+        rows (int): The amount of rows per table.
+        seed (int): The seed of the random generator.
+    Returns:
+        int: The amount of created rows.
+    """
+    rnd = random.Random(seed)
+    connection = source.connect()
+    cursor = connection.cursor()
+    amount = 0
+
+    for statement in mssql_tables + mn_source_tables:
+        cursor.execute(statement)
+
+    for table in sql_tables + list(mn_tables_dict.keys()):
+        info = cursor.execute(f"PRAGMA table_info({table})").fetchall()
+        references = {
+            el[3]: el[2]
+            for el in cursor.execute(f"PRAGMA foreign_key_list({table})").fetchall()
+        }
+        columns = [el[1] for el in info]
+        table_rows = []
+
+        for row_id in range(1, rows + 1):
+            row = []
+
+            for _, column, type_name, _, _, pk in info:
+                if pk > 0:
+                    row.append(row_id)
+                elif column in references:
+                    row.append(rnd.randint(1, rows))
+                else:
+                    row.append(create_value(type_name, column, row_id, rnd))
+
+            table_rows.append(row)
+
+        cursor.executemany(
+            f"INSERT INTO {table} ({','.join(columns)}) "
+            f"VALUES ({','.join('?' for _ in columns)})",
+            table_rows,
+        )
+        amount += len(table_rows)
+
+    connection.commit()
+    connection.close()
+    return amount
+
+
+def copy_script_database(source: SqliteBackend, script_path: str):
+    """Creates the old database from a T-SQL script (see
+    initial_database_sql_script.sql). The script is loaded once per hash,
+    later benchmarks copy the cached SQLite file.
+    Args:
+        source (SqliteBackend): The backend of the old database.
+        script_path (str): The path of the script.
+    Returns:
+        int: The amount of rows.
+    """
+    database_path, _ = get_script_database(script_path)
+    shutil.copyfile(database_path, source.path)
+    connection = source.connect()
+    cursor = connection.cursor()
+    amount = sum(
+        cursor.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in sql_tables + list(mn_tables_dict.keys())
+    )
+    connection.close()
+    return amount
+
+
+def run_sequentially(tables: list, dependencies: dict, func, max_workers: int):
+    """Executes func for every table in dependency order in the calling thread.
+    Replaces scheduler.run_in_dependency_order while profiling, because cProfile
+    only sees the thread that enabled it.
+    Args:
+        tables (list): The table names.
+        dependencies (dict): See scheduler.get_table_dependencies.
+        func (_type_): Function that is called with the table name.
+        max_workers (int): Ignored.
+    Returns:
+        dict: Dictionary of the format {<table>: <result of func>}.
+    """
+    return {table: func(table) for table in get_dependency_order(tables, dependencies)}
+
+
+def run_async_benchmark_migration(*inputs):
+    """Runs the asyncio engine (see async_engine.run_async_migration).
+    Args:
+        inputs (_type_): See run_migration.
+    Returns:
+        bool: True if the migration completed.
+    """
+    return asyncio.run(run_async_migration(*inputs))
+
+
+def get_graph_counts(graph):
+    """Counts the nodes of every node name and the relationships
+    of every relationship name of the graph.
+    Args:
+        graph (InMemoryGraph): The graph.
+    Returns:
+        dict: Dictionary of the format {<name>: <amount>}.
+    """
+    counts = {table: graph.count_nodes(table) for table in neo4j_tables}
+
+    for el in mn_tables_dict.values():
+        counts[el["relationshipName"]] = graph.count_relationships(
+            el["relationshipName"]
+        )
+
+    return counts
+
+
+def run_benchmark(
+    rows: int,
+    seed: int,
+    directory: str,
+    profiler=None,
+    async_engine=False,
+    export=False,
+    verify=False,
+    sharded=False,
+    plan=None,
+    script=None,
+    scale=None,
+    upsert=False,
+    recommend=False,
+    graph_manager=None,
+):
+    """Runs the full migration on the stand-ins and logs the throughput.
+    Args:
+        rows (int): The amount of rows per source table.
+        seed (int): The seed of the random generator.
+        directory (str): The directory of the SQLite files.
+        profiler (cProfile.Profile, optional): If set, the migration
+        (without the creation of the source database) is profiled. Defaults to None.
+        async_engine (bool, optional): Whether the asyncio engine is used.
+        Defaults to False.
+        export (bool, optional): Whether the graph is written as CSV files
+        for neo4j-admin import (see csv_export.CsvGraphExport). Defaults to False.
+        verify (bool, optional): Whether the migration is verified afterwards
+        (see verify.run_verification). Defaults to False.
+        sharded (bool, optional): Whether migration.sharded_tables are migrated
+        by migration.shard_processes worker processes. Their graph writes
+        are discarded (see adapters.NullGraph) unless graph_manager is set.
+        Defaults to False.
+        plan (str, optional): The path of a migration plan file that is compiled
+        and then loaded from its cache (see migration.apply_migration_plan).
+        Defaults to None.
+        script (str, optional): The path of a T-SQL script whose rows replace the
+        synthetic rows (see copy_script_database). Defaults to None.
+        scale (float, optional): If set, the old database is generated at this
+        scale factor of the seed script (see data_scaler.scale_database)
+        instead of rows per table. Defaults to None.
+        upsert (bool, optional): Whether the migration is run again in the upsert
+        mode against the loaded targets (see migration.upsert_table).
+        Defaults to False.
+        recommend (bool, optional): Whether the product recommendations are
+        precomputed afterwards, once from scratch and once incrementally
+        (see recommender.run_recommendations). Defaults to False.
+        graph_manager (GraphManager, optional): If set, the graph is held by this
+        started manager process, so the worker processes of the sharded mode
+        write to it like to a graph server. Defaults to None.
+    Returns:
+        bool: True if the migration completed.
+    """
+    source = SqliteBackend(os.path.join(directory, "ECommerce.sqlite"))
+    target = SqliteBackend(os.path.join(directory, "ECommercePolyglot.sqlite"))
+    graph = InMemoryGraph() if graph_manager is None else graph_manager.InMemoryGraph()
+
+    if export:
+        graph = CsvGraphExport(
+            os.path.join(directory, "export"),
+            dict(get_m_to_n_constraints(mn_tables_dict)),
+            migration.export_gzip,
+            migration.export_gzip_level,
+        )
+
+    documents = InMemoryDocumentStore()
+    if scale is not None:
+        output = DatabaseOutput(source, mssql_tables + mn_source_tables)
+
+        try:
+            amount = sum(scale_database(output, scale, seed).values())
+        finally:
+            output.close()
+    elif script is None:
+        amount = create_source_database(source, rows, seed)
+        log(f"Created {amount} synthetic rows in {source.name}.")
+    else:
+        amount = copy_script_database(source, script)
+        log(f"Copied {amount} rows of {script} to {source.name}.")
+
+    if plan is not None:
+        migration.plan_cache_path = os.path.join(directory, "plan_cache.json")
+
+        # The second run hits the cache of the first one
+        for _ in range(2):
+            apply_migration_plan(source, plan)
+
+    checkpoint_file = os.path.join(directory, "checkpoint.sqlite")
+    migration.sync_state_path = os.path.join(directory, "sync_state.sqlite")
+    inputs = [source, target, graph, documents, checkpoint_file]
+    run = run_async_benchmark_migration if async_engine else run_migration
+
+    if sharded:
+        graph_factory = NullGraph
+
+        if graph_manager is not None:
+            graph_factory = functools.partial(get_shared_graph, graph)
+
+        inputs += [False, graph_factory]
+
+    start = time.perf_counter()
+
+    if profiler is None:
+        completed = run(*inputs)
+    else:
+        completed = profiler.runcall(run, *inputs)
+
+    seconds = time.perf_counter() - start
+
+    if not completed:
+        return False
+
+    if upsert:
+        before = get_graph_counts(graph)
+
+        # The second re-run finds no changed ranges in the sync state
+        for run in range(1, 3):
+            start = time.perf_counter()
+            completed = run_migration(*inputs[:5], False, None, True)
+            upsert_seconds = time.perf_counter() - start
+            log(
+                f"Upsert re-run {run} took {upsert_seconds:.2f}s "
+                f"({upsert_seconds / seconds:.0%} of the migration time)."
+            )
+
+            if not completed:
+                return False
+
+            # The re-run must neither add nor remove nodes or relationships
+            after = get_graph_counts(graph)
+
+            if after != before:
+                changed = {
+                    name: (before[name], after[name])
+                    for name in before.keys()
+                    if before[name] != after[name]
+                }
+                log(f"The upsert re-run changed the graph counts {changed}.", ERROR)
+                return False
+
+    if verify:
+        start = time.perf_counter()
+        report = verify_migration(
+            source,
+            target,
+            None if export or (sharded and graph_manager is None) else graph,
+            os.path.join(directory, "verification.json"),
+        )
+        verify_seconds = time.perf_counter() - start
+        log(
+            f"Verified {amount} rows in {verify_seconds:.2f}s "
+            f"({verify_seconds / seconds:.0%} of the migration time), "
+            f"{'passed' if report['passed'] else 'failed'}."
+        )
+
+    if recommend:
+        state_path = os.path.join(directory, "recommendation_state.npz")
+
+        # The second pass finds no changed baskets
+        for _ in range(2):
+            run_recommendations(source, documents, mongodb_db_name, state_path)
+
+    if export:
+        graph.close()
+        files = list(graph.node_files.values()) + list(
+            graph.relationship_files.values()
+        )
+        size = sum(os.path.getsize(el.path) for el in files) / 1024**2
+        log(
+            f"Migrated {amount} rows in {seconds:.2f}s ({amount / seconds:.0f} rows/s): "
+            f"exported {sum(el.rows for el in files)} nodes and relationships "
+            f"({size:.1f} MiB) to {graph.directory}."
+        )
+        return True
+
+    nodes = sum(graph.count_nodes(table) for table in neo4j_tables)
+    relationships = sum(
+        graph.count_relationships(el["relationshipName"])
+        for el in mn_tables_dict.values()
+    )
+    collections = documents[mongodb_db_name].list_collection_names()
+    log(
+        f"Migrated {amount} rows in {seconds:.2f}s ({amount / seconds:.0f} rows/s): "
+        f"{nodes} nodes, {relationships} relationships, "
+        f"{len(collections)} of {len(mongodb_tables)} collections."
+    )
+    return True
+
+
+def main():
+    """Benchmarks the migration on SQLite and in-memory stand-ins
+    of SQL Server, Neo4j and MongoDB."""
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the migration on SQLite and in-memory stand-ins "
+        "of SQL Server, Neo4j and MongoDB."
+    )
+    parser.add_argument(
+        "--rows", type=int, default=10000, help="Amount of rows per source table."
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed of the synthetic rows."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Amount of tables that are copied concurrently "
+        "(SQLite serializes the writers).",
+    )
+    parser.add_argument(
+        "--pipeline", action="store_true", help="Enables the pipelined mode."
+    )
+    parser.add_argument(
+        "--async",
+        dest="async_engine",
+        action="store_true",
+        help="Uses the asyncio engine (see async_engine.py).",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=migration.async_max_in_flight,
+        help="Maximal amount of graph writes in flight of the asyncio engine.",
+    )
+    parser.add_argument(
+        "--shard-processes",
+        type=int,
+        default=1,
+        help="Amount of worker processes of the sharded tables "
+        f"({', '.join(migration.sharded_tables)}, graph writes are discarded "
+        "without --shared-graph).",
+    )
+    parser.add_argument(
+        "--shard-range-size",
+        type=int,
+        default=migration.shard_range_size,
+        help="Amount of primary keys per range of the sharded tables.",
+    )
+    parser.add_argument(
+        "--shard-min-rows",
+        type=int,
+        default=migration.shard_min_rows,
+        help="Sharded tables with fewer rows are migrated without worker processes.",
+    )
+    parser.add_argument(
+        "--shared-graph",
+        action="store_true",
+        help="Holds the graph in a manager process that the worker processes of "
+        "--shard-processes write to (see adapters.GraphManager), instead of "
+        "discarding their graph writes.",
+    )
+    parser.add_argument(
+        "--export",
+        action="store_true",
+        help="Writes the graph as CSV files for neo4j-admin import.",
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Verifies the migration afterwards (see verify.py).",
+    )
+    parser.add_argument(
+        "--script",
+        metavar="PATH",
+        help="Migrates the rows of a T-SQL script (e.g. "
+        "initial_database_sql_script.sql) instead of synthetic rows. "
+        "The script is loaded once into a cached SQLite file.",
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        help="Generates the old database at this scale factor of the seed script "
+        "with skewed references (see data_scaler.py) instead of --rows per table.",
+    )
+    parser.add_argument(
+        "--plan",
+        metavar="PATH",
+        help="Migrates the tables of a migration plan file (see migration_plan.json).",
+    )
+    parser.add_argument(
+        "--upsert",
+        action="store_true",
+        help="Runs the migration again in the upsert mode against the loaded targets.",
+    )
+    parser.add_argument(
+        "--recommend",
+        action="store_true",
+        help="Precomputes the product recommendations afterwards (see recommender.py).",
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=list(migration_log.log_levels.keys()),
+        help="Minimal log level.",
+    )
+    parser.add_argument(
+        "--log-json", action="store_true", help="Writes the log as JSON lines."
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="Writes the spans of the migration as a Chrome trace event file "
+        "and logs the hot spots (see migration_trace.py).",
+    )
+    parser.add_argument(
+        "--trace-cprofile",
+        action="store_true",
+        help="Additionally profiles every phase of --trace with cProfile.",
+    )
+    parser.add_argument(
+        "--profile",
+        type=int,
+        default=0,
+        help="Profiles the migration and prints this amount of functions "
+        "with the highest cumulative time. The tables are migrated one after another "
+        "in the main thread (the writers of the pipelined mode are not profiled).",
+    )
+    args = parser.parse_args()
+    configure_logging(args.log_level, True if args.log_json else None)
+    migration.migration_workers = args.workers
+    migration.pipeline_mode = args.pipeline
+    migration.async_max_in_flight = args.max_in_flight
+    migration.shard_processes = args.shard_processes
+    migration.shard_range_size = args.shard_range_size
+    migration.shard_min_rows = args.shard_min_rows
+
+    if args.shard_processes > 1 and (args.async_engine or args.export):
+        parser.error("--shard-processes can not be combined with --async or --export")
+
+    if args.shared_graph and args.shard_processes <= 1:
+        parser.error("--shared-graph requires --shard-processes")
+
+    if args.upsert and (args.shard_processes > 1 or args.export):
+        parser.error("--upsert can not be combined with --shard-processes or --export")
+
+    if args.trace_cprofile and (args.trace is None or args.profile > 0):
+        parser.error("--trace-cprofile requires --trace and excludes --profile")
+
+    if args.trace is not None:
+        start_trace(True if args.trace_cprofile else None)
+
+    graph_manager = None
+
+    try:
+        if args.shared_graph:
+            graph_manager = GraphManager()
+            graph_manager.start()
+
+        with tempfile.TemporaryDirectory() as directory:
+            if args.profile <= 0:
+                run_benchmark(
+                    args.rows,
+                    args.seed,
+                    directory,
+                    None,
+                    args.async_engine,
+                    args.export,
+                    args.verify,
+                    args.shard_processes > 1,
+                    args.plan,
+                    args.script,
+                    args.scale,
+                    args.upsert,
+                    args.recommend,
+                    graph_manager,
+                )
+                return
+
+            migration.run_in_dependency_order = run_sequentially
+            profiler = cProfile.Profile()
+            run_benchmark(
+                args.rows,
+                args.seed,
+                directory,
+                profiler,
+                args.async_engine,
+                args.export,
+                args.verify,
+                args.shard_processes > 1,
+                args.plan,
+                args.script,
+                args.scale,
+                args.upsert,
+                args.recommend,
+                graph_manager,
+            )
+            migration_log.flush()
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(args.profile)
+
+    finally:
+        if graph_manager is not None:
+            graph_manager.shutdown()
+
+        if args.trace is not None:
+            migration_trace.finish(args.trace)
+
+if __name__ == "__main__":
+    main()
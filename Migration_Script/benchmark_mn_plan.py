@@ -0,0 +1,98 @@
+# Import necessary packages
+import argparse
+import random
+import time
+from migration import (
+    compile_m_to_n_plan,
+    create_neo4j_m_to_n_tuple,
+    log,
+    mn_tables_dict,
+)
+
+# Columns of the m:n tables of the old database (see initial_database_sql_script.sql)
+mn_table_columns = {
+    "ProductToCart": ["ProductToCartId", "VendorToProductId", "CartId", "Amount"],
+    "ProductToCategory": ["ProductToCategoryId", "CategoryId", "ProductId"],
+}
+
+
+def create_rows(columns: list, amount: int, seed: int):
+    """Creates synthetic rows of a m:n table.
+    Args:
+        columns (list): The column names (the first column is the primary key).
+        amount (int): The amount of rows.
+        seed (int): The seed of the random generator.
+    Returns:
+        list: The rows.
+    """
+    rnd = random.Random(seed)
+    return [
+        tuple([row_id] + [rnd.randint(1, 100000) for _ in columns[1:]])
+        for row_id in range(1, amount + 1)
+    ]
+
+
+def measure(func, rows: list, repetitions: int):
+    """Measures the fastest mapping of all rows.
+    Args:
+        func (_type_): Function that maps a row.
+        rows (list): The rows.
+        repetitions (int): The amount of repetitions.
+    Returns:
+        float: The fastest duration in seconds.
+    """
+    durations = []
+
+    for _ in range(repetitions):
+        start = time.perf_counter()
+
+        for row in rows:
+            func(row)
+
+        durations.append(time.perf_counter() - start)
+
+    return min(durations)
+
+
+def main():
+    """Compares the per-row cost of create_neo4j_m_to_n_tuple
+    with a compiled mapping plan (compile_m_to_n_plan)."""
+    parser = argparse.ArgumentParser(
+        description="Compares the per-row cost of create_neo4j_m_to_n_tuple "
+        "with a compiled mapping plan."
+    )
+    parser.add_argument(
+        "--rows", type=int, default=1000000, help="Amount of rows per m:n table."
+    )
+    parser.add_argument(
+        "--repetitions", type=int, default=3, help="Repetitions per mapping."
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the rows.")
+    args = parser.parse_args()
+
+    for table, columns in mn_table_columns.items():
+        mn_information = mn_tables_dict[table]
+        rows = create_rows(columns, args.rows, args.seed)
+        map_row = compile_m_to_n_plan(columns, mn_information)
+
+        for row in rows[:1000]:
+            if map_row(row) != create_neo4j_m_to_n_tuple(
+                columns, list(row), mn_information
+            ):
+                raise ValueError(f"The mapping plan of {table} differs!")
+
+        before = measure(
+            lambda row: create_neo4j_m_to_n_tuple(columns, list(row), mn_information),
+            rows,
+            args.repetitions,
+        )
+        after = measure(map_row, rows, args.repetitions)
+        log(
+            f"{table}: {len(rows)} rows, per row "
+            f"{before / len(rows) * 1e9:.0f} ns before and "
+            f"{after / len(rows) * 1e9:.0f} ns after ({before / after:.1f}x faster)."
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+# Import necessary packages
+import sqlite3
+import threading
+
+# Targets of the migration
+TARGET_DDL = "ddl"
+TARGET_MSSQL = "mssql"
+TARGET_NEO4J = "neo4j"
+TARGET_MONGODB = "mongodb"
+
+
+class CheckpointStore:
+    """Journal of the migration progress in a local SQLite database.
+    For every table and target, the last committed primary key
+    and whether the table is finished are recorded. Tables that are migrated
+    in primary key ranges (see migration.migrate_table_sharded) record their
+    finished ranges. The journal is also the record of what the last run
+    created and from which key it wrote (see migration.run_rollback)."""
+
+    def __init__(self, path: str):
+        """Opens (and creates) the journal.
+        Args:
+            path (str): The path of the SQLite file.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS Checkpoint
+            (
+                TableName TEXT NOT NULL,
+                Target TEXT NOT NULL,
+                LastKey,
+                Finished INTEGER NOT NULL,
+                PRIMARY KEY (TableName, Target)
+            )
+            """
+        )
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ShardRange
+            (
+                TableName TEXT NOT NULL,
+                RangeStart INTEGER NOT NULL,
+                RangeEnd INTEGER NOT NULL,
+                PRIMARY KEY (TableName, RangeStart, RangeEnd)
+            )
+            """
+        )
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS RunStart
+            (
+                TableName TEXT NOT NULL,
+                Target TEXT NOT NULL,
+                StartKey,
+                Created INTEGER NOT NULL,
+                PRIMARY KEY (TableName, Target)
+            )
+            """
+        )
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS RunRange
+            (
+                TableName TEXT NOT NULL,
+                RangeStart INTEGER NOT NULL,
+                RangeEnd INTEGER NOT NULL,
+                PRIMARY KEY (TableName, RangeStart, RangeEnd)
+            )
+            """
+        )
+
+    def get(self, table: str, target: str):
+        """Gets the progress of a table in a target.
+        Args:
+            table (str): The table name.
+            target (str): The target.
+        Returns:
+            dict: Dictionary of the format {"lastKey": <value>, "finished": <value>}
+            or None if the table was not started in the target.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT LastKey, Finished FROM Checkpoint "
+                "WHERE TableName = ? AND Target = ?",
+                [table, target],
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return {"lastKey": row[0], "finished": row[1] == 1}
+
+    def is_finished(self, table: str, target: str):
+        """Checks whether a table is finished in a target.
+        Args:
+            table (str): The table name.
+            target (str): The target.
+        Returns:
+            bool: True if the table is finished.
+        """
+        progress = self.get(table, target)
+        return progress is not None and progress["finished"]
+
+    def save(self, table: str, target: str, last_key, finished=False):
+        """Records the last committed primary key of a table in a target.
+        Args:
+            table (str): The table name.
+            target (str): The target.
+            last_key (_type_): The last committed primary key.
+            finished (bool, optional): Whether the table is finished.
+            Defaults to False.
+        """
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO Checkpoint "
+                "(TableName, Target, LastKey, Finished) VALUES (?, ?, ?, ?)",
+                [table, target, last_key, 1 if finished else 0],
+            )
+
+    def finish(self, table: str, target: str, last_key=None):
+        """Marks a table as finished in a target.
+        Args:
+            table (str): The table name.
+            target (str): The target.
+            last_key (_type_, optional): The last primary key. Defaults to None
+            (the last recorded key is kept).
+        """
+        if last_key is None:
+            progress = self.get(table, target)
+            last_key = progress["lastKey"] if progress is not None else None
+
+        self.save(table, target, last_key, True)
+
+    def start(self, table: str, target: str):
+        """Records that the run starts writing a table (or creates another object)
+        in a target. The last committed primary key is kept as the start key of
+        the run, a table that was not started yet is recorded as created by the run.
+        Args:
+            table (str): The table name.
+            target (str): The target.
+        Returns:
+            dict: The progress before the run (see get).
+        """
+        progress = self.get(table, target)
+
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO RunStart "
+                "(TableName, Target, StartKey, Created) VALUES (?, ?, ?, ?)",
+                [
+                    table,
+                    target,
+                    progress["lastKey"] if progress is not None else None,
+                    1 if progress is None else 0,
+                ],
+            )
+
+        if progress is None:
+            self.save(table, target, None)
+
+        return progress
+
+    def get_start(self, table: str, target: str):
+        """Gets where the run started writing a table in a target.
+        Args:
+            table (str): The table name.
+            target (str): The target.
+        Returns:
+            dict: Dictionary of the format {"startKey": <value>, "created": <value>}
+            or None if the run did not write the table in the target.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT StartKey, Created FROM RunStart "
+                "WHERE TableName = ? AND Target = ?",
+                [table, target],
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return {"startKey": row[0], "created": row[1] == 1}
+
+    def get_created(self, target: str):
+        """Gets the tables (or other objects) that the run created in a target.
+        Args:
+            target (str): The target.
+        Returns:
+            list: The names.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT TableName FROM RunStart WHERE Target = ? AND Created = 1",
+                [target],
+            ).fetchall()
+
+        return [row[0] for row in rows]
+
+    def finish_range(self, table: str, key_range: tuple):
+        """Marks a primary key range of a table as finished in all targets.
+        Args:
+            table (str): The table name.
+            key_range (tuple): The first key and the key after the range.
+        """
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO ShardRange "
+                "(TableName, RangeStart, RangeEnd) VALUES (?, ?, ?)",
+                [table, key_range[0], key_range[1]],
+            )
+
+    def get_finished_ranges(self, table: str):
+        """Gets the finished primary key ranges of a table.
+        Args:
+            table (str): The table name.
+        Returns:
+            set: The (first key, key after the range) tuples.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT RangeStart, RangeEnd FROM ShardRange WHERE TableName = ?",
+                [table],
+            ).fetchall()
+
+        return {(row[0], row[1]) for row in rows}
+
+    def start_ranges(self, table: str, key_ranges: list):
+        """Records the primary key ranges of a table that the run writes.
+        Args:
+            table (str): The table name.
+            key_ranges (list): The (first key, key after the range) tuples.
+        """
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO RunRange "
+                "(TableName, RangeStart, RangeEnd) VALUES (?, ?, ?)",
+                [[table, el[0], el[1]] for el in key_ranges],
+            )
+
+    def get_run_ranges(self, table: str):
+        """Gets the primary key ranges of a table that the run wrote.
+        Args:
+            table (str): The table name.
+        Returns:
+            set: The (first key, key after the range) tuples.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT RangeStart, RangeEnd FROM RunRange WHERE TableName = ?",
+                [table],
+            ).fetchall()
+
+        return {(row[0], row[1]) for row in rows}
+
+    def begin_run(self):
+        """Forgets where the previous run started, the recorded progress is kept
+        (a resumed run starts at the last committed keys)."""
+        with self.lock:
+            self.connection.execute("DELETE FROM RunStart")
+            self.connection.execute("DELETE FROM RunRange")
+
+    def restore(self):
+        """Resets the recorded progress to the start of the run: the objects that
+        the run created are forgotten, the tables that it continued are reset
+        to their start keys and their ranges that it finished are unfinished."""
+        with self.lock:
+            self.connection.execute(
+                "DELETE FROM Checkpoint WHERE EXISTS (SELECT 1 FROM RunStart r "
+                "WHERE r.TableName = Checkpoint.TableName "
+                "AND r.Target = Checkpoint.Target AND r.Created = 1)"
+            )
+            self.connection.execute(
+                "UPDATE Checkpoint SET Finished = 0, LastKey = (SELECT r.StartKey "
+                "FROM RunStart r WHERE r.TableName = Checkpoint.TableName "
+                "AND r.Target = Checkpoint.Target) WHERE EXISTS (SELECT 1 "
+                "FROM RunStart r WHERE r.TableName = Checkpoint.TableName "
+                "AND r.Target = Checkpoint.Target)"
+            )
+            self.connection.execute(
+                "DELETE FROM ShardRange WHERE EXISTS (SELECT 1 FROM RunRange r "
+                "WHERE r.TableName = ShardRange.TableName "
+                "AND r.RangeStart = ShardRange.RangeStart "
+                "AND r.RangeEnd = ShardRange.RangeEnd)"
+            )
+
+        self.begin_run()
+
+    def clear(self):
+        """Deletes all recorded progress."""
+        with self.lock:
+            self.connection.execute("DELETE FROM Checkpoint")
+            self.connection.execute("DELETE FROM ShardRange")
+
+        self.begin_run()
+
+    def close(self):
+        """Closes the journal."""
+        with self.lock:
+            self.connection.close()
+
+
+def get_resume_key(progresses: list):
+    """Gets the primary key after which a table has to be read
+    so that every unfinished target receives all missing rows.
+    Args:
+        progresses (list): The progress of every target (see CheckpointStore.get).
+    Returns:
+        _type_: The primary key or None if the table has to be read completely.
+    """
+    keys = []
+
+    for progress in progresses:
+        if progress is not None and progress["finished"]:
+            continue
+
+        if progress is None or progress["lastKey"] is None:
+            return None
+
+        keys.append(progress["lastKey"])
+
+    return min(keys) if len(keys) > 0 else None
+
+
+def get_pending_rows(rows: list, key_index: int, progress):
+    """Gets the rows that were not committed in a target yet.
+    Args:
+        rows (list): Rows ordered by the primary key.
+        key_index (int): The index of the primary key column.
+        progress (dict): The progress of the target (see CheckpointStore.get).
+    Returns:
+        list: The pending rows.
+    """
+    if progress is None:
+        return rows
+
+    if progress["finished"]:
+        return []
+
+    if progress["lastKey"] is None:
+        return rows
+
+    last_key = progress["lastKey"]
+    return [row for row in rows if row[key_index] > last_key]
@@ -0,0 +1,183 @@
+# Import necessary packages
+import re
+from scheduler import create_table_pattern
+
+# FOREIGN KEY clause of a CREATE TABLE statement with its leading comma
+foreign_key_pattern = re.compile(
+    r",?\s*FOREIGN\s+KEY\s*\((\w+)\)\s*REFERENCES\s+(\w+)\s*\((\w+)\)",
+    re.IGNORECASE,
+)
+
+
+def get_foreign_keys(statement: str):
+    """Gets the foreign keys of a CREATE TABLE statement.
+    Args:
+        statement (str): The CREATE TABLE statement.
+    Raises:
+        ValueError: Is thrown if the statement does not create a table.
+    Returns:
+        list: List of dictionaries of the format {"table": <value>,
+        "column": <value>, "referencedTable": <value>,
+        "referencedColumn": <value>, "name": <constraint name>}.
+    """
+    match = create_table_pattern.search(statement)
+
+    if match is None:
+        raise ValueError("The statement must contain a CREATE TABLE clause!")
+
+    table = match.group(1)
+    return [
+        {
+            "table": table,
+            "column": column,
+            "referencedTable": referenced_table,
+            "referencedColumn": referenced_column,
+            "name": f"FK_{table}_{column}",
+        }
+        for column, referenced_table, referenced_column in foreign_key_pattern.findall(
+            statement
+        )
+    ]
+
+
+def remove_foreign_keys(statement: str):
+    """Removes the FOREIGN KEY clauses of a CREATE TABLE statement,
+    so the table is created with its primary key only.
+    Args:
+        statement (str): The CREATE TABLE statement.
+    Returns:
+        str: The statement without foreign keys.
+    """
+    return foreign_key_pattern.sub("", statement)
+
+
+def create_table_if_not_exists_query(statement: str):
+    """Guards a CREATE TABLE statement, so an existing table is kept.
+    Args:
+        statement (str): The CREATE TABLE statement.
+    Raises:
+        ValueError: Is thrown if the statement does not create a table.
+    Returns:
+        str: The query.
+    """
+    match = create_table_pattern.search(statement)
+
+    if match is None:
+        raise ValueError("The statement must contain a CREATE TABLE clause!")
+
+    return f"IF OBJECT_ID(N'{match.group(1)}', N'U') IS NULL {statement.strip()}"
+
+
+def create_foreign_key_index_query(foreign_key: dict, if_not_exists=False):
+    """Creates the query of the secondary index on a foreign key column.
+    Args:
+        foreign_key (dict): See get_foreign_keys.
+        if_not_exists (bool, optional): If True, an existing index is kept.
+        Defaults to False.
+    Returns:
+        str: The query.
+    """
+    index_name = f"IX_{foreign_key['table']}_{foreign_key['column']}"
+    query = (
+        f"CREATE INDEX {index_name} "
+        f"ON {foreign_key['table']} ({foreign_key['column']});"
+    )
+
+    if if_not_exists:
+        return (
+            f"IF INDEXPROPERTY(OBJECT_ID(N'{foreign_key['table']}'), "
+            f"N'{index_name}', 'IndexID') IS NULL {query}"
+        )
+
+    return query
+
+
+def create_foreign_key_query(foreign_key: dict, if_not_exists=False):
+    """Creates the query that adds a foreign key to a loaded table.
+    WITH CHECK lets SQL Server trust the constraint for query plans.
+    Args:
+        foreign_key (dict): See get_foreign_keys.
+        if_not_exists (bool, optional): If True, an existing foreign key
+        is kept. Defaults to False.
+    Returns:
+        str: The query.
+    """
+    guard = ""
+
+    if if_not_exists:
+        guard = f"IF OBJECT_ID(N'{foreign_key['name']}', N'F') IS NULL "
+
+    return guard + (
+        f"ALTER TABLE {foreign_key['table']} WITH CHECK "
+        f"ADD CONSTRAINT {foreign_key['name']} FOREIGN KEY ({foreign_key['column']}) "
+        f"REFERENCES {foreign_key['referencedTable']}({foreign_key['referencedColumn']});"
+    )
+
+
+def drop_foreign_key_index_query(foreign_key: dict):
+    """Creates the query that drops the secondary index on a foreign key column
+    (see create_foreign_key_index_query).
+    Args:
+        foreign_key (dict): See get_foreign_keys.
+    Returns:
+        str: The query.
+    """
+    index_name = f"IX_{foreign_key['table']}_{foreign_key['column']}"
+    return f"DROP INDEX {index_name} ON {foreign_key['table']};"
+
+
+def drop_foreign_key_query(foreign_key: dict):
+    """Creates the query that drops a foreign key of a table.
+    Args:
+        foreign_key (dict): See get_foreign_keys.
+    Returns:
+        str: The query.
+    """
+    return f"ALTER TABLE {foreign_key['table']} DROP CONSTRAINT {foreign_key['name']};"
+
+
+def create_violations_query(foreign_key: dict, select: str):
+    """Creates the anti join that selects the rows of a table whose
+    foreign key value has no referenced row.
+    Args:
+        foreign_key (dict): See get_foreign_keys.
+        select (str): The selected expressions (e.g. "COUNT(*)").
+    Returns:
+        str: The query.
+    """
+    return (
+        f"SELECT {select} FROM {foreign_key['table']} c "
+        f"LEFT JOIN {foreign_key['referencedTable']} p "
+        f"ON c.{foreign_key['column']} = p.{foreign_key['referencedColumn']} "
+        f"WHERE c.{foreign_key['column']} IS NOT NULL "
+        f"AND p.{foreign_key['referencedColumn']} IS NULL"
+    )
+
+
+def find_violations(cursor, foreign_key: dict, primary_key: str, max_keys: int):
+    """Validates a foreign key in one set based pass over the table.
+    Args:
+        cursor (_type_): A cursor of the database.
+        foreign_key (dict): See get_foreign_keys.
+        primary_key (str): The primary key column name of the table.
+        max_keys (int): The maximal amount of reported primary keys.
+    Returns:
+        dict: Dictionary of the format {"constraint": <name>,
+        "violations": <amount of rows>, "keys": [[<primary key>, <value>], ...]}.
+    """
+    violations = cursor.execute(
+        create_violations_query(foreign_key, "COUNT(*)")
+    ).fetchone()[0]
+    keys = []
+
+    if violations > 0 and max_keys > 0:
+        rows = cursor.execute(
+            create_violations_query(
+                foreign_key,
+                f"TOP ({max_keys}) c.{primary_key}, c.{foreign_key['column']}",
+            )
+            + f" ORDER BY c.{primary_key}"
+        ).fetchall()
+        keys = [list(el) for el in rows]
+
+    return {"constraint": foreign_key["name"], "violations": violations, "keys": keys}
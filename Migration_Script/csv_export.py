@@ -0,0 +1,340 @@
+# Import necessary packages
+import gzip
+import os
+import threading
+from csv import writer
+from cypher_builder import (
+    create_relationship_index_query,
+    create_unique_constraint_query,
+)
+from neo4j.time import DateTime
+
+# Types of the header fields of neo4j-admin import
+csv_field_types = [
+    (bool, "boolean"),
+    (int, "long"),
+    (float, "double"),
+    (DateTime, "datetime"),
+    (str, "string"),
+]
+
+
+def get_csv_field_type(val):
+    """Gets the neo4j-admin import type of a value.
+    Args:
+        val (_type_): The value (see cypher_builder.to_neo4j_value).
+    Raises:
+        TypeError: Is thrown if the type is not supported.
+    Returns:
+        str: The type name.
+    """
+    # bool is checked first because it is a subclass of int
+    for value_type, type_name in csv_field_types:
+        if isinstance(val, value_type):
+            return type_name
+
+    raise TypeError(f"Values of type {type(val).__name__} can not be exported!")
+
+
+def to_csv_value(val):
+    """Converts a value to its neo4j-admin import representation.
+    None is written as an empty field (no property).
+    Args:
+        val (_type_): The value (see cypher_builder.to_neo4j_value).
+    Returns:
+        _type_: The converted value.
+    """
+    if isinstance(val, bool):
+        return "true" if val else "false"
+
+    if isinstance(val, DateTime):
+        return val.iso_format()
+
+    return val
+
+
+class CsvExportFile:
+    """Data file of a node name or relationship name that is written
+    row by row, with a separate header file that is written on close.
+    The property columns and their types are taken from the first rows."""
+
+    def __init__(
+        self,
+        path: str,
+        id_fields: list,
+        trailer_field: str,
+        compress: bool,
+        compression_level: int,
+    ):
+        """Opens the data file.
+        Args:
+            path (str): The path of the data file without extension.
+            id_fields (list): The header fields before the properties
+            (e.g. [":ID(Product)"]).
+            trailer_field (str): The header field after the properties
+            (":LABEL" or ":TYPE").
+            compress (bool): Whether the data file is compressed with gzip.
+            compression_level (int): The gzip compression level (1-9).
+        """
+        self.header_path = path + "_header.csv"
+        self.id_fields = id_fields
+        self.trailer_field = trailer_field
+        self.lock = threading.Lock()
+        self.properties = None
+        self.property_set = set()
+        self.types = dict()
+        self.rows = 0
+
+        if compress:
+            self.path = path + ".csv.gz"
+            self.file = gzip.open(
+                self.path,
+                "wt",
+                compresslevel=compression_level,
+                newline="",
+                encoding="utf-8",
+            )
+        else:
+            self.path = path + ".csv"
+            self.file = open(self.path, "w", newline="", encoding="utf-8")
+
+        self.writer = writer(self.file)
+
+    def write(self, rows: list):
+        """Writes rows.
+        Args:
+            rows (list): List of (id values, properties, trailer value) tuples.
+        Raises:
+            ValueError: Is thrown if a row has a property
+            that the first row did not have.
+        """
+        with self.lock:
+            if self.properties is None and len(rows) > 0:
+                self.properties = list(rows[0][1].keys())
+                self.property_set = set(self.properties)
+
+            csv_rows = []
+
+            for id_values, properties, trailer in rows:
+                if not self.property_set.issuperset(properties):
+                    raise ValueError(
+                        f"The properties of every row of {self.path} must be "
+                        f"{self.properties}!"
+                    )
+
+                values = [properties.get(k) for k in self.properties]
+
+                for k, v in zip(self.properties, values):
+                    if v is not None and k not in self.types:
+                        self.types[k] = get_csv_field_type(v)
+
+                csv_rows.append(
+                    list(id_values) + [to_csv_value(v) for v in values] + [trailer]
+                )
+
+            self.writer.writerows(csv_rows)
+            self.rows += len(csv_rows)
+
+    def close(self):
+        """Closes the data file and writes the header file."""
+        with self.lock:
+            self.file.close()
+            fields = list(self.id_fields)
+
+            for k in self.properties or []:
+                type_name = self.types.get(k, "string")
+                fields.append(k if type_name == "string" else f"{k}:{type_name}")
+
+            fields.append(self.trailer_field)
+
+            with open(self.header_path, "w", newline="", encoding="utf-8") as file:
+                writer(file).writerow(fields)
+
+
+class CsvGraphExport:
+    """Graph store that writes the nodes and relationships as CSV files
+    for the offline importer (neo4j-admin import) instead of running
+    transactions. The nodes are identified in ID spaces named after their
+    node name and keyed by the matched attributes of the relationships."""
+
+    def __init__(
+        self,
+        directory: str,
+        id_attributes: dict,
+        compress=False,
+        compression_level=1,
+    ):
+        """Initializes the export. Existing files of the same names are replaced.
+        Args:
+            directory (str): The directory of the files (created if needed).
+            id_attributes (dict): Dictionary of the format
+            {<node name>: <attribute>} (see migration.get_m_to_n_constraints).
+            compress (bool, optional): Whether the data files are compressed
+            with gzip. Defaults to False.
+            compression_level (int, optional): The gzip compression level (1-9).
+            Defaults to 1 (fastest).
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.name = f"CSV export to {directory}"
+        self.directory = directory
+        self.id_attributes = id_attributes
+        self.compress = compress
+        self.compression_level = compression_level
+        self.lock = threading.Lock()
+        self.node_files = dict()
+        self.relationship_files = dict()
+        self.constraints = []
+        self.relationship_indexes = []
+
+    def get_file(self, files: dict, name: str, id_fields: list, trailer_field: str):
+        """Gets (and opens) the data file of a node name or relationship name.
+        Args:
+            files (dict): The opened files of the kind.
+            name (str): The node name or relationship name.
+            id_fields (list): See CsvExportFile.
+            trailer_field (str): See CsvExportFile.
+        Returns:
+            CsvExportFile: The data file.
+        """
+        with self.lock:
+            if name not in files:
+                files[name] = CsvExportFile(
+                    os.path.join(self.directory, name),
+                    id_fields,
+                    trailer_field,
+                    self.compress,
+                    self.compression_level,
+                )
+
+            return files[name]
+
+    def create_unique_constraint(self, node_name: str, attribute: str):
+        """Records a uniqueness constraint. The importer does not create
+        constraints, they are written to constraints.cypher on close.
+        Args:
+            node_name (str): The node name.
+            attribute (str): The attribute that has to be unique.
+        """
+        with self.lock:
+            if (node_name, attribute) not in self.constraints:
+                self.constraints.append((node_name, attribute))
+
+    def create_relationship_index(self, relationship_name: str, attribute: str):
+        """Records a relationship property index. The importer does not create
+        indexes, they are written to constraints.cypher on close.
+        Args:
+            relationship_name (str): The name of the relationship.
+            attribute (str): The indexed property.
+        """
+        with self.lock:
+            if (relationship_name, attribute) not in self.relationship_indexes:
+                self.relationship_indexes.append((relationship_name, attribute))
+
+    def write_nodes(self, node_name: str, rows: list, merge_key=None):
+        """Writes a node for every parameter map.
+        Args:
+            node_name (str): The node name.
+            rows (list): The parameter maps.
+            merge_key (str, optional): Ignored, the importer
+            only loads empty databases. Defaults to None.
+        """
+        id_attribute = self.id_attributes.get(node_name)
+        id_fields = [] if id_attribute is None else [f":ID({node_name})"]
+        export_file = self.get_file(self.node_files, node_name, id_fields, ":LABEL")
+
+        if id_attribute is None:
+            export_file.write([([], row, node_name) for row in rows])
+            return
+
+        export_file.write([([row[id_attribute]], row, node_name) for row in rows])
+
+    def write_relationships(self, mn_information: dict, rows: list, merge=False):
+        """Writes a relationship for every {fromKey, toKey, props} map.
+        Args:
+            mn_information (dict): See migration.create_neo4j_m_to_n_dict.
+            rows (list): The {fromKey, toKey, props} maps.
+            merge (bool, optional): Ignored, the importer
+            only loads empty databases. Defaults to False.
+        """
+        relationship_name = mn_information["relationshipName"]
+        id_fields = [
+            f":START_ID({mn_information['fromEntity']})",
+            f":END_ID({mn_information['toEntity']})",
+        ]
+        export_file = self.get_file(
+            self.relationship_files, relationship_name, id_fields, ":TYPE"
+        )
+        export_file.write(
+            [
+                ([row["fromKey"], row["toKey"]], row["props"], relationship_name)
+                for row in rows
+            ]
+        )
+
+    def delete_nodes(self, node_name: str, key_attribute: str, keys: list):
+        """Not supported by the export.
+        Raises:
+            ValueError: Is always thrown.
+        """
+        raise ValueError("The CSV export can only write new nodes!")
+
+    def delete_node_range(
+        self, node_name: str, key_attribute: str, first, last, batch_size: int
+    ):
+        """Not supported by the export.
+        Raises:
+            ValueError: Is always thrown.
+        """
+        raise ValueError("The CSV export can only write new nodes!")
+
+    def delete_relationships(self, mn_information: dict, rows: list):
+        """Not supported by the export.
+        Raises:
+            ValueError: Is always thrown.
+        """
+        raise ValueError("The CSV export can only write new relationships!")
+
+    def get_import_arguments(self):
+        """Gets the arguments of neo4j-admin import for the written files.
+        Returns:
+            list: The arguments.
+        """
+        arguments = [
+            "--multiline-fields=true",
+            "--skip-bad-relationships=true",
+        ]
+
+        for option, files in [
+            ("--nodes", self.node_files),
+            ("--relationships", self.relationship_files),
+        ]:
+            for export_file in files.values():
+                header_path = os.path.abspath(export_file.header_path)
+                arguments.append(
+                    f"{option}={header_path},{os.path.abspath(export_file.path)}"
+                )
+
+        return arguments
+
+    def close(self):
+        """Closes the data files and writes the header files, the arguments
+        of neo4j-admin import (neo4j_admin_import.txt) and the queries
+        of the uniqueness constraints and relationship indexes (constraints.cypher)."""
+        with self.lock:
+            files = list(self.node_files.values()) + list(
+                self.relationship_files.values()
+            )
+
+        for export_file in files:
+            export_file.close()
+
+        with open(os.path.join(self.directory, "neo4j_admin_import.txt"), "w") as file:
+            file.write(" \\\n".join(self.get_import_arguments()) + "\n")
+
+        with open(os.path.join(self.directory, "constraints.cypher"), "w") as file:
+            for node_name, attribute in self.constraints:
+                file.write(create_unique_constraint_query(node_name, attribute) + ";\n")
+
+            for relationship_name, attribute in self.relationship_indexes:
+                query = create_relationship_index_query(relationship_name, attribute)
+                file.write(query + ";\n")
@@ -0,0 +1,368 @@
+# Import necessary packages
+from datetime import datetime, timezone
+from decimal import Decimal
+from functools import lru_cache
+from neo4j.time import DateTime
+
+# Policies for DECIMAL values (e.g. VendorToProduct.UnitPriceEuro)
+DECIMAL_AS_FLOAT = "float"
+DECIMAL_AS_STRING = "string"
+decimal_policies = [DECIMAL_AS_FLOAT, DECIMAL_AS_STRING]
+
+
+def to_neo4j_value(val, decimal_policy=DECIMAL_AS_FLOAT):
+    """Converts a random database type of the value
+    to a native Neo4j driver type that can be sent as a query parameter.
+    Datetimes without a time zone are interpreted as UTC.
+    Args:
+        val (_type_): The value.
+        decimal_policy (str, optional): Either DECIMAL_AS_FLOAT
+        or DECIMAL_AS_STRING. Defaults to DECIMAL_AS_FLOAT.
+    Raises:
+        ValueError: Is thrown if decimal_policy is unknown.
+    Returns:
+        _type_: The converted value.
+    """
+    if type(val) == datetime:
+        if val.tzinfo is None:
+            val = val.replace(tzinfo=timezone.utc)
+
+        return DateTime.from_native(val)
+
+    if type(val) == Decimal:
+        if decimal_policy == DECIMAL_AS_FLOAT:
+            return float(val)
+
+        if decimal_policy == DECIMAL_AS_STRING:
+            return str(val)
+
+        raise ValueError(f"decimal_policy must be one of {decimal_policies}!")
+
+    return val
+
+
+def to_neo4j_properties(param_names, vals, decimal_policy=DECIMAL_AS_FLOAT):
+    """Creates the parameter map of a node or relationship.
+    E.g. ["a", "b"], [1, Decimal("2.50")] -> {"a": 1, "b": 2.5}
+    Args:
+        param_names (list): The parameter names.
+        vals (list): The parameter values.
+        decimal_policy (str, optional): See to_neo4j_value.
+        Defaults to DECIMAL_AS_FLOAT.
+    Raises:
+        ValueError: Is thrown if param_names and
+        vals do not have an equal length.
+    Returns:
+        dict: The parameter map.
+    """
+    if len(param_names) != len(vals):
+        raise ValueError("param_names must have the same length as vals!")
+
+    return {
+        name: to_neo4j_value(val, decimal_policy)
+        for name, val in zip(param_names, vals)
+    }
+
+
+@lru_cache(maxsize=None)
+def create_node_query(node_name: str):
+    """Creates the query that creates a single node
+    from the parameter $props.
+    Args:
+        node_name (str): The node name.
+    Returns:
+        str: The query.
+    """
+    return f"CREATE (n:{node_name}) SET n = $props"
+
+
+@lru_cache(maxsize=None)
+def create_nodes_query(node_name: str):
+    """Creates the query that creates a node for every
+    parameter map in the parameter $rows.
+    Args:
+        node_name (str): The node name.
+    Returns:
+        str: The query.
+    """
+    return f"UNWIND $rows AS row CREATE (n:{node_name}) SET n = row"
+
+
+@lru_cache(maxsize=None)
+def create_relationship_query(
+    from_entity: str,
+    from_attribute: str,
+    to_entity: str,
+    to_attribute: str,
+    relationship_name: str,
+):
+    """Creates the query that creates a single relationship
+    between the nodes matched by the parameters $fromKey and $toKey.
+    The relationship properties are set from the parameter $props.
+    Args:
+        from_entity (str): The source entity.
+        from_attribute (str): The matched attribute of the source entity.
+        to_entity (str): The destination entity.
+        to_attribute (str): The matched attribute of the destination entity.
+        relationship_name (str): The name of the relationship.
+    Returns:
+        str: The query.
+    """
+    return (
+        f"MATCH (a:{from_entity} {{{from_attribute}: $fromKey}}) "
+        f"MATCH (b:{to_entity} {{{to_attribute}: $toKey}}) "
+        f"CREATE (a)-[r:{relationship_name}]->(b) "
+        "SET r = $props"
+    )
+
+
+@lru_cache(maxsize=None)
+def create_relationships_query(
+    from_entity: str,
+    from_attribute: str,
+    to_entity: str,
+    to_attribute: str,
+    relationship_name: str,
+):
+    """Creates the query that creates a relationship for every
+    {fromKey, toKey, props} map in the parameter $rows.
+    Args:
+        from_entity (str): The source entity.
+        from_attribute (str): The matched attribute of the source entity.
+        to_entity (str): The destination entity.
+        to_attribute (str): The matched attribute of the destination entity.
+        relationship_name (str): The name of the relationship.
+    Returns:
+        str: The query.
+    """
+    return (
+        "UNWIND $rows AS row "
+        f"MATCH (a:{from_entity} {{{from_attribute}: row.fromKey}}) "
+        f"MATCH (b:{to_entity} {{{to_attribute}: row.toKey}}) "
+        f"CREATE (a)-[r:{relationship_name}]->(b) "
+        "SET r = row.props"
+    )
+
+
+@lru_cache(maxsize=None)
+def create_unique_constraint_query(node_name: str, attribute: str):
+    """Creates the query that creates a uniqueness constraint
+    on a node attribute if it does not exist yet.
+    Args:
+        node_name (str): The node name.
+        attribute (str): The attribute that has to be unique.
+    Returns:
+        str: The query.
+    """
+    return (
+        f"CREATE CONSTRAINT IF NOT EXISTS FOR (n:{node_name}) "
+        f"REQUIRE n.{attribute} IS UNIQUE"
+    )
+
+
+@lru_cache(maxsize=None)
+def create_relationship_index_query(relationship_name: str, attribute: str):
+    """Creates the query that creates a range index on a relationship
+    property if it does not exist yet.
+    Args:
+        relationship_name (str): The name of the relationship.
+        attribute (str): The indexed property.
+    Returns:
+        str: The query.
+    """
+    return (
+        f"CREATE INDEX IF NOT EXISTS FOR ()-[r:{relationship_name}]-() "
+        f"ON (r.{attribute})"
+    )
+
+
+@lru_cache(maxsize=None)
+def merge_nodes_query(node_name: str, key_attribute: str):
+    """Creates the query that creates or updates a node for every
+    parameter map in the parameter $rows. The nodes are matched by
+    the key attribute, so writing the same rows twice is idempotent.
+    Args:
+        node_name (str): The node name.
+        key_attribute (str): The attribute that identifies a node.
+    Returns:
+        str: The query.
+    """
+    return (
+        "UNWIND $rows AS row "
+        f"MERGE (n:{node_name} {{{key_attribute}: row.{key_attribute}}}) "
+        "SET n = row"
+    )
+
+
+@lru_cache(maxsize=None)
+def merge_relationships_query(
+    from_entity: str,
+    from_attribute: str,
+    to_entity: str,
+    to_attribute: str,
+    relationship_name: str,
+    key_attribute: str,
+):
+    """Creates the query that creates or updates a relationship for every
+    {fromKey, toKey, props} map in the parameter $rows. The relationships
+    are matched by the key property (the primary key of the m:n row), so rows
+    of the same node pair stay separate and writing the same rows twice
+    is idempotent.
+    Args:
+        from_entity (str): The source entity.
+        from_attribute (str): The matched attribute of the source entity.
+        to_entity (str): The destination entity.
+        to_attribute (str): The matched attribute of the destination entity.
+        relationship_name (str): The name of the relationship.
+        key_attribute (str): The property that identifies a relationship.
+    Returns:
+        str: The query.
+    """
+    return (
+        "UNWIND $rows AS row "
+        f"MATCH (a:{from_entity} {{{from_attribute}: row.fromKey}}) "
+        f"MATCH (b:{to_entity} {{{to_attribute}: row.toKey}}) "
+        f"MERGE (a)-[r:{relationship_name} "
+        f"{{{key_attribute}: row.props.{key_attribute}}}]->(b) "
+        "SET r = row.props"
+    )
+
+
+@lru_cache(maxsize=None)
+def delete_nodes_query(node_name: str, key_attribute: str):
+    """Creates the query that deletes the nodes (and their relationships)
+    whose key attribute is contained in the parameter $keys.
+    Args:
+        node_name (str): The node name.
+        key_attribute (str): The attribute that identifies a node.
+    Returns:
+        str: The query.
+    """
+    return (
+        "UNWIND $keys AS key "
+        f"MATCH (n:{node_name} {{{key_attribute}: key}}) "
+        "DETACH DELETE n"
+    )
+
+
+@lru_cache(maxsize=None)
+def delete_node_range_query(node_name: str, key_attribute: str, batch_size: int):
+    """Creates the query that deletes the nodes (and their relationships) whose
+    key attribute is in the range from the parameter $first to the parameter
+    $last (inclusive) in transactions of batch_size nodes. Must run in an
+    implicit (auto commit) transaction.
+    Args:
+        node_name (str): The node name.
+        key_attribute (str): The attribute that identifies a node.
+        batch_size (int): The amount of nodes per transaction.
+    Returns:
+        str: The query.
+    """
+    return (
+        f"MATCH (n:{node_name}) "
+        f"WHERE n.{key_attribute} >= $first AND n.{key_attribute} <= $last "
+        "CALL { WITH n DETACH DELETE n } "
+        f"IN TRANSACTIONS OF {int(batch_size)} ROWS"
+    )
+
+
+@lru_cache(maxsize=None)
+def delete_relationships_query(
+    from_entity: str,
+    from_attribute: str,
+    to_entity: str,
+    to_attribute: str,
+    relationship_name: str,
+    key_attribute: str,
+):
+    """Creates the query that deletes the relationship of every
+    {fromKey, toKey, key} map in the parameter $rows. Only the relationship
+    whose key property is the key is deleted, not the other relationships
+    between the same nodes.
+    Args:
+        from_entity (str): The source entity.
+        from_attribute (str): The matched attribute of the source entity.
+        to_entity (str): The destination entity.
+        to_attribute (str): The matched attribute of the destination entity.
+        relationship_name (str): The name of the relationship.
+        key_attribute (str): The property that identifies a relationship.
+    Returns:
+        str: The query.
+    """
+    return (
+        "UNWIND $rows AS row "
+        f"MATCH (a:{from_entity} {{{from_attribute}: row.fromKey}})"
+        f"-[r:{relationship_name} {{{key_attribute}: row.key}}]->"
+        f"(b:{to_entity} {{{to_attribute}: row.toKey}}) "
+        "DELETE r"
+    )
+
+
+@lru_cache(maxsize=None)
+def count_nodes_query(node_name: str):
+    """Creates the query that counts the nodes of a node name.
+    Args:
+        node_name (str): The node name.
+    Returns:
+        str: The query.
+    """
+    return f"MATCH (n:{node_name}) RETURN count(n) AS amount"
+
+
+@lru_cache(maxsize=None)
+def count_relationships_query(relationship_name: str):
+    """Creates the query that counts the relationships of a relationship name.
+    Args:
+        relationship_name (str): The relationship name.
+    Returns:
+        str: The query.
+    """
+    return f"MATCH ()-[r:{relationship_name}]->() RETURN count(r) AS amount"
+
+
+@lru_cache(maxsize=None)
+def read_nodes_query(node_name: str, key_attribute: str):
+    """Creates the query that reads the properties of the nodes whose key
+    attribute is in the range from the parameter $start to the parameter $end
+    (exclusive).
+    Args:
+        node_name (str): The node name.
+        key_attribute (str): The attribute that identifies a node.
+    Returns:
+        str: The query.
+    """
+    return (
+        f"MATCH (n:{node_name}) "
+        f"WHERE n.{key_attribute} >= $start AND n.{key_attribute} < $end "
+        "RETURN properties(n) AS props"
+    )
+
+
+@lru_cache(maxsize=None)
+def read_relationships_query(
+    from_entity: str,
+    from_attribute: str,
+    to_entity: str,
+    to_attribute: str,
+    relationship_name: str,
+    key_attribute: str,
+):
+    """Creates the query that reads the relationships whose key property
+    is in the range from the parameter $start to the parameter $end
+    (exclusive) as {fromKey, toKey, props} maps.
+    Args:
+        from_entity (str): The source entity.
+        from_attribute (str): The matched attribute of the source entity.
+        to_entity (str): The destination entity.
+        to_attribute (str): The matched attribute of the destination entity.
+        relationship_name (str): The name of the relationship.
+        key_attribute (str): The property that identifies a relationship.
+    Returns:
+        str: The query.
+    """
+    return (
+        f"MATCH (a:{from_entity})-[r:{relationship_name}]->(b:{to_entity}) "
+        f"WHERE r.{key_attribute} >= $start AND r.{key_attribute} < $end "
+        f"RETURN a.{from_attribute} AS fromKey, b.{to_attribute} AS toKey, "
+        "properties(r) AS props"
+    )
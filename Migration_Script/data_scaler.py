@@ -0,0 +1,749 @@
+# Import necessary packages
+import argparse
+import csv
+import math
+import os
+import time
+from adapters import OdbcBackend, SqliteBackend
+from migration_log import log
+from mssql_writer import create_insert_query, get_bulk_cursor, insert_rows
+from scheduler import get_dependency_order, get_table_dependencies
+from script_loader import get_script_tables
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet as parquet
+except ImportError:
+    pyarrow = None
+
+# Seed script whose CREATE TABLE statements define the generated tables
+# (next to this file, so the scaler can be run from any working directory)
+scaler_script_path = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "initial_database_sql_script.sql"
+)
+# Row counts of the seed script (scale factor 1)
+seed_cardinalities = {
+    "Customer": 200,
+    "Address": 900,
+    "CustomerToAddress": 200,
+    "Product": 500,
+    "Category": 7,
+    "ProductToCategory": 500,
+    "Vendor": 200,
+    "VendorToAddress": 200,
+    "VendorToProduct": 20000,
+    "CustomerOrder": 200,
+    "Courier": 20,
+    "OrderPosition": 600,
+    "ShoppingCart": 200,
+    "ProductToCart": 2000,
+    "CourierToAddress": 20,
+}
+# Tables that keep their seed row count at every scale factor
+fixed_tables = ["Category"]
+# Line tables whose vendor products are distinct per basket (see BasketLayout),
+# like in the application, which increases the Amount of an existing line instead
+basket_tables = {"ProductToCart": "ShoppingCart", "OrderPosition": "CustomerOrder"}
+# Amount of rows that are generated and written at a time
+scaler_chunk_size = 100000
+# Zipf exponent of the vendor products in carts and order positions (0: uniform)
+product_zipf_exponent = 1.0
+# Zipf exponent of the customers of the orders (0: uniform)
+customer_zipf_exponent = 0.8
+# Output formats of the scaled data
+FORMAT_CSV = "csv"
+FORMAT_PARQUET = "parquet"
+FORMAT_SQLITE = "sqlite"
+FORMAT_MSSQL = "mssql"
+output_formats = [FORMAT_CSV, FORMAT_PARQUET, FORMAT_SQLITE, FORMAT_MSSQL]
+# Values of the generated text columns
+first_names = ["Max", "Anna", "Luca", "Sophie", "Paul", "Marie", "Felix", "Emma"]
+last_names = ["Müller", "Schmidt", "Schneider", "Fischer", "Weber", "Wagner", "Bauer"]
+cities = ["Vienna", "Graz", "Linz", "Salzburg", "Innsbruck", "Klagenfurt"]
+streets = ["Kaiserstraße", "Hauptstraße", "Ringstraße", "Bahnhofstraße", "Gartengasse"]
+category_names = [
+    "Health",
+    "Electronics",
+    "Kitchen",
+    "Garden",
+    "Sports",
+    "Books",
+    "Toys",
+]
+# bcrypt hash of the password of the generated customers and vendors
+password_hash = "$2a$04$MlQ37GhOAbn8Dp02iXmeAeq41vE3gEogJVZPWWoeoeNWGZL57D8xO"
+# Range of the generated order, delivery and cart dates
+first_date = "2023-01-01T00:00:00"
+date_range_seconds = 365 * 24 * 3600
+
+
+def get_cardinalities(scale: float):
+    """Gets the row counts of the tables at a scale factor.
+    Args:
+        scale (float): The scale factor (1: the size of the seed script).
+    Raises:
+        ValueError: Is thrown if the scale factor is not positive.
+    Returns:
+        dict: Dictionary of the format {<table>: <amount of rows>}.
+    """
+    if scale <= 0:
+        raise ValueError("The scale factor must be positive!")
+
+    return {
+        table: rows if table in fixed_tables else max(1, round(rows * scale))
+        for table, rows in seed_cardinalities.items()
+    }
+
+
+class ZipfSampler:
+    """Draws ids 0..n-1 with Zipf distributed frequencies: the rank k is drawn
+    with a probability proportional to 1 / k^exponent. The ranks are spread
+    over the ids by a multiplicative permutation, so the popular ids are not
+    the lowest ones."""
+
+    def __init__(self, n: int, exponent: float, rng):
+        """Computes the cumulative distribution of the ranks.
+        Args:
+            n (int): The amount of ids.
+            exponent (float): The Zipf exponent (0: uniform).
+            rng (numpy.random.Generator): The random generator.
+        """
+        self.n = n
+        self.rng = rng
+        self.cdf = None
+
+        if exponent > 0:
+            weights = np.arange(1, n + 1, dtype=np.float64) ** -exponent
+            self.cdf = np.cumsum(weights)
+            self.cdf /= self.cdf[-1]
+
+        # A multiplier coprime to n maps the ranks to the ids one to one
+        self.multiplier = next(
+            el for el in range(int(n * 0.618) | 1, 2 * n + 2) if math.gcd(el, n) == 1
+        )
+
+    def sample(self, size: int):
+        """Draws ids.
+        Args:
+            size (int): The amount of ids.
+        Returns:
+            numpy.ndarray: The ids.
+        """
+        if self.cdf is None:
+            return self.rng.integers(0, self.n, size)
+
+        ranks = np.searchsorted(self.cdf, self.rng.random(size), side="right")
+        ranks = np.minimum(ranks, self.n - 1)
+        return ranks * self.multiplier % self.n
+
+
+class BasketLayout:
+    """Distributes the lines of a basket table over the baskets with the
+    sizes of independent uniform draws (a multinomial distribution), but
+    with the lines of a basket at consecutive ids. Chunks end at basket
+    boundaries, so the items of a basket can be drawn distinct chunk by chunk."""
+
+    def __init__(self, lines: int, baskets: int, rng):
+        """Draws the basket sizes.
+        Args:
+            lines (int): The amount of lines.
+            baskets (int): The amount of baskets.
+            rng (numpy.random.Generator): The random generator.
+        """
+        self.sizes = rng.multinomial(lines, np.full(baskets, 1 / baskets))
+        self.ends = np.cumsum(self.sizes)
+
+    def get_chunk_end(self, start: int, chunk_size: int):
+        """Gets the end of a chunk at the last basket boundary
+        within chunk_size lines (or of the first basket if it is larger).
+        Args:
+            start (int): The first line id of the chunk (a basket boundary).
+            chunk_size (int): The maximal amount of lines per chunk.
+        Returns:
+            int: The line id after the last line of the chunk.
+        """
+        index = np.searchsorted(self.ends, start + chunk_size, side="right") - 1
+
+        if index < 0 or self.ends[index] <= start:
+            index = np.searchsorted(self.ends, start, side="right")
+
+        return int(self.ends[index])
+
+    def get_baskets(self, ids):
+        """Gets the baskets of lines.
+        Args:
+            ids (numpy.ndarray): The line ids.
+        Returns:
+            numpy.ndarray: The basket ids.
+        """
+        return np.searchsorted(self.ends, ids, side="right")
+
+
+def draw_distinct_items(baskets, sampler: ZipfSampler):
+    """Draws an item for every line, distinct within every basket.
+    Lines that repeat an item of their basket are drawn again.
+    Args:
+        baskets (numpy.ndarray): The basket ids of the lines (whole baskets).
+        sampler (ZipfSampler): The sampler of the items.
+    Returns:
+        numpy.ndarray: The item ids.
+    """
+    items = sampler.sample(len(baskets))
+    repeated = np.ones(len(baskets), dtype=bool)
+
+    while True:
+        _, first = np.unique(baskets * sampler.n + items, return_index=True)
+        repeated[:] = True
+        repeated[first] = False
+
+        if not repeated.any():
+            return items
+
+        items[repeated] = sampler.sample(int(repeated.sum()))
+
+
+def format_ids(prefix: str, ids, suffix=""):
+    """Creates text values of ids, e.g. "user" + 12 -> "user12".
+    Args:
+        prefix (str): The text before the id.
+        ids (numpy.ndarray): The ids.
+        suffix (str, optional): The text after the id. Defaults to "".
+    Returns:
+        numpy.ndarray: The texts.
+    """
+    return np.char.add(np.char.add(prefix, ids.astype(str)), suffix)
+
+
+def choose(values: list, ids):
+    """Picks a value of a list for every id.
+    Args:
+        values (list): The values.
+        ids (numpy.ndarray): The ids.
+    Returns:
+        numpy.ndarray: The values.
+    """
+    return np.array(values)[ids % len(values)]
+
+
+def create_dates(rng, size: int):
+    """Creates random date times within date_range_seconds after first_date.
+    Args:
+        rng (numpy.random.Generator): The random generator.
+        size (int): The amount of values.
+    Returns:
+        numpy.ndarray: The datetime64[s] values.
+    """
+    return np.datetime64(first_date, "s") + rng.integers(
+        0, date_range_seconds, size
+    ).astype("timedelta64[s]")
+
+
+def create_prices(rng, size: int):
+    """Creates random prices between 0.01 and 999.99 with two decimals.
+    Args:
+        rng (numpy.random.Generator): The random generator.
+        size (int): The amount of values.
+    Returns:
+        numpy.ndarray: The prices.
+    """
+    return rng.integers(1, 100000, size) / 100
+
+
+def create_chunk(table: str, ids, rows: dict, samplers: dict, rng, layouts=None):
+    """Creates the columns of a chunk of rows of a table.
+    Every foreign key references an existing row of the referenced table.
+    Args:
+        table (str): The table name.
+        ids (numpy.ndarray): The primary keys of the rows.
+        rows (dict): See get_cardinalities.
+        samplers (dict): Dictionary of the format {<table>: ZipfSampler}
+        of the skewed references.
+        rng (numpy.random.Generator): The random generator.
+        layouts (dict, optional): Dictionary of the format
+        {<basket table>: BasketLayout}, the ids must be whole baskets.
+        Defaults to None.
+    Raises:
+        ValueError: Is thrown if the table is not generated.
+    Returns:
+        dict: Dictionary of the format {<column>: <values>}.
+    """
+    size = len(ids)
+
+    def uniform(referenced_table):
+        return rng.integers(0, rows[referenced_table], size)
+
+    if table == "Customer":
+        first = choose(first_names, rng.integers(0, len(first_names), size))
+        last = choose(last_names, rng.integers(0, len(last_names), size))
+        return {
+            "CustomerId": ids,
+            "UserName": format_ids("user", ids),
+            "FirstName": first,
+            "LastName": last,
+            "Email": format_ids("customer", ids, "@example.com"),
+            "Password": np.full(size, password_hash),
+            "PhoneNumber": format_ids("+43 1 ", 1000000 + ids % 9000000),
+        }
+
+    if table == "Address":
+        return {
+            "AddressId": ids,
+            "Street": np.char.add(
+                choose(streets, rng.integers(0, len(streets), size)),
+                format_ids(" ", rng.integers(1, 300, size)),
+            ),
+            "City": choose(cities, rng.integers(0, len(cities), size)),
+            "PostalCode": (1000 + rng.integers(0, 9000, size)).astype(str),
+            "Country": np.full(size, "Austria"),
+        }
+
+    if table in ["CustomerToAddress", "VendorToAddress", "CourierToAddress"]:
+        owner = table[: -len("ToAddress")]
+        return {
+            f"{table}Id": ids,
+            f"{owner}Id": ids % rows[owner],
+            "AddressId": uniform("Address"),
+        }
+
+    if table == "Product":
+        return {
+            "ProductId": ids,
+            "Name": format_ids("Product ", ids),
+            "Description": format_ids("Description of product ", ids),
+        }
+
+    if table == "Category":
+        return {"CategoryId": ids, "Name": choose(category_names, ids)}
+
+    if table == "ProductToCategory":
+        return {
+            "ProductToCategoryId": ids,
+            "CategoryId": uniform("Category"),
+            "ProductId": ids % rows["Product"],
+        }
+
+    if table == "Vendor":
+        return {
+            "VendorId": ids,
+            "UserName": format_ids("vendor", ids),
+            "Password": np.full(size, password_hash),
+            "Name": format_ids("Vendor ", ids, " GmbH"),
+            "Email": format_ids("vendor", ids, "@example.com"),
+            "PhoneNumber": format_ids("+43 1 ", 2000000 + ids % 8000000),
+        }
+
+    if table == "VendorToProduct":
+        return {
+            "VendorToProductId": ids,
+            "VendorId": uniform("Vendor"),
+            # Every product is offered by at least one vendor
+            "ProductId": ids % rows["Product"],
+            "UnitPriceEuro": create_prices(rng, size),
+            "InventoryLevel": rng.integers(0, 1000, size),
+        }
+
+    if table == "CustomerOrder":
+        return {
+            "OrderId": ids,
+            "OrderName": format_ids("Order", ids),
+            "OrderDate": create_dates(rng, size),
+            "CustomerId": samplers["Customer"].sample(size),
+            "BillingAddressId": uniform("Address"),
+            "IsPaid": rng.integers(0, 2, size),
+        }
+
+    if table == "Courier":
+        return {
+            "CourierId": ids,
+            "Name": format_ids("Courier ", ids),
+            "Email": format_ids("courier", ids, "@example.com"),
+            "PhoneNumber": format_ids("+43 1 ", 3000000 + ids % 7000000),
+        }
+
+    if table in basket_tables:
+        baskets = layouts[table].get_baskets(ids)
+        items = draw_distinct_items(baskets, samplers["VendorToProduct"])
+
+    if table == "OrderPosition":
+        return {
+            "OrderPositionId": ids,
+            "OrderId": baskets,
+            "Amount": rng.integers(1, 8, size),
+            "VendorToProductId": items,
+            "CourierCompanyId": uniform("Courier"),
+            "DeliveryDate": create_dates(rng, size),
+            "DeliveryAddressId": uniform("Address"),
+        }
+
+    if table == "ShoppingCart":
+        return {
+            "CartId": ids,
+            "DateCreated": create_dates(rng, size),
+            "CustomerId": ids % rows["Customer"],
+        }
+
+    if table == "ProductToCart":
+        return {
+            "ProductToCartId": ids,
+            "VendorToProductId": items,
+            "CartId": baskets,
+            "Amount": rng.integers(1, 11, size),
+        }
+
+    raise ValueError(f"The table {table} is not generated!")
+
+
+def iter_chunks(
+    table: str, rows: dict, samplers: dict, rng, chunk_size: int, layouts=None
+):
+    """Creates the rows of a table chunk by chunk.
+    The chunks of basket tables end at basket boundaries.
+    Args:
+        table (str): The table name.
+        rows (dict): See get_cardinalities.
+        samplers (dict): See create_chunk.
+        rng (numpy.random.Generator): The random generator.
+        chunk_size (int): The maximal amount of rows per chunk.
+        layouts (dict, optional): See create_chunk. Defaults to None.
+    Yields:
+        dict: The columns of the next chunk (see create_chunk).
+    """
+    start = 0
+
+    while start < rows[table]:
+        if table in basket_tables:
+            end = layouts[table].get_chunk_end(start, chunk_size)
+        else:
+            end = min(start + chunk_size, rows[table])
+
+        yield create_chunk(table, np.arange(start, end), rows, samplers, rng, layouts)
+        start = end
+
+
+def to_rows(chunk: dict):
+    """Converts the columns of a chunk to rows of Python values.
+    Args:
+        chunk (dict): See create_chunk.
+    Returns:
+        list: The rows.
+    """
+    return list(zip(*[values.tolist() for values in chunk.values()]))
+
+
+class CsvOutput:
+    """Writes every table to a CSV file with a header line."""
+
+    def __init__(self, directory: str):
+        """Initializes the output.
+        Args:
+            directory (str): The directory of the files.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.name = directory
+        self.directory = directory
+        self.file = None
+
+    def start(self, table: str):
+        """Opens the file of a table.
+        Args:
+            table (str): The table name.
+        """
+        path = os.path.join(self.directory, f"{table}.csv")
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.header = True
+
+    def write(self, table: str, chunk: dict):
+        """Writes a chunk.
+        Args:
+            table (str): The table name.
+            chunk (dict): See create_chunk.
+        """
+        if self.header:
+            self.writer.writerow(chunk.keys())
+            self.header = False
+
+        for name, values in chunk.items():
+            if values.dtype.kind == "M":
+                chunk[name] = np.char.replace(
+                    np.datetime_as_string(values, unit="s"), "T", " "
+                )
+
+        self.writer.writerows(to_rows(chunk))
+
+    def finish(self, table: str):
+        """Closes the file of a table.
+        Args:
+            table (str): The table name.
+        """
+        self.file.close()
+
+    def close(self):
+        """Does nothing, every file is closed by finish."""
+
+
+class ParquetOutput:
+    """Writes every table to a Parquet file with a row group per chunk."""
+
+    def __init__(self, directory: str):
+        """Initializes the output.
+        Args:
+            directory (str): The directory of the files.
+        Raises:
+            ImportError: Is thrown if pyarrow is not installed.
+        """
+        if pyarrow is None:
+            raise ImportError("The Parquet output requires pyarrow!")
+
+        os.makedirs(directory, exist_ok=True)
+        self.name = directory
+        self.directory = directory
+        self.writer = None
+
+    def start(self, table: str):
+        """Does nothing, the file is opened with the schema of the first chunk.
+        Args:
+            table (str): The table name.
+        """
+
+    def write(self, table: str, chunk: dict):
+        """Writes a chunk.
+        Args:
+            table (str): The table name.
+            chunk (dict): See create_chunk.
+        """
+        row_group = pyarrow.table(chunk)
+
+        if self.writer is None:
+            path = os.path.join(self.directory, f"{table}.parquet")
+            self.writer = parquet.ParquetWriter(path, row_group.schema)
+
+        self.writer.write_table(row_group)
+
+    def finish(self, table: str):
+        """Closes the file of a table.
+        Args:
+            table (str): The table name.
+        """
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def close(self):
+        """Does nothing, every file is closed by finish."""
+
+
+class DatabaseOutput:
+    """Bulk inserts the tables into a database (see adapters.SqliteBackend
+    and adapters.OdbcBackend) and commits every table."""
+
+    def __init__(self, backend, create_tables: list, fast_executemany=True):
+        """Opens the connection and creates the tables.
+        Args:
+            backend (_type_): The backend of the database.
+            create_tables (list): The CREATE TABLE statements that are executed
+            (empty if the tables exist).
+            fast_executemany (bool, optional): Whether pyodbc sends the rows as
+            parameter arrays. Defaults to True.
+        """
+        self.name = backend.name
+        self.connection = backend.connect()
+        self.cursor = get_bulk_cursor(self.connection, fast_executemany)
+
+        for statement in create_tables:
+            self.cursor.execute(statement)
+
+        self.connection.commit()
+
+    def start(self, table: str):
+        """Does nothing, the rows are inserted by write.
+        Args:
+            table (str): The table name.
+        """
+
+    def write(self, table: str, chunk: dict):
+        """Inserts a chunk with a single executemany call.
+        Args:
+            table (str): The table name.
+            chunk (dict): See create_chunk.
+        """
+        for name, values in chunk.items():
+            if values.dtype.kind == "M":
+                # tolist converts microseconds to datetime objects
+                chunk[name] = values.astype("datetime64[us]")
+
+        query = create_insert_query(table, tuple(chunk))
+        insert_rows(self.cursor, query, to_rows(chunk))
+
+    def finish(self, table: str):
+        """Commits the rows of a table.
+        Args:
+            table (str): The table name.
+        """
+        self.connection.commit()
+
+    def close(self):
+        """Closes the connection."""
+        self.cursor.close()
+        self.connection.close()
+
+
+def scale_database(output, scale: float, seed=0, chunk_size=None):
+    """Generates referentially consistent rows of all tables of the seed script
+    at a scale factor and writes them table by table in dependency order.
+    The references of the order positions and cart positions to the vendor
+    products and of the orders to the customers are Zipf distributed
+    (product_zipf_exponent, customer_zipf_exponent). The vendor products
+    of an order or cart are distinct (see basket_tables).
+    Args:
+        output (_type_): The output (CsvOutput, ParquetOutput or DatabaseOutput).
+        scale (float): The scale factor (see get_cardinalities).
+        seed (int, optional): The seed of the random generator. Defaults to 0.
+        chunk_size (int, optional): The amount of rows per chunk.
+        Defaults to None (scaler_chunk_size).
+    Raises:
+        ImportError: Is thrown if NumPy is not installed.
+        ValueError: Is thrown if a basket has more lines than there are vendor products.
+    Returns:
+        dict: See get_cardinalities.
+    """
+    if np is None:
+        raise ImportError("The data scaler requires numpy!")
+
+    chunk_size = chunk_size or scaler_chunk_size
+    rows = get_cardinalities(scale)
+    rng = np.random.default_rng(seed)
+    samplers = {
+        "Customer": ZipfSampler(rows["Customer"], customer_zipf_exponent, rng),
+        "VendorToProduct": ZipfSampler(
+            rows["VendorToProduct"], product_zipf_exponent, rng
+        ),
+    }
+    layouts = {
+        table: BasketLayout(rows[table], rows[basket_table], rng)
+        for table, basket_table in basket_tables.items()
+    }
+
+    for table, layout in layouts.items():
+        if layout.sizes.max() > rows["VendorToProduct"]:
+            raise ValueError(
+                f"A basket of {table} has more lines than there are vendor products!"
+            )
+
+    dependencies = get_table_dependencies(get_script_tables(scaler_script_path))
+    start = time.perf_counter()
+
+    for table in get_dependency_order(list(rows.keys()), dependencies):
+        table_start = time.perf_counter()
+        output.start(table)
+
+        for chunk in iter_chunks(table, rows, samplers, rng, chunk_size, layouts):
+            output.write(table, chunk)
+
+        output.finish(table)
+        seconds = time.perf_counter() - table_start
+        log(
+            f"Generated {rows[table]} rows of {table} in {seconds:.2f}s "
+            f"({rows[table] / seconds if seconds > 0 else 0:.0f} rows/s)."
+        )
+
+    seconds = time.perf_counter() - start
+    amount = sum(rows.values())
+    log(
+        f"Generated {amount} rows at scale {scale} into {output.name} in {seconds:.2f}s "
+        f"({amount / seconds if seconds > 0 else 0:.0f} rows/s)."
+    )
+    return rows
+
+
+def create_output(output_format: str, path: str, create_tables=True):
+    """Creates the output of a format.
+    Args:
+        output_format (str): See output_formats.
+        path (str): The directory of the CSV or Parquet files, the SQLite file
+        or the ODBC connection string of the MSSQL database.
+        create_tables (bool, optional): Whether the tables of the seed script are
+        created in the database. Defaults to True.
+    Raises:
+        ValueError: Is thrown if the format is unknown.
+    Returns:
+        _type_: The output.
+    """
+    if output_format == FORMAT_CSV:
+        return CsvOutput(path)
+
+    if output_format == FORMAT_PARQUET:
+        return ParquetOutput(path)
+
+    if output_format not in [FORMAT_SQLITE, FORMAT_MSSQL]:
+        raise ValueError(f"The output format must be one of {output_formats}!")
+
+    statements = get_script_tables(scaler_script_path) if create_tables else []
+
+    if output_format == FORMAT_SQLITE:
+        return DatabaseOutput(SqliteBackend(path), statements)
+
+    return DatabaseOutput(OdbcBackend(path), statements)
+
+
+def main():
+    """Generates the e commerce model at a scale factor of the seed script."""
+    global product_zipf_exponent, customer_zipf_exponent
+    parser = argparse.ArgumentParser(
+        description="Generates referentially consistent rows of the e commerce "
+        "model at a scale factor of initial_database_sql_script.sql."
+    )
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="Scale factor (1 to 1000)."
+    )
+    parser.add_argument(
+        "--format", choices=output_formats, default=FORMAT_CSV, help="Output format."
+    )
+    parser.add_argument(
+        "--output",
+        required=True,
+        help="Directory of the CSV or Parquet files, path of the SQLite file "
+        "or ODBC connection string of the MSSQL database.",
+    )
+    parser.add_argument(
+        "--existing-tables",
+        action="store_true",
+        help="Inserts into existing tables instead of creating them (sqlite, mssql).",
+    )
+    parser.add_argument(
+        "--product-skew",
+        type=float,
+        default=product_zipf_exponent,
+        help="Zipf exponent of the vendor products in carts and orders (0: uniform).",
+    )
+    parser.add_argument(
+        "--customer-skew",
+        type=float,
+        default=customer_zipf_exponent,
+        help="Zipf exponent of the customers of the orders (0: uniform).",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the rows.")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=scaler_chunk_size,
+        help="Amount of rows per generated chunk.",
+    )
+    args = parser.parse_args()
+    product_zipf_exponent = args.product_skew
+    customer_zipf_exponent = args.customer_skew
+    output = create_output(args.format, args.output, not args.existing_tables)
+
+    try:
+        scale_database(output, args.scale, args.seed, args.chunk_size)
+    finally:
+        output.close()
+
+
+if __name__ == "__main__":
+    main()
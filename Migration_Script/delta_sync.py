@@ -0,0 +1,490 @@
+# Import necessary packages
+import json
+import sqlite3
+import threading
+
+# Column types that are not accepted by CONVERT and have to be cast
+checksum_cast_types = {
+    "text": "VARCHAR(MAX)",
+    "ntext": "NVARCHAR(MAX)",
+    "image": "VARBINARY(MAX)",
+}
+# Styles of CONVERT that keep the full value (ISO 8601, 17 digits, 4 decimals, hex)
+checksum_styles = {
+    "date": 126,
+    "datetime": 126,
+    "datetime2": 126,
+    "smalldatetime": 126,
+    "time": 126,
+    "datetimeoffset": 126,
+    "float": 3,
+    "real": 3,
+    "money": 2,
+    "smallmoney": 2,
+    "binary": 1,
+    "varbinary": 1,
+    "image": 1,
+}
+
+
+def get_column_types(cursor, table: str):
+    """Gets the column names and types of a table.
+    Args:
+        cursor (_type_): A pyodbc cursor.
+        table (str): The table name.
+    Returns:
+        list: List of (column name, type name) tuples in table order.
+    """
+    return [
+        (el.column_name, el.type_name.lower())
+        for el in cursor.columns(table=table).fetchall()
+    ]
+
+
+def create_row_text_expression(column_types: list):
+    """Creates the expression that serializes a row for HASHBYTES.
+    Every value is converted to NVARCHAR and prefixed by its length,
+    so NULL (":") and empty strings ("0:") differ and the values can not shift
+    into each other. The conversion keeps the case of strings.
+    Args:
+        column_types (list): See get_column_types.
+    Returns:
+        str: The expression.
+    """
+    parts = []
+
+    for name, type_name in column_types:
+        value = (
+            f"CAST({name} AS {checksum_cast_types[type_name]})"
+            if type_name in checksum_cast_types
+            else name
+        )
+        style = f", {checksum_styles[type_name]}" if type_name in checksum_styles else ""
+        text = f"CONVERT(NVARCHAR(MAX), {value}{style})"
+        parts.append(f"CONCAT(DATALENGTH({text}), ':', {text})")
+
+    return parts[0] if len(parts) == 1 else f"CONCAT({', '.join(parts)})"
+
+
+def create_checksum_query(
+    table: str, column_types: list, primary_key: str, range_size: int
+):
+    """Creates the query that computes the row count and an
+    order-independent checksum of every primary key range on the server.
+    Every row is hashed with SHA-256 and the two 32 bit halves of the first
+    8 bytes of the hashes are summed up per range, so changes do not cancel
+    out like with the XOR of CHECKSUM_AGG. The primary keys must be
+    non-negative integers.
+    Args:
+        table (str): The table name.
+        column_types (list): See get_column_types.
+        primary_key (str): The primary key column name.
+        range_size (int): The amount of primary keys per range.
+    Returns:
+        str: The query.
+    """
+    hashes = (
+        f"SELECT {primary_key} / {range_size} AS RangeId, "
+        f"HASHBYTES('SHA2_256', {create_row_text_expression(column_types)}) "
+        f"AS RowHash FROM {table}"
+    )
+    sums = ", ".join(
+        f"SUM(CAST(CAST(SUBSTRING(RowHash, {start}, 4) AS INT) AS BIGINT))"
+        for start in [1, 5]
+    )
+    return (
+        f"SELECT RangeId, COUNT(*), {sums} "
+        f"FROM ({hashes}) AS RowHashes GROUP BY RangeId"
+    )
+
+
+def combine_checksums(high_sum: int, low_sum: int):
+    """Combines the sums of the hash halves of a range to a signed 64 bit checksum.
+    Args:
+        high_sum (int): The sum of the first 4 bytes of the row hashes.
+        low_sum (int): The sum of the next 4 bytes of the row hashes.
+    Returns:
+        int: The checksum.
+    """
+    checksum = ((high_sum & 0xFFFFFFFF) << 32) | (low_sum & 0xFFFFFFFF)
+    return checksum - 2**64 if checksum >= 2**63 else checksum
+
+
+def get_range_checksums(
+    cursor, table: str, column_types: list, primary_key: str, range_size: int
+):
+    """Gets the row count and checksum of every primary key range of a table.
+    Args:
+        cursor (_type_): A pyodbc cursor.
+        table (str): The table name.
+        column_types (list): See get_column_types.
+        primary_key (str): The primary key column name.
+        range_size (int): The amount of primary keys per range.
+    Returns:
+        dict: Dictionary of the format {<range id>: (<row count>, <checksum>)}.
+    """
+    cursor.execute(create_checksum_query(table, column_types, primary_key, range_size))
+    return {
+        row[0]: (row[1], combine_checksums(row[2], row[3])) for row in cursor.fetchall()
+    }
+
+
+def get_changed_ranges(source_checksums: dict, target_checksums: dict):
+    """Gets the primary key ranges whose row count or checksum differ.
+    Args:
+        source_checksums (dict): See get_range_checksums.
+        target_checksums (dict): See get_range_checksums.
+    Returns:
+        list: The sorted range ids.
+    """
+    range_ids = set(source_checksums.keys()) | set(target_checksums.keys())
+    return sorted(
+        range_id
+        for range_id in range_ids
+        if source_checksums.get(range_id) != target_checksums.get(range_id)
+    )
+
+
+def read_range_rows(
+    cursor, table: str, columns: list, primary_key: str, range_id: int, range_size: int
+):
+    """Reads the rows of a primary key range.
+    Args:
+        cursor (_type_): A pyodbc cursor.
+        table (str): The table name.
+        columns (list): The column names.
+        primary_key (str): The primary key column name.
+        range_id (int): The range id.
+        range_size (int): The amount of primary keys per range.
+    Returns:
+        dict: Dictionary of the format {<primary key>: <row tuple>}.
+    """
+    key_index = columns.index(primary_key)
+    cursor.execute(
+        f"SELECT {','.join(columns)} FROM {table} "
+        f"WHERE {primary_key} >= ? AND {primary_key} < ?",
+        [range_id * range_size, (range_id + 1) * range_size],
+    )
+    return {row[key_index]: tuple(row) for row in cursor.fetchall()}
+
+
+def normalize_rows(rows: dict):
+    """Converts the rows to the representation stored by SyncState,
+    so they can be compared with the recorded rows.
+    Args:
+        rows (dict): See read_range_rows.
+    Returns:
+        dict: The converted rows.
+    """
+    return {
+        key: tuple(json.loads(json.dumps(list(row), default=str)))
+        for key, row in rows.items()
+    }
+
+
+def diff_rows(source_rows: dict, target_rows: dict):
+    """Compares the rows of a range by primary key.
+    Args:
+        source_rows (dict): See read_range_rows.
+        target_rows (dict): See read_range_rows.
+    Returns:
+        tuple: The new rows, the changed rows (source version)
+        and the primary keys of the deleted rows.
+    """
+    inserts = [row for key, row in source_rows.items() if key not in target_rows]
+    updates = [
+        row
+        for key, row in source_rows.items()
+        if key in target_rows and target_rows[key] != row
+    ]
+    deletes = [key for key in target_rows.keys() if key not in source_rows]
+    return inserts, updates, deletes
+
+
+class SyncState:
+    """State of the last sync pass of the tables that have no relational
+    copy in the target (the m:n tables) and the range checksums of the source
+    rows that the Neo4j nodes were last upserted from, stored in a local
+    SQLite database."""
+
+    def __init__(self, path: str):
+        """Opens (and creates) the state.
+        Args:
+            path (str): The path of the SQLite file.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS SyncRange
+            (
+                TableName TEXT NOT NULL,
+                RangeId INTEGER NOT NULL,
+                RowCount INTEGER NOT NULL,
+                Checksum INTEGER,
+                PRIMARY KEY (TableName, RangeId)
+            );
+            CREATE TABLE IF NOT EXISTS SyncRow
+            (
+                TableName TEXT NOT NULL,
+                RangeId INTEGER NOT NULL,
+                PrimaryKey NOT NULL,
+                RowJson TEXT NOT NULL,
+                PRIMARY KEY (TableName, PrimaryKey)
+            );
+            CREATE INDEX IF NOT EXISTS SyncRowRange ON SyncRow (TableName, RangeId);
+            CREATE TABLE IF NOT EXISTS NodeRange
+            (
+                TableName TEXT NOT NULL,
+                RangeId INTEGER NOT NULL,
+                RowCount INTEGER NOT NULL,
+                Checksum INTEGER,
+                PRIMARY KEY (TableName, RangeId)
+            );
+            """
+        )
+
+    def get_range_checksums(self, table: str):
+        """Gets the range checksums recorded by the last sync pass.
+        Args:
+            table (str): The table name.
+        Returns:
+            dict: See get_range_checksums.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT RangeId, RowCount, Checksum FROM SyncRange WHERE TableName = ?",
+                [table],
+            ).fetchall()
+
+        return {row[0]: (row[1], row[2]) for row in rows}
+
+    def get_range_rows(self, table: str, range_id: int):
+        """Gets the rows of a range recorded by the last sync pass.
+        Args:
+            table (str): The table name.
+            range_id (int): The range id.
+        Returns:
+            dict: Dictionary of the format {<primary key>: <row tuple>}.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT PrimaryKey, RowJson FROM SyncRow "
+                "WHERE TableName = ? AND RangeId = ?",
+                [table, range_id],
+            ).fetchall()
+
+        return {row[0]: tuple(json.loads(row[1])) for row in rows}
+
+    def count_rows(self, table: str):
+        """Counts the rows of a table recorded by the last sync pass.
+        Args:
+            table (str): The table name.
+        Returns:
+            int: The amount of rows.
+        """
+        with self.lock:
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM SyncRow WHERE TableName = ?", [table]
+            ).fetchone()[0]
+
+    def clear_table(self, table: str):
+        """Deletes the recorded checksums and rows of a table,
+        so the next sync pass compares all of its ranges.
+        Args:
+            table (str): The table name.
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM SyncRange WHERE TableName = ?", [table]
+            )
+            self.connection.execute("DELETE FROM SyncRow WHERE TableName = ?", [table])
+
+    def save_range(self, table: str, range_id: int, checksum, rows: dict):
+        """Replaces the recorded checksum and rows of a range.
+        Args:
+            table (str): The table name.
+            range_id (int): The range id.
+            checksum (tuple): The (row count, checksum) tuple or None
+            if the range is empty.
+            rows (dict): See read_range_rows.
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM SyncRange WHERE TableName = ? AND RangeId = ?",
+                [table, range_id],
+            )
+            self.connection.execute(
+                "DELETE FROM SyncRow WHERE TableName = ? AND RangeId = ?",
+                [table, range_id],
+            )
+
+            if checksum is None:
+                return
+
+            self.connection.execute(
+                "INSERT INTO SyncRange (TableName, RangeId, RowCount, Checksum) "
+                "VALUES (?, ?, ?, ?)",
+                [table, range_id, checksum[0], checksum[1]],
+            )
+            self.connection.executemany(
+                "INSERT INTO SyncRow (TableName, RangeId, PrimaryKey, RowJson) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    [table, range_id, key, json.dumps(list(row), default=str)]
+                    for key, row in rows.items()
+                ],
+            )
+
+    def get_node_checksums(self, table: str):
+        """Gets the range checksums of the source rows that the nodes of a table
+        were last upserted from.
+        Args:
+            table (str): The table name.
+        Returns:
+            dict: See get_range_checksums.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT RangeId, RowCount, Checksum FROM NodeRange WHERE TableName = ?",
+                [table],
+            ).fetchall()
+
+        return {row[0]: (row[1], row[2]) for row in rows}
+
+    def count_node_rows(self, table: str):
+        """Counts the source rows that the nodes of a table were last upserted from.
+        Args:
+            table (str): The table name.
+        Returns:
+            int: The amount of rows.
+        """
+        with self.lock:
+            return self.connection.execute(
+                "SELECT COALESCE(SUM(RowCount), 0) FROM NodeRange WHERE TableName = ?",
+                [table],
+            ).fetchone()[0]
+
+    def clear_node_table(self, table: str):
+        """Deletes the recorded node checksums of a table,
+        so the next upsert compares all of its ranges.
+        Args:
+            table (str): The table name.
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM NodeRange WHERE TableName = ?", [table]
+            )
+
+    def save_node_range(self, table: str, range_id: int, checksum):
+        """Replaces the recorded checksum of the source rows that the nodes
+        of a range were upserted from.
+        Args:
+            table (str): The table name.
+            range_id (int): The range id.
+            checksum (tuple): The (row count, checksum) tuple or None
+            if the range is empty.
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM NodeRange WHERE TableName = ? AND RangeId = ?",
+                [table, range_id],
+            )
+
+            if checksum is None:
+                return
+
+            self.connection.execute(
+                "INSERT INTO NodeRange (TableName, RangeId, RowCount, Checksum) "
+                "VALUES (?, ?, ?, ?)",
+                [table, range_id, checksum[0], checksum[1]],
+            )
+
+    def close(self):
+        """Closes the state."""
+        with self.lock:
+            self.connection.close()
+
+
+class SyncStateRecorder:
+    """Records the rows of a m:n table in the sync state while the table is
+    migrated, so the first sync or upsert pass afterwards only reads the
+    changed ranges. A range is recorded once its rows were added and the
+    rows of the next range started (or the table ended). Ranges that were
+    not read completely are not recorded."""
+
+    def __init__(
+        self,
+        sync_state: SyncState,
+        table: str,
+        column_types: list,
+        columns: list,
+        primary_key: str,
+        checksums: dict,
+        range_size: int,
+        key_range=(None, None),
+    ):
+        """Initializes the recorder of a table.
+        Args:
+            sync_state (SyncState): The state of the sync passes.
+            table (str): The table name.
+            column_types (list): See get_column_types.
+            columns (list): The column names of the added rows.
+            primary_key (str): The primary key column name.
+            checksums (dict): The range checksums of the source, computed
+            before the rows were read (see get_range_checksums).
+            range_size (int): The amount of primary keys per range.
+            key_range (tuple, optional): The first key and the key after
+            the read rows. Defaults to (None, None) (all rows).
+        """
+        self.sync_state = sync_state
+        self.table = table
+        self.order = [columns.index(name) for name, _ in column_types]
+        self.key_index = columns.index(primary_key)
+        self.checksums = checksums
+        self.range_size = range_size
+        self.key_range = key_range
+        self.range_id = None
+        self.rows = dict()
+
+    def save(self):
+        """Records the rows of the current range if it was read completely."""
+        first = self.range_id * self.range_size
+        end = first + self.range_size
+
+        if self.key_range[0] is not None and first < self.key_range[0]:
+            return
+
+        if self.key_range[1] is not None and end > self.key_range[1]:
+            return
+
+        self.sync_state.save_range(
+            self.table,
+            self.range_id,
+            self.checksums.get(self.range_id),
+            normalize_rows(self.rows),
+        )
+
+    def add(self, rows: list):
+        """Adds rows whose relationships were written.
+        Args:
+            rows (list): Rows ordered by the primary key.
+        """
+        for row in rows:
+            key = row[self.key_index]
+            range_id = key // self.range_size
+
+            if range_id != self.range_id:
+                if self.range_id is not None:
+                    self.save()
+
+                self.range_id = range_id
+                self.rows = dict()
+
+            self.rows[key] = tuple(row[i] for i in self.order)
+
+    def finish(self):
+        """Records the last range after all rows were added."""
+        if self.range_id is not None:
+            self.save()
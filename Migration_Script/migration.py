@@ -1,25 +1,105 @@
 # Import necessary packages
-import pyodbc
+import argparse
+import atexit
+import os
+import time
 import pymongo
-from datetime import datetime
-from neo4j import GraphDatabase, Neo4jDriver
+from pymongo.errors import BulkWriteError
+from neo4j import GraphDatabase
+from adapters import Neo4jGraph, OdbcBackend
+from csv_export import CsvGraphExport
+from verify import get_node_values, get_row_node_values, run_verification
+from migration_log import DEBUG, ERROR, WARNING, TableProgress, log
+import migration_log
+import migration_trace
+from delta_sync import (
+    SyncState,
+    SyncStateRecorder,
+    diff_rows,
+    get_changed_ranges,
+    get_column_types,
+    get_range_checksums,
+    normalize_rows,
+    read_range_rows,
+)
+from mssql_writer import (
+    create_insert_query,
+    delete_rows,
+    get_bulk_cursor,
+    insert_rows,
+    update_rows,
+)
+from constraints import (
+    create_foreign_key_index_query,
+    create_foreign_key_query,
+    create_table_if_not_exists_query,
+    drop_foreign_key_index_query,
+    drop_foreign_key_query,
+    find_violations,
+    get_foreign_keys,
+    remove_foreign_keys,
+)
+from checkpoint import (
+    TARGET_DDL,
+    TARGET_MONGODB,
+    TARGET_MSSQL,
+    TARGET_NEO4J,
+    CheckpointStore,
+    get_pending_rows,
+    get_resume_key,
+)
+from pipeline import PipelineWriter, run_pipeline
+from recommender import run_recommendations
+from scheduler import (
+    ThreadConnections,
+    get_dependency_order,
+    get_table_dependencies,
+    run_in_dependency_order,
+    run_in_processes,
+)
+from source_reader import (
+    READ_FETCHMANY,
+    count_rows,
+    get_columns,
+    get_key_bounds,
+    get_key_ranges,
+    get_peak_rss,
+    get_primary_key,
+    iter_fetchmany,
+    iter_keyset_pages,
+    read_table,
+    set_table_metadata,
+    table_metadata,
+)
+from cypher_builder import DECIMAL_AS_FLOAT, to_neo4j_properties, to_neo4j_value
+from migration_plan import get_compiled_plan, load_plan, relationship_attributes
+from migration_trace import iter_spans, phase, span
 
 
-# Helper functions
-def log(message: str):
-    """Logs the message.
-    Args:
-        message (str): The message.
-    Raises:
-        TypeError: Is thrown if message is not a str.
-    """
-    if type(message) != str:
-        raise TypeError("message must be a str!")
-
-    current_time =datetime.today().strftime("%Y-%m-%d %H:%M:%S")
-    print(current_time + " " + message)
+# Connections and graph store of a shard worker process (see init_shard_worker)
+shard_worker = dict()
+# Configuration that is passed to the shard worker processes
+shard_settings = [
+    "neo4j_tables",
+    "mn_tables_dict",
+    "source_chunk_size",
+    "source_max_buffered_rows",
+    "source_read_mode",
+    "mssql_fast_executemany",
+    "mssql_commit_interval",
+    "neo4j_default_batch_size",
+    "neo4j_batch_sizes",
+    "neo4j_decimal_policy",
+    "sync_state_path",
+    "sync_range_size",
+    "log_level",
+    "log_json_lines",
+    "log_sample_rate",
+    "log_progress_interval",
+]
 
 
+# Helper functions
 def create_dict(parameters, vals):
     """Creates a dictionary from parameters
     and values. E.g. ["a", "b"], [1,2]
@@ -84,137 +164,462 @@ def rollback(connection, log_message=None):
         log(log_message)
 
 
-def run_query(tx, query):
-    """Runs a Neo4j query.
+def chunks(iterable, size):
+    """Splits an iterable into lists of at most size elements.
+    E.g. [1, 2, 3, 4, 5], 2 -> [1, 2], [3, 4], [5]
     Args:
-        tx (_type_): A Neo4j transaction.
-        query (str): The query.
+        iterable (_type_): The iterable.
+        size (int): The maximal chunk size.
+    Raises:
+        ValueError: Is thrown if size is not positive.
+    Yields:
+        list: The next chunk.
     """
-    tx.run(query)
+    if size <= 0:
+        raise ValueError("size must be positive!")
 
+    chunk = []
 
-def convert_to_neo4j_datatype(val):
-    """Converts a random
-    database type of the value to a Neo4j type.
+    for el in iterable:
+        chunk.append(el)
+
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+
+    if len(chunk) > 0:
+        yield chunk
+
+
+def get_mongodb_indexes(collection_name: str):
+    """Gets the indexes of a collection (see mongodb_indexes).
     Args:
-        val (_type_): The value.
+        collection_name (str): Collection name.
     Returns:
-        _type_: The converted value.
+        list: List of (field, unique, index name) tuples.
     """
-    if type(val) == str:
-        return f'"{val}"'
-
-    if type(val) == datetime:
-        return f'"{val}"'
-
-    return val
+    indexes = mongodb_indexes.get(collection_name, {})
+    return [(field, True, f"{field}_unique") for field in indexes.get("unique", [])] + [
+        (field, False, f"{field}_1") for field in indexes.get("secondary", [])
+    ]
 
 
 def create_mongodb_collection(
     mongo_client: pymongo.MongoClient, db_name, collection_name
 ):
-    """Creates a MongoDB collection.
+    """Creates a MongoDB collection explicitly (without documents)
+    and its indexes. Existing indexes are kept.
     Args:
         mongo_client (pymongo.MongoClient): Mongo client.
         db_name (str): DB name.
         collection_name (str): Collection name.
+    Returns:
+        bool: True if the collection was created.
     """
     db = mongo_client[db_name]
-    collist = db.list_collection_names()
+    created = collection_name not in db.list_collection_names()
 
-    if collection_name in collist:
-        return
+    if created:
+        db.create_collection(collection_name)
 
     collection = db[collection_name]
-    collection.insert_one({})
+
+    for field, unique, name in get_mongodb_indexes(collection_name):
+        collection.create_index([(field, pymongo.ASCENDING)], unique=unique, name=name)
+
+    return created
 
 
-def create_neo4j_properties_string(properties_dict: dict):
-    """Creates a properties string from properties dict.
-    E.g.: {"a": 2, "b": 3} -> a: 2, b: 3
+def get_inserted_documents(error: BulkWriteError):
+    """Gets the amount of inserted documents of an unordered insert_many
+    that only failed on duplicate keys (documents of a previous run).
     Args:
-        properties_dict (dict): The dictionary with properties.
+        error (BulkWriteError): The error of insert_many.
+    Raises:
+        BulkWriteError: Is thrown again if a document failed for another reason.
     Returns:
-        str: The Neo4j properties string.
+        int: The amount of inserted documents.
     """
-    properties = ", ".join(
-        "{0}: {1}".format(k, convert_to_neo4j_datatype(v))
-        for k, v in properties_dict.items()
-    )
-    return properties
+    if any(el.get("code") != DUPLICATE_KEY_ERROR for el in error.details["writeErrors"]):
+        raise error
+
+    return error.details["nInserted"]
+
+
+def insert_documents(collection, documents: list):
+    """Inserts documents in one unordered insert_many call, so a duplicate
+    does not stop the other documents. Duplicates of the unique indexes
+    are skipped, which makes the seeding idempotent.
+    Args:
+        collection (_type_): The pymongo collection.
+        documents (list): The documents.
+    Returns:
+        int: The amount of inserted documents.
+    """
+    try:
+        collection.insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        return get_inserted_documents(e)
+
+    return len(documents)
+
+
+def iter_customer_actions(conn_old, chunk_size: int):
+    """Derives a "purchase" CustomerAction document from every order position
+    of the old database, keyed by the order position id.
+    Args:
+        conn_old (_type_): The connection to the old database.
+        chunk_size (int): The amount of documents per chunk.
+    Yields:
+        list: The next chunk of documents.
+    """
+    cursor = conn_old.cursor()
+
+    try:
+        for chunk in iter_fetchmany(
+            cursor,
+            "SELECT p.OrderPositionId, o.CustomerId, p.VendorToProductId, o.OrderDate "
+            "FROM OrderPosition p JOIN CustomerOrder o ON o.OrderId = p.OrderId "
+            "ORDER BY p.OrderPositionId",
+            chunk_size,
+        ):
+            yield [
+                {
+                    "customerActionId": position_id,
+                    "customerId": customer_id,
+                    "vendorToProductId": vendor_to_product_id,
+                    "actionType": "purchase",
+                    "actionDate": order_date,
+                }
+                for position_id, customer_id, vendor_to_product_id, order_date in chunk
+            ]
+    finally:
+        cursor.close()
 
 
-def execute_write_transaction(driver: Neo4jDriver, func, input):
-    """Executes a Neo4j write transaction.
+def seed_mongodb_collections(conn_old, mongo_client: pymongo.MongoClient, db_name):
+    """Seeds the collections of mongodb_seed_collections with historical
+    documents derived from the old database in batches of mongodb_insert_batch_size.
     Args:
-        driver (Neo4jDriver): The Neo4j driver.
-        func (_type_): The function to execute.
-        input (_type_): The function input.
+        conn_old (_type_): The connection to the old database.
+        mongo_client (pymongo.MongoClient): Mongo client.
+        db_name (str): DB name.
     """
-    with driver.session() as session:
-        session.write_transaction(func, input)
+    for collection_name in mongodb_seed_collections:
+        start = time.perf_counter()
+        collection = mongo_client[db_name][collection_name]
+        inserted = 0
 
+        for documents in mongodb_seeds[collection_name](conn_old, mongodb_insert_batch_size):
+            with span(
+                "insert_many", "mongodb", collection=collection_name, rows=len(documents)
+            ):
+                inserted += insert_documents(collection, documents)
 
-def add_node(driver: Neo4jDriver, param_names: list, vals: list, node_name: str):
-    """Adds a node to the Neo4j database.
+        seconds = time.perf_counter() - start
+        log(
+            f"Seeded {inserted} {collection_name} documents in {seconds:.2f}s "
+            f"({inserted / seconds if seconds > 0 else 0:.0f} documents/s)."
+        )
+
+
+def add_nodes(
+    graph,
+    param_names: list,
+    rows,
+    node_name: str,
+    batch_size: int,
+    decimal_policy=DECIMAL_AS_FLOAT,
+    merge_key=None,
+):
+    """Adds nodes to the graph store in batches.
+    Every batch is written by a single call of the graph store
+    (for Neo4j a parameterized UNWIND query in its own write transaction).
     Args:
-        driver (Neo4jDriver): The Neo4j driver.
+        graph (_type_): The graph store (see adapters.Neo4jGraph).
         param_names (list): The parameter names.
-        vals (list): The parameter values.
+        rows (_type_): Iterable of the parameter values of every node.
+        node_name (str): The node name.
+        batch_size (int): The maximal amount of nodes per transaction.
+        decimal_policy (str, optional): See cypher_builder.to_neo4j_value.
+        Defaults to DECIMAL_AS_FLOAT.
+        merge_key (str, optional): If set, existing nodes with the same
+        value of this attribute are updated instead of creating duplicates.
+        Defaults to None.
+    Returns:
+        int: The amount of created nodes.
+    """
+    amount = 0
+
+    for batch in chunks(rows, batch_size):
+        node_dicts = [
+            to_neo4j_properties(param_names, vals, decimal_policy) for vals in batch
+        ]
+
+        with span("nodes", "neo4j", label=node_name, rows=len(node_dicts)):
+            graph.write_nodes(node_name, node_dicts, merge_key)
+
+        amount += len(node_dicts)
+
+    return amount
+
+
+def get_neo4j_batch_size(name: str):
+    """Gets the configured batch size of a Neo4j label
+    or relationship name.
+    Args:
+        name (str): The node or relationship name.
+    Returns:
+        int: The batch size.
+    """
+    return neo4j_batch_sizes.get(name, neo4j_default_batch_size)
+
+
+def create_unique_constraint(graph, node_name: str, attribute: str):
+    """Creates a uniqueness constraint (and its backing index)
+    on a node attribute if it does not exist yet.
+    Args:
+        graph (_type_): The graph store (see adapters.Neo4jGraph).
         node_name (str): The node name.
+        attribute (str): The attribute that has to be unique.
+    """
+    graph.create_unique_constraint(node_name, attribute)
+
+
+def get_m_to_n_constraints(mn_information_dict: dict):
+    """Gets the node attributes that are used to match the nodes
+    of the m:n relationships.
+    Args:
+        mn_information_dict (dict): Dictionary of the format
+        {<table>: <mn_information>} (see create_neo4j_m_to_n_dict).
+    Returns:
+        list: List of (node name, attribute) tuples without duplicates.
+    """
+    constraints = []
+
+    for mn_information in mn_information_dict.values():
+        for entity, attribute in [
+            (mn_information["fromEntity"], mn_information["fromAttribute"]),
+            (mn_information["toEntity"], mn_information["toAttribute"]),
+        ]:
+            if (entity, attribute) not in constraints:
+                constraints.append((entity, attribute))
+
+    return constraints
+
+
+def get_m_to_n_indexes(mn_information_dict: dict):
+    """Gets the relationship properties that identify the relationships
+    of the m:n tables (the primary keys of their rows).
+    Args:
+        mn_information_dict (dict): Dictionary of the format
+        {<table>: <mn_information>} (see create_neo4j_m_to_n_dict).
+    Returns:
+        list: List of (relationship name, property) tuples without duplicates.
+    """
+    indexes = []
+
+    for mn_information in mn_information_dict.values():
+        index = (
+            mn_information["relationshipName"],
+            mn_information["primaryKeyAttribute"],
+        )
+
+        if index not in indexes:
+            indexes.append(index)
+
+    return indexes
+
+
+def compile_m_to_n_plan(entity_attributes, mn_information):
+    """Compiles the mapping of the rows of a m:n table to the
+    (fromKey, toKey, props) tuples that are needed by the function
+    create_relationships. The column positions are resolved once,
+    so the returned function only indexes the row.
+    Args:
+        entity_attributes (list): The attribute names in row order.
+        mn_information (dict): See create_neo4j_m_to_n_dict.
+    Raises:
+        ValueError: Is thrown if an attribute of mn_information
+        is not contained in entity_attributes.
+    Returns:
+        _type_: Function that maps a row to the tuple (fromKey, toKey, props).
+    """
+    key_attributes = [
+        mn_information["primaryKeyAttribute"],
+        mn_information["fromAttribute"],
+        mn_information["toAttribute"],
+    ]
+
+    for attribute in key_attributes:
+        if attribute not in entity_attributes:
+            raise ValueError(f"entity_attributes must contain {attribute}!")
+
+    from_index = entity_attributes.index(mn_information["fromAttribute"])
+    to_index = entity_attributes.index(mn_information["toAttribute"])
+    # The primary key identifies the relationship (see merge_relationships_query)
+    properties = tuple(
+        (attribute, index)
+        for index, attribute in enumerate(entity_attributes)
+        if attribute not in key_attributes[1:]
+    )
+
+    def map_row(row):
+        return (
+            row[from_index],
+            row[to_index],
+            {attribute: row[index] for attribute, index in properties},
+        )
+
+    return map_row
+
+
+def create_neo4j_m_to_n_tuple(entity_attributes, entity_values, mn_information):
+    """Creates the (fromKey, toKey, props) tuple of a m:n table row
+    that is needed by the function create_relationships.
+    Resolves the column positions for every row, use
+    compile_m_to_n_plan for many rows of the same table.
+    Args:
+        entity_attributes (list): The attribute names.
+        entity_values (list): The attribute values.
+        mn_information (dict): See create_neo4j_m_to_n_dict.
+    Returns:
+        tuple: The tuple (fromKey, toKey, props).
+    """
+    rd = create_neo4j_m_to_n_dict(entity_attributes, entity_values, mn_information)
+    from_key = rd["fromEntityAttributeValDict"][mn_information["fromAttribute"]]
+    to_key = rd["toEntityAttributeValDict"][mn_information["toAttribute"]]
+    props = rd["relationshipDict"] if rd["relationshipDict"] is not None else {}
+    return (from_key, to_key, props)
+
+
+def create_relationship_dicts(relationship_tuples, decimal_policy=DECIMAL_AS_FLOAT):
+    """Creates the parameter maps of relationships.
+    Args:
+        relationship_tuples (_type_):
+        Iterable of (fromKey, toKey, props) tuples.
+        decimal_policy (str, optional): See cypher_builder.to_neo4j_value.
+        Defaults to DECIMAL_AS_FLOAT.
+    Returns:
+        list: List of {fromKey, toKey, props} maps.
     """
-    node_dict = create_dict(param_names, vals)
-    properties = create_neo4j_properties_string(node_dict)
-    query = f"CREATE (n:{node_name} {{ {properties} }})"
-    execute_write_transaction(driver, run_query, query)
+    return [
+        {
+            "fromKey": to_neo4j_value(from_key, decimal_policy),
+            "toKey": to_neo4j_value(to_key, decimal_policy),
+            "props": {k: to_neo4j_value(v, decimal_policy) for k, v in props.items()},
+        }
+        for from_key, to_key, props in relationship_tuples
+    ]
 
 
-def create_relationship(
-    driver: Neo4jDriver,
-    from_entity,
-    to_entity,
-    relationship_name,
-    from_entity_attribute_val_dict,
-    to_entity_attribute_val_dict,
-    relationship_dict=None,
+def create_relationships(
+    graph,
+    mn_information: dict,
+    relationship_tuples,
+    batch_size: int,
+    decimal_policy=DECIMAL_AS_FLOAT,
+    merge=False,
 ):
-    """Creates a Neo4j relationship.
-    Args:
-        driver (Neo4jDriver): The Neo4j driver.
-        from_entity (str): The source entity.
-        to_entity (str): The destination entity.
-        relationship_name (str): The name of the relationship.
-        from_entity_attribute_val_dict (dict):
-        A dictionary containing data of the Neo4j source entity node.
-        to_entity_attribute_val_dict (dict):
-        A dictionary containing data of the Neo4j destination entity node.
-        relationship_dict (dict):
-        A dictionary containing data of the Neo4j relationship node.
-    """
-    from_properties = create_neo4j_properties_string(
-        from_entity_attribute_val_dict)
-    to_properties = create_neo4j_properties_string(
-        to_entity_attribute_val_dict)
-
-    if relationship_dict is not None:
-        relationship_properties = create_neo4j_properties_string(relationship_dict)
-        query = f"""
-        MATCH (a:{from_entity}{{ {from_properties} }}),
-        (b:{to_entity}{{ {to_properties} }}) CREATE (a)-[r:{relationship_name}{{ {relationship_properties} }}]->(b)
-        """
-        execute_write_transaction(driver, run_query, query)
-        return
+    """Creates relationships in the graph store in batches.
+    Every batch is written by a single call of the graph store (for Neo4j
+    a parameterized UNWIND/MATCH/CREATE query in its own write transaction).
+    The matched attributes should be backed by uniqueness
+    constraints (see create_unique_constraint).
+    Args:
+        graph (_type_): The graph store (see adapters.Neo4jGraph).
+        mn_information (dict): See create_neo4j_m_to_n_dict.
+        relationship_tuples (_type_):
+        Iterable of (fromKey, toKey, props) tuples.
+        batch_size (int): The maximal amount of relationships per transaction.
+        decimal_policy (str, optional): See cypher_builder.to_neo4j_value.
+        Defaults to DECIMAL_AS_FLOAT.
+        merge (bool, optional): If True, existing relationships with the same
+        primary key (primaryKeyAttribute) are updated instead of creating
+        duplicates. Defaults to False.
+    Returns:
+        int: The amount of created relationships.
+    """
+    amount = 0
+
+    for batch in chunks(relationship_tuples, batch_size):
+        relationship_dicts = create_relationship_dicts(batch, decimal_policy)
+
+        with span(
+            "relationships",
+            "neo4j",
+            type=mn_information["relationshipName"],
+            rows=len(relationship_dicts),
+        ):
+            graph.write_relationships(mn_information, relationship_dicts, merge)
+
+        amount += len(relationship_dicts)
+
+    return amount
+
+
+def delete_nodes(graph, node_name: str, key_attribute: str, keys, batch_size: int):
+    """Deletes nodes and their relationships from the graph store in batches.
+    Args:
+        graph (_type_): The graph store (see adapters.Neo4jGraph).
+        node_name (str): The node name.
+        key_attribute (str): The attribute that identifies a node.
+        keys (_type_): Iterable of the key attribute values of the nodes.
+        batch_size (int): The maximal amount of nodes per transaction.
+    Returns:
+        int: The amount of processed keys.
+    """
+    amount = 0
+
+    for batch in chunks(keys, batch_size):
+        graph.delete_nodes(node_name, key_attribute, batch)
+        amount += len(batch)
+
+    return amount
+
 
-    query = f"""
-    MATCH (a:{from_entity}{{ {from_properties} }}),
-    (b:{to_entity}{{ {to_properties} }}) CREATE (a)-[r:{relationship_name}]->(b)
+def delete_relationships(
+    graph,
+    mn_information: dict,
+    relationship_tuples,
+    batch_size: int,
+    decimal_policy=DECIMAL_AS_FLOAT,
+):
+    """Deletes the relationships of the given m:n rows in batches.
+    Args:
+        graph (_type_): The graph store (see adapters.Neo4jGraph).
+        mn_information (dict): See create_neo4j_m_to_n_dict.
+        relationship_tuples (_type_):
+        Iterable of (fromKey, toKey, props) tuples, only the primary key
+        of the props is used.
+        batch_size (int): The maximal amount of relationships per transaction.
+        decimal_policy (str, optional): See cypher_builder.to_neo4j_value.
+        Defaults to DECIMAL_AS_FLOAT.
+    Returns:
+        int: The amount of processed tuples.
     """
-    execute_write_transaction(driver, run_query, query)
+    amount = 0
+
+    key_attribute = mn_information["primaryKeyAttribute"]
+
+    for batch in chunks(relationship_tuples, batch_size):
+        relationship_dicts = [
+            {
+                "fromKey": to_neo4j_value(from_key, decimal_policy),
+                "toKey": to_neo4j_value(to_key, decimal_policy),
+                "key": to_neo4j_value(props[key_attribute], decimal_policy),
+            }
+            for from_key, to_key, props in batch
+        ]
+        graph.delete_relationships(mn_information, relationship_dicts)
+        amount += len(relationship_dicts)
+
+    return amount
 
 
 def create_neo4j_m_to_n_dict(entity_attributes, entity_values, mn_information):
     """Creates a dictionary that is needed to create a relationship
-    representing a m:n table (function create_relationship).
+    representing a m:n table (function create_relationships).
     Args:
         entity_attributes (list): The attribute names.
         entity_values (list): The attribute values.
@@ -261,51 +666,271 @@ def create_neo4j_m_to_n_dict(entity_attributes, entity_values, mn_information):
     ][0]
     to_entity_val = [el[1] for el in values_enum if el[0] == to_entity_val_index][0]
     result["toEntityAttributeValDict"] = {mn_information["toAttribute"]: to_entity_val}
-    omit_index = [prim_key_index, from_entity_val_index, to_entity_val_index]
+    # The primary key stays a property, it identifies the relationship
+    omit_index = [from_entity_val_index, to_entity_val_index]
     relationship_attributes = [
         el[1] for el in attributes_enum if el[0] not in omit_index
     ]
     relationship_values = [el[1] for el in values_enum if el[0] not in omit_index]
-
-    if len(relationship_attributes) == len(relationship_values) == 0:
-        result["relationshipDict"] = None
-        return result
-
     result["relationshipDict"] = create_dict(
         relationship_attributes, relationship_values
     )
     return result
 
 
-def neo4j_rollback(driver: Neo4jDriver, nodes, relationships):
-    """Executes a Neo4j rollback.
+def get_key_after(conn_old, table: str, primary_key: str, last_key, rows: int):
+    """Gets the primary key of the row that follows a key by an amount of rows
+    (or of the last row if the table ends before).
+    Args:
+        conn_old (_type_): The connection to the old database.
+        table (str): The table name.
+        primary_key (str): The primary key column name.
+        last_key (_type_): The key, None for the start of the table.
+        rows (int): The amount of rows.
+    Returns:
+        _type_: The primary key or None if no row follows the key.
+    """
+    cursor = conn_old.cursor()
+
+    try:
+        for page in iter_keyset_pages(
+            cursor, table, [primary_key], primary_key, rows, last_key
+        ):
+            return page[-1][0]
+    finally:
+        cursor.close()
+
+    return None
+
+
+def get_written_ranges(conn_old, table: str, target: str, checkpoints: CheckpointStore):
+    """Gets the primary key ranges of a table that the recorded run wrote
+    to a target. The run wrote from its start key (see CheckpointStore.start)
+    to the last committed key of a finished target. An unfinished target
+    may have committed one more batch after its last committed key, so its
+    range ends one chunk (or Neo4j batch if larger) after it. A table that was
+    migrated in key ranges (see migrate_table_sharded) was written in the
+    ranges that the run started.
+    Args:
+        conn_old (_type_): The connection to the old database.
+        table (str): The table name.
+        target (str): The target.
+        checkpoints (CheckpointStore): The checkpoint store.
+    Returns:
+        tuple: The primary key column name and the list of (first key, last key)
+        tuples, or None if the run did not write the table.
+    """
+    start = checkpoints.get_start(table, target)
+
+    if start is None:
+        return None
+
+    cursor = conn_old.cursor()
+    primary_key = get_primary_key(cursor, table)
+    cursor.close()
+    run_ranges = checkpoints.get_run_ranges(table)
+
+    if len(run_ranges) > 0 or len(checkpoints.get_finished_ranges(table)) > 0:
+        return primary_key, [(el[0], el[1] - 1) for el in sorted(run_ranges)]
+
+    progress = checkpoints.get(table, target)
+    last = progress["lastKey"]
+
+    if not progress["finished"]:
+        name = mn_tables_dict.get(table, {}).get("relationshipName", table)
+        batch_size = max(source_chunk_size, get_neo4j_batch_size(name))
+        batch_last = get_key_after(conn_old, table, primary_key, last, batch_size)
+        last = batch_last if batch_last is not None else last
+
+    first = get_key_after(conn_old, table, primary_key, start["startKey"], 1)
+
+    if first is None or last is None or first > last:
+        return primary_key, []
+
+    return primary_key, [(first, last)]
+
+
+def neo4j_rollback(
+    graph, conn_old, checkpoints: CheckpointStore, sync_state: SyncState
+):
+    """Deletes the relationships and then the nodes that the recorded run
+    created in Neo4j, in batches of rollback_batch_size. The relationships
+    are matched by the rows of their m:n tables in the written key ranges,
+    the nodes by their written key ranges (see get_written_ranges).
+    The recorded sync state of the m:n tables is discarded.
     Args:
-        driver (Neo4jDriver): The Neo4j driver.
-        nodes (list): The Neo4j nodes.
-        relationships (list): The relationship names.
+        graph (_type_): The graph store (see adapters.Neo4jGraph).
+        conn_old (_type_): The connection to the old database.
+        checkpoints (CheckpointStore): The checkpoint store.
+        sync_state (SyncState): The state of the sync passes.
     """
-    if driver is None:
+    if graph is None:
         return
-    
-    for relationship in relationships:
-        execute_write_transaction(
-            driver, run_query, f"MATCH ()-[r:{relationship}]->() DELETE r"
-        )
 
-    for node in nodes:
-        execute_write_transaction(driver, run_query, f"MATCH (d:{node}) DELETE d")
+    for table, mn_information in mn_tables_dict.items():
+        written = get_written_ranges(conn_old, table, TARGET_NEO4J, checkpoints)
+
+        if written is None:
+            continue
+
+        sync_state.clear_table(table)
+
+        for first, last in written[1]:
+            columns, _, row_chunks = read_table(
+                conn_old,
+                table,
+                rollback_batch_size,
+                rollback_batch_size,
+                source_read_mode,
+                first - 1,
+                last + 1,
+            )
+            map_row = compile_m_to_n_plan(columns, mn_information)
+
+            for chunk in row_chunks:
+                graph.delete_relationships(
+                    mn_information,
+                    create_relationship_dicts(
+                        map(map_row, chunk), neo4j_decimal_policy
+                    ),
+                )
+
+            log(
+                f"Rolled back {mn_information['relationshipName']} of {table} "
+                f"({first}-{last})."
+            )
+
+    for table in neo4j_tables:
+        written = get_written_ranges(conn_old, table, TARGET_NEO4J, checkpoints)
+
+        if written is None:
+            continue
+
+        primary_key, key_ranges = written
+
+        for first, last in key_ranges:
+            graph.delete_node_range(
+                table, primary_key, first, last, rollback_batch_size
+            )
+            log(f"Rolled back {table} nodes ({primary_key} {first}-{last}).")
 
 
-def mongodb_rollback(client: pymongo.MongoClient, db_name):
-    """Executes a MongoDB rollback.
+def mongodb_rollback(client: pymongo.MongoClient, db_name, checkpoints: CheckpointStore):
+    """Drops the MongoDB collections that the recorded run created.
     Args:
         client (pymongo.MongoClient): The Mongo client.
         db_name (str): The database name.
+        checkpoints (CheckpointStore): The checkpoint store.
     """
     if client is None:
         return
-    
-    client.drop_database(db_name)
+
+    for collection_name in checkpoints.get_created(TARGET_MONGODB):
+        client[db_name].drop_collection(collection_name)
+        log(f"Rolled back MongoDB collection {collection_name}.")
+
+
+def mssql_rollback(target, conn_old, checkpoints: CheckpointStore):
+    """Undoes what the recorded run wrote to the new database, the referencing
+    tables first: the tables that it created are dropped, the indexes, foreign
+    keys and rows (see get_written_ranges) that it added to the other tables
+    are deleted. The database itself is kept.
+    Args:
+        target (_type_): The backend of the new database (see adapters.OdbcBackend).
+        conn_old (_type_): The connection to the old database.
+        checkpoints (CheckpointStore): The checkpoint store.
+    """
+    created = set(checkpoints.get_created(TARGET_DDL))
+    dependencies = get_table_dependencies(mssql_tables)
+    tables = list(
+        reversed(get_dependency_order(list(dependencies.keys()), dependencies))
+    )
+    foreign_keys = [
+        el
+        for statement in mssql_tables
+        for el in get_foreign_keys(statement)
+        if el["table"] not in created
+    ]
+    written = {
+        table: get_written_ranges(conn_old, table, TARGET_MSSQL, checkpoints)
+        for table in tables
+        if table not in created
+    }
+
+    if len(created) == 0 and all(el is None for el in written.values()):
+        return
+
+    conn_new = target.connect()
+
+    try:
+        cursor = conn_new.cursor()
+
+        for foreign_key in foreign_keys:
+            if foreign_key["name"] in created:
+                cursor.execute(drop_foreign_key_query(foreign_key))
+                log(f"Rolled back foreign key {foreign_key['name']}.")
+
+            if f"IX_{foreign_key['table']}_{foreign_key['column']}" in created:
+                cursor.execute(drop_foreign_key_index_query(foreign_key))
+                log(f"Rolled back index on {foreign_key['table']}.", DEBUG)
+
+        for table in tables:
+            if table in created:
+                cursor.execute(f"DROP TABLE {table};")
+                log(f"Rolled back table {table}.")
+                continue
+
+            if written[table] is None:
+                continue
+
+            primary_key, key_ranges = written[table]
+
+            for first, last in key_ranges:
+                cursor.execute(
+                    f"DELETE FROM {table} "
+                    f"WHERE {primary_key} >= ? AND {primary_key} <= ?;",
+                    [first, last],
+                )
+                log(f"Rolled back {table} rows ({primary_key} {first}-{last}).")
+
+        commit(conn_new, f"{target.name} committed.")
+    finally:
+        close(conn_new, f"{target.name} closed.")
+
+
+def run_rollback(source, target, graph, documents, checkpoint_file: str):
+    """Undoes what the run recorded in the checkpoint journal wrote: the
+    Neo4j relationships and nodes, the MongoDB collections and the tables,
+    indexes, foreign keys and rows of the new database. A resumed run only
+    undoes its own writes, the writes of the previous runs are kept.
+    The rollback time depends on the amount of written rows, not on the size
+    of the stores. The journal is reset to the start of the run afterwards
+    (see CheckpointStore.restore).
+    Args:
+        source (_type_): The backend of the old database (see adapters.OdbcBackend).
+        target (_type_): The backend of the new database (see adapters.OdbcBackend).
+        graph (_type_): The graph store (see adapters.Neo4jGraph).
+        documents (_type_): The document store (a pymongo.MongoClient
+        or adapters.InMemoryDocumentStore).
+        checkpoint_file (str): The path of the checkpoint journal.
+    """
+    start = time.perf_counter()
+    checkpoints = CheckpointStore(checkpoint_file)
+    sync_state = SyncState(sync_state_path)
+    conn_old = None
+
+    try:
+        conn_old = source.connect()
+        neo4j_rollback(graph, conn_old, checkpoints, sync_state)
+        mongodb_rollback(documents, mongodb_db_name, checkpoints)
+        mssql_rollback(target, conn_old, checkpoints)
+        checkpoints.restore()
+    finally:
+        close(conn_old)
+        close(checkpoints)
+        close(sync_state)
+
+    log(f"Rollback completed in {time.perf_counter() - start:.2f}s.")
 
 
 def get_neo4j_driver(connection_data):
@@ -335,321 +960,2099 @@ def get_mongodb_driver(connection_data):
     return driver
 
 
-# Connection data
-master_db_conn_str = "DRIVER={SQL Server};SERVER=localhost;DATABASE=master;UID=sa;PWD=strongPassword123A!"
-ecommerce_db_conn_str = "DRIVER={SQL Server};SERVER=localhost;DATABASE=ECommerce;UID=sa;PWD=strongPassword123A!"
-new_ecommerce_db_conn_str = "DRIVER={SQL Server};SERVER=localhost;DATABASE=ECommercePolyglot;UID=sa;PWD=strongPassword123A!"
-neo4j_connection = {
-    "URI": "neo4j://localhost:7687",
-    "Username": "neo4j",
-    "Password": "strongPassword123A!",
-}
-mongodb_connection = {
-    "connectionString": "mongodb://localhost:27017"
-}
+def start_targets(checkpoints: CheckpointStore, table: str, progress: dict):
+    """Records that the run starts writing a table in its unfinished targets
+    and the last committed key of every target as its start key
+    (see CheckpointStore.start).
+    Args:
+        checkpoints (CheckpointStore): The checkpoint store.
+        table (str): The table name.
+        progress (dict): The progress of every target {<target>: <progress>}.
+    Returns:
+        bool: True if the table was started in Neo4j by a previous run. Then
+        the first batch after the checkpoint may have been committed already
+        and has to be merged instead of created.
+    """
+    for target, target_progress in progress.items():
+        if target_progress is None or not target_progress["finished"]:
+            checkpoints.start(table, target)
 
-# SQL Tables
-sql_tables = [
-    "Address",
-    "Category",
-    "Customer",
-    "CustomerOrder",
-    "CustomerToAddress",
-    "Courier",
-    "CourierToAddress",
-    "Vendor",
-    "VendorToAddress",
-    "Product",
-    "VendorToProduct",
-    "OrderPosition",
-    "ShoppingCart",
-]
-old_mssql_db_name = "ECommerce"
-mssql_db_name = "ECommercePolyglot"
-neo4j_tables = [
-    "VendorToProduct",
-    "ShoppingCart",
-    "Product",
-    "Category"
-]
-mongodb_db_name = "ECommercePolyglot"
-mongodb_tables = [
-    "CustomerAction",
-    "ProductImage",
-    "ProductRecommendation",
-    "ProductVideo",
-    "Review",
-]
-relationships = ["HAS_CATEGORY", "IS_IN"]
-mn_tables_dict = {
-    "ProductToCart": {
-        "fromEntity": "VendorToProduct",
-        "toEntity": "ShoppingCart",
-        "relationshipName": "IS_IN",
-        "fromAttribute": "VendorToProductId",
-        "toAttribute": "CartId",
-        "primaryKeyAttribute": "ProductToCartId",
-    },
-    "ProductToCategory": {
-        "fromEntity": "Product",
-        "toEntity": "Category",
-        "relationshipName": "HAS_CATEGORY",
-        "fromAttribute": "ProductId",
-        "toAttribute": "CategoryId",
-        "primaryKeyAttribute": "ProductToCategoryId"
-    }
-}
+    return progress.get(TARGET_NEO4J) is not None
 
-# Create a new MSSQL server with necessary tables
-# ----------------------------------------------------------------
-try:
-    master_conn = None
-    conn_old = None
-    conn_new = None
-    neo4j_driver = None
-    mongodb_driver = None
-    neo4j_driver = get_neo4j_driver(neo4j_connection)
-    mongodb_driver = get_mongodb_driver(mongodb_connection)
-    master_conn = pyodbc.connect(master_db_conn_str, autocommit=True)
-    log(f"Connected to {master_db_conn_str}.")
-    conn_old = pyodbc.connect(ecommerce_db_conn_str)
-    log(f"Connected to {ecommerce_db_conn_str}.")
-    cursor = master_conn.cursor()
-    cursor.execute(f"CREATE DATABASE {mssql_db_name}")
-    log(f"Created {mssql_db_name}.")
-
-    mssql_tables = [
-    """
-    CREATE TABLE Address
-    (
-        AddressId INT PRIMARY KEY,
-        Street VARCHAR(100) NOT NULL,
-        City VARCHAR(100) NOT NULL,
-        PostalCode VARCHAR(10) NOT NULL,
-        Country VARCHAR(20) NOT NULL,
-    );
-    """,
-    """
-    CREATE TABLE Category
-    (
-        CategoryId INT PRIMARY KEY,
-        Name VARCHAR(100) NOT NULL
-    );
-    """,
-    """
-    CREATE TABLE Customer 
-    (
-        CustomerId INT PRIMARY KEY,
-        UserName VARCHAR(100) NOT NULL,
-        FirstName VARCHAR(100) NOT NULL,
-        LastName VARCHAR(100) NOT NULL,
-        Email VARCHAR(100) NOT NULL,
-        Password VARCHAR(100) NOT NULL,
-        PhoneNumber VARCHAR(20)
-    );
-    """,
-    """
-    CREATE TABLE CustomerOrder
-    (
-        OrderId INT PRIMARY KEY,
-        OrderName VARCHAR(100),
-        OrderDate DATETIME NOT NULL,
-        CustomerId INT NOT NULL,
-        BillingAddressId INT NOT NULL,
-        IsPaid BIT NOT NULL,
-        FOREIGN KEY (CustomerId) REFERENCES Customer(CustomerId),
-        FOREIGN KEY (BillingAddressId) REFERENCES Address(AddressId)
-    );
-    """,
-    """
-    CREATE TABLE CustomerToAddress
-    (
-        CustomerToAddressId INT PRIMARY KEY,
-        CustomerId INT NOT NULL,
-        AddressId INT NOT NULL,
-        FOREIGN KEY (CustomerId) REFERENCES Customer(CustomerId),
-        FOREIGN KEY (AddressId) REFERENCES Address(AddressId)
-    );
-    """,
-    """
-    CREATE TABLE Courier
-    (
-        CourierId INT PRIMARY KEY,
-        Name VARCHAR(100) NOT NULL,
-        Email VARCHAR(100) NOT NULL,
-        PhoneNumber VARCHAR(20)
-    );
-    """,
-    """
-    CREATE TABLE CourierToAddress
-    (
-        CourierToAddressId INT PRIMARY KEY,
-        CourierId INT NOT NULL,
-        AddressId INT NOT NULL,
-        FOREIGN KEY (CourierId) REFERENCES Courier(CourierId),
-        FOREIGN KEY (AddressId) REFERENCES Address(AddressId)
-    );
-    """,
-    """
-    CREATE TABLE Vendor
-    (
-        VendorId INT PRIMARY KEY,
-        UserName VARCHAR(100) NOT NULL,
-        Password VARCHAR(100) NOT NULL,
-        Name VARCHAR(100) NOT NULL,
-        Email VARCHAR(100) NOT NULL,
-        PhoneNumber VARCHAR(20)
-    );
-    """,
-    """
-    CREATE TABLE VendorToAddress
-    (
-        VendorToAddressId INT PRIMARY KEY,
-        VendorId INT NOT NULL,
-        AddressId INT NOT NULL,
-        FOREIGN KEY (VendorId) REFERENCES Vendor(VendorId),
-        FOREIGN KEY (AddressId) REFERENCES Address(AddressId)
-    );
-    """,
-    """
-    CREATE TABLE Product 
-    (
-        ProductId INT PRIMARY KEY,
-        Name VARCHAR(100) NOT NULL,
-        Description TEXT NOT NULL
-    );
-    """,
-    """
-    CREATE TABLE VendorToProduct
-    (
-        VendorToProductId INT PRIMARY KEY,
-        VendorId INT NOT NULL,
-        ProductId INT NOT NULL,
-        UnitPriceEuro DECIMAL(10,2) NOT NULL,
-        InventoryLevel INT NOT NULL,
-        FOREIGN KEY (VendorId) REFERENCES Vendor(VendorId),
-        FOREIGN KEY (ProductId) REFERENCES Product(ProductId)
-    );
-    """,
-    """
-    CREATE TABLE OrderPosition
-    (
-    OrderPositionId INT PRIMARY KEY,
-    OrderId INT NOT NULL,
-    Amount INT, 
-    VendorToProductId INT NOT NULL,
-    CourierCompanyId INT NOT NULL,
-    DeliveryDate DATETIME NOT NULL,
-    DeliveryAddressId INT NOT NULL,
-    FOREIGN KEY (CourierCompanyId) REFERENCES Courier(CourierId),
-    FOREIGN KEY (DeliveryAddressId) REFERENCES Address(AddressId),
-    FOREIGN KEY (OrderId) REFERENCES CustomerOrder(OrderId),
-    FOREIGN KEY (VendorToProductId) REFERENCES VendorToProduct(VendorToProductId),
-    );
-    """,
-    """
-    CREATE TABLE ShoppingCart
-    (
-    CartId INT PRIMARY KEY,
-    DateCreated DATETIME NOT NULL,
-    CustomerId INT NOT NULL,
-    FOREIGN KEY (CustomerId) REFERENCES Customer(CustomerId)
-    );
+
+def create_table_progress(conn_old, table: str, primary_key: str, resume_key):
+    """Creates the progress counters of a table. The rows left to read are
+    counted for the ETA if log_progress_totals is set.
+    Args:
+        conn_old (_type_): The connection to the old database.
+        table (str): The table name.
+        primary_key (str): The primary key column name.
+        resume_key (_type_): See checkpoint.get_resume_key.
+    Returns:
+        TableProgress: The progress counters.
     """
+    total = None
+
+    if log_progress_totals:
+        total = count_rows(conn_old, table, primary_key, resume_key)
+
+    return TableProgress(table, total)
+
+
+def migrate_table(
+    table: str,
+    source_connections: ThreadConnections,
+    target_connections: ThreadConnections,
+    graph,
+    checkpoints: CheckpointStore,
+):
+    """Copies a table into the new MSSQL database and creates
+    the corresponding Neo4j nodes if the table is part of a m:n relationship.
+    The progress of every target is recorded in the checkpoint store, so an
+    interrupted table continues after the last committed primary key.
+    The table is committed in the new database afterwards.
+    Args:
+        table (str): The table name.
+        source_connections (ThreadConnections): Connections to the old database.
+        target_connections (ThreadConnections): Connections to the new database.
+        graph (_type_): The graph store (see adapters.Neo4jGraph).
+        checkpoints (CheckpointStore): The checkpoint store.
+    """
+    targets = [TARGET_MSSQL, TARGET_NEO4J] if table in neo4j_tables else [TARGET_MSSQL]
+    progress = {target: checkpoints.get(table, target) for target in targets}
+
+    if all(checkpoints.is_finished(table, target) for target in targets):
+        log(f"Skipped {table} (already migrated).")
+        return
+
+    conn_old = source_connections.get()
+    conn_new = target_connections.get()
+    resume_key = get_resume_key(list(progress.values()))
+    columns, primary_key, row_chunks = read_table(
+        conn_old,
+        table,
+        source_chunk_size,
+        source_max_buffered_rows,
+        source_read_mode,
+        resume_key,
+    )
+    log(f"Executed SELECT from {table} in {old_mssql_db_name}.", DEBUG)
+    table_progress = create_table_progress(conn_old, table, primary_key, resume_key)
+
+    if table in neo4j_tables and progress[TARGET_NEO4J] is not None:
+        # The batch after the checkpoint may have been committed already
+        create_unique_constraint(graph, table, primary_key)
+
+    if pipeline_mode and table in neo4j_tables:
+        migrate_table_pipelined(
+            table,
+            columns,
+            primary_key,
+            row_chunks,
+            conn_new,
+            graph,
+            checkpoints,
+            table_progress,
+        )
+        return
+
+    key_index = columns.index(primary_key)
+    cursor_new = get_bulk_cursor(conn_new, mssql_fast_executemany)
+    insert_query = create_insert_query(table, tuple(columns))
+    merge_neo4j = start_targets(checkpoints, table, progress)
+    mssql_amount = 0
+    mssql_seconds = 0
+    uncommitted = 0
+    amount = 0
+    neo4j_seconds = 0
+    last_key = None
+
+    for chunk in iter_spans(row_chunks, "SELECT", "source", table=table):
+        last_key = chunk[-1][key_index]
+        start = time.perf_counter()
+        rows = get_pending_rows(chunk, key_index, progress[TARGET_MSSQL])
+
+        with span("INSERT", "mssql", table=table, rows=len(rows)):
+            inserted = insert_rows(cursor_new, insert_query, rows)
+
+        mssql_amount += inserted
+        uncommitted += inserted
+        table_progress.count("mssql", inserted)
+
+        if (
+            mssql_commit_interval is not None
+            and uncommitted >= mssql_commit_interval
+        ):
+            conn_new.commit()
+            checkpoints.save(table, TARGET_MSSQL, last_key)
+            uncommitted = 0
+
+        mssql_seconds += time.perf_counter() - start
+
+        if table in neo4j_tables:
+            start = time.perf_counter()
+            rows = get_pending_rows(chunk, key_index, progress[TARGET_NEO4J])
+            nodes = add_nodes(
+                graph,
+                columns,
+                rows,
+                table,
+                get_neo4j_batch_size(table),
+                neo4j_decimal_policy,
+                primary_key if merge_neo4j else None,
+            )
+            amount += nodes
+            table_progress.count("neo4j", nodes)
+            checkpoints.save(table, TARGET_NEO4J, last_key)
+            merge_neo4j = False
+            neo4j_seconds += time.perf_counter() - start
+
+        table_progress.add(len(chunk))
+
+    rows_per_second = mssql_amount / mssql_seconds if mssql_seconds > 0 else 0
+    log(
+        f"Executed INSERT of {mssql_amount} rows to {table} in {mssql_db_name} "
+        f"in {mssql_seconds:.2f}s ({rows_per_second:.0f} rows/s)."
+    )
+
+    if table in neo4j_tables:
+        rows_per_second = amount / neo4j_seconds if neo4j_seconds > 0 else 0
+        log(
+            f"Created {amount} Neo4j nodes for {table} in {neo4j_seconds:.2f}s "
+            f"({rows_per_second:.0f} rows/s, old database {old_mssql_db_name})."
+        )
+        checkpoints.finish(table, TARGET_NEO4J, last_key)
+
+    conn_new.commit()
+    checkpoints.finish(table, TARGET_MSSQL, last_key)
+
+
+def migrate_table_pipelined(
+    table: str,
+    columns: list,
+    primary_key: str,
+    row_chunks,
+    conn_new,
+    graph,
+    checkpoints: CheckpointStore,
+    table_progress: TableProgress,
+):
+    """Writes the streamed rows of a table to MSSQL and Neo4j concurrently.
+    Both writers batch on their own and are fed through bounded queues.
+    The utilization and queue depth of every stage are logged.
+    Args:
+        table (str): The table name.
+        columns (list): The column names.
+        primary_key (str): The primary key column name.
+        row_chunks (_type_): Iterable of row chunks of the old database
+        ordered by the primary key.
+        conn_new (_type_): The connection to the new database.
+        graph (_type_): The graph store (see adapters.Neo4jGraph).
+        checkpoints (CheckpointStore): The checkpoint store.
+        table_progress (TableProgress): The progress counters of the table.
+    """
+    key_index = columns.index(primary_key)
+    cursor_new = get_bulk_cursor(conn_new, mssql_fast_executemany)
+    insert_query = create_insert_query(table, tuple(columns))
+    progress = {
+        TARGET_MSSQL: checkpoints.get(table, TARGET_MSSQL),
+        TARGET_NEO4J: checkpoints.get(table, TARGET_NEO4J),
+    }
+    merge_neo4j = start_targets(checkpoints, table, progress)
+    last_keys = {TARGET_MSSQL: None, TARGET_NEO4J: None}
+    uncommitted = 0
+
+    def write_mssql(rows):
+        nonlocal uncommitted
+        last_keys[TARGET_MSSQL] = rows[-1][key_index]
+        table_progress.add(len(rows))
+        rows = get_pending_rows(rows, key_index, progress[TARGET_MSSQL])
+
+        with span("INSERT", "mssql", table=table, rows=len(rows)):
+            inserted = insert_rows(cursor_new, insert_query, rows)
+
+        uncommitted += inserted
+        table_progress.count("mssql", inserted)
+
+        if mssql_commit_interval is not None and uncommitted >= mssql_commit_interval:
+            conn_new.commit()
+            checkpoints.save(table, TARGET_MSSQL, last_keys[TARGET_MSSQL])
+            uncommitted = 0
+
+    def write_neo4j(rows):
+        nonlocal merge_neo4j
+        last_keys[TARGET_NEO4J] = rows[-1][key_index]
+        nodes = add_nodes(
+            graph,
+            columns,
+            get_pending_rows(rows, key_index, progress[TARGET_NEO4J]),
+            table,
+            neo4j_batch_size,
+            neo4j_decimal_policy,
+            primary_key if merge_neo4j else None,
+        )
+        table_progress.count("neo4j", nodes)
+        checkpoints.save(table, TARGET_NEO4J, last_keys[TARGET_NEO4J])
+        merge_neo4j = False
+
+    def read_rows():
+        yield from iter_spans(row_chunks, "SELECT", "source", table=table)
+        read_all[0] = True
+
+    def finish_mssql():
+        # Targets are only finished after the reader reached the end
+        if not read_all[0]:
+            raise RuntimeError(f"The reader of {table} stopped before the end!")
+
+        conn_new.commit()
+        checkpoints.finish(table, TARGET_MSSQL, last_keys[TARGET_MSSQL])
+
+    def finish_neo4j():
+        if not read_all[0]:
+            raise RuntimeError(f"The reader of {table} stopped before the end!")
+
+        checkpoints.finish(table, TARGET_NEO4J, last_keys[TARGET_NEO4J])
+
+    read_all = [False]
+    neo4j_batch_size = get_neo4j_batch_size(table)
+    writers = [
+        PipelineWriter(
+            "mssql",
+            write_mssql,
+            mssql_batch_size,
+            finish_mssql,
+            # The saved checkpoint matches the committed rows
+            conn_new.rollback,
+        ),
+        PipelineWriter("neo4j", write_neo4j, neo4j_batch_size, finish_neo4j),
     ]
+    stats = run_pipeline(read_rows(), writers, pipeline_queue_size)
+
+    for stage in stats:
+        log(
+            f"Pipeline {table} {stage['stage']}: {stage['rows']} rows, "
+            f"busy {stage['busySeconds']:.2f}s "
+            f"({stage['utilization']:.0%} utilization), queue depth "
+            f"mean {stage['meanQueueDepth']:.1f} / max {stage['maxQueueDepth']}."
+        )
+
+    bottleneck = max(stats, key=lambda stage: stage["utilization"])
+    log(f"Pipeline {table} bottleneck: {bottleneck['stage']}.")
+
+
+def get_sync_checksums(conn_old, table: str, sync_state: SyncState, progress):
+    """Gets the range checksums of a m:n table that is migrated, so its rows can
+    be recorded in the sync state (see delta_sync.SyncStateRecorder). They are
+    computed before the rows are read, a range that changes in between is
+    compared again by the next sync pass. The recorded state of a table that
+    was not started yet is discarded, it describes another graph.
+    Args:
+        conn_old (_type_): The connection to the old database.
+        table (str): The table name.
+        sync_state (SyncState): The state of the sync passes.
+        progress (dict): The Neo4j progress of the table (see CheckpointStore.get).
+    Returns:
+        tuple: The column types (see delta_sync.get_column_types)
+        and the range checksums (see delta_sync.get_range_checksums).
+    """
+    if progress is None:
+        sync_state.clear_table(table)
 
-    conn_new = pyodbc.connect(new_ecommerce_db_conn_str)
-    log(f"Connected to {new_ecommerce_db_conn_str}.")
-    for mssql_create_table_query in mssql_tables:
+    cursor = conn_old.cursor()
+
+    try:
+        column_types = get_column_types(cursor, table)
+        primary_key = get_primary_key(cursor, table)
+        return column_types, get_range_checksums(
+            cursor, table, column_types, primary_key, sync_range_size
+        )
+    finally:
+        cursor.close()
+
+
+def migrate_m_to_n_table(
+    table: str,
+    source_connections: ThreadConnections,
+    graph,
+    checkpoints: CheckpointStore,
+    sync_state: SyncState,
+):
+    """Stores a m:n table as relationships in the graph database.
+    The progress is recorded in the checkpoint store after every chunk,
+    the written rows are recorded in the sync state, so the first sync
+    or upsert pass only merges the changed ranges (see sync_m_to_n_table).
+    Args:
+        table (str): The table name.
+        source_connections (ThreadConnections): Connections to the old database.
+        graph (_type_): The graph store (see adapters.Neo4jGraph).
+        checkpoints (CheckpointStore): The checkpoint store.
+        sync_state (SyncState): The state of the sync passes.
+    """
+    progress = checkpoints.get(table, TARGET_NEO4J)
+
+    if checkpoints.is_finished(table, TARGET_NEO4J):
+        log(f"Skipped {table} (already migrated).")
+        return
+
+    conn_old = source_connections.get()
+    resume_key = get_resume_key([progress])
+    column_types, checksums = get_sync_checksums(conn_old, table, sync_state, progress)
+    columns, primary_key, row_chunks = read_table(
+        conn_old,
+        table,
+        source_chunk_size,
+        source_max_buffered_rows,
+        source_read_mode,
+        resume_key,
+    )
+    log(f"Executed SELECT from {table} in {old_mssql_db_name}.", DEBUG)
+    table_progress = create_table_progress(conn_old, table, primary_key, resume_key)
+
+    mn_information = mn_tables_dict[table]
+    map_row = compile_m_to_n_plan(columns, mn_information)
+    key_index = columns.index(primary_key)
+    merge = start_targets(checkpoints, table, {TARGET_NEO4J: progress})
+    recorder = SyncStateRecorder(
+        sync_state,
+        table,
+        column_types,
+        columns,
+        primary_key,
+        checksums,
+        sync_range_size,
+        (resume_key + 1 if resume_key is not None else None, None),
+    )
+    start = time.perf_counter()
+    amount = 0
+    last_key = None
+
+    for chunk in iter_spans(row_chunks, "SELECT", "source", table=table):
+        last_key = chunk[-1][key_index]
+        relationships = create_relationships(
+            graph,
+            mn_information,
+            map(map_row, chunk),
+            get_neo4j_batch_size(mn_information["relationshipName"]),
+            neo4j_decimal_policy,
+            merge,
+        )
+        amount += relationships
+        table_progress.count("neo4j", relationships)
+        checkpoints.save(table, TARGET_NEO4J, last_key)
+        recorder.add(chunk)
+        merge = False
+        table_progress.add(len(chunk))
+
+    recorder.finish()
+    seconds = time.perf_counter() - start
+    rows_per_second = amount / seconds if seconds > 0 else 0
+    log(
+        f"Created {amount} Neo4j relationships for {table} in {seconds:.2f}s "
+        f"({rows_per_second:.0f} rows/s, old database {old_mssql_db_name})."
+    )
+    checkpoints.finish(table, TARGET_NEO4J, last_key)
+
+
+def get_table_targets(table: str):
+    """Gets the targets a table is migrated to.
+    Args:
+        table (str): The table name.
+    Returns:
+        list: The targets.
+    """
+    if table in mn_tables_dict:
+        return [TARGET_NEO4J]
+
+    if table in neo4j_tables:
+        return [TARGET_MSSQL, TARGET_NEO4J]
+
+    return [TARGET_MSSQL]
+
+
+def get_shard_settings():
+    """Gets the configuration that is passed to the shard worker processes,
+    so changes at runtime (e.g. by the benchmarks) reach them.
+    Returns:
+        dict: Dictionary of the format {<variable name>: <value>}.
+    """
+    return {name: globals()[name] for name in shard_settings}
+
+
+def init_shard_worker(source, target, graph_factory, settings: dict, metadata: dict):
+    """Initializes a shard worker process: applies the configuration and opens
+    the connections and the graph store of the process.
+    Args:
+        source (_type_): The backend of the old database (see adapters.OdbcBackend).
+        target (_type_): The backend of the new database (see adapters.OdbcBackend).
+        graph_factory (_type_): Module level function without arguments that
+        creates the graph store (e.g. get_server_graph).
+        settings (dict): See get_shard_settings.
+        metadata (dict): The column metadata of the source tables
+        (see source_reader.set_table_metadata).
+    """
+    globals().update(settings)
+    set_table_metadata(metadata)
+    configure_logging()
+    shard_worker["source"] = source.connect()
+    shard_worker["target"] = target.connect()
+    shard_worker["graph"] = graph_factory()
+    shard_worker["syncState"] = SyncState(sync_state_path)
+    atexit.register(close_shard_worker)
+
+
+def close_shard_worker():
+    """Closes the connections, the graph store and the sync state
+    of a shard worker process."""
+    for name in ["source", "target", "graph", "syncState"]:
+        close(shard_worker.pop(name, None))
+
+
+def migrate_table_range(table: str, key_range: tuple, resumed: bool, checksums=None):
+    """Migrates the rows of an integer primary key range of a table
+    in a shard worker process (see migrate_table_sharded). The new database
+    is committed once per range unless mssql_commit_interval is set.
+    Args:
+        table (str): The table name.
+        key_range (tuple): The first key and the key after the range.
+        resumed (bool): Whether the range may have been written partially
+        by a previous run. Then the MSSQL rows continue after the greatest key
+        of the range in the new database and the Neo4j writes are merged.
+        checksums (dict, optional): The range checksums of a m:n table within
+        the key range, its rows are recorded in the sync state of the process
+        (see get_sync_checksums). Defaults to None.
+    Returns:
+        dict: Dictionary of the format {"rows": <value>, "mssql": <value>,
+        "neo4j": <value>, "seconds": <value>}.
+    """
+    start = time.perf_counter()
+    conn_old = shard_worker["source"]
+    conn_new = shard_worker["target"]
+    graph = shard_worker["graph"]
+    result = {"rows": 0, "mssql": 0, "neo4j": 0}
+    columns, primary_key, row_chunks = read_table(
+        conn_old,
+        table,
+        source_chunk_size,
+        source_max_buffered_rows,
+        source_read_mode,
+        key_range[0] - 1,
+        key_range[1],
+    )
+
+    if table in mn_tables_dict:
+        mn_information = mn_tables_dict[table]
+        map_row = compile_m_to_n_plan(columns, mn_information)
+        cursor = conn_old.cursor()
+        recorder = SyncStateRecorder(
+            shard_worker["syncState"],
+            table,
+            get_column_types(cursor, table),
+            columns,
+            primary_key,
+            checksums,
+            sync_range_size,
+            key_range,
+        )
+        cursor.close()
+
+        for chunk in row_chunks:
+            result["neo4j"] += create_relationships(
+                graph,
+                mn_information,
+                map(map_row, chunk),
+                get_neo4j_batch_size(mn_information["relationshipName"]),
+                neo4j_decimal_policy,
+                resumed,
+            )
+            recorder.add(chunk)
+            result["rows"] += len(chunk)
+
+        recorder.finish()
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+    key_index = columns.index(primary_key)
+    cursor_new = get_bulk_cursor(conn_new, mssql_fast_executemany)
+    insert_query = create_insert_query(table, tuple(columns))
+    mssql_progress = None
+    uncommitted = 0
+
+    if resumed:
         cursor = conn_new.cursor()
-        cursor.execute(mssql_create_table_query)
-        log(f"Executed CREATE TABLE query in {mssql_db_name}.")
-    # ----------------------------------------------------------------
-    # Load data into tables and create corresponding graph nodes if part of m:n relationship
-    # ----------------------------------------------------------------
-    for table in sql_tables:
-        cursor_old = conn_old.cursor()
-        cursor_new = conn_new.cursor()
-        cols = cursor_old.columns(table=table)
-        columns = [el.column_name for el in cols.fetchall()]
-        columns_str = ",".join(columns)
-        select_query = f"SELECT * FROM {table}"
-        cursor_old.execute(select_query)
-        old_rows = cursor_old.fetchall()
-        log(f"Executed SELECT from {table} in {old_mssql_db_name}.")
-
-        for row in old_rows:
-            insert_query = (
-                f"INSERT INTO {table} ("
-                + columns_str
-                + ") VALUES ("
-                + ",".join(["?" for _ in row])
-                + ");"
+        last_key = cursor.execute(
+            f"SELECT MAX({primary_key}) FROM {table} "
+            f"WHERE {primary_key} >= ? AND {primary_key} < ?",
+            list(key_range),
+        ).fetchone()[0]
+        cursor.close()
+        mssql_progress = {"lastKey": last_key, "finished": False}
+
+    try:
+        for chunk in row_chunks:
+            rows = get_pending_rows(chunk, key_index, mssql_progress)
+            inserted = insert_rows(cursor_new, insert_query, rows)
+            result["mssql"] += inserted
+            uncommitted += inserted
+
+            if (
+                mssql_commit_interval is not None
+                and uncommitted >= mssql_commit_interval
+            ):
+                conn_new.commit()
+                uncommitted = 0
+
+            if table in neo4j_tables:
+                result["neo4j"] += add_nodes(
+                    graph,
+                    columns,
+                    chunk,
+                    table,
+                    get_neo4j_batch_size(table),
+                    neo4j_decimal_policy,
+                    primary_key if resumed else None,
+                )
+
+            result["rows"] += len(chunk)
+
+        conn_new.commit()
+    except Exception:
+        conn_new.rollback()
+        raise
+
+    result["seconds"] = time.perf_counter() - start
+    log(
+        f"Migrated {table} keys {key_range[0]} to {key_range[1] - 1} "
+        f"in {result['seconds']:.2f}s (process {os.getpid()}).",
+        DEBUG,
+    )
+    return result
+
+
+def migrate_table_sharded(
+    table: str,
+    source,
+    target,
+    source_connections: ThreadConnections,
+    graph,
+    checkpoints: CheckpointStore,
+    graph_factory,
+    sync_state: SyncState,
+):
+    """Migrates a table in integer primary key ranges of shard_range_size keys
+    that are processed by shard_processes worker processes with their own
+    connections and graph store (see migrate_table_range). Finished ranges
+    are recorded in the checkpoint store and skipped when resuming. The rows
+    of a m:n table are recorded in the sync state by the worker processes.
+    Args:
+        table (str): The table name.
+        source (_type_): The backend of the old database (see adapters.OdbcBackend).
+        target (_type_): The backend of the new database (see adapters.OdbcBackend).
+        source_connections (ThreadConnections): Connections to the old database.
+        graph (_type_): The graph store of the coordinator (see adapters.Neo4jGraph).
+        checkpoints (CheckpointStore): The checkpoint store.
+        graph_factory (_type_): See init_shard_worker.
+        sync_state (SyncState): The state of the sync passes.
+    """
+    targets = get_table_targets(table)
+    progress = {target: checkpoints.get(table, target) for target in targets}
+
+    if all(checkpoints.is_finished(table, target) for target in targets):
+        log(f"Skipped {table} (already migrated).")
+        return
+
+    conn_old = source_connections.get()
+    cursor = conn_old.cursor()
+    primary_key = get_primary_key(cursor, table)
+    cursor.close()
+    resumed = any(el is not None for el in progress.values())
+    start_targets(checkpoints, table, progress)
+
+    if resumed and table in neo4j_tables:
+        # The nodes of the unfinished ranges are merged
+        create_unique_constraint(graph, table, primary_key)
+
+    key_ranges = get_key_ranges(
+        [get_key_bounds(conn_old, table, primary_key)], shard_range_size
+    )
+    finished = checkpoints.get_finished_ranges(table)
+    checksums = dict()
+
+    if table in mn_tables_dict:
+        _, checksums = get_sync_checksums(
+            conn_old, table, sync_state, progress[TARGET_NEO4J]
+        )
+
+    tasks = [
+        (
+            table,
+            key_range,
+            resumed,
+            {
+                range_id: checksum
+                for range_id, checksum in checksums.items()
+                if key_range[0] <= range_id * sync_range_size < key_range[1]
+            },
+        )
+        for key_range in key_ranges
+        if key_range not in finished
+    ]
+    checkpoints.start_ranges(table, [el[1] for el in tasks])
+    table_progress = create_table_progress(conn_old, table, primary_key, None)
+    table_progress.add(0)
+    processes = min(shard_processes, max(len(tasks), 1))
+
+    def on_finished(task, result):
+        checkpoints.finish_range(table, task[1])
+
+        for target in targets:
+            table_progress.count(target, result[target])
+
+        table_progress.add(result["rows"])
+
+    start = time.perf_counter()
+    results = run_in_processes(
+        tasks,
+        migrate_table_range,
+        processes,
+        init_shard_worker,
+        (
+            source,
+            target,
+            graph_factory,
+            get_shard_settings(),
+            dict(table_metadata),
+        ),
+        on_finished,
+    )
+    seconds = time.perf_counter() - start
+    rows = sum(el["rows"] for el in results)
+    busy_seconds = sum(el["seconds"] for el in results)
+    utilization = busy_seconds / (seconds * processes) if seconds > 0 else 0
+    log(
+        f"Migrated {rows} rows of {table} in {len(tasks)} of {len(key_ranges)} key "
+        f"ranges with {processes} processes in {seconds:.2f}s "
+        f"({rows / seconds if seconds > 0 else 0:.0f} rows/s, "
+        f"{utilization:.0%} process utilization, "
+        + ", ".join(f"{target} {sum(el[target] for el in results)}" for target in targets)
+        + ")."
+    )
+
+    for target in targets:
+        checkpoints.finish(table, target)
+
+
+def sync_table_deltas(cursor_old, cursor_new, table: str):
+    """Determines the rows of a table that were inserted, updated or deleted
+    in the old database compared to the new database. Only the primary key
+    ranges whose server-side checksums differ are read.
+    Args:
+        cursor_old (_type_): A cursor of the old database.
+        cursor_new (_type_): A cursor of the new database.
+        table (str): The table name.
+    Returns:
+        dict: Dictionary of the format {"columns": <value>, "primaryKey": <value>,
+        "inserts": <value>, "updates": <value>, "deletes": <value>}.
+    """
+    column_types = get_column_types(cursor_old, table)
+    columns = [name for name, _ in column_types]
+    primary_key = get_primary_key(cursor_old, table)
+    source_checksums = get_range_checksums(
+        cursor_old, table, column_types, primary_key, sync_range_size
+    )
+    target_checksums = get_range_checksums(
+        cursor_new, table, column_types, primary_key, sync_range_size
+    )
+    changed_ranges = get_changed_ranges(source_checksums, target_checksums)
+    result = {
+        "columns": columns,
+        "primaryKey": primary_key,
+        "inserts": [],
+        "updates": [],
+        "deletes": [],
+    }
+
+    for range_id in changed_ranges:
+        inserts, updates, deletes = diff_rows(
+            read_range_rows(
+                cursor_old, table, columns, primary_key, range_id, sync_range_size
+            ),
+            read_range_rows(
+                cursor_new, table, columns, primary_key, range_id, sync_range_size
+            ),
+        )
+        result["inserts"] += inserts
+        result["updates"] += updates
+        result["deletes"] += deletes
+
+    range_amount = len(set(source_checksums.keys()) | set(target_checksums.keys()))
+    log(
+        f"Sync {table}: {len(changed_ranges)} of {range_amount} key ranges changed, "
+        f"{len(result['inserts'])} new, {len(result['updates'])} changed and "
+        f"{len(result['deletes'])} deleted rows."
+    )
+    return result
+
+
+def sync_m_to_n_table(table: str, cursor_old, graph, sync_state: SyncState):
+    """Applies the rows of a m:n table that were inserted, updated or deleted
+    since the last sync pass to the Neo4j relationships. Only the primary key
+    ranges whose checksums differ from the recorded ones are read.
+    The first sync pass records the state of all ranges and merges
+    all relationships.
+    Args:
+        table (str): The table name.
+        cursor_old (_type_): A cursor of the old database.
+        graph (_type_): The graph store (see adapters.Neo4jGraph).
+        sync_state (SyncState): The state of the last sync pass.
+    """
+    column_types = get_column_types(cursor_old, table)
+    columns = [name for name, _ in column_types]
+    primary_key = get_primary_key(cursor_old, table)
+    key_index = columns.index(primary_key)
+    mn_information = mn_tables_dict[table]
+    map_row = compile_m_to_n_plan(columns, mn_information)
+    batch_size = get_neo4j_batch_size(mn_information["relationshipName"])
+    source_checksums = get_range_checksums(
+        cursor_old, table, column_types, primary_key, sync_range_size
+    )
+    changed_ranges = get_changed_ranges(
+        source_checksums, sync_state.get_range_checksums(table)
+    )
+    upserted = 0
+    deleted = 0
+
+    for range_id in changed_ranges:
+        source_rows = normalize_rows(
+            read_range_rows(
+                cursor_old, table, columns, primary_key, range_id, sync_range_size
+            )
+        )
+        previous_rows = sync_state.get_range_rows(table, range_id)
+        inserts, updates, deletes = diff_rows(source_rows, previous_rows)
+        removed_rows = [previous_rows[key] for key in deletes] + [
+            previous_rows[row[key_index]] for row in updates
+        ]
+        deleted += delete_relationships(
+            graph,
+            mn_information,
+            map(map_row, removed_rows),
+            batch_size,
+            neo4j_decimal_policy,
+        )
+        upserted += create_relationships(
+            graph,
+            mn_information,
+            map(map_row, inserts + updates),
+            batch_size,
+            neo4j_decimal_policy,
+            True,
+        )
+        sync_state.save_range(
+            table, range_id, source_checksums.get(range_id), source_rows
+        )
+
+    log(
+        f"Sync {table}: {len(changed_ranges)} of {len(source_checksums)} key ranges "
+        f"changed, {upserted} relationships merged and {deleted} deleted."
+    )
+
+
+def sync_databases(conn_old, conn_new, graph, sync_state: SyncState):
+    """Applies the rows that were inserted, updated or deleted in the old
+    database to the new database, the Neo4j nodes and the Neo4j relationships.
+    Inserts and updates are applied in foreign key order,
+    deletes in reverse foreign key order.
+    Args:
+        conn_old (_type_): The connection to the old database.
+        conn_new (_type_): The connection to the new database.
+        graph (_type_): The graph store (see adapters.Neo4jGraph).
+        sync_state (SyncState): The state of the last sync pass.
+    """
+    cursor_old = conn_old.cursor()
+    cursor_new = get_bulk_cursor(conn_new, mssql_fast_executemany)
+    order = get_dependency_order(sql_tables, get_table_dependencies(mssql_tables))
+    deltas = {
+        table: sync_table_deltas(cursor_old, cursor_new, table) for table in order
+    }
+
+    for table in order:
+        delta = deltas[table]
+        columns = delta["columns"]
+        insert_rows(
+            cursor_new, create_insert_query(table, tuple(columns)), delta["inserts"]
+        )
+        update_rows(cursor_new, table, columns, delta["primaryKey"], delta["updates"])
+
+        if table in neo4j_tables:
+            add_nodes(
+                graph,
+                columns,
+                delta["inserts"] + delta["updates"],
+                table,
+                get_neo4j_batch_size(table),
+                neo4j_decimal_policy,
+                delta["primaryKey"],
             )
-            param_els = list(row)
-            cursor_new.execute(insert_query, param_els)
-            log(f"Executed INSERT to {table} in {mssql_db_name}.")
+
+    for table in mn_tables_dict.keys():
+        sync_m_to_n_table(table, cursor_old, graph, sync_state)
+
+    if sync_deletes:
+        for table in reversed(order):
+            delta = deltas[table]
+            delete_rows(cursor_new, table, delta["primaryKey"], delta["deletes"])
 
             if table in neo4j_tables:
-                add_node(neo4j_driver, columns, param_els, table)
-                log(
-                    f"Created Neo4j node for {table} (old database {old_mssql_db_name})."
+                delete_nodes(
+                    graph,
+                    table,
+                    delta["primaryKey"],
+                    delta["deletes"],
+                    get_neo4j_batch_size(table),
                 )
 
-    # Store the m:n-Tables as relationships in the graph database
-    # ----------------------------------------------------------------
-    mntables = list(mn_tables_dict.keys())
-
-    for table in mntables:
-        cursor_old = conn_old.cursor()
-        cols = cursor_old.columns(table=table)
-        columns = [el.column_name for el in cols.fetchall()]
-        select_query = f"SELECT * FROM {table}"
-        cursor_old.execute(select_query)
-        old_rows = cursor_old.fetchall()
-        log(f"Executed SELECT from {table} in {old_mssql_db_name}.")
-
-        for row in old_rows:
-            row = list(row)
-            rd = create_neo4j_m_to_n_dict(columns, row, mn_tables_dict[table])
-            create_relationship(
-                neo4j_driver,
-                rd["fromEntity"],
-                rd["toEntity"],
-                rd["relationshipName"],
-                rd["fromEntityAttributeValDict"],
-                rd["toEntityAttributeValDict"],
-                rd["relationshipDict"],
+    conn_new.commit()
+
+
+def upsert_table(
+    table: str,
+    source_connections: ThreadConnections,
+    target_connections: ThreadConnections,
+    graph,
+    sync_state: SyncState,
+):
+    """Upserts a table into the new MSSQL database and, if the table is part of
+    a m:n relationship, into its Neo4j nodes. Only the primary key ranges whose
+    server-side checksums differ are read from the new database, their missing
+    and changed rows are inserted and updated. The nodes have no server-side
+    checksums, so the source checksums of the last upsert are recorded in the
+    sync state instead. Only the nodes of the ranges whose source checksums
+    differ from the recorded ones are compared with the source rows, missing and
+    changed nodes are merged on the constrained primary key. The recorded
+    checksums are discarded if the graph has fewer nodes than the recorded rows
+    (e.g. a new graph). Rows and nodes that only exist in the targets are
+    kept (see --sync). The table is committed in the new database afterwards.
+    Args:
+        table (str): The table name.
+        source_connections (ThreadConnections): Connections to the old database.
+        target_connections (ThreadConnections): Connections to the new database.
+        graph (_type_): The graph store (see adapters.Neo4jGraph).
+        sync_state (SyncState): The state of the last upsert or sync pass.
+    """
+    start = time.perf_counter()
+    cursor_old = source_connections.get().cursor()
+    conn_new = target_connections.get()
+    cursor_new = get_bulk_cursor(conn_new, mssql_fast_executemany)
+    column_types = get_column_types(cursor_old, table)
+    columns = [name for name, _ in column_types]
+    primary_key = get_primary_key(cursor_old, table)
+    insert_query = create_insert_query(table, tuple(columns))
+    source_checksums = get_range_checksums(
+        cursor_old, table, column_types, primary_key, upsert_range_size
+    )
+    changed_ranges = get_changed_ranges(
+        source_checksums,
+        get_range_checksums(
+            cursor_new, table, column_types, primary_key, upsert_range_size
+        ),
+    )
+    node_ranges = []
+
+    if table in neo4j_tables:
+        create_unique_constraint(graph, table, primary_key)
+
+        if graph.count_nodes(table) < sync_state.count_node_rows(table):
+            log(f"Discarded the node checksums of {table} (missing nodes).", WARNING)
+            sync_state.clear_node_table(table)
+
+        node_ranges = get_changed_ranges(
+            source_checksums, sync_state.get_node_checksums(table)
+        )
+
+    changed = set(changed_ranges)
+    changed_nodes = set(node_ranges)
+    range_ids = sorted(changed | changed_nodes)
+    order = sorted(range(len(columns)), key=lambda i: columns[i])
+    mssql_amount = 0
+    neo4j_amount = 0
+
+    for range_id in range_ids:
+        with span("SELECT", "source", table=table):
+            source_rows = read_range_rows(
+                cursor_old, table, columns, primary_key, range_id, upsert_range_size
             )
-            log(
-                f"Created Neo4j relationship for {table} (old database {old_mssql_db_name})."
+
+        if range_id in changed:
+            inserts, updates, _ = diff_rows(
+                source_rows,
+                read_range_rows(
+                    cursor_new, table, columns, primary_key, range_id, upsert_range_size
+                ),
+            )
+
+            with span("UPSERT", "mssql", table=table, rows=len(inserts) + len(updates)):
+                mssql_amount += insert_rows(cursor_new, insert_query, inserts)
+                update_rows(cursor_new, table, columns, primary_key, updates)
+                mssql_amount += len(updates)
+
+        if range_id in changed_nodes:
+            start_key = range_id * upsert_range_size
+            nodes = {
+                el[primary_key]: get_node_values(el)
+                for el in graph.read_nodes(
+                    table, primary_key, start_key, start_key + upsert_range_size
+                )
+            }
+            pending = [
+                row
+                for key, row in source_rows.items()
+                if nodes.get(key)
+                != get_row_node_values(columns, order, row, neo4j_decimal_policy)
+            ]
+            neo4j_amount += add_nodes(
+                graph,
+                columns,
+                pending,
+                table,
+                get_neo4j_batch_size(table),
+                neo4j_decimal_policy,
+                primary_key,
             )
+            sync_state.save_node_range(table, range_id, source_checksums.get(range_id))
+
+    conn_new.commit()
+    log(
+        f"Upsert {table}: {len(changed_ranges)} of {len(source_checksums)} key ranges "
+        f"changed ({len(node_ranges)} for the nodes), {mssql_amount} rows and "
+        f"{neo4j_amount} Neo4j nodes written in {time.perf_counter() - start:.2f}s."
+    )
+
+
+def upsert_m_to_n_table(
+    table: str, source_connections: ThreadConnections, graph, sync_state: SyncState
+):
+    """Merges the relationships of a m:n table whose rows changed since they were
+    last merged (see sync_m_to_n_table). Relationships can not be read by the
+    primary key of their row, so the state of the last upsert or sync pass is
+    compared instead. The state is discarded if the graph has fewer relationships
+    than the recorded rows (e.g. a new graph), then all relationships are merged.
+    Args:
+        table (str): The table name.
+        source_connections (ThreadConnections): Connections to the old database.
+        graph (_type_): The graph store (see adapters.Neo4jGraph).
+        sync_state (SyncState): The state of the last upsert or sync pass.
+    """
+    relationship_name = mn_tables_dict[table]["relationshipName"]
+
+    if graph.count_relationships(relationship_name) < sync_state.count_rows(table):
+        log(f"Discarded the sync state of {table} (missing relationships).", WARNING)
+        sync_state.clear_table(table)
+
+    sync_m_to_n_table(table, source_connections.get().cursor(), graph, sync_state)
+
+
+def run_sync(source, target, graph):
+    """Runs an incremental sync pass from the old database
+    to the polyglot persistence model.
+    Args:
+        source (_type_): The backend of the old database (see adapters.OdbcBackend).
+        target (_type_): The backend of the new database (see adapters.OdbcBackend).
+        graph (_type_): The graph store (see adapters.Neo4jGraph).
+    """
+    try:
+        conn_old = None
+        conn_new = None
+        sync_state = None
+        sync_state = SyncState(sync_state_path)
+        conn_old = source.connect()
+        log(f"Connected to {source.name}.")
+        conn_new = target.connect()
+        log(f"Connected to {target.name}.")
+        start = time.perf_counter()
+        sync_databases(conn_old, conn_new, graph, sync_state)
+        log(f"Sync pass took {time.perf_counter() - start:.2f}s.")
+        close(conn_old, f"{source.name} closed.")
+        close(conn_new, f"{target.name} closed.")
+        close(graph, f"{graph.name} closed.")
+        close(sync_state)
+        log("Sync completed.")
+    except Exception as e:
+        log("Error occurred: " + str(e), ERROR)
+        rollback(conn_new, f"{target.name} rollback.")
+        close(conn_old, f"{source.name} closed.")
+        close(conn_new, f"{target.name} closed.")
+        close(graph, f"{graph.name} closed.")
+        close(sync_state)
+
 
-    # Store the MongoDB entities
+# Connection data
+master_db_conn_str = "DRIVER={SQL Server};SERVER=localhost;DATABASE=master;UID=sa;PWD=strongPassword123A!"
+ecommerce_db_conn_str = "DRIVER={SQL Server};SERVER=localhost;DATABASE=ECommerce;UID=sa;PWD=strongPassword123A!"
+new_ecommerce_db_conn_str = "DRIVER={SQL Server};SERVER=localhost;DATABASE=ECommercePolyglot;UID=sa;PWD=strongPassword123A!"
+neo4j_connection = {
+    "URI": "neo4j://localhost:7687",
+    "Username": "neo4j",
+    "Password": "strongPassword123A!",
+}
+mongodb_connection = {
+    "connectionString": "mongodb://localhost:27017"
+}
+
+# SQL Tables
+sql_tables = [
+    "Address",
+    "Category",
+    "Customer",
+    "CustomerOrder",
+    "CustomerToAddress",
+    "Courier",
+    "CourierToAddress",
+    "Vendor",
+    "VendorToAddress",
+    "Product",
+    "VendorToProduct",
+    "OrderPosition",
+    "ShoppingCart",
+]
+old_mssql_db_name = "ECommerce"
+mssql_db_name = "ECommercePolyglot"
+neo4j_tables = [
+    "VendorToProduct",
+    "ShoppingCart",
+    "Product",
+    "Category"
+]
+# Amount of Neo4j nodes or relationships per UNWIND transaction
+neo4j_default_batch_size = 1000
+neo4j_batch_sizes = {
+    "VendorToProduct": 5000,
+    "ShoppingCart": 1000,
+    "Product": 500,
+    "Category": 1000,
+    "IS_IN": 5000,
+    "HAS_CATEGORY": 5000,
+}
+# Declarative migration plan (see migration_plan.json) that replaces the tables,
+# relationships, collections and batch sizes above and below (None: no plan)
+plan_path = None
+# Compiled plan that is reused while the source schema and the plan are unchanged
+plan_cache_path = "migration_plan_cache.json"
+# Journal of the committed progress (used by --resume)
+checkpoint_path = "migration_checkpoint.sqlite"
+# State of the incremental sync (used by --sync)
+sync_state_path = "migration_sync_state.sqlite"
+# Amount of primary keys per checksum range of the incremental sync
+sync_range_size = 1000
+# Whether rows deleted in the old database are deleted by the incremental sync
+sync_deletes = True
+# Re-runs the migration against a loaded target: only missing or changed rows,
+# nodes and relationships are written, existing objects are kept (used by --upsert)
+upsert_mode = False
+# Amount of primary keys per compared range of the upsert mode
+upsert_range_size = 10000
+# Amount of tables that are copied concurrently (one connection per worker)
+migration_workers = 4
+# Streaming of the source tables (see source_reader.read_modes)
+source_read_mode = READ_FETCHMANY
+source_chunk_size = 5000
+# Maximal amount of source rows held in memory at a time
+source_max_buffered_rows = 10000
+# Bulk inserts into the new MSSQL database
+mssql_fast_executemany = True
+# Commit after at least this amount of rows per table (None: commit once at the end)
+mssql_commit_interval = None
+# Create the tables with their primary keys only and add the foreign keys after the load
+mssql_deferred_constraints = True
+# Create an index on every foreign key column after the load (deferred constraints)
+mssql_foreign_key_indexes = True
+# Maximal amount of reported primary keys per violated foreign key
+mssql_max_reported_violations = 100
+# Undo what a failed run created instead of keeping it for --resume
+rollback_on_error = False
+# Amount of nodes and relationships per rollback transaction
+rollback_batch_size = 10000
+# Pipelined mode: the rows of the Neo4j tables are read once and written to MSSQL
+# and Neo4j by independent writer threads that are fed through bounded queues
+pipeline_mode = False
+# Maximal amount of row chunks per writer queue
+pipeline_queue_size = 4
+# Amount of rows per MSSQL executemany call of the pipeline writer
+mssql_batch_size = 5000
+# Maximal amount of Neo4j write transactions in flight (async_engine.py)
+async_max_in_flight = 8
+# Tables that are migrated in primary key ranges by a pool of worker processes
+sharded_tables = ["VendorToProduct", "ProductToCart"]
+# Amount of worker processes of the sharded tables (1: no sharding)
+shard_processes = min(4, os.cpu_count() or 1)
+# Amount of primary keys per range of the sharded tables
+shard_range_size = 100000
+# Sharded tables with fewer rows are migrated by the threads of the main process:
+# every worker process costs about a second to start (spawn, imports, connections),
+# which only pays off above a few hundred thousand rows per table
+shard_min_rows = 500000
+# Neo4j representation of DECIMAL values (see cypher_builder.decimal_policies)
+neo4j_decimal_policy = DECIMAL_AS_FLOAT
+# Chrome trace event file of --trace (see migration_trace.py)
+trace_path = "migration_trace.json"
+# Seconds between two stack samples of all threads of --trace (None: no sampling)
+trace_sample_interval = 0.005
+# Profile every phase of --trace with cProfile (only the main thread, slows it down)
+trace_profile_phases = False
+# Amount of entries per table of the --trace summary
+trace_top_entries = 20
+# Minimal log level (see migration_log.log_levels)
+log_level = "INFO"
+# Write the log as JSON lines instead of text lines
+log_json_lines = False
+# Log every n-th occurrence of a per-row event (0: never)
+log_sample_rate = 1000
+# Minimal amount of seconds between two progress lines of a table
+log_progress_interval = 10.0
+# Count the rows of every table before reading it for the ETA of the progress lines
+# (one additional COUNT(*) per table)
+log_progress_totals = False
+# Verify the new database and the graph against the old database after the migration
+# (reads every table a second time, python migration.py --verify verifies on its own)
+verify_after_migration = False
+# Path of the JSON report of the verification
+verify_report_path = "migration_verification.json"
+# Amount of primary keys per range that is verified as one task
+verify_range_size = 10000
+# Maximal amount of reported keys per table and kind of difference
+verify_max_reported_keys = 100
+# Precompute the product recommendations after a completed migration (recommender.py)
+recommend_after_migration = False
+# Compress the data files of the neo4j-admin CSV export (--export) with gzip
+export_gzip = True
+# gzip compression level of the export (1: fastest, 9: smallest)
+export_gzip_level = 1
+mongodb_db_name = "ECommercePolyglot"
+mongodb_tables = [
+    "CustomerAction",
+    "ProductImage",
+    "ProductRecommendation",
+    "ProductVideo",
+    "Review",
+]
+# Indexes of the MongoDB collections: the ids that the REST API increments
+# (getNewId sorts on them) are unique, the filtered references are secondary
+mongodb_indexes = {
+    "CustomerAction": {
+        "unique": ["customerActionId"],
+        "secondary": ["customerId", "vendorToProductId"],
+    },
+    "ProductImage": {"unique": ["pictureId"], "secondary": ["vendorToProductId"]},
+    "ProductRecommendation": {
+        "unique": ["recommendationId"],
+        "secondary": ["customerId", "vendorToProductId"],
+    },
+    "ProductVideo": {"unique": ["videoId"], "secondary": ["vendorToProductId"]},
+    "Review": {
+        "unique": ["reviewId"],
+        "secondary": ["customerId", "vendorToProductId"],
+    },
+}
+# Functions that derive historical documents of a collection from the old database
+mongodb_seeds = {"CustomerAction": iter_customer_actions}
+# Collections that are seeded with historical documents (see mongodb_seeds)
+mongodb_seed_collections = ["CustomerAction"]
+# Amount of documents per insert_many call
+mongodb_insert_batch_size = 10000
+# MongoDB error code of a duplicate key
+DUPLICATE_KEY_ERROR = 11000
+relationships = ["HAS_CATEGORY", "IS_IN"]
+mn_tables_dict = {
+    "ProductToCart": {
+        "fromEntity": "VendorToProduct",
+        "toEntity": "ShoppingCart",
+        "relationshipName": "IS_IN",
+        "fromAttribute": "VendorToProductId",
+        "toAttribute": "CartId",
+        "primaryKeyAttribute": "ProductToCartId",
+    },
+    "ProductToCategory": {
+        "fromEntity": "Product",
+        "toEntity": "Category",
+        "relationshipName": "HAS_CATEGORY",
+        "fromAttribute": "ProductId",
+        "toAttribute": "CategoryId",
+        "primaryKeyAttribute": "ProductToCategoryId"
+    }
+}
+
+# MSSQL tables of the polyglot persistence model
+mssql_tables = [
+"""
+CREATE TABLE Address
+(
+    AddressId INT PRIMARY KEY,
+    Street VARCHAR(100) NOT NULL,
+    City VARCHAR(100) NOT NULL,
+    PostalCode VARCHAR(10) NOT NULL,
+    Country VARCHAR(20) NOT NULL,
+);
+""",
+"""
+CREATE TABLE Category
+(
+    CategoryId INT PRIMARY KEY,
+    Name VARCHAR(100) NOT NULL
+);
+""",
+"""
+CREATE TABLE Customer 
+(
+    CustomerId INT PRIMARY KEY,
+    UserName VARCHAR(100) NOT NULL,
+    FirstName VARCHAR(100) NOT NULL,
+    LastName VARCHAR(100) NOT NULL,
+    Email VARCHAR(100) NOT NULL,
+    Password VARCHAR(100) NOT NULL,
+    PhoneNumber VARCHAR(20)
+);
+""",
+"""
+CREATE TABLE CustomerOrder
+(
+    OrderId INT PRIMARY KEY,
+    OrderName VARCHAR(100),
+    OrderDate DATETIME NOT NULL,
+    CustomerId INT NOT NULL,
+    BillingAddressId INT NOT NULL,
+    IsPaid BIT NOT NULL,
+    FOREIGN KEY (CustomerId) REFERENCES Customer(CustomerId),
+    FOREIGN KEY (BillingAddressId) REFERENCES Address(AddressId)
+);
+""",
+"""
+CREATE TABLE CustomerToAddress
+(
+    CustomerToAddressId INT PRIMARY KEY,
+    CustomerId INT NOT NULL,
+    AddressId INT NOT NULL,
+    FOREIGN KEY (CustomerId) REFERENCES Customer(CustomerId),
+    FOREIGN KEY (AddressId) REFERENCES Address(AddressId)
+);
+""",
+"""
+CREATE TABLE Courier
+(
+    CourierId INT PRIMARY KEY,
+    Name VARCHAR(100) NOT NULL,
+    Email VARCHAR(100) NOT NULL,
+    PhoneNumber VARCHAR(20)
+);
+""",
+"""
+CREATE TABLE CourierToAddress
+(
+    CourierToAddressId INT PRIMARY KEY,
+    CourierId INT NOT NULL,
+    AddressId INT NOT NULL,
+    FOREIGN KEY (CourierId) REFERENCES Courier(CourierId),
+    FOREIGN KEY (AddressId) REFERENCES Address(AddressId)
+);
+""",
+"""
+CREATE TABLE Vendor
+(
+    VendorId INT PRIMARY KEY,
+    UserName VARCHAR(100) NOT NULL,
+    Password VARCHAR(100) NOT NULL,
+    Name VARCHAR(100) NOT NULL,
+    Email VARCHAR(100) NOT NULL,
+    PhoneNumber VARCHAR(20)
+);
+""",
+"""
+CREATE TABLE VendorToAddress
+(
+    VendorToAddressId INT PRIMARY KEY,
+    VendorId INT NOT NULL,
+    AddressId INT NOT NULL,
+    FOREIGN KEY (VendorId) REFERENCES Vendor(VendorId),
+    FOREIGN KEY (AddressId) REFERENCES Address(AddressId)
+);
+""",
+"""
+CREATE TABLE Product 
+(
+    ProductId INT PRIMARY KEY,
+    Name VARCHAR(100) NOT NULL,
+    Description TEXT NOT NULL
+);
+""",
+"""
+CREATE TABLE VendorToProduct
+(
+    VendorToProductId INT PRIMARY KEY,
+    VendorId INT NOT NULL,
+    ProductId INT NOT NULL,
+    UnitPriceEuro DECIMAL(10,2) NOT NULL,
+    InventoryLevel INT NOT NULL,
+    FOREIGN KEY (VendorId) REFERENCES Vendor(VendorId),
+    FOREIGN KEY (ProductId) REFERENCES Product(ProductId)
+);
+""",
+"""
+CREATE TABLE OrderPosition
+(
+OrderPositionId INT PRIMARY KEY,
+OrderId INT NOT NULL,
+Amount INT, 
+VendorToProductId INT NOT NULL,
+CourierCompanyId INT NOT NULL,
+DeliveryDate DATETIME NOT NULL,
+DeliveryAddressId INT NOT NULL,
+FOREIGN KEY (CourierCompanyId) REFERENCES Courier(CourierId),
+FOREIGN KEY (DeliveryAddressId) REFERENCES Address(AddressId),
+FOREIGN KEY (OrderId) REFERENCES CustomerOrder(OrderId),
+FOREIGN KEY (VendorToProductId) REFERENCES VendorToProduct(VendorToProductId),
+);
+""",
+"""
+CREATE TABLE ShoppingCart
+(
+CartId INT PRIMARY KEY,
+DateCreated DATETIME NOT NULL,
+CustomerId INT NOT NULL,
+FOREIGN KEY (CustomerId) REFERENCES Customer(CustomerId)
+);
+"""
+]
+
+
+def create_target_tables(target, checkpoints: CheckpointStore, upsert=False):
+    """Creates the new database and its tables.
+    The database and the tables that are recorded as created are skipped.
+    With mssql_deferred_constraints, the tables are created without their
+    foreign keys (see create_deferred_constraints) and can be loaded in any order.
+    Args:
+        target (_type_): The backend of the new database (see adapters.OdbcBackend).
+        checkpoints (CheckpointStore): The checkpoint store.
+        upsert (bool, optional): If True, the database and the tables are created
+        only if they do not exist, and only the created tables are recorded
+        (see mssql_rollback). The existing tables may have their foreign keys,
+        so the dependencies are always returned. Defaults to False.
+    Returns:
+        dict: The foreign key dependencies of the tables that have to be
+        loaded first (see scheduler.get_table_dependencies).
+    """
+    if checkpoints.is_finished(mssql_db_name, TARGET_DDL):
+        log(f"Skipped CREATE DATABASE {mssql_db_name} (already created).")
+    else:
+        target.create_database(mssql_db_name, upsert)
+        checkpoints.start(mssql_db_name, TARGET_DDL)
+        checkpoints.finish(mssql_db_name, TARGET_DDL)
+        log(f"Created {mssql_db_name}.")
+
+    conn_new = target.connect()
+    log(f"Connected to {target.name}.")
+    dependencies = get_table_dependencies(mssql_tables)
+    created = []
+
+    try:
+        for mssql_create_table_query, table in zip(mssql_tables, dependencies.keys()):
+            if checkpoints.is_finished(table, TARGET_DDL):
+                continue
+
+            cursor = conn_new.cursor()
+
+            if upsert and len(get_columns(cursor, table)) > 0:
+                log(f"Kept the existing table {table}.", DEBUG)
+                continue
+
+            if mssql_deferred_constraints:
+                mssql_create_table_query = remove_foreign_keys(mssql_create_table_query)
+
+            if upsert:
+                mssql_create_table_query = create_table_if_not_exists_query(
+                    mssql_create_table_query
+                )
+
+            cursor.execute(mssql_create_table_query)
+            created.append(table)
+            log(f"Executed CREATE TABLE query in {mssql_db_name}.", DEBUG)
+
+        # The tables must be visible to the connections of the workers
+        commit(conn_new, f"{target.name} committed.")
+    finally:
+        close(conn_new, f"{target.name} closed.")
+
+    for table in created:
+        checkpoints.start(table, TARGET_DDL)
+        checkpoints.finish(table, TARGET_DDL)
+
+    if mssql_deferred_constraints and not upsert:
+        return {table: set() for table in dependencies.keys()}
+
+    return dependencies
+
+
+def create_deferred_constraints(target, checkpoints: CheckpointStore, upsert=False):
+    """Adds the foreign keys (and with mssql_foreign_key_indexes their indexes)
+    to the loaded tables of the new database. Every foreign key is validated
+    in one set based pass first, violated foreign keys are logged and not added.
+    The created indexes and foreign keys are recorded in the checkpoint store.
+    Args:
+        target (_type_): The backend of the new database (see adapters.OdbcBackend).
+        checkpoints (CheckpointStore): The checkpoint store.
+        upsert (bool, optional): If True, existing indexes and foreign keys
+        are kept. Defaults to False.
+    Returns:
+        list: The violated foreign keys (see constraints.find_violations).
+    """
+    start = time.perf_counter()
+    conn_new = target.connect()
+    cursor = conn_new.cursor()
+    violated = []
+    added = 0
+
+    try:
+        for statement in mssql_tables:
+            foreign_keys = get_foreign_keys(statement)
+
+            if len(foreign_keys) == 0:
+                continue
+
+            primary_key = get_primary_key(cursor, foreign_keys[0]["table"])
+
+            for foreign_key in foreign_keys:
+                index_name = f"IX_{foreign_key['table']}_{foreign_key['column']}"
+
+                if mssql_foreign_key_indexes and not checkpoints.is_finished(
+                    index_name, TARGET_DDL
+                ):
+                    cursor.execute(create_foreign_key_index_query(foreign_key, upsert))
+                    conn_new.commit()
+                    checkpoints.start(index_name, TARGET_DDL)
+                    checkpoints.finish(index_name, TARGET_DDL)
+
+                if checkpoints.is_finished(foreign_key["name"], TARGET_DDL):
+                    continue
+
+                result = find_violations(
+                    cursor, foreign_key, primary_key, mssql_max_reported_violations
+                )
+
+                if result["violations"] > 0:
+                    violated.append(result)
+                    log(
+                        f"Skipped {foreign_key['name']}: {result['violations']} rows of "
+                        f"{foreign_key['table']} reference no "
+                        f"{foreign_key['referencedTable']} "
+                        f"({primary_key}, {foreign_key['column']}: {result['keys']}).",
+                        WARNING,
+                        **result,
+                    )
+                    continue
+
+                cursor.execute(create_foreign_key_query(foreign_key, upsert))
+                conn_new.commit()
+                checkpoints.start(foreign_key["name"], TARGET_DDL)
+                checkpoints.finish(foreign_key["name"], TARGET_DDL)
+                added += 1
+    finally:
+        close(conn_new, f"{target.name} closed.")
+
+    log(
+        f"Added {added} deferred foreign keys in {time.perf_counter() - start:.2f}s, "
+        f"{len(violated)} violated."
+    )
+    return violated
+
+
+def apply_migration_plan(source, path: str):
+    """Loads a migration plan file, gets its compiled plan (see
+    migration_plan.get_compiled_plan) and replaces the configured tables,
+    relationships, collections and batch sizes by it.
+    The lists and dictionaries are changed in place, so modules that
+    imported them (e.g. async_engine.py) see the plan.
+    Args:
+        source (_type_): The backend of the old database (see adapters.OdbcBackend).
+        path (str): The path of the plan file (see migration_plan.json).
+    Raises:
+        ValueError: Is thrown if the plan is invalid or a table with the target
+        mssql has no CREATE TABLE query in mssql_tables.
+    Returns:
+        dict: The compiled plan.
+    """
+    global neo4j_default_batch_size
+    plan = load_plan(path)
+    start = time.perf_counter()
+    conn_old = source.connect()
+
+    try:
+        compiled, cached = get_compiled_plan(conn_old, plan, plan_cache_path)
+    finally:
+        close(conn_old)
+
+    plan = compiled["plan"]
+    tables = plan.get("tables", [])
+    created_tables = get_table_dependencies(mssql_tables).keys()
+    missing = [
+        el["name"]
+        for el in tables
+        if "mssql" in el["targets"] and el["name"] not in created_tables
+    ]
+
+    if len(missing) > 0:
+        raise ValueError(f"The tables {missing} have no CREATE TABLE query!")
+
+    sql_tables[:] = [el["name"] for el in tables if "mssql" in el["targets"]]
+    neo4j_tables[:] = [el["name"] for el in tables if "neo4j" in el["targets"]]
+    mn_tables_dict.clear()
+    mn_tables_dict.update(
+        {
+            el["table"]: {
+                name: el[name] for name in relationship_attributes if name != "table"
+            }
+            for el in plan.get("relationships", [])
+        }
+    )
+    mongodb_tables[:] = [el["name"] for el in plan.get("collections", [])]
+    mongodb_indexes.clear()
+    mongodb_indexes.update(
+        {
+            el["name"]: {
+                "unique": el.get("uniqueIndexes", []),
+                "secondary": el.get("secondaryIndexes", []),
+            }
+            for el in plan.get("collections", [])
+        }
+    )
+    neo4j_batch_sizes.clear()
+    neo4j_batch_sizes.update(
+        {el["name"]: el["batchSize"] for el in tables if "batchSize" in el}
+    )
+    neo4j_batch_sizes.update(
+        {
+            el["relationshipName"]: el["batchSize"]
+            for el in plan.get("relationships", [])
+            if "batchSize" in el
+        }
+    )
+    neo4j_default_batch_size = plan.get("defaultBatchSize", neo4j_default_batch_size)
+    set_table_metadata(compiled["tables"])
+    log(
+        f"{'Loaded the cached' if cached else 'Compiled the'} plan {path} "
+        f"({len(sql_tables)} tables, {len(mn_tables_dict)} relationships, "
+        f"{len(mongodb_tables)} collections) in {time.perf_counter() - start:.3f}s."
+    )
+    return compiled
+
+
+def is_sharded(table: str, graph_factory, conn_old):
+    """Checks whether a table is migrated by the shard worker processes.
+    Tables of sharded_tables with fewer than shard_min_rows rows are not.
+    Args:
+        table (str): The table name.
+        graph_factory (_type_): See init_shard_worker. None disables the sharding.
+        conn_old (_type_): The connection to the old database.
+    Returns:
+        bool: True if the table is sharded.
+    """
+    if graph_factory is None or shard_processes <= 1 or table not in sharded_tables:
+        return False
+
+    amount = count_rows(conn_old, table, None)
+
+    if amount < shard_min_rows:
+        log(
+            f"Migrating {table} without shard processes "
+            f"({amount} rows, shard_min_rows {shard_min_rows})."
+        )
+        return False
+
+    return True
+
+
+def run_migration(
+    source,
+    target,
+    graph,
+    documents,
+    checkpoint_file: str,
+    resume=False,
+    graph_factory=None,
+    upsert=None,
+):
+    """Migrates the relational e commerce model to the polyglot persistence model.
+    Errors are logged, the committed progress is kept in the checkpoint journal.
+    Args:
+        source (_type_): The backend of the old database (see adapters.OdbcBackend).
+        target (_type_): The backend of the new database (see adapters.OdbcBackend).
+        graph (_type_): The graph store (see adapters.Neo4jGraph).
+        documents (_type_): The document store (a pymongo.MongoClient
+        or adapters.InMemoryDocumentStore).
+        checkpoint_file (str): The path of the checkpoint journal.
+        resume (bool, optional): Whether the recorded progress is continued.
+        Defaults to False.
+        graph_factory (_type_, optional): Module level function that creates
+        the graph store of a shard worker process (see migrate_table_sharded).
+        Defaults to None (no sharding).
+        upsert (bool, optional): Overrides upsert_mode. The tables are upserted
+        (see upsert_table) instead of copied, the relationships are merged
+        (see upsert_m_to_n_table). Defaults to None.
+    Raises:
+        ValueError: Is thrown if the upsert mode is resumed.
+    Returns:
+        bool: True if the migration completed.
+    """
+    upsert = upsert if upsert is not None else upsert_mode
+
+    if upsert and resume:
+        raise ValueError("The upsert mode is not resumed, it is run again instead!")
+
+    # Create a new MSSQL server with necessary tables
     # ----------------------------------------------------------------
-    for table in mongodb_tables:
-        create_mongodb_collection(mongodb_driver, mongodb_db_name, table)
-        log(f"Created MongoDB collection for {table} in database {mongodb_db_name}.")
-
-    commit(master_conn, f"{master_db_conn_str} committed.")
-    commit(conn_old, f"{ecommerce_db_conn_str} committed.")
-    commit(conn_new, f"{new_ecommerce_db_conn_str} committed.")
-    close(master_conn, f"{master_db_conn_str} closed.")
-    close(conn_old, f"{ecommerce_db_conn_str} closed.")
-    close(conn_new, f"{new_ecommerce_db_conn_str} closed.")
-    close(neo4j_driver, "Neo4j driver closed.")
-    close(mongodb_driver, "MongoDB driver closed.")
-    log("Script completed.")
-except Exception as e:
-    log("Error occurred: " + str(e))
-    log("Please revert the changes in the other No-SQL databases.")
-    rollback(master_conn, f"{master_db_conn_str} rollback.")
-    rollback(conn_old, f"{ecommerce_db_conn_str} rollback.")
-    rollback(conn_new, f"{new_ecommerce_db_conn_str} rollback.")
-    close(master_conn, f"{master_db_conn_str} closed.")
-    close(conn_old, f"{ecommerce_db_conn_str} closed.")
-    close(conn_new, f"{new_ecommerce_db_conn_str} closed.")
-    neo4j_rollback(neo4j_driver, neo4j_tables)
-    close(neo4j_driver, "Neo4j driver closed.")
-    close(mongodb_driver, "MongoDB driver closed.")
-    mongodb_rollback()
+    try:
+        source_connections = None
+        target_connections = None
+        checkpoints = None
+        sync_state = None
+        checkpoints = CheckpointStore(checkpoint_file)
+        sync_state = SyncState(sync_state_path)
+
+        if not resume:
+            checkpoints.clear()
+        else:
+            checkpoints.begin_run()
+
+        source_connections = ThreadConnections(source.connect)
+        source_connections.get()
+        log(f"Connected to {source.name}.")
+
+        with phase("ddl"):
+            dependencies = create_target_tables(target, checkpoints, upsert)
+
+        target_connections = ThreadConnections(target.connect)
+
+        def migrate_source_table(table):
+            try:
+                with span(table, "table"):
+                    if upsert and table in mn_tables_dict:
+                        return upsert_m_to_n_table(
+                            table, source_connections, graph, sync_state
+                        )
+
+                    if upsert:
+                        return upsert_table(
+                            table,
+                            source_connections,
+                            target_connections,
+                            graph,
+                            sync_state,
+                        )
+
+                    if is_sharded(table, graph_factory, source_connections.get()):
+                        return migrate_table_sharded(
+                            table,
+                            source,
+                            target,
+                            source_connections,
+                            graph,
+                            checkpoints,
+                            graph_factory,
+                            sync_state,
+                        )
+
+                    if table in mn_tables_dict:
+                        return migrate_m_to_n_table(
+                            table, source_connections, graph, checkpoints, sync_state
+                        )
+
+                    return migrate_table(
+                        table,
+                        source_connections,
+                        target_connections,
+                        graph,
+                        checkpoints,
+                    )
+            except Exception:
+                # The thread keeps its connection for its next table, whose commit
+                # would otherwise include the uncommitted rows of this table
+                rollback(target_connections.get())
+                raise
+
+        # ----------------------------------------------------------------
+        # Load data into tables and create corresponding graph nodes if part of m:n relationship
+        # ----------------------------------------------------------------
+        # Tables without a foreign key dependency on each other are copied concurrently
+        with phase("tables"):
+            run_in_dependency_order(
+                sql_tables, dependencies, migrate_source_table, migration_workers
+            )
+
+        if mssql_deferred_constraints:
+            # The worker connections must not hold locks on the tables
+            commit(target_connections, f"{target.name} (workers) committed.")
+
+            with phase("deferred constraints"):
+                create_deferred_constraints(target, checkpoints, upsert)
+
+        # Store the m:n-Tables as relationships in the graph database
+        # ----------------------------------------------------------------
+        start = time.perf_counter()
+
+        with phase("neo4j constraints"):
+            for node_name, attribute in get_m_to_n_constraints(mn_tables_dict):
+                create_unique_constraint(graph, node_name, attribute)
+                log(f"Created Neo4j uniqueness constraint on {node_name}.{attribute}.")
+
+            for relationship_name, attribute in get_m_to_n_indexes(mn_tables_dict):
+                graph.create_relationship_index(relationship_name, attribute)
+                log(f"Created Neo4j index on {relationship_name}.{attribute}.")
+
+        constraint_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+
+        with phase("relationships"):
+            run_in_dependency_order(
+                list(mn_tables_dict.keys()),
+                dict(),
+                migrate_source_table,
+                migration_workers,
+            )
+
+        relationship_seconds = time.perf_counter() - start
+        log(
+            f"Neo4j m:n phase: constraint creation took {constraint_seconds:.2f}s, "
+            f"relationship load took {relationship_seconds:.2f}s."
+        )
+
+        # Store the MongoDB entities
+        # ----------------------------------------------------------------
+        with phase("mongodb"):
+            for table in mongodb_tables:
+                if create_mongodb_collection(documents, mongodb_db_name, table):
+                    checkpoints.start(table, TARGET_MONGODB)
+                    checkpoints.finish(table, TARGET_MONGODB)
+
+                log(
+                    f"Created MongoDB collection for {table} "
+                    f"in database {mongodb_db_name}."
+                )
+
+            seed_mongodb_collections(
+                source_connections.get(), documents, mongodb_db_name
+            )
+
+        commit(source_connections, f"{source.name} committed.")
+        commit(target_connections, f"{target.name} (workers) committed.")
+        close(source_connections, f"{source.name} closed.")
+        close(target_connections, f"{target.name} (workers) closed.")
+        close(checkpoints)
+        close(sync_state)
+        peak_rss = get_peak_rss()
+
+        if peak_rss is not None:
+            log(f"Peak RSS: {peak_rss:.1f} MiB.")
+
+        log("Script completed.")
+        return True
+    except Exception as e:
+        log("Error occurred: " + str(e), ERROR)
+        rollback(source_connections, f"{source.name} rollback.")
+        rollback(target_connections, f"{target.name} (workers) rollback.")
+        close(source_connections, f"{source.name} closed.")
+        close(target_connections, f"{target.name} (workers) closed.")
+        close(checkpoints)
+        close(sync_state)
+
+        if rollback_on_error:
+            try:
+                run_rollback(source, target, graph, documents, checkpoint_file)
+            except Exception as rollback_error:
+                log("Rollback failed: " + str(rollback_error), ERROR)
+
+            return False
+
+        if upsert:
+            log("Run the script with --upsert again to continue.")
+            return False
+
+        log(
+            f"The committed progress is recorded in {checkpoint_file}. "
+            "Run the script with --resume to continue."
+        )
+        return False
+
+
+def verify_migration(source, target, graph, report_path=None):
+    """Verifies the new database and the graph against the old database
+    (see verify.run_verification) with the verification configuration.
+    Args:
+        source (_type_): The backend of the old database (see adapters.OdbcBackend).
+        target (_type_): The backend of the new database (see adapters.OdbcBackend).
+        graph (_type_): The graph store (see adapters.Neo4jGraph).
+        None skips the graph checks.
+        report_path (str, optional): Overrides verify_report_path. Defaults to None.
+    Returns:
+        dict: The report.
+    """
+    with phase("verification"):
+        return run_verification(
+            source,
+            target,
+            graph,
+            sql_tables,
+            neo4j_tables,
+            mn_tables_dict,
+            report_path if report_path is not None else verify_report_path,
+            verify_range_size,
+            migration_workers,
+            verify_max_reported_keys,
+            neo4j_decimal_policy,
+        )
+
+
+def configure_logging(level=None, json_lines=None):
+    """Configures migration_log with the logging configuration.
+    Args:
+        level (str, optional): Overrides log_level. Defaults to None.
+        json_lines (bool, optional): Overrides log_json_lines. Defaults to None.
+    """
+    migration_log.configure(
+        level if level is not None else log_level,
+        json_lines if json_lines is not None else log_json_lines,
+        log_sample_rate,
+        log_progress_interval,
+    )
+
+
+def start_trace(profile_phases=None):
+    """Starts migration_trace with the trace configuration.
+    Args:
+        profile_phases (bool, optional): Overrides trace_profile_phases.
+        Defaults to None.
+    """
+    migration_trace.trace_top_entries = trace_top_entries
+    migration_trace.enable(
+        profile_phases if profile_phases is not None else trace_profile_phases,
+        trace_sample_interval,
+    )
+
+
+def get_server_graph():
+    """Creates the graph store of the configured Neo4j instance
+    (also the graph_factory of the shard worker processes).
+    Returns:
+        Neo4jGraph: The graph store.
+    """
+    return Neo4jGraph(get_neo4j_driver(neo4j_connection))
+
+
+def get_server_backends(export_directory=None):
+    """Gets the backends of the SQL Server, Neo4j and MongoDB instances
+    configured by the connection data. No connection is opened yet.
+    Args:
+        export_directory (str, optional): If set, the graph is written as CSV files
+        for neo4j-admin import to this directory instead of Neo4j. Defaults to None.
+    Returns:
+        tuple: The backends of the old and the new database,
+        the graph store and the document store.
+    """
+    source = OdbcBackend(ecommerce_db_conn_str, master_db_conn_str)
+    target = OdbcBackend(new_ecommerce_db_conn_str, master_db_conn_str)
+
+    if export_directory is None:
+        graph = get_server_graph()
+    else:
+        graph = CsvGraphExport(
+            export_directory,
+            dict(get_m_to_n_constraints(mn_tables_dict)),
+            export_gzip,
+            export_gzip_level,
+        )
+
+    documents = get_mongodb_driver(mongodb_connection)
+    return source, target, graph, documents
+
+
+def main():
+    """Migrates the relational e commerce model
+    to the polyglot persistence model."""
+    parser = argparse.ArgumentParser(
+        description="Migrates the relational e commerce model "
+        "to the polyglot persistence model."
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skips finished tables and continues partially migrated tables "
+        f"after the last committed primary key recorded in {checkpoint_path}.",
+    )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="Applies only the rows that were inserted, updated or deleted "
+        "in the old database since the last run.",
+    )
+    parser.add_argument(
+        "--upsert",
+        action="store_true",
+        default=upsert_mode,
+        help="Re-runs the migration against a loaded target: existing tables, "
+        "indexes, constraints and collections are kept, only missing or changed "
+        "rows, nodes and relationships are written.",
+    )
+    parser.add_argument(
+        "--export",
+        metavar="DIRECTORY",
+        help="Writes the Neo4j nodes and relationships as CSV files for "
+        "neo4j-admin import to this directory instead of running transactions "
+        "(first-time loads into an empty graph).",
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Only verifies the new database and the graph against the old database "
+        f"and writes the report to {verify_report_path}.",
+    )
+    parser.add_argument(
+        "--recommend",
+        nargs="?",
+        const="incremental",
+        choices=["incremental", "full"],
+        help="Only precomputes the ProductRecommendation documents from the carts and "
+        "orders of the old database, for the changed baskets (incremental, default) "
+        "or all of them (full).",
+    )
+    parser.add_argument(
+        "--rollback",
+        action="store_true",
+        help="Deletes what the run recorded in "
+        f"{checkpoint_path} created (Neo4j relationships and nodes, "
+        "MongoDB collections, MSSQL tables).",
+    )
+    parser.add_argument(
+        "--plan",
+        metavar="PATH",
+        default=plan_path,
+        help="Migrates the tables, relationships and collections of a declarative "
+        "plan file (JSON, or YAML with PyYAML) instead of the configured ones.",
+    )
+    parser.add_argument(
+        "--trace",
+        nargs="?",
+        const=trace_path,
+        metavar="PATH",
+        help="Records timed spans of the phases, tables and batches and samples the "
+        "stacks of all threads, writes the spans as a Chrome trace event file "
+        f"(default {trace_path}) and logs the hot spots.",
+    )
+    parser.add_argument(
+        "--trace-cprofile",
+        action="store_true",
+        help="Additionally profiles every phase of --trace with cProfile.",
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=list(migration_log.log_levels.keys()),
+        help=f"Minimal log level (default {log_level}).",
+    )
+    parser.add_argument(
+        "--log-json", action="store_true", help="Writes the log as JSON lines."
+    )
+    args = parser.parse_args()
+    configure_logging(args.log_level, True if args.log_json else None)
+
+    if args.trace is not None:
+        start_trace(True if args.trace_cprofile else None)
+        # Runs before migration_log is closed, also after --sync, --rollback or --verify
+        atexit.register(migration_trace.finish, args.trace)
+
+    if args.export is not None and (
+        args.resume or args.sync or args.verify or args.rollback
+    ):
+        parser.error(
+            "--export can not be combined with --resume, --sync, --verify or --rollback"
+        )
+
+    if args.upsert and (
+        args.resume or args.sync or args.verify or args.rollback or args.export
+    ):
+        parser.error(
+            "--upsert can not be combined with --resume, --sync, --verify, "
+            "--rollback or --export"
+        )
+
+    if args.plan is not None:
+        # The CSV export reads the m:n mappings of the plan
+        apply_migration_plan(
+            OdbcBackend(ecommerce_db_conn_str, master_db_conn_str), args.plan
+        )
+
+    source, target, graph, documents = get_server_backends(args.export)
+
+    if args.sync:
+        close(documents)
+        run_sync(source, target, graph)
+        return
+
+    if args.rollback:
+        try:
+            run_rollback(source, target, graph, documents, checkpoint_path)
+        finally:
+            close(graph, f"{graph.name} closed.")
+            close(documents, "MongoDB driver closed.")
+
+        return
+
+    if args.recommend is not None:
+        close(graph)
+
+        try:
+            run_recommendations(
+                source, documents, mongodb_db_name, full=args.recommend == "full"
+            )
+        finally:
+            close(documents, "MongoDB driver closed.")
+
+        return
+
+    if args.verify:
+        close(documents)
+
+        try:
+            verify_migration(source, target, graph)
+        finally:
+            close(graph, f"{graph.name} closed.")
+
+        return
+
+    try:
+        # The CSV export is written by this process only
+        completed = run_migration(
+            source,
+            target,
+            graph,
+            documents,
+            checkpoint_path,
+            args.resume,
+            get_server_graph if args.export is None else None,
+            args.upsert,
+        )
+
+        if completed and verify_after_migration:
+            # The CSV export can not be read back, only the tables are verified
+            verify_migration(source, target, graph if args.export is None else None)
+
+        if completed and recommend_after_migration:
+            run_recommendations(source, documents, mongodb_db_name)
+    finally:
+        close(graph, f"{graph.name} closed.")
+        close(documents, "MongoDB driver closed.")
+
+    if args.export is not None and completed:
+        log(
+            "Load the graph into an empty database with: neo4j-admin database "
+            f"import full (Neo4j 4.x: neo4j-admin import) and the arguments in "
+            f"{args.export}/neo4j_admin_import.txt, then run "
+            f"{args.export}/constraints.cypher."
+        )
+
+
+if __name__ == "__main__":
+    main()
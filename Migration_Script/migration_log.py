@@ -0,0 +1,338 @@
+# Import necessary packages
+import atexit
+import itertools
+import json
+import queue
+import sys
+import threading
+import time
+
+# Log levels
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+log_levels = {"DEBUG": DEBUG, "INFO": INFO, "WARNING": WARNING, "ERROR": ERROR}
+level_names = {v: k for k, v in log_levels.items()}
+
+# Records below this level are dropped before they are formatted
+log_level = INFO
+# Write JSON lines ({"time", "level", "message", <fields>}) instead of text lines
+log_json_lines = False
+# Log every n-th occurrence of a per-row event (0: never)
+log_sample_rate = 1000
+# Minimal amount of seconds between two progress lines of a table
+log_progress_interval = 10.0
+writer = None
+writer_lock = threading.Lock()
+sample_counters = dict()
+
+
+class LogWriter:
+    """Writes the log records of a queue to a stream in a background thread.
+    The logging threads only enqueue the records, the writer formats them
+    and writes and flushes every batch of queued records at once."""
+
+    def __init__(self, stream, json_lines: bool):
+        """Starts the writer thread.
+        Args:
+            stream (_type_): The text stream (e.g. sys.stdout).
+            json_lines (bool): Whether the records are written as JSON lines.
+        """
+        self.stream = stream
+        self.json_lines = json_lines
+        self.records = queue.SimpleQueue()
+        self.second = None
+        self.timestamp = None
+        self.thread = threading.Thread(target=self.run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def format(self, record: tuple):
+        """Formats a record.
+        Args:
+            record (tuple): The (time, level, message, fields) tuple.
+        Returns:
+            str: The line.
+        """
+        created, level, message, fields = record
+        second = int(created)
+
+        # The timestamp changes at most once per second
+        if second != self.second:
+            self.second = second
+            self.timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+
+        if self.json_lines:
+            line = {
+                "time": self.timestamp,
+                "level": level_names.get(level, str(level)),
+                "message": message,
+            }
+            line.update(fields)
+            return json.dumps(line, default=str) + "\n"
+
+        if level == INFO:
+            return f"{self.timestamp} {message}\n"
+
+        return f"{self.timestamp} {level_names.get(level, level)} {message}\n"
+
+    def run(self):
+        """Writes the queued records until None is queued."""
+        running = True
+
+        while running:
+            items = [self.records.get()]
+
+            while True:
+                try:
+                    items.append(self.records.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = []
+            flushed = []
+
+            for item in items:
+                if item is None:
+                    running = False
+                elif isinstance(item, threading.Event):
+                    flushed.append(item)
+                else:
+                    lines.append(self.format(item))
+
+            if len(lines) > 0:
+                self.stream.write("".join(lines))
+                self.stream.flush()
+
+            for event in flushed:
+                event.set()
+
+    def flush(self):
+        """Waits until the records queued so far are written."""
+        event = threading.Event()
+        self.records.put(event)
+        event.wait()
+
+    def close(self):
+        """Writes the queued records and stops the writer thread."""
+        self.records.put(None)
+        self.thread.join()
+
+
+def configure(
+    level=None, json_lines=None, sample_rate=None, progress_interval=None, stream=None
+):
+    """Configures the logging. Unset arguments keep their value.
+    The queued records are written before the writer is replaced.
+    Args:
+        level (_type_, optional): The log level (e.g. INFO or "INFO").
+        Defaults to None.
+        json_lines (bool, optional): See log_json_lines. Defaults to None.
+        sample_rate (int, optional): See log_sample_rate. Defaults to None.
+        progress_interval (float, optional): See log_progress_interval.
+        Defaults to None.
+        stream (_type_, optional): The text stream. Defaults to None (sys.stdout).
+    Raises:
+        ValueError: Is thrown if the level is unknown.
+    """
+    global log_level, log_json_lines, log_sample_rate, log_progress_interval
+
+    if isinstance(level, str):
+        if level.upper() not in log_levels:
+            raise ValueError(f"level must be one of {list(log_levels.keys())}!")
+
+        level = log_levels[level.upper()]
+
+    log_level = level if level is not None else log_level
+    log_json_lines = json_lines if json_lines is not None else log_json_lines
+    log_sample_rate = sample_rate if sample_rate is not None else log_sample_rate
+    log_progress_interval = (
+        progress_interval if progress_interval is not None else log_progress_interval
+    )
+    close()
+
+    with writer_lock:
+        start_writer(stream)
+
+
+def start_writer(stream=None):
+    """Starts the writer if it is not running. Must hold writer_lock.
+    Args:
+        stream (_type_, optional): The text stream. Defaults to None (sys.stdout).
+    Returns:
+        LogWriter: The writer.
+    """
+    global writer
+
+    if writer is None:
+        writer = LogWriter(stream if stream is not None else sys.stdout, log_json_lines)
+
+    return writer
+
+
+def log(message: str, level=INFO, **fields):
+    """Logs the message. The record is written by the background writer.
+    Args:
+        message (str): The message.
+        level (int, optional): The log level. Defaults to INFO.
+        fields (_type_): Additional fields of JSON lines.
+    Raises:
+        TypeError: Is thrown if message is not a str.
+    """
+    if type(message) != str:
+        raise TypeError("message must be a str!")
+
+    if level < log_level:
+        return
+
+    current_writer = writer
+
+    if current_writer is None:
+        with writer_lock:
+            current_writer = start_writer()
+
+    current_writer.records.put((time.time(), level, message, fields))
+
+
+def log_sampled(event: str, message: str, level=DEBUG, **fields):
+    """Logs every log_sample_rate-th occurrence of a per-row event.
+    Args:
+        event (str): The event name (e.g. "node").
+        message (str): The message.
+        level (int, optional): The log level. Defaults to DEBUG.
+        fields (_type_): Additional fields of JSON lines.
+    """
+    if level < log_level or log_sample_rate <= 0:
+        return
+
+    counter = sample_counters.get(event)
+
+    if counter is None:
+        counter = sample_counters.setdefault(event, itertools.count())
+
+    occurrence = next(counter)
+
+    if occurrence % log_sample_rate == 0:
+        log(message, level, event=event, occurrence=occurrence, **fields)
+
+
+def format_duration(seconds: float):
+    """Formats a duration, e.g. 3725 -> "1h 2m 5s".
+    Args:
+        seconds (float): The duration in seconds.
+    Returns:
+        str: The formatted duration.
+    """
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+
+    if hours > 0:
+        return f"{hours}h {minutes}m {seconds}s"
+
+    if minutes > 0:
+        return f"{minutes}m {seconds}s"
+
+    return f"{seconds}s"
+
+
+class TableProgress:
+    """Per-table counters of the migrated rows. A progress line with the
+    throughput and the estimated remaining time is logged at most every
+    log_progress_interval seconds while rows are added."""
+
+    def __init__(self, table: str, total=None):
+        """Initializes the counters of a table.
+        Args:
+            table (str): The table name.
+            total (int, optional): The amount of rows to migrate.
+            Defaults to None (unknown, no ETA).
+        """
+        self.table = table
+        self.total = total
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+        self.last_log = self.start
+        self.counters = {"rows": 0}
+
+    def count(self, counter: str, amount: int):
+        """Adds to a counter without logging (e.g. the written nodes).
+        Args:
+            counter (str): The counter name.
+            amount (int): The amount.
+        """
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def add(self, rows: int):
+        """Adds migrated rows and logs a progress line if it is due.
+        Args:
+            rows (int): The amount of rows.
+        """
+        now = time.perf_counter()
+
+        with self.lock:
+            self.counters["rows"] += rows
+
+            if now - self.last_log < log_progress_interval:
+                return
+
+            self.last_log = now
+            counters = dict(self.counters)
+
+        self.log(counters, now - self.start)
+
+    def log(self, counters: dict, seconds: float):
+        """Logs a progress line.
+        Args:
+            counters (dict): The counters.
+            seconds (float): The elapsed seconds.
+        """
+        rows = counters["rows"]
+        rows_per_second = rows / seconds if seconds > 0 else 0
+        fields = {"table": self.table, "rowsPerSecond": round(rows_per_second)}
+        fields.update(counters)
+        message = f"Progress {self.table}: {rows}"
+
+        if self.total:
+            remaining = max(self.total - rows, 0)
+            message += f"/{self.total} rows ({rows / self.total:.0%})"
+            fields["total"] = self.total
+
+            if rows_per_second > 0:
+                fields["etaSeconds"] = round(remaining / rows_per_second)
+                eta = format_duration(remaining / rows_per_second)
+                message += f", {rows_per_second:.0f} rows/s, ETA {eta}"
+        else:
+            message += f" rows, {rows_per_second:.0f} rows/s"
+
+        others = [f"{k} {v}" for k, v in counters.items() if k != "rows"]
+
+        if len(others) > 0:
+            message += " (" + ", ".join(others) + ")"
+
+        log(message + ".", INFO, **fields)
+
+
+def flush():
+    """Waits until the records logged so far are written."""
+    with writer_lock:
+        current_writer = writer
+
+    if current_writer is not None:
+        current_writer.flush()
+
+
+def close():
+    """Writes the queued records and stops the writer.
+    The next record starts a new writer."""
+    global writer
+
+    with writer_lock:
+        current_writer = writer
+        writer = None
+
+    if current_writer is not None:
+        current_writer.close()
+
+
+atexit.register(close)
@@ -0,0 +1,227 @@
+# Import necessary packages
+import hashlib
+import json
+import os
+from source_reader import get_columns, get_primary_key
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+# Version of the plan format
+PLAN_VERSION = 1
+# Targets of a source table
+plan_targets = ["mssql", "neo4j"]
+# Attributes of a relationship mapping (see migration.mn_tables_dict)
+relationship_attributes = [
+    "table",
+    "fromEntity",
+    "toEntity",
+    "relationshipName",
+    "fromAttribute",
+    "toAttribute",
+    "primaryKeyAttribute",
+]
+# Catalog query of the source schema (rewritten by adapters.translate_query for SQLite)
+schema_query = (
+    "SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE FROM INFORMATION_SCHEMA.COLUMNS "
+    "ORDER BY TABLE_NAME, ORDINAL_POSITION"
+)
+
+
+def load_plan(path: str):
+    """Loads a migration plan from a JSON or (with PyYAML) a YAML file.
+    Args:
+        path (str): The path of the plan file (.json, .yaml or .yml).
+    Raises:
+        ValueError: Is thrown if the file is YAML and PyYAML is not installed.
+    Returns:
+        dict: The plan (see migration_plan.json).
+    """
+    with open(path, encoding="utf-8") as file:
+        if os.path.splitext(path)[1].lower() not in [".yaml", ".yml"]:
+            return json.load(file)
+
+        if yaml is None:
+            raise ValueError("YAML plans require PyYAML (pip install pyyaml)!")
+
+        return yaml.safe_load(file)
+
+
+def check_batch_size(name: str, batch_size):
+    """Checks an optional batch size of a plan entry.
+    Args:
+        name (str): The name of the entry.
+        batch_size (_type_): The batch size or None.
+    Raises:
+        ValueError: Is thrown if the batch size is not a positive int.
+    """
+    if batch_size is None:
+        return
+
+    if type(batch_size) != int or batch_size <= 0:
+        raise ValueError(f"The batchSize of {name} must be a positive int!")
+
+
+def validate_plan(plan: dict):
+    """Validates the structure and the references of a plan.
+    Args:
+        plan (dict): The plan.
+    Raises:
+        ValueError: Is thrown if the plan is invalid.
+    """
+    if type(plan) != dict or plan.get("version") != PLAN_VERSION:
+        raise ValueError(f"The plan must be an object with version {PLAN_VERSION}!")
+
+    check_batch_size("the plan", plan.get("defaultBatchSize"))
+    names = set()
+    nodes = set()
+
+    for table in plan.get("tables", []):
+        name = table.get("name")
+
+        if type(name) != str or name in names:
+            raise ValueError(f"Every table needs a unique name ({name})!")
+
+        targets = table.get("targets", [])
+
+        if len(targets) == 0 or not set(targets).issubset(plan_targets):
+            raise ValueError(f"The targets of {name} must be some of {plan_targets}!")
+
+        check_batch_size(name, table.get("batchSize"))
+        names.add(name)
+
+        if "neo4j" in targets:
+            nodes.add(name)
+
+    for relationship in plan.get("relationships", []):
+        missing = [el for el in relationship_attributes if el not in relationship]
+
+        if len(missing) > 0:
+            raise ValueError(f"The relationship {relationship} misses {missing}!")
+
+        if relationship["table"] in names:
+            raise ValueError(f"{relationship['table']} is mapped twice!")
+
+        for entity in [relationship["fromEntity"], relationship["toEntity"]]:
+            if entity not in nodes:
+                raise ValueError(
+                    f"The relationship {relationship['relationshipName']} references "
+                    f"{entity}, which is no table with the target neo4j!"
+                )
+
+        check_batch_size(relationship["relationshipName"], relationship.get("batchSize"))
+        names.add(relationship["table"])
+
+    collections = [el.get("name") for el in plan.get("collections", [])]
+
+    if len(set(collections)) != len(collections) or None in collections:
+        raise ValueError("Every collection needs a unique name!")
+
+
+def get_source_tables(plan: dict):
+    """Gets the source tables of a plan.
+    Args:
+        plan (dict): The plan.
+    Returns:
+        list: The table names followed by the tables of the relationships.
+    """
+    return [el["name"] for el in plan.get("tables", [])] + [
+        el["table"] for el in plan.get("relationships", [])
+    ]
+
+
+def get_schema_fingerprint(connection, plan: dict):
+    """Gets the fingerprint of the source schema and the plan.
+    The schema is read by one catalog query.
+    Args:
+        connection (_type_): The connection to the old database.
+        plan (dict): The plan.
+    Returns:
+        str: The SHA-256 hex digest.
+    """
+    cursor = connection.cursor()
+    rows = cursor.execute(schema_query).fetchall()
+    cursor.close()
+    digest = hashlib.sha256(json.dumps(plan, sort_keys=True).encode())
+
+    for row in rows:
+        digest.update(("\t".join(str(el) for el in row) + "\n").encode())
+
+    return digest.hexdigest()
+
+
+def compile_plan(connection, plan: dict, fingerprint: str):
+    """Resolves the column metadata of the source tables of a plan
+    and checks the mapped attributes against it.
+    Args:
+        connection (_type_): The connection to the old database.
+        plan (dict): The validated plan.
+        fingerprint (str): See get_schema_fingerprint.
+    Raises:
+        ValueError: Is thrown if a mapped attribute is no column of its table.
+    Returns:
+        dict: Dictionary of the format {"fingerprint": <value>, "plan": <plan>,
+        "tables": {<table>: {"columns": [...], "primaryKey": <value>}}}.
+    """
+    cursor = connection.cursor()
+    tables = dict()
+
+    try:
+        for table in get_source_tables(plan):
+            columns = get_columns(cursor, table)
+
+            if len(columns) == 0:
+                raise ValueError(f"The source table {table} does not exist!")
+
+            tables[table] = {
+                "columns": columns,
+                "primaryKey": get_primary_key(cursor, table),
+            }
+    finally:
+        cursor.close()
+
+    for relationship in plan.get("relationships", []):
+        columns = tables[relationship["table"]]["columns"]
+
+        for attribute in ["fromAttribute", "toAttribute", "primaryKeyAttribute"]:
+            if relationship[attribute] not in columns:
+                raise ValueError(
+                    f"{relationship[attribute]} is no column of {relationship['table']}!"
+                )
+
+    return {"fingerprint": fingerprint, "plan": plan, "tables": tables}
+
+
+def get_compiled_plan(connection, plan: dict, cache_path=None):
+    """Gets the compiled plan from the cache if the fingerprint of the source
+    schema and the plan is unchanged, otherwise compiles and caches it.
+    Args:
+        connection (_type_): The connection to the old database.
+        plan (dict): The plan.
+        cache_path (str, optional): The path of the cache file.
+        Defaults to None (no cache).
+    Returns:
+        tuple: The compiled plan (see compile_plan) and whether it was cached.
+    """
+    validate_plan(plan)
+    fingerprint = get_schema_fingerprint(connection, plan)
+
+    if cache_path is not None and os.path.exists(cache_path):
+        with open(cache_path, encoding="utf-8") as file:
+            try:
+                compiled = json.load(file)
+            except ValueError:
+                compiled = None
+
+        if compiled is not None and compiled.get("fingerprint") == fingerprint:
+            return compiled, True
+
+    compiled = compile_plan(connection, plan, fingerprint)
+
+    if cache_path is not None:
+        with open(cache_path, "w", encoding="utf-8") as file:
+            json.dump(compiled, file, indent=2)
+
+    return compiled, False
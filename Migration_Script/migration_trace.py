@@ -0,0 +1,381 @@
+# Import necessary packages
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from migration_log import log
+
+# Record the spans of the phases, tables and batches (see enable)
+trace_enabled = False
+# Profile every phase with cProfile (only the thread that runs the phase)
+trace_profile_phases = False
+# Seconds between two stack samples of all threads (None: no sampling)
+trace_sample_interval = None
+# Amount of entries per table of the summary
+trace_top_entries = 20
+# Threads that are not sampled (see migration_log.LogWriter)
+idle_threads = ["log-writer", "trace-sampler"]
+# Innermost functions of threads that wait for work (file name, function name)
+idle_functions = [
+    ("threading.py", "wait"),
+    ("thread.py", "_worker"),
+    ("queue.py", "get"),
+]
+# Name of the spans outside of a phase in the profiles
+NO_PHASE = "(no phase)"
+# Span of a disabled trace (reusable, does nothing)
+no_span = nullcontext()
+spans = []
+# Dictionary of the format {<thread id>: <thread name>} of the spans
+thread_names = dict()
+spans_lock = threading.Lock()
+# Dictionary of the format {<phase>: pstats.Stats}
+phase_profiles = dict()
+# Dictionary of the format {<phase>: {<function>: <amount of samples>}}
+phase_samples = dict()
+current_phase = NO_PHASE
+sampler = None
+trace_start = 0
+
+
+class Span:
+    """Timed span that is recorded as a complete event
+    ("ph": "X") of the Chrome trace event format on exit."""
+
+    def __init__(self, name: str, category: str, args: dict):
+        """Initializes the span.
+        Args:
+            name (str): The name (e.g. the table name).
+            category (str): The category (e.g. "phase", "table", "mssql").
+            args (dict): The arguments shown with the event (e.g. the rows).
+        """
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = None
+
+    def __enter__(self):
+        """Starts the span.
+        Returns:
+            Span: The span.
+        """
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Records the span, with the error if the span raised one.
+        Args:
+            exc_type (_type_): The type of the raised error or None.
+            exc_value (_type_): The raised error or None.
+            traceback (_type_): The traceback or None.
+        Returns:
+            bool: False, errors are not suppressed.
+        """
+        end = time.perf_counter()
+        event = {
+            "name": self.name,
+            "cat": self.category,
+            "ph": "X",
+            "ts": round((self.start - trace_start) * 1e6, 1),
+            "dur": round((end - self.start) * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+
+        if len(self.args) > 0:
+            event["args"] = self.args
+
+        if exc_type is not None:
+            event.setdefault("args", dict())["error"] = str(exc_value)
+
+        with spans_lock:
+            spans.append(event)
+            thread_names[event["tid"]] = threading.current_thread().name
+
+        return False
+
+
+class StackSampler:
+    """Counts the innermost functions of the busy threads in a background
+    thread, per phase. Unlike cProfile, it sees the worker threads and adds
+    no overhead to the sampled code. Threads that wait for work
+    (idle_threads, idle_functions) are skipped."""
+
+    def __init__(self, interval: float):
+        """Starts the sampler thread.
+        Args:
+            interval (float): The seconds between two samples.
+        """
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run, name="trace-sampler", daemon=True
+        )
+        self.thread.start()
+
+    def run(self):
+        """Takes samples until the sampler is stopped."""
+        while not self.stopped.wait(self.interval):
+            counts = phase_samples.setdefault(current_phase, dict())
+            idle_ids = {
+                el.ident for el in threading.enumerate() if el.name in idle_threads
+            }
+
+            for thread_id, frame in sys._current_frames().items():
+                code = frame.f_code
+                file_name = os.path.basename(code.co_filename)
+
+                if thread_id in idle_ids or (file_name, code.co_name) in idle_functions:
+                    continue
+
+                function = f"{code.co_name} ({file_name}:{code.co_firstlineno})"
+                counts[function] = counts.get(function, 0) + 1
+
+    def stop(self):
+        """Stops the sampler thread."""
+        self.stopped.set()
+        self.thread.join()
+
+
+def enable(profile_phases=None, sample_interval=None):
+    """Clears the recorded spans and profiles and starts the trace.
+    Args:
+        profile_phases (bool, optional): See trace_profile_phases.
+        Defaults to None (unchanged).
+        sample_interval (float, optional): See trace_sample_interval.
+        Defaults to None (unchanged).
+    """
+    global trace_enabled, trace_profile_phases, trace_sample_interval
+    global trace_start, sampler, current_phase
+
+    if profile_phases is not None:
+        trace_profile_phases = profile_phases
+
+    if sample_interval is not None:
+        trace_sample_interval = sample_interval
+
+    disable()
+    spans.clear()
+    thread_names.clear()
+    phase_profiles.clear()
+    phase_samples.clear()
+    current_phase = NO_PHASE
+    trace_start = time.perf_counter()
+    trace_enabled = True
+
+    if trace_sample_interval:
+        sampler = StackSampler(trace_sample_interval)
+
+
+def disable():
+    """Stops the trace. The recorded spans and profiles are kept."""
+    global trace_enabled, sampler
+    trace_enabled = False
+
+    if sampler is not None:
+        sampler.stop()
+        sampler = None
+
+
+def span(name: str, category: str, **args):
+    """Creates a timed span, e.g. with span("Product", "table"): ...
+    Args:
+        name (str): See Span.
+        category (str): See Span.
+        args (_type_): See Span.
+    Returns:
+        _type_: The span, or no_span if the trace is disabled.
+    """
+    if not trace_enabled:
+        return no_span
+
+    return Span(name, category, args)
+
+
+@contextmanager
+def phase(name: str):
+    """Runs a phase of the migration (e.g. "tables") in a span of the
+    category "phase" and attributes the samples and the cProfile
+    profile (trace_profile_phases) to it.
+    Args:
+        name (str): The phase name.
+    Yields:
+        _type_: Nothing.
+    """
+    global current_phase
+
+    if not trace_enabled:
+        yield
+        return
+
+    previous_phase = current_phase
+    current_phase = name
+    profiler = cProfile.Profile() if trace_profile_phases else None
+
+    try:
+        with Span(name, "phase", dict()):
+            if profiler is None:
+                yield
+            else:
+                profiler.enable()
+
+                try:
+                    yield
+                finally:
+                    profiler.disable()
+    finally:
+        current_phase = previous_phase
+
+        if profiler is not None:
+            if name in phase_profiles:
+                phase_profiles[name].add(profiler)
+            else:
+                phase_profiles[name] = pstats.Stats(profiler)
+
+
+def iter_spans(iterable, name: str, category: str, **args):
+    """Records a span for every item that is taken from an iterable,
+    e.g. the fetch of every chunk of a SELECT.
+    Args:
+        iterable (_type_): The iterable.
+        name (str): See Span.
+        category (str): See Span.
+        args (_type_): See Span.
+    Yields:
+        _type_: The next item.
+    """
+    iterator = iter(iterable)
+
+    while True:
+        with span(name, category, **args):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+
+        yield item
+
+
+def get_thread_events():
+    """Creates the metadata events that name the threads of the spans.
+    Returns:
+        list: The events.
+    """
+    threads = sorted({(el["pid"], el["tid"]) for el in spans})
+    return [
+        {
+            "name": "thread_name",
+            "ph": "M",
+            "pid": pid,
+            "tid": tid,
+            "args": {"name": thread_names[tid]},
+        }
+        for pid, tid in threads
+    ]
+
+
+def write_trace(path: str):
+    """Writes the recorded spans as a Chrome trace event file
+    (chrome://tracing, https://ui.perfetto.dev).
+    Args:
+        path (str): The path of the JSON file.
+    """
+    with spans_lock:
+        events = get_thread_events() + sorted(spans, key=lambda el: el["ts"])
+
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+def get_hot_spots(top=None):
+    """Sums up the recorded spans by category and name.
+    Args:
+        top (int, optional): The amount of returned entries.
+        Defaults to None (trace_top_entries).
+    Returns:
+        list: List of dictionaries of the format {"category": <value>,
+        "name": <value>, "count": <value>, "seconds": <total>,
+        "maxSeconds": <value>} with the highest total first.
+    """
+    totals = dict()
+
+    with spans_lock:
+        for event in spans:
+            total = totals.setdefault(
+                (event["cat"], event["name"]),
+                {
+                    "category": event["cat"],
+                    "name": event["name"],
+                    "count": 0,
+                    "seconds": 0,
+                    "maxSeconds": 0,
+                },
+            )
+            seconds = event["dur"] / 1e6
+            total["count"] += 1
+            total["seconds"] += seconds
+            total["maxSeconds"] = max(total["maxSeconds"], seconds)
+
+    return sorted(totals.values(), key=lambda el: el["seconds"], reverse=True)[
+        : top or trace_top_entries
+    ]
+
+
+def format_summary(top=None):
+    """Formats the hot spots of the spans, the most sampled functions
+    and the cProfile profiles per phase as text tables.
+    Args:
+        top (int, optional): The amount of entries per table.
+        Defaults to None (trace_top_entries).
+    Returns:
+        str: The summary.
+    """
+    top = top or trace_top_entries
+    lines = [
+        "Hot spots (spans by total time):",
+        f"{'category':<10} {'name':<32} {'count':>8} {'total s':>10} {'max s':>9}",
+    ]
+
+    for el in get_hot_spots(top):
+        lines.append(
+            f"{el['category'][:10]:<10} {el['name'][:32]:<32} {el['count']:>8} "
+            f"{el['seconds']:>10.3f} {el['maxSeconds']:>9.3f}"
+        )
+
+    for name, counts in phase_samples.items():
+        total = sum(counts.values())
+        lines += ["", f"Sampled functions of {name} ({total} samples):"]
+
+        for function, amount in sorted(
+            counts.items(), key=lambda el: el[1], reverse=True
+        )[:top]:
+            lines.append(f"{amount / total:>7.1%} {function}")
+
+    for name, stats in phase_profiles.items():
+        stream = io.StringIO()
+        stats.stream = stream
+        stats.sort_stats("cumulative").print_stats(top)
+        lines += ["", f"cProfile of {name}:", stream.getvalue().strip()]
+
+    return "\n".join(lines)
+
+
+def finish(path=None, top=None):
+    """Stops the trace, writes the trace file and logs the summary.
+    Args:
+        path (str, optional): The path of the trace file.
+        Defaults to None (no file).
+        top (int, optional): See format_summary.
+    """
+    disable()
+
+    if path is not None:
+        write_trace(path)
+        log(f"Trace with {len(spans)} spans written to {path}.")
+
+    log(format_summary(top))
@@ -0,0 +1,124 @@
+# Import necessary packages
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def create_insert_query(table: str, columns: tuple):
+    """Creates the parameterized INSERT query of a table.
+    E.g. "Category", ("CategoryId", "Name")
+    -> INSERT INTO Category (CategoryId,Name) VALUES (?,?);
+    Args:
+        table (str): The table name.
+        columns (tuple): The column names.
+    Returns:
+        str: The query.
+    """
+    return (
+        f"INSERT INTO {table} ("
+        + ",".join(columns)
+        + ") VALUES ("
+        + ",".join(["?" for _ in columns])
+        + ");"
+    )
+
+
+@lru_cache(maxsize=None)
+def create_update_query(table: str, columns: tuple, primary_key: str):
+    """Creates the parameterized UPDATE query of a table.
+    The parameters are the values of all columns except the
+    primary key, followed by the primary key.
+    Args:
+        table (str): The table name.
+        columns (tuple): The column names.
+        primary_key (str): The primary key column name.
+    Returns:
+        str: The query.
+    """
+    assignments = ",".join(f"{column}=?" for column in columns if column != primary_key)
+    return f"UPDATE {table} SET {assignments} WHERE {primary_key}=?;"
+
+
+@lru_cache(maxsize=None)
+def create_delete_query(table: str, primary_key: str):
+    """Creates the parameterized DELETE query of a table row.
+    Args:
+        table (str): The table name.
+        primary_key (str): The primary key column name.
+    Returns:
+        str: The query.
+    """
+    return f"DELETE FROM {table} WHERE {primary_key}=?;"
+
+
+def update_rows(cursor, table: str, columns: list, primary_key: str, rows):
+    """Updates rows by primary key with a single executemany call.
+    Args:
+        cursor (_type_): A pyodbc cursor of the target database.
+        table (str): The table name.
+        columns (list): The column names.
+        primary_key (str): The primary key column name.
+        rows (list): The rows with the new values.
+    Returns:
+        int: The amount of updated rows.
+    """
+    if len(rows) == 0:
+        return 0
+
+    key_index = columns.index(primary_key)
+    query = create_update_query(table, tuple(columns), primary_key)
+    parameters = [
+        [v for i, v in enumerate(row) if i != key_index] + [row[key_index]]
+        for row in rows
+    ]
+    cursor.executemany(query, parameters)
+    return len(rows)
+
+
+def delete_rows(cursor, table: str, primary_key: str, keys):
+    """Deletes rows by primary key with a single executemany call.
+    Args:
+        cursor (_type_): A pyodbc cursor of the target database.
+        table (str): The table name.
+        primary_key (str): The primary key column name.
+        keys (list): The primary keys.
+    Returns:
+        int: The amount of deleted rows.
+    """
+    if len(keys) == 0:
+        return 0
+
+    cursor.executemany(create_delete_query(table, primary_key), [[key] for key in keys])
+    return len(keys)
+
+
+def insert_rows(cursor, insert_query: str, rows):
+    """Inserts rows with a single executemany call.
+    If fast_executemany is enabled on the cursor, pyodbc sends
+    all rows as one ODBC parameter array instead of one
+    round trip per row.
+    Args:
+        cursor (_type_): A pyodbc cursor of the target database.
+        insert_query (str): The INSERT query (see create_insert_query).
+        rows (list): The rows.
+    Returns:
+        int: The amount of inserted rows.
+    """
+    if len(rows) == 0:
+        return 0
+
+    cursor.executemany(insert_query, [list(row) for row in rows])
+    return len(rows)
+
+
+def get_bulk_cursor(connection, fast_executemany=True):
+    """Gets a cursor for bulk inserts.
+    Args:
+        connection (_type_): The pyodbc connection of the target database.
+        fast_executemany (bool, optional):
+        Whether the rows are sent as parameter arrays. Defaults to True.
+    Returns:
+        _type_: The cursor.
+    """
+    cursor = connection.cursor()
+    cursor.fast_executemany = fast_executemany
+    return cursor
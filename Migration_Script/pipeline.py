@@ -0,0 +1,236 @@
+# Import necessary packages
+import queue
+import threading
+import time
+
+# Marks the end of the stream in the queues
+end_of_stream = object()
+# Marks a stream that was stopped because a stage failed (see stop_writers)
+aborted_stream = object()
+
+
+class StageStats:
+    """Collects the statistics of a pipeline stage."""
+
+    def __init__(self, name: str):
+        """Initializes the statistics.
+        Args:
+            name (str): The stage name.
+        """
+        self.name = name
+        self.rows = 0
+        self.busy_seconds = 0
+        self.queue_depth_sum = 0
+        self.queue_depth_samples = 0
+        self.max_queue_depth = 0
+
+    def add_queue_depth(self, depth: int):
+        """Adds a sample of the depth of the input queue.
+        Args:
+            depth (int): The amount of chunks in the queue.
+        """
+        self.queue_depth_sum += depth
+        self.queue_depth_samples += 1
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def to_dict(self, wall_seconds: float):
+        """Converts the statistics to a dictionary.
+        Args:
+            wall_seconds (float): The wall-clock time of the pipeline.
+        Returns:
+            dict: The statistics.
+        """
+        samples = self.queue_depth_samples
+        return {
+            "stage": self.name,
+            "rows": self.rows,
+            "busySeconds": self.busy_seconds,
+            "utilization": self.busy_seconds / wall_seconds if wall_seconds > 0 else 0,
+            "meanQueueDepth": self.queue_depth_sum / samples if samples > 0 else 0,
+            "maxQueueDepth": self.max_queue_depth,
+        }
+
+
+class PipelineWriter:
+    """A writer stage that batches the rows it receives on its own."""
+
+    def __init__(
+        self, name: str, write_batch, batch_size: int, finish=None, abort=None
+    ):
+        """Initializes the writer.
+        Args:
+            name (str): The stage name.
+            write_batch (_type_): Function that writes a list of rows.
+            batch_size (int): The amount of rows per write_batch call.
+            finish (_type_, optional): Function without arguments that is
+            called after the last batch of a complete stream was written.
+            Defaults to None.
+            abort (_type_, optional): Function without arguments that is
+            called instead of finish if the stream was aborted, e.g. to
+            discard the uncommitted rows. Defaults to None.
+        """
+        self.name = name
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.finish = finish
+        self.abort = abort
+
+
+def run_writer(writer: PipelineWriter, input_queue, stats: StageStats, failed):
+    """Consumes row chunks of the input queue until the end of the stream.
+    The writer is only finished if the reader reached the end of the stream
+    and no stage failed, otherwise it is aborted.
+    Args:
+        writer (PipelineWriter): The writer.
+        input_queue (queue.Queue): The input queue.
+        stats (StageStats): The statistics of the writer.
+        failed (threading.Event): Is set if the writer fails.
+    """
+    batch = []
+
+    def flush():
+        start = time.perf_counter()
+        writer.write_batch(batch)
+        stats.busy_seconds += time.perf_counter() - start
+        stats.rows += len(batch)
+
+    try:
+        while True:
+            chunk = input_queue.get()
+
+            if chunk is aborted_stream:
+                if writer.abort is not None:
+                    writer.abort()
+
+                return
+
+            if chunk is end_of_stream:
+                break
+
+            for row in chunk:
+                batch.append(row)
+
+                if len(batch) == writer.batch_size:
+                    flush()
+                    batch = []
+
+        if len(batch) > 0:
+            flush()
+
+        # Another stage failed while the last batch was written
+        if failed.is_set():
+            if writer.abort is not None:
+                writer.abort()
+
+            return
+
+        if writer.finish is not None:
+            start = time.perf_counter()
+            writer.finish()
+            stats.busy_seconds += time.perf_counter() - start
+    except BaseException:
+        failed.set()
+        raise
+
+
+def put(input_queue, item, failed):
+    """Puts an item into a bounded queue and blocks while it is full.
+    Args:
+        input_queue (queue.Queue): The queue.
+        item (_type_): The item.
+        failed (threading.Event): Stops waiting if a writer failed.
+    Returns:
+        bool: False if a writer failed.
+    """
+    while not failed.is_set():
+        try:
+            input_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+
+    return False
+
+
+def stop_writers(queues: list):
+    """Discards the queued chunks and aborts the stream of every writer.
+    Args:
+        queues (list): The input queues of the writers.
+    """
+    for input_queue in queues:
+        while True:
+            try:
+                input_queue.get_nowait()
+            except queue.Empty:
+                break
+
+        input_queue.put(aborted_stream)
+
+
+def run_pipeline(row_chunks, writers: list, queue_size: int):
+    """Fans the row chunks of a reader out to independent writer stages.
+    Every writer runs in its own thread and receives the chunks through
+    its own bounded queue, so the reader blocks (backpressure) as soon as
+    the slowest writer is queue_size chunks behind.
+    Args:
+        row_chunks (_type_): Iterable of row chunks (the reader stage).
+        writers (list): The writer stages (PipelineWriter).
+        queue_size (int): The maximal amount of chunks per queue.
+    Raises:
+        RuntimeError: Is thrown if a writer failed.
+    Returns:
+        list: The statistics of every stage (see StageStats.to_dict).
+    """
+    failed = threading.Event()
+    errors = []
+    reader_stats = StageStats("reader")
+    queues = [queue.Queue(maxsize=queue_size) for _ in writers]
+    writer_stats = [StageStats(writer.name) for writer in writers]
+
+    def target(writer, input_queue, stats):
+        try:
+            run_writer(writer, input_queue, stats, failed)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [
+        threading.Thread(target=target, args=args, daemon=True)
+        for args in zip(writers, queues, writer_stats)
+    ]
+    wall_start = time.perf_counter()
+
+    for thread in threads:
+        thread.start()
+
+    iterator = iter(row_chunks)
+
+    try:
+        while not failed.is_set():
+            start = time.perf_counter()
+            chunk = next(iterator, end_of_stream)
+            reader_stats.busy_seconds += time.perf_counter() - start
+
+            if chunk is not end_of_stream:
+                reader_stats.rows += len(chunk)
+
+            for input_queue, stats in zip(queues, writer_stats):
+                stats.add_queue_depth(input_queue.qsize())
+                put(input_queue, chunk, failed)
+
+            if chunk is end_of_stream:
+                break
+    except BaseException:
+        failed.set()
+        raise
+    finally:
+        if failed.is_set():
+            stop_writers(queues)
+
+        for thread in threads:
+            thread.join()
+
+    if len(errors) > 0:
+        raise RuntimeError(f"A pipeline writer failed: {errors[0]}") from errors[0]
+
+    wall_seconds = time.perf_counter() - wall_start
+    return [stats.to_dict(wall_seconds) for stats in [reader_stats] + writer_stats]
@@ -0,0 +1,648 @@
+# Import necessary packages
+import os
+import time
+from datetime import datetime, timezone
+from delta_sync import get_column_types, get_range_checksums
+from migration_log import WARNING, log
+from source_reader import iter_fetchmany
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+try:
+    from pymongo import DeleteOne, ReplaceOne
+except ImportError:
+    DeleteOne = None
+    ReplaceOne = None
+
+# Baskets of the old database whose vendor products are bought together
+# (the line table with its basket and the basket table with its customer)
+recommendation_baskets = {
+    "cart": {
+        "lineTable": "ProductToCart",
+        "basketTable": "ShoppingCart",
+        "basketColumn": "CartId",
+        "customerColumn": "CustomerId",
+        "itemColumn": "VendorToProductId",
+    },
+    "order": {
+        "lineTable": "OrderPosition",
+        "basketTable": "CustomerOrder",
+        "basketColumn": "OrderId",
+        "customerColumn": "CustomerId",
+        "itemColumn": "VendorToProductId",
+    },
+}
+# Collection of the recommendations (see ProductRecommendationService)
+recommendation_collection = "ProductRecommendation"
+# Value of the field source of the written documents, the requests only match
+# documents with it, so the recommendations entered by the admins are kept
+recommendation_source = "precomputed"
+# State of the last pass, used to recompute only the changed baskets and customers
+recommendation_state_path = "recommendation_state.npz"
+# Amount of recommendations per customer
+recommendation_top_n = 10
+# Minimal amount of baskets that contain two vendor products
+# before one is recommended for the other
+recommendation_min_support = 2
+# Amount of most probable co-purchased vendor products kept per vendor product,
+# bounds the scores per customer to about (products of the customer) x neighbors
+recommendation_neighbors = 50
+# Amount of basket ids per checksum range
+recommendation_range_size = 100000
+# Amount of customers whose scores are computed at a time
+recommendation_customer_chunk_size = 5000
+# Amount of rows per fetch of the basket rows
+recommendation_fetch_size = 50000
+# Amount of requests per bulk write
+recommendation_write_batch_size = 10000
+# Decimal places of the stored purchase probabilities (changes below are not written)
+recommendation_probability_digits = 4
+
+
+def create_basket_query(basket: dict):
+    """Creates the query that reads the rows of a basket id range
+    with the customer of their basket.
+    Args:
+        basket (dict): See recommendation_baskets.
+    Returns:
+        str: The query.
+    """
+    return (
+        f"SELECT l.{basket['basketColumn']}, b.{basket['customerColumn']}, "
+        f"l.{basket['itemColumn']} FROM {basket['lineTable']} l "
+        f"JOIN {basket['basketTable']} b "
+        f"ON b.{basket['basketColumn']} = l.{basket['basketColumn']} "
+        f"WHERE l.{basket['basketColumn']} >= ? AND l.{basket['basketColumn']} < ?"
+    )
+
+
+def get_basket_checksums(cursor, basket: dict, range_size: int):
+    """Gets the server-side checksums of the line table and the basket table
+    per basket id range (see delta_sync.get_range_checksums).
+    Args:
+        cursor (_type_): A cursor of the old database.
+        basket (dict): See recommendation_baskets.
+        range_size (int): The amount of basket ids per range.
+    Returns:
+        dict: Dictionary of the format {<range id>: (<line count>,
+        <line checksum>, <basket count>, <basket checksum>)}.
+    """
+    checksums = [
+        get_range_checksums(
+            cursor,
+            table,
+            get_column_types(cursor, table),
+            basket["basketColumn"],
+            range_size,
+        )
+        for table in [basket["lineTable"], basket["basketTable"]]
+    ]
+    range_ids = set(checksums[0].keys()) | set(checksums[1].keys())
+    return {
+        range_id: tuple(
+            el or 0
+            for el in checksums[0].get(range_id, (0, 0))
+            + checksums[1].get(range_id, (0, 0))
+        )
+        for range_id in range_ids
+    }
+
+
+def read_basket_rows(cursor, basket: dict, range_ids: list, range_size: int):
+    """Reads the rows of basket id ranges.
+    Args:
+        cursor (_type_): A cursor of the old database.
+        basket (dict): See recommendation_baskets.
+        range_ids (list): The range ids.
+        range_size (int): The amount of basket ids per range.
+    Returns:
+        np.ndarray: Array of (basket id, customer id, item id) rows.
+    """
+    query = create_basket_query(basket)
+    chunks = [np.empty((0, 3), dtype=np.int64)]
+
+    for range_id in range_ids:
+        for rows in iter_fetchmany(
+            cursor,
+            query,
+            recommendation_fetch_size,
+            [range_id * range_size, (range_id + 1) * range_size],
+        ):
+            chunks.append(np.array([tuple(el) for el in rows], dtype=np.int64))
+
+    return np.concatenate(chunks)
+
+
+def get_cooccurrences(rows: np.ndarray, item_count: int):
+    """Counts the baskets that contain every pair of items: B^T B of the
+    binary basket x item matrix B. The diagonal holds the baskets per item.
+    Args:
+        rows (np.ndarray): See read_basket_rows.
+        item_count (int): The amount of item ids (greatest item id + 1).
+    Returns:
+        sparse.csr_matrix: The item x item counts.
+    """
+    baskets = np.unique(rows[:, 0], return_inverse=True)[1].reshape(-1)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int64), (baskets, rows[:, 2])),
+        shape=(int(baskets.max(initial=-1)) + 1, item_count),
+    )
+    # An item that is added to a basket twice counts once
+    matrix.data[:] = 1
+    return (matrix.T @ matrix).tocsr()
+
+
+def get_row_ranks(rows: np.ndarray, values: np.ndarray, columns: np.ndarray):
+    """Ranks the entries of every row of a sparse matrix by descending value
+    (ties by column).
+    Args:
+        rows (np.ndarray): The row of every entry.
+        values (np.ndarray): The value of every entry.
+        columns (np.ndarray): The column of every entry.
+    Returns:
+        tuple: The entry indexes sorted by row and rank, and their ranks.
+    """
+    order = np.lexsort((columns, -values, rows))
+    starts = np.flatnonzero(np.diff(rows[order], prepend=-1))
+    ranks = np.arange(len(order)) - np.repeat(
+        starts, np.diff(starts, append=len(order))
+    )
+    return order, ranks
+
+
+def get_log_probabilities(cooccurrences, min_support: int, neighbors: int):
+    """Gets log(1 - P(j | i)) for the item pairs with at least min_support
+    common baskets, with P(j | i) the share of the baskets of item i
+    that also contain item j. Only the neighbors most probable items j
+    are kept per item i.
+    Args:
+        cooccurrences (sparse.csr_matrix): See get_cooccurrences.
+        min_support (int): See recommendation_min_support.
+        neighbors (int): See recommendation_neighbors.
+    Returns:
+        sparse.csr_matrix: The item x item matrix.
+    """
+    matrix = cooccurrences.tocoo()
+    counts = cooccurrences.diagonal()
+    mask = (matrix.row != matrix.col) & (matrix.data >= min_support)
+    rows = matrix.row[mask]
+    columns = matrix.col[mask]
+    probabilities = matrix.data[mask] / counts[rows]
+    order, ranks = get_row_ranks(rows, probabilities, columns)
+    keep = order[ranks < neighbors]
+    return sparse.csr_matrix(
+        (
+            np.log1p(-np.minimum(probabilities[keep], 1 - 1e-9)),
+            (rows[keep], columns[keep]),
+        ),
+        shape=cooccurrences.shape,
+    )
+
+
+def get_history(rows: np.ndarray, customer_count: int, item_count: int):
+    """Gets the binary customer x item matrix of the items in the
+    baskets of every customer.
+    Args:
+        rows (np.ndarray): See read_basket_rows.
+        customer_count (int): The amount of customer ids (greatest id + 1).
+        item_count (int): The amount of item ids (greatest id + 1).
+    Returns:
+        sparse.csr_matrix: The matrix.
+    """
+    history = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int8), (rows[:, 1], rows[:, 2])),
+        shape=(customer_count, item_count),
+    )
+    history.data[:] = 1
+    return history
+
+
+def get_top_recommendations(
+    history, log_probabilities, customers: np.ndarray, top_n: int
+):
+    """Computes the purchase probability of every item for customers,
+    1 - prod(1 - P(j | i)) over the items i of their baskets, by one sparse
+    matrix product, and selects their top_n items that are in none of their
+    baskets.
+    Args:
+        history (sparse.csr_matrix): See get_history.
+        log_probabilities (sparse.csr_matrix): See get_log_probabilities.
+        customers (np.ndarray): The customer ids.
+        top_n (int): The amount of recommendations per customer.
+    Returns:
+        tuple: The arrays of the customer ids, item ids and probabilities,
+        sorted by customer and descending probability.
+    """
+    customer_history = history[customers]
+    scores = customer_history @ log_probabilities
+    scores = (scores - scores.multiply(customer_history)).tocsr()
+    scores.eliminate_zeros()
+    rows = np.repeat(np.arange(len(customers)), np.diff(scores.indptr))
+    probabilities = -np.expm1(scores.data)
+    order, ranks = get_row_ranks(rows, probabilities, scores.indices)
+    keep = order[ranks < top_n]
+    return (
+        customers[rows[keep]],
+        scores.indices[keep].astype(np.int64),
+        np.round(probabilities[keep], recommendation_probability_digits),
+    )
+
+
+class RecommendationState:
+    """Rows, checksums, co-occurrences and written recommendations
+    of the last pass, stored in a NumPy .npz file."""
+
+    def __init__(self, path: str):
+        """Loads the state, or initializes an empty one if the file
+        does not exist.
+        Args:
+            path (str): The path of the .npz file.
+        """
+        self.path = path
+        self.clear()
+
+        if not os.path.exists(path):
+            return
+
+        with np.load(path) as data:
+            self.settings = tuple(data["settings"].tolist())
+
+            for kind in recommendation_baskets.keys():
+                if f"{kind}Rows" not in data:
+                    continue
+
+                self.checksums[kind] = {
+                    int(range_id): tuple(int(el) for el in checksum)
+                    for range_id, checksum in zip(
+                        data[f"{kind}RangeIds"], data[f"{kind}Checksums"]
+                    )
+                }
+                self.rows[kind] = data[f"{kind}Rows"]
+
+            self.cooccurrences = sparse.csr_matrix(
+                (
+                    data["cooccurrenceData"],
+                    data["cooccurrenceIndices"],
+                    data["cooccurrenceIndptr"],
+                ),
+                shape=tuple(data["cooccurrenceShape"]),
+            )
+            self.recommendations = tuple(
+                data[name]
+                for name in [
+                    "recommendationCustomers",
+                    "recommendationItems",
+                    "recommendationProbabilities",
+                    "recommendationIds",
+                ]
+            )
+
+    def clear(self):
+        """Discards the state, so the next pass reads all basket ranges
+        and scores all customers."""
+        self.settings = None
+        self.checksums = {kind: dict() for kind in recommendation_baskets.keys()}
+        self.rows = {
+            kind: np.empty((0, 3), dtype=np.int64)
+            for kind in recommendation_baskets.keys()
+        }
+        self.cooccurrences = sparse.csr_matrix((0, 0), dtype=np.int64)
+        # Arrays of the written documents: customer id, item id, probability, id
+        self.recommendations = (
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.float64),
+            np.empty(0, dtype=np.int64),
+        )
+
+    def save(self, settings: tuple):
+        """Writes the state. A cancelled write keeps the previous file.
+        Args:
+            settings (tuple): The settings the recommendations were computed with.
+        """
+        arrays = {
+            "settings": np.array(settings, dtype=np.float64),
+            "cooccurrenceData": self.cooccurrences.data,
+            "cooccurrenceIndices": self.cooccurrences.indices,
+            "cooccurrenceIndptr": self.cooccurrences.indptr,
+            "cooccurrenceShape": np.array(self.cooccurrences.shape, dtype=np.int64),
+            "recommendationCustomers": self.recommendations[0],
+            "recommendationItems": self.recommendations[1],
+            "recommendationProbabilities": self.recommendations[2],
+            "recommendationIds": self.recommendations[3],
+        }
+
+        for kind, checksums in self.checksums.items():
+            arrays[f"{kind}RangeIds"] = np.array(list(checksums.keys()), dtype=np.int64)
+            arrays[f"{kind}Checksums"] = np.array(
+                list(checksums.values()), dtype=np.int64
+            ).reshape(-1, 4)
+            arrays[f"{kind}Rows"] = self.rows[kind]
+
+        temp_path = f"{self.path}.{os.getpid()}.tmp.npz"
+        np.savez(temp_path, **arrays)
+        os.replace(temp_path, self.path)
+
+
+def resize(matrix, shape: tuple):
+    """Enlarges a sparse matrix to at least a shape.
+    Args:
+        matrix (sparse.csr_matrix): The matrix.
+        shape (tuple): The minimal shape.
+    Returns:
+        sparse.csr_matrix: The matrix.
+    """
+    matrix = matrix.tocsr()
+    matrix.resize(tuple(max(el) for el in zip(matrix.shape, shape)))
+    return matrix
+
+
+def update_baskets(cursor, state: RecommendationState, range_size: int, full: bool):
+    """Reads the basket id ranges whose checksums changed since the last pass,
+    replaces their rows in the state and updates the co-occurrences by the
+    difference of the old and the new rows of these ranges.
+    Args:
+        cursor (_type_): A cursor of the old database.
+        state (RecommendationState): The state.
+        range_size (int): See recommendation_range_size.
+        full (bool): Whether all ranges are read.
+    Returns:
+        tuple: The amount of changed ranges, and the arrays of the customer ids
+        and item ids of the old and new rows of the changed ranges.
+    """
+    changed_amount = 0
+    customers = [np.empty(0, dtype=np.int64)]
+    items = [np.empty(0, dtype=np.int64)]
+    old_rows = []
+    new_rows = []
+
+    for kind, basket in recommendation_baskets.items():
+        checksums = get_basket_checksums(cursor, basket, range_size)
+        changed = sorted(
+            range_id
+            for range_id in set(checksums.keys()) | set(state.checksums[kind].keys())
+            if full or checksums.get(range_id) != state.checksums[kind].get(range_id)
+        )
+        rows = state.rows[kind]
+        mask = np.isin(rows[:, 0] // range_size, changed)
+        old_rows.append(rows[mask])
+        new_rows.append(read_basket_rows(cursor, basket, changed, range_size))
+        rows = np.concatenate([rows[~mask], new_rows[-1]])
+        state.rows[kind] = rows[np.argsort(rows[:, 0], kind="stable")]
+        state.checksums[kind] = checksums
+        changed_amount += len(changed)
+
+        for el in [old_rows[-1], new_rows[-1]]:
+            customers.append(el[:, 1])
+            items.append(el[:, 2])
+
+    item_count = 1 + max(
+        [state.cooccurrences.shape[0] - 1]
+        + [int(el[:, 2].max(initial=-1)) for el in state.rows.values()]
+        + [int(el[:, 2].max(initial=-1)) for el in old_rows]
+    )
+    cooccurrences = resize(state.cooccurrences, (item_count, item_count))
+
+    # The baskets of different kinds have separate ids
+    for old, new in zip(old_rows, new_rows):
+        cooccurrences = cooccurrences + get_cooccurrences(new, item_count)
+        cooccurrences = cooccurrences - get_cooccurrences(old, item_count)
+
+    cooccurrences.eliminate_zeros()
+    state.cooccurrences = cooccurrences.tocsr()
+    return changed_amount, np.concatenate(customers), np.concatenate(items)
+
+
+def create_write_requests(
+    old: tuple,
+    customers: np.ndarray,
+    items: np.ndarray,
+    probabilities: np.ndarray,
+    next_id: int,
+    date: datetime,
+):
+    """Compares the new recommendations of customers with the written ones.
+    Args:
+        old (tuple): The written recommendations of these customers
+        (see RecommendationState.recommendations).
+        customers (np.ndarray): See get_top_recommendations.
+        items (np.ndarray): See get_top_recommendations.
+        probabilities (np.ndarray): See get_top_recommendations.
+        next_id (int): The next free recommendationId.
+        date (datetime): The recommendationDate of the written documents.
+    Returns:
+        tuple: The pymongo requests (ReplaceOne upserts of the new and changed
+        recommendations, DeleteOne of the dropped ones), the recommendation ids
+        of the new recommendations and the next free recommendationId.
+    """
+    base = 1 + max(int(items.max(initial=-1)), int(old[1].max(initial=-1)))
+    _, old_indexes, new_indexes = np.intersect1d(
+        old[0] * base + old[1],
+        customers * base + items,
+        assume_unique=True,
+        return_indices=True,
+    )
+    ids = np.full(len(customers), -1, dtype=np.int64)
+    ids[new_indexes] = old[3][old_indexes]
+    inserted = ids < 0
+    ids[inserted] = np.arange(next_id, next_id + int(inserted.sum()))
+    written = inserted.copy()
+    written[new_indexes] = old[2][old_indexes] != probabilities[new_indexes]
+    dropped = np.ones(len(old[0]), dtype=bool)
+    dropped[old_indexes] = False
+    requests = [
+        ReplaceOne(
+            {
+                "customerId": customer_id,
+                "vendorToProductId": item_id,
+                "source": recommendation_source,
+            },
+            {
+                "recommendationId": recommendation_id,
+                "customerId": customer_id,
+                "vendorToProductId": item_id,
+                "purchaseProbability": probability,
+                "recommendationDate": date,
+                "source": recommendation_source,
+            },
+            upsert=True,
+        )
+        for customer_id, item_id, probability, recommendation_id in zip(
+            customers[written].tolist(),
+            items[written].tolist(),
+            probabilities[written].tolist(),
+            ids[written].tolist(),
+        )
+    ] + [
+        DeleteOne(
+            {
+                "customerId": customer_id,
+                "vendorToProductId": item_id,
+                "source": recommendation_source,
+            }
+        )
+        for customer_id, item_id in zip(
+            old[0][dropped].tolist(), old[1][dropped].tolist()
+        )
+    ]
+    return requests, ids, next_id + int(inserted.sum())
+
+
+def write_requests(collection, requests: list, batch_size: int):
+    """Writes pymongo requests in batches, as unordered bulk writes.
+    Args:
+        collection (_type_): The collection (pymongo or adapters.InMemoryCollection).
+        requests (list): The requests (see create_write_requests).
+        batch_size (int): See recommendation_write_batch_size.
+    """
+    for start in range(0, len(requests), batch_size):
+        collection.bulk_write(requests[start : start + batch_size], ordered=False)
+
+
+def read_recommendations(collection):
+    """Reads the precomputed recommendations of the collection.
+    Args:
+        collection (_type_): The collection (pymongo or adapters.InMemoryCollection).
+    Returns:
+        tuple: See RecommendationState.recommendations.
+    """
+    documents = list(collection.find({"source": recommendation_source}))
+    return (
+        np.array([el["customerId"] for el in documents], dtype=np.int64),
+        np.array([el["vendorToProductId"] for el in documents], dtype=np.int64),
+        np.array([el["purchaseProbability"] for el in documents], dtype=np.float64),
+        np.array([el["recommendationId"] for el in documents], dtype=np.int64),
+    )
+
+
+def run_recommendations(
+    source, documents, db_name: str, state_path=None, top_n=None, full=False
+):
+    """Precomputes the top_n vendor products per customer from the co-occurrences
+    of the vendor products in the shopping carts and orders of the old database,
+    and upserts them into the ProductRecommendation collection.
+    Only the basket id ranges whose server-side checksums changed since the last
+    pass are read, only the customers whose baskets or whose items' co-occurrences
+    changed are scored, and only new, changed and dropped recommendations are
+    written. Recommendations of other customers are not touched.
+    Args:
+        source (_type_): The backend of the old database (see adapters.OdbcBackend).
+        documents (_type_): The document store (a pymongo.MongoClient
+        or adapters.InMemoryDocumentStore).
+        db_name (str): The MongoDB database name.
+        state_path (str, optional): Defaults to None (recommendation_state_path).
+        top_n (int, optional): Defaults to None (recommendation_top_n).
+        full (bool, optional): If True, all basket ranges are read and all
+        customers are scored (also after a change of top_n or
+        recommendation_min_support). Defaults to False.
+    Raises:
+        ImportError: Is thrown if NumPy, SciPy or pymongo is not installed.
+    Returns:
+        dict: Dictionary of the format {"changedRanges": <value>,
+        "customers": <scored customers>, "upserted": <value>, "deleted": <value>}.
+    """
+    if np is None or sparse is None or ReplaceOne is None:
+        raise ImportError("The recommendations require numpy, scipy and pymongo!")
+
+    start = time.perf_counter()
+    state_path = state_path or recommendation_state_path
+    top_n = top_n or recommendation_top_n
+    state = RecommendationState(state_path)
+    settings = (
+        float(top_n),
+        float(recommendation_min_support),
+        float(recommendation_neighbors),
+    )
+    collection = documents[db_name][recommendation_collection]
+    written = collection.count_documents({"source": recommendation_source})
+
+    # The collection was changed without the state (e.g. a restored backup),
+    # the pass starts over from the written documents
+    if written != len(state.recommendations[0]):
+        log(
+            f"Discarded {state_path} ({written} {recommendation_collection} "
+            f"documents, {len(state.recommendations[0])} in the state).",
+            WARNING,
+        )
+        state.clear()
+        state.recommendations = read_recommendations(collection)
+
+    connection = source.connect()
+
+    try:
+        changed_ranges, changed_customers, changed_items = update_baskets(
+            connection.cursor(), state, recommendation_range_size, full
+        )
+    finally:
+        connection.close()
+
+    rows = np.concatenate(list(state.rows.values()))
+    old = state.recommendations
+    item_count = state.cooccurrences.shape[0]
+    customer_count = 1 + max(
+        int(rows[:, 1].max(initial=-1)),
+        int(old[0].max(initial=-1)),
+        int(changed_customers.max(initial=-1)),
+    )
+    history = get_history(rows, customer_count, item_count)
+
+    if full or state.settings != settings:
+        customers = np.arange(customer_count)
+    else:
+        # The probabilities of the items of changed baskets changed for every
+        # customer with one of these items
+        affected = history.tocsc()[:, np.unique(changed_items)].getnnz(axis=1) > 0
+        customers = np.union1d(changed_customers, np.flatnonzero(affected))
+
+    log_probabilities = get_log_probabilities(
+        state.cooccurrences, recommendation_min_support, recommendation_neighbors
+    )
+    last = collection.find_one(sort=[("recommendationId", -1)])
+    next_id = max(
+        int(old[3].max(initial=0)), last["recommendationId"] if last else 0
+    ) + 1
+    date = datetime.now(timezone.utc)
+    kept = ~np.isin(old[0], customers)
+    recommendations = [tuple(el[kept] for el in old)]
+    upserted = 0
+    deleted = 0
+
+    chunk_size = recommendation_customer_chunk_size
+
+    for chunk_start in range(0, len(customers), chunk_size):
+        chunk = customers[chunk_start : chunk_start + chunk_size]
+        new = get_top_recommendations(history, log_probabilities, chunk, top_n)
+        mask = np.isin(old[0], chunk)
+        requests, ids, next_id = create_write_requests(
+            tuple(el[mask] for el in old), *new, next_id, date
+        )
+        write_requests(collection, requests, recommendation_write_batch_size)
+        deletes = sum(1 for el in requests if isinstance(el, DeleteOne))
+        upserted += len(requests) - deletes
+        deleted += deletes
+        recommendations.append(new + (ids,))
+
+    state.recommendations = tuple(
+        np.concatenate([el[i] for el in recommendations]) for i in range(4)
+    )
+    state.save(settings)
+    seconds = time.perf_counter() - start
+    log(
+        f"Recommendations: {changed_ranges} basket ranges changed, "
+        f"{len(customers)} customers scored, {upserted} {recommendation_collection} "
+        f"documents upserted and {deleted} deleted in {seconds:.2f}s."
+    )
+    return {
+        "changedRanges": changed_ranges,
+        "customers": len(customers),
+        "upserted": upserted,
+        "deleted": deleted,
+    }
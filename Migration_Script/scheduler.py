@@ -0,0 +1,217 @@
+# Import necessary packages
+import multiprocessing
+import re
+import threading
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+
+create_table_pattern = re.compile(r"CREATE\s+TABLE\s+(\w+)", re.IGNORECASE)
+references_pattern = re.compile(r"REFERENCES\s+(\w+)\s*\(", re.IGNORECASE)
+
+
+def get_table_dependencies(ddl_statements: list):
+    """Derives the foreign key dependencies of the tables
+    from their CREATE TABLE statements.
+    Args:
+        ddl_statements (list): The CREATE TABLE statements.
+    Raises:
+        ValueError: Is thrown if a statement does not create a table.
+    Returns:
+        dict: Dictionary of the format {<table>: {<referenced table>, ...}}.
+    """
+    dependencies = dict()
+
+    for statement in ddl_statements:
+        match = create_table_pattern.search(statement)
+
+        if match is None:
+            raise ValueError("Every statement must contain a CREATE TABLE clause!")
+
+        table = match.group(1)
+        references = set(references_pattern.findall(statement))
+        references.discard(table)
+        dependencies[table] = references
+
+    return dependencies
+
+
+def get_dependency_order(tables: list, dependencies: dict):
+    """Sorts the tables so that every table follows the tables it references.
+    Dependencies that are not part of tables are ignored.
+    Tables without an order between them keep their list order.
+    Args:
+        tables (list): The table names.
+        dependencies (dict): See get_table_dependencies.
+    Raises:
+        ValueError: Is thrown if the dependencies contain a cycle.
+    Returns:
+        list: The sorted table names.
+    """
+    pending = {
+        table: set(dependencies.get(table, set())) & set(tables) for table in tables
+    }
+    order = []
+
+    while len(pending) > 0:
+        ready = [table for table, parents in pending.items() if len(parents) == 0]
+
+        if len(ready) == 0:
+            raise ValueError(
+                f"The dependencies of {list(pending.keys())} contain a cycle!"
+            )
+
+        for table in ready:
+            del pending[table]
+            order.append(table)
+
+        for parents in pending.values():
+            parents.difference_update(ready)
+
+    return order
+
+
+def run_in_dependency_order(tables: list, dependencies: dict, func, max_workers: int):
+    """Executes func for every table in a thread pool.
+    A table is started as soon as func has returned for all of its
+    dependencies. Dependencies that are not part of tables are ignored.
+    Tables that are ready at the same time are started in list order.
+    Args:
+        tables (list): The table names.
+        dependencies (dict): See get_table_dependencies.
+        func (_type_): Function that is called with the table name.
+        max_workers (int): The maximal amount of concurrently processed tables.
+    Raises:
+        ValueError: Is thrown if the dependencies contain a cycle.
+    Returns:
+        dict: Dictionary of the format {<table>: <result of func>}.
+    """
+    pending = {
+        table: set(dependencies.get(table, set())) & set(tables) for table in tables
+    }
+    results = dict()
+    running = dict()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while len(pending) > 0 or len(running) > 0:
+            ready = [table for table, parents in pending.items() if len(parents) == 0]
+
+            for table in ready:
+                del pending[table]
+                running[executor.submit(func, table)] = table
+
+            if len(running) == 0:
+                raise ValueError(
+                    f"The dependencies of {list(pending.keys())} contain a cycle!"
+                )
+
+            done, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                table = running.pop(future)
+
+                try:
+                    results[table] = future.result()
+                except Exception:
+                    for other in running.keys():
+                        other.cancel()
+                    raise
+
+                for parents in pending.values():
+                    parents.discard(table)
+
+    return results
+
+
+def run_in_processes(
+    tasks: list, func, max_workers: int, initializer, initargs: tuple, on_finished
+):
+    """Executes func for every task in a pool of spawned processes.
+    The processes are initialized once with initializer(*initargs),
+    func, initializer and initargs must be picklable.
+    Args:
+        tasks (list): The argument tuples of func.
+        func (_type_): Module level function that is called with the arguments
+        of a task in a worker process.
+        max_workers (int): The amount of processes.
+        initializer (_type_): Module level function that initializes a process.
+        initargs (tuple): The arguments of initializer.
+        on_finished (_type_): Function that is called with the task and
+        the result of func in the calling process as soon as a task is finished.
+    Returns:
+        list: The results of func in task order.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = [None] * len(tasks)
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=context,
+        initializer=initializer,
+        initargs=initargs,
+    ) as executor:
+        futures = {executor.submit(func, *task): i for i, task in enumerate(tasks)}
+
+        try:
+            for future in as_completed(futures.keys()):
+                i = futures[future]
+                results[i] = future.result()
+                on_finished(tasks[i], results[i])
+        except BaseException:
+            for future in futures.keys():
+                future.cancel()
+            raise
+
+    return results
+
+
+class ThreadConnections:
+    """Opens one connection per thread and keeps track of them."""
+
+    def __init__(self, connect):
+        """Initializes the connections.
+        Args:
+            connect (_type_): Function without arguments that opens a connection.
+        """
+        self.connect = connect
+        self.connections = []
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def get(self):
+        """Gets the connection of the current thread.
+        Returns:
+            _type_: The connection.
+        """
+        connection = getattr(self.local, "connection", None)
+
+        if connection is None:
+            connection = self.connect()
+            self.local.connection = connection
+
+            with self.lock:
+                self.connections.append(connection)
+
+        return connection
+
+    def commit(self):
+        """Commits all connections."""
+        for connection in self.connections:
+            connection.commit()
+
+    def rollback(self):
+        """Rollbacks all connections."""
+        for connection in self.connections:
+            connection.rollback()
+
+    def close(self):
+        """Closes all connections."""
+        for connection in self.connections:
+            connection.close()
+
+        self.connections = []
+        self.local = threading.local()
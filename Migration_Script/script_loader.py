@@ -0,0 +1,273 @@
+# Import necessary packages
+import hashlib
+import os
+import re
+import time
+from decimal import Decimal
+from adapters import SqliteBackend
+from migration_log import log
+from scheduler import create_table_pattern
+
+# Encoding of initial_database_sql_script.sql (Windows-1252 umlauts)
+script_encoding = "cp1252"
+# Directory of the SQLite files loaded from the scripts (one per script hash),
+# next to this file, so the cache does not depend on the working directory
+script_cache_directory = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "script_cache"
+)
+# Amount of rows per executemany call of the loader
+script_insert_batch_size = 10000
+# Batch separator of sqlcmd and SQL Server Management Studio
+go_pattern = re.compile(r"^\s*GO\s*(--.*)?$", re.IGNORECASE)
+insert_pattern = re.compile(
+    r"^\s*INSERT\s+INTO\s+(\w+)\s*\(([^)]*)\)\s*VALUES\s*\((.*)\)\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+# A literal of a VALUES list followed by its separator
+value_pattern = re.compile(
+    r"\s*(?:N?'((?:[^']|'')*)'|(NULL)|([-+]?\d+)(\.\d+)?)\s*(,|$)",
+    re.IGNORECASE,
+)
+
+
+def get_script_hash(path: str):
+    """Gets the SHA-256 hex digest of a file, read in blocks.
+    Args:
+        path (str): The path of the file.
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024**2), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def iter_statements(lines):
+    """Splits the lines of a T-SQL script into statements.
+    A statement ends with a semicolon at the end of a line or with a GO line,
+    outside of string literals. Comment lines between statements are skipped.
+    Args:
+        lines (_type_): Iterable of the lines (e.g. a text file).
+    Yields:
+        str: The next statement.
+    """
+    statement = []
+    in_string = False
+
+    for line in lines:
+        stripped = line.strip()
+
+        if not in_string and go_pattern.match(line) is not None:
+            if len(statement) > 0:
+                yield "".join(statement).strip()
+                statement = []
+
+            continue
+
+        if not in_string and len(statement) == 0:
+            if stripped == "" or stripped.startswith("--"):
+                continue
+
+        statement.append(line)
+
+        # Escaped quotes ('') do not change the state
+        if line.count("'") % 2 == 1:
+            in_string = not in_string
+
+        if not in_string and stripped.endswith(";"):
+            yield "".join(statement).strip()
+            statement = []
+
+    if len(statement) > 0:
+        yield "".join(statement).strip()
+
+
+def parse_values(values: str):
+    """Parses the literals of a VALUES list.
+    Args:
+        values (str): The VALUES list without its parentheses,
+        e.g. 0,'M''s',359.59,NULL
+    Raises:
+        ValueError: Is thrown if a value is no string, number or NULL literal.
+    Returns:
+        list: The values (str, int, Decimal or None).
+    """
+    row = []
+    position = 0
+
+    while True:
+        match = value_pattern.match(values, position)
+
+        if match is None or match.end() == position:
+            raise ValueError(
+                f"Unsupported value at {values[position:position + 40]!r}!"
+            )
+
+        text, null, integer, fraction, separator = match.groups()
+
+        if text is not None:
+            row.append(text.replace("''", "'"))
+        elif null is not None:
+            row.append(None)
+        elif fraction is not None:
+            row.append(Decimal(integer + fraction))
+        else:
+            row.append(int(integer))
+
+        position = match.end()
+
+        if separator == "":
+            return row
+
+
+def parse_insert(statement: str):
+    """Parses a single row INSERT statement.
+    Args:
+        statement (str): The statement.
+    Raises:
+        ValueError: Is thrown if the amounts of columns and values differ.
+    Returns:
+        tuple: The table name, the column names and the values,
+        or None if the statement is no INSERT with a column list.
+    """
+    match = insert_pattern.match(statement)
+
+    if match is None:
+        return None
+
+    table, columns, values = match.groups()
+    columns = tuple(el.strip() for el in columns.split(","))
+    row = parse_values(values)
+
+    if len(row) != len(columns):
+        raise ValueError(
+            f"The INSERT INTO {table} has {len(row)} values for {len(columns)} columns!"
+        )
+
+    return table, columns, row
+
+
+def get_script_tables(script_path: str):
+    """Gets the CREATE TABLE statements of a T-SQL script.
+    Args:
+        script_path (str): The path of the script.
+    Returns:
+        list: The statements in script order.
+    """
+    with open(script_path, encoding=script_encoding) as file:
+        return [
+            el.rstrip(";")
+            for el in iter_statements(file)
+            if create_table_pattern.search(el) is not None
+            and insert_pattern.match(el) is None
+        ]
+
+
+def load_script(script_path: str, database_path: str, batch_size=None):
+    """Loads a T-SQL script of CREATE TABLE and single row INSERT statements
+    into a new SQLite file. The file is streamed, consecutive INSERTs into the
+    same columns are bulk inserted by executemany, and everything is
+    committed once.
+    Args:
+        script_path (str): The path of the script.
+        database_path (str): The path of the SQLite file (replaced if it exists).
+        batch_size (int, optional): The amount of rows per executemany call.
+        Defaults to None (script_insert_batch_size).
+    Returns:
+        dict: Dictionary of the format {<table>: <amount of inserted rows>}.
+    """
+    batch_size = batch_size or script_insert_batch_size
+
+    if os.path.exists(database_path):
+        os.remove(database_path)
+
+    connection = SqliteBackend(database_path).connect()
+    cursor = connection.cursor()
+    # The file is only published after the commit (see get_script_database)
+    cursor.execute("PRAGMA journal_mode = OFF")
+    cursor.execute("PRAGMA synchronous = OFF")
+    amounts = dict()
+    key = None
+    rows = []
+
+    def flush():
+        table, columns = key
+        cursor.executemany(
+            f"INSERT INTO {table} ({','.join(columns)}) "
+            f"VALUES ({','.join('?' for _ in columns)})",
+            rows,
+        )
+        amounts[table] = amounts.get(table, 0) + len(rows)
+        rows.clear()
+
+    try:
+        with open(script_path, encoding=script_encoding) as file:
+            for statement in iter_statements(file):
+                insert = parse_insert(statement)
+
+                if insert is None:
+                    if len(rows) > 0:
+                        flush()
+
+                    cursor.execute(statement.rstrip(";"))
+                    continue
+
+                if (insert[0], insert[1]) != key or len(rows) >= batch_size:
+                    if len(rows) > 0:
+                        flush()
+
+                    key = (insert[0], insert[1])
+
+                rows.append(insert[2])
+
+        if len(rows) > 0:
+            flush()
+
+        connection.commit()
+    finally:
+        cursor.close()
+        connection.close()
+
+    return amounts
+
+
+def get_script_database(script_path: str, cache_directory=None):
+    """Gets the SQLite file of a T-SQL script, loads it (see load_script)
+    only if the cache directory has no file of the script's hash.
+    Args:
+        script_path (str): The path of the script.
+        cache_directory (str, optional): The directory of the loaded files.
+        Defaults to None (script_cache_directory).
+    Returns:
+        tuple: The path of the SQLite file and whether it was cached.
+    """
+    start = time.perf_counter()
+    cache_directory = cache_directory or script_cache_directory
+    name = os.path.splitext(os.path.basename(script_path))[0]
+    database_path = os.path.join(
+        cache_directory, f"{name}_{get_script_hash(script_path)[:16]}.sqlite"
+    )
+
+    if os.path.exists(database_path):
+        log(
+            f"Loaded the cached {database_path} of {script_path} "
+            f"in {time.perf_counter() - start:.3f}s."
+        )
+        return database_path, True
+
+    os.makedirs(cache_directory, exist_ok=True)
+    # A cancelled load leaves no file that is taken for the cache
+    temp_path = f"{database_path}.{os.getpid()}.tmp"
+    amounts = load_script(script_path, temp_path)
+    os.replace(temp_path, database_path)
+    seconds = time.perf_counter() - start
+    rows = sum(amounts.values())
+    log(
+        f"Loaded {rows} rows into {len(amounts)} tables of {database_path} "
+        f"from {script_path} in {seconds:.2f}s ({rows / seconds:.0f} rows/s)."
+    )
+    return database_path, False
@@ -0,0 +1,313 @@
+# Import necessary packages
+import sys
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Read modes of the source tables
+READ_FETCHMANY = "fetchmany"
+READ_KEYSET = "keyset"
+read_modes = [READ_FETCHMANY, READ_KEYSET]
+# Column metadata of the source tables resolved by a compiled plan
+table_metadata = dict()
+
+
+def set_table_metadata(metadata: dict):
+    """Sets the column metadata of the source tables that read_table uses
+    instead of the catalog functions (see migration_plan.get_compiled_plan).
+    Args:
+        metadata (dict): Dictionary of the format
+        {<table>: {"columns": [...], "primaryKey": <value>}}.
+    """
+    table_metadata.clear()
+    table_metadata.update(metadata)
+
+
+def get_table_metadata(cursor, table: str):
+    """Gets the column names and the primary key of a source table,
+    from the compiled plan if it describes the table.
+    Args:
+        cursor (_type_): A pyodbc cursor.
+        table (str): The table name.
+    Returns:
+        tuple: The column names in table order and the primary key column name.
+    """
+    metadata = table_metadata.get(table)
+
+    if metadata is not None:
+        return list(metadata["columns"]), metadata["primaryKey"]
+
+    return get_columns(cursor, table), get_primary_key(cursor, table)
+
+
+def get_columns(cursor, table: str):
+    """Gets the column names of a table.
+    Args:
+        cursor (_type_): A pyodbc cursor.
+        table (str): The table name.
+    Returns:
+        list: The column names in table order.
+    """
+    return [el.column_name for el in cursor.columns(table=table).fetchall()]
+
+
+def get_primary_key(cursor, table: str):
+    """Gets the primary key column of a table.
+    Falls back to the first column if the table has no primary key.
+    Args:
+        cursor (_type_): A pyodbc cursor.
+        table (str): The table name.
+    Returns:
+        str: The primary key column name.
+    """
+    keys = [el.column_name for el in cursor.primaryKeys(table=table).fetchall()]
+
+    if len(keys) > 0:
+        return keys[0]
+
+    return get_columns(cursor, table)[0]
+
+
+def iter_fetchmany(cursor, query: str, chunk_size: int, parameters=None):
+    """Executes a query and yields its rows in chunks.
+    Args:
+        cursor (_type_): A pyodbc cursor.
+        query (str): The query.
+        chunk_size (int): The maximal amount of rows per chunk.
+        parameters (list, optional): The query parameters. Defaults to None.
+    Yields:
+        list: The next chunk of rows.
+    """
+    if parameters is None:
+        cursor.execute(query)
+    else:
+        cursor.execute(query, parameters)
+
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+
+        if len(rows) == 0:
+            return
+
+        yield rows
+
+
+def get_key_condition(primary_key: str, last_key=None, end_key=None):
+    """Creates the WHERE clause that restricts the primary keys.
+    Args:
+        primary_key (str): The primary key column name.
+        last_key (_type_, optional): Only greater primary keys. Defaults to None.
+        end_key (_type_, optional): Only smaller primary keys. Defaults to None.
+    Returns:
+        tuple: The clause (empty if unrestricted) and its parameters.
+    """
+    conditions = []
+    parameters = []
+
+    if last_key is not None:
+        conditions.append(f"{primary_key} > ?")
+        parameters.append(last_key)
+
+    if end_key is not None:
+        conditions.append(f"{primary_key} < ?")
+        parameters.append(end_key)
+
+    if len(conditions) == 0:
+        return "", parameters
+
+    return " WHERE " + " AND ".join(conditions), parameters
+
+
+def iter_keyset_pages(
+    cursor,
+    table: str,
+    columns: list,
+    primary_key: str,
+    page_size: int,
+    last_key=None,
+    end_key=None,
+):
+    """Yields the rows of a table in pages ordered by the primary key.
+    Every page is read with its own query that continues after the
+    last key of the previous page, so no server-side cursor is kept open.
+    Args:
+        cursor (_type_): A pyodbc cursor.
+        table (str): The table name.
+        columns (list): The column names.
+        primary_key (str): The primary key column name.
+        page_size (int): The maximal amount of rows per page.
+        last_key (_type_, optional): Only rows with a greater
+        primary key are read. Defaults to None (all rows).
+        end_key (_type_, optional): Only rows with a smaller
+        primary key are read. Defaults to None (all rows).
+    Yields:
+        list: The next page of rows.
+    """
+    key_index = columns.index(primary_key)
+    columns_str = ",".join(columns)
+
+    while True:
+        condition, parameters = get_key_condition(primary_key, last_key, end_key)
+        query = (
+            f"SELECT TOP ({page_size}) {columns_str} FROM {table}{condition} "
+            f"ORDER BY {primary_key}"
+        )
+
+        if len(parameters) == 0:
+            cursor.execute(query)
+        else:
+            cursor.execute(query, parameters)
+
+        rows = cursor.fetchall()
+
+        if len(rows) == 0:
+            return
+
+        yield rows
+        last_key = rows[-1][key_index]
+
+        if len(rows) < page_size:
+            return
+
+
+def read_table(
+    connection,
+    table: str,
+    chunk_size: int,
+    max_buffered_rows: int,
+    read_mode=READ_FETCHMANY,
+    last_key=None,
+    end_key=None,
+):
+    """Streams the rows of a source table ordered by the primary key.
+    At most max_buffered_rows rows are held by the reader at a time.
+    Args:
+        connection (_type_): The pyodbc connection of the source database.
+        table (str): The table name.
+        chunk_size (int): The preferred amount of rows per chunk.
+        max_buffered_rows (int): The maximal amount of buffered rows.
+        read_mode (str, optional): Either READ_FETCHMANY or READ_KEYSET.
+        Defaults to READ_FETCHMANY.
+        last_key (_type_, optional): Only rows with a greater
+        primary key are read. Defaults to None (all rows).
+        end_key (_type_, optional): Only rows with a smaller
+        primary key are read. Defaults to None (all rows).
+    Raises:
+        ValueError: Is thrown if read_mode is unknown or
+        if chunk_size or max_buffered_rows is not positive.
+    Returns:
+        tuple: The column names, the primary key column name
+        and a generator of row chunks.
+    """
+    if read_mode not in read_modes:
+        raise ValueError(f"read_mode must be one of {read_modes}!")
+
+    if chunk_size <= 0 or max_buffered_rows <= 0:
+        raise ValueError("chunk_size and max_buffered_rows must be positive!")
+
+    chunk_size = min(chunk_size, max_buffered_rows)
+    cursor = connection.cursor()
+    columns, primary_key = get_table_metadata(cursor, table)
+
+    if read_mode == READ_KEYSET:
+        chunks = iter_keyset_pages(
+            cursor, table, columns, primary_key, chunk_size, last_key, end_key
+        )
+        return columns, primary_key, chunks
+
+    condition, parameters = get_key_condition(primary_key, last_key, end_key)
+    query = f"SELECT {','.join(columns)} FROM {table}{condition} ORDER BY {primary_key}"
+
+    if len(parameters) == 0:
+        return columns, primary_key, iter_fetchmany(cursor, query, chunk_size)
+
+    return columns, primary_key, iter_fetchmany(cursor, query, chunk_size, parameters)
+
+
+def count_rows(connection, table: str, primary_key: str, last_key=None):
+    """Counts the rows of a source table that are left to read.
+    Args:
+        connection (_type_): The pyodbc connection of the source database.
+        table (str): The table name.
+        primary_key (str): The primary key column name.
+        last_key (_type_, optional): Only rows with a greater
+        primary key are counted. Defaults to None (all rows).
+    Returns:
+        int: The amount of rows.
+    """
+    cursor = connection.cursor()
+
+    if last_key is None:
+        amount = cursor.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    else:
+        amount = cursor.execute(
+            f"SELECT COUNT(*) FROM {table} WHERE {primary_key} > ?", [last_key]
+        ).fetchone()[0]
+
+    cursor.close()
+    return amount
+
+
+def get_key_bounds(connection, table: str, primary_key: str):
+    """Gets the smallest and the greatest primary key of a table.
+    Args:
+        connection (_type_): The pyodbc connection.
+        table (str): The table name.
+        primary_key (str): The primary key column name.
+    Returns:
+        tuple: The smallest and the greatest key (None if the table is empty).
+    """
+    cursor = connection.cursor()
+    bounds = cursor.execute(
+        f"SELECT MIN({primary_key}), MAX({primary_key}) FROM {table}"
+    ).fetchone()
+    cursor.close()
+    return bounds[0], bounds[1]
+
+
+def get_key_ranges(bounds: list, range_size: int):
+    """Splits the integer primary keys of the bounds into ranges.
+    Args:
+        bounds (list): List of (smallest key, greatest key) tuples.
+        range_size (int): The amount of primary keys per range.
+    Returns:
+        list: List of (first key, key after the range) tuples.
+    """
+    bounds = [el for el in bounds if el[0] is not None]
+
+    if len(bounds) == 0:
+        return []
+
+    first = min(el[0] for el in bounds) // range_size
+    last = max(el[1] for el in bounds) // range_size
+    return [
+        (range_id * range_size, (range_id + 1) * range_size)
+        for range_id in range(first, last + 1)
+    ]
+
+
+def get_peak_rss():
+    """Gets the peak resident set size of the process.
+    Returns:
+        float: The peak resident set size in MiB
+        or None if it can not be determined.
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+        if sys.platform == "darwin":
+            return peak / (1024 * 1024)
+
+        return peak / 1024
+
+    try:
+        import psutil
+    except ImportError:
+        return None
+
+    memory_info = psutil.Process().memory_info()
+    peak = getattr(memory_info, "peak_wset", memory_info.rss)
+    return peak / (1024 * 1024)
@@ -0,0 +1,773 @@
+# Import necessary packages
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from decimal import Decimal
+from cypher_builder import DECIMAL_AS_FLOAT, to_neo4j_value
+from migration_log import WARNING, log
+from neo4j.time import DateTime
+from scheduler import ThreadConnections
+from source_reader import (
+    get_columns,
+    get_key_bounds,
+    get_key_ranges,
+    get_primary_key,
+    iter_fetchmany,
+)
+
+# The checksum of a table is the sum of its 64 bit range checksums modulo 2^64
+checksum_mask = 2**64 - 1
+# Amount of rows per fetchmany call of the verifier
+verify_fetch_size = 5000
+
+
+def hash_values(values: tuple):
+    """Hashes the values of a row to a 64 bit integer.
+    Args:
+        values (tuple): The values.
+    Returns:
+        int: The hash.
+    """
+    digest = hashlib.blake2b(repr(values).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def get_comparable_value(val, decimal_policy=DECIMAL_AS_FLOAT):
+    """Converts a source value or node property to the value that is compared.
+    Decimals are converted like by the migration, temporal values are compared
+    by their ISO representation (datetimes without a time zone as UTC).
+    Args:
+        val (_type_): The value.
+        decimal_policy (str, optional): See cypher_builder.to_neo4j_value.
+        Defaults to DECIMAL_AS_FLOAT.
+    Returns:
+        _type_: The comparable value.
+    """
+    if type(val) == Decimal:
+        return to_neo4j_value(val, decimal_policy)
+
+    if isinstance(val, DateTime):
+        val = val.to_native()
+
+    if isinstance(val, datetime):
+        if val.tzinfo is None:
+            val = val.replace(tzinfo=timezone.utc)
+
+        return val.isoformat()
+
+    return val
+
+
+def get_node_values(properties: dict):
+    """Gets the comparable values of node properties.
+    Args:
+        properties (dict): The properties.
+    Returns:
+        tuple: The (name, value) tuples sorted by name.
+    """
+    return tuple(
+        (k, get_comparable_value(properties[k])) for k in sorted(properties.keys())
+    )
+
+
+def get_row_node_values(
+    columns: list, order: list, row: tuple, decimal_policy=DECIMAL_AS_FLOAT
+):
+    """Gets the comparable values of the node a source row is migrated to.
+    Null values are dropped (Neo4j does not store them).
+    Args:
+        columns (list): The column names.
+        order (list): The column indexes sorted by column name.
+        row (tuple): The row.
+        decimal_policy (str, optional): See cypher_builder.to_neo4j_value.
+        Defaults to DECIMAL_AS_FLOAT.
+    Returns:
+        tuple: The (name, value) tuples sorted by name.
+    """
+    return tuple(
+        (columns[i], get_comparable_value(row[i], decimal_policy))
+        for i in order
+        if row[i] is not None
+    )
+
+
+def get_relationship_values(
+    from_key, to_key, properties: dict, decimal_policy=DECIMAL_AS_FLOAT
+):
+    """Gets the comparable values of a relationship: the keys of its nodes
+    and its properties. Null values are dropped (Neo4j does not store them).
+    Args:
+        from_key (_type_): The key of the source node.
+        to_key (_type_): The key of the destination node.
+        properties (dict): The properties.
+        decimal_policy (str, optional): See cypher_builder.to_neo4j_value.
+        Defaults to DECIMAL_AS_FLOAT.
+    Returns:
+        tuple: The node keys and the (name, value) tuples sorted by name.
+    """
+    return (
+        get_comparable_value(from_key, decimal_policy),
+        get_comparable_value(to_key, decimal_policy),
+        tuple(
+            (k, get_comparable_value(properties[k], decimal_policy))
+            for k in sorted(properties.keys())
+            if properties[k] is not None
+        ),
+    )
+
+
+class RangeChecksum:
+    """Checksum of the rows of a primary key range that are added in primary
+    key order: the row count and a 64 bit BLAKE2b digest of the streamed rows.
+    It does not depend on the physical row order, and the checksums of the
+    ranges of a table are combined order-independently (sum modulo 2^64)."""
+
+    def __init__(self, keep_hashes=False):
+        """Initializes an empty checksum.
+        Args:
+            keep_hashes (bool, optional): Whether the hash of every key is kept
+            to find the differing keys. Defaults to False.
+        """
+        self.count = 0
+        self.digest = hashlib.blake2b(digest_size=8)
+        self.hashes = dict() if keep_hashes else None
+
+    def add(self, keys: list, rows: list):
+        """Adds rows.
+        Args:
+            keys (list): The primary keys.
+            rows (list): The values of the rows as tuples.
+        """
+        self.count += len(rows)
+        self.digest.update(("\n".join(map(repr, rows)) + "\n").encode())
+
+        if self.hashes is not None:
+            for key, row in zip(keys, rows):
+                self.hashes[key] = hash_values(row)
+
+    def get_checksum(self):
+        """Gets the checksum.
+        Returns:
+            int: The 64 bit checksum.
+        """
+        return int.from_bytes(self.digest.digest(), "little")
+
+
+def checksum_range(
+    connection,
+    table: str,
+    columns: list,
+    primary_key: str,
+    key_range: tuple,
+    keep_hashes=False,
+    node_checksum=None,
+    decimal_policy=DECIMAL_AS_FLOAT,
+):
+    """Streams the rows of a primary key range and computes their checksum.
+    Args:
+        connection (_type_): The pyodbc connection.
+        table (str): The table name.
+        columns (list): The compared column names.
+        primary_key (str): The primary key column name.
+        key_range (tuple): The first key and the key after the range.
+        keep_hashes (bool, optional): See RangeChecksum. Defaults to False.
+        node_checksum (RangeChecksum, optional): If set, the rows are also added
+        as the Neo4j nodes they are migrated to. Defaults to None.
+        decimal_policy (str, optional): See cypher_builder.to_neo4j_value.
+        Defaults to DECIMAL_AS_FLOAT.
+    Returns:
+        RangeChecksum: The checksum of the rows.
+    """
+    key_index = columns.index(primary_key)
+    order = sorted(range(len(columns)), key=lambda i: columns[i])
+    checksum = RangeChecksum(keep_hashes)
+    cursor = connection.cursor()
+    query = (
+        f"SELECT {','.join(columns)} FROM {table} "
+        f"WHERE {primary_key} >= ? AND {primary_key} < ? ORDER BY {primary_key}"
+    )
+
+    for chunk in iter_fetchmany(cursor, query, verify_fetch_size, list(key_range)):
+        rows = [tuple(row) for row in chunk]
+        keys = [row[key_index] for row in rows]
+        checksum.add(keys, rows)
+
+        if node_checksum is not None:
+            node_checksum.add(
+                keys,
+                [
+                    get_row_node_values(columns, order, row, decimal_policy)
+                    for row in rows
+                ],
+            )
+
+    cursor.close()
+    return checksum
+
+
+def checksum_node_range(
+    graph, node_name: str, primary_key: str, key_range: tuple, keep_hashes=False
+):
+    """Computes the checksum of the nodes of a primary key range.
+    Args:
+        graph (_type_): The graph store (see adapters.Neo4jGraph).
+        node_name (str): The node name.
+        primary_key (str): The key attribute.
+        key_range (tuple): The first key and the key after the range.
+        keep_hashes (bool, optional): See RangeChecksum. Defaults to False.
+    Returns:
+        RangeChecksum: The checksum of the nodes.
+    """
+    checksum = RangeChecksum(keep_hashes)
+    nodes = sorted(
+        graph.read_nodes(node_name, primary_key, *key_range),
+        key=lambda properties: properties[primary_key],
+    )
+    checksum.add(
+        [properties[primary_key] for properties in nodes],
+        [get_node_values(properties) for properties in nodes],
+    )
+    return checksum
+
+
+def checksum_relationship_source_range(
+    connection,
+    table: str,
+    columns: list,
+    mn_information: dict,
+    key_range: tuple,
+    keep_hashes=False,
+    decimal_policy=DECIMAL_AS_FLOAT,
+):
+    """Streams the rows of a primary key range of a m:n table and computes
+    the checksum of the relationships they are migrated to.
+    Args:
+        connection (_type_): The pyodbc connection.
+        table (str): The m:n table name.
+        columns (list): The column names of the table.
+        mn_information (dict): See migration.create_neo4j_m_to_n_dict.
+        key_range (tuple): The first key and the key after the range.
+        keep_hashes (bool, optional): See RangeChecksum. Defaults to False.
+        decimal_policy (str, optional): See cypher_builder.to_neo4j_value.
+        Defaults to DECIMAL_AS_FLOAT.
+    Returns:
+        RangeChecksum: The checksum of the relationships.
+    """
+    primary_key = mn_information["primaryKeyAttribute"]
+    from_index = columns.index(mn_information["fromAttribute"])
+    to_index = columns.index(mn_information["toAttribute"])
+    key_index = columns.index(primary_key)
+    # The matched attributes are the end nodes, not properties
+    properties = [
+        (column, index)
+        for index, column in enumerate(columns)
+        if index not in [from_index, to_index]
+    ]
+    checksum = RangeChecksum(keep_hashes)
+    cursor = connection.cursor()
+    query = (
+        f"SELECT {','.join(columns)} FROM {table} "
+        f"WHERE {primary_key} >= ? AND {primary_key} < ? ORDER BY {primary_key}"
+    )
+
+    for chunk in iter_fetchmany(cursor, query, verify_fetch_size, list(key_range)):
+        checksum.add(
+            [row[key_index] for row in chunk],
+            [
+                get_relationship_values(
+                    row[from_index],
+                    row[to_index],
+                    {column: row[index] for column, index in properties},
+                    decimal_policy,
+                )
+                for row in chunk
+            ],
+        )
+
+    cursor.close()
+    return checksum
+
+
+def checksum_relationship_range(
+    graph, mn_information: dict, key_range: tuple, keep_hashes=False
+):
+    """Computes the checksum of the relationships of a primary key range.
+    Args:
+        graph (_type_): The graph store (see adapters.Neo4jGraph).
+        mn_information (dict): See migration.create_neo4j_m_to_n_dict.
+        key_range (tuple): The first key and the key after the range.
+        keep_hashes (bool, optional): See RangeChecksum. Defaults to False.
+    Returns:
+        RangeChecksum: The checksum of the relationships.
+    """
+    primary_key = mn_information["primaryKeyAttribute"]
+    checksum = RangeChecksum(keep_hashes)
+    relationships = sorted(
+        graph.read_relationships(mn_information, *key_range),
+        key=lambda row: row["props"].get(primary_key),
+    )
+    checksum.add(
+        [row["props"].get(primary_key) for row in relationships],
+        [
+            get_relationship_values(row["fromKey"], row["toKey"], row["props"])
+            for row in relationships
+        ],
+    )
+    return checksum
+
+
+def get_differing_keys(source: RangeChecksum, target: RangeChecksum):
+    """Gets the keys whose rows differ between two checksums with kept hashes.
+    Args:
+        source (RangeChecksum): The checksum of the source rows.
+        target (RangeChecksum): The checksum of the migrated rows.
+    Returns:
+        dict: Dictionary of the format {"missingKeys": <value>,
+        "extraKeys": <value>, "changedKeys": <value>}.
+    """
+    return {
+        "missingKeys": sorted(k for k in source.hashes if k not in target.hashes),
+        "extraKeys": sorted(k for k in target.hashes if k not in source.hashes),
+        "changedKeys": sorted(
+            k
+            for k, v in source.hashes.items()
+            if k in target.hashes and target.hashes[k] != v
+        ),
+    }
+
+
+class Verifier:
+    """Compares the migrated tables and Neo4j nodes with the old database
+    range by range in a thread pool."""
+
+    def __init__(
+        self,
+        source,
+        target,
+        graph,
+        neo4j_tables: list,
+        range_size: int,
+        decimal_policy=DECIMAL_AS_FLOAT,
+    ):
+        """Initializes the verifier.
+        Args:
+            source (_type_): The backend of the old database (see adapters.OdbcBackend).
+            target (_type_): The backend of the new database (see adapters.OdbcBackend).
+            graph (_type_): The graph store (see adapters.Neo4jGraph).
+            None skips the graph checks.
+            neo4j_tables (list): The tables that are migrated to Neo4j nodes.
+            range_size (int): The amount of primary keys per range.
+            decimal_policy (str, optional): See cypher_builder.to_neo4j_value.
+            Defaults to DECIMAL_AS_FLOAT.
+        """
+        self.graph = graph
+        self.neo4j_tables = neo4j_tables
+        self.range_size = range_size
+        self.decimal_policy = decimal_policy
+        self.source_connections = ThreadConnections(source.connect)
+        self.target_connections = ThreadConnections(target.connect)
+
+    def get_table_ranges(self, table: str):
+        """Gets the compared columns and the primary key ranges of a table.
+        Args:
+            table (str): The table name.
+        Returns:
+            tuple: The column names, the primary key column name and the ranges.
+        """
+        conn_old = self.source_connections.get()
+        conn_new = self.target_connections.get()
+        cursor = conn_new.cursor()
+        columns = get_columns(cursor, table)
+        primary_key = get_primary_key(cursor, table)
+        cursor.close()
+        bounds = [
+            get_key_bounds(conn_old, table, primary_key),
+            get_key_bounds(conn_new, table, primary_key),
+        ]
+        return columns, primary_key, get_key_ranges(bounds, self.range_size)
+
+    def verify_range(
+        self, table: str, columns: list, primary_key: str, key_range: tuple, keep_hashes
+    ):
+        """Computes the checksums of a primary key range.
+        Args:
+            table (str): The table name.
+            columns (list): The compared column names.
+            primary_key (str): The primary key column name.
+            key_range (tuple): The first key and the key after the range.
+            keep_hashes (bool): See RangeChecksum.
+        Returns:
+            dict: Dictionary of the format {"source": <value>, "target": <value>,
+            "sourceNodes": <value>, "nodes": <value>} of RangeChecksums
+            (without the node checksums if the table has no nodes).
+        """
+        with_nodes = self.graph is not None and table in self.neo4j_tables
+        source_nodes = RangeChecksum(keep_hashes) if with_nodes else None
+        checksums = {
+            "source": checksum_range(
+                self.source_connections.get(),
+                table,
+                columns,
+                primary_key,
+                key_range,
+                keep_hashes,
+                source_nodes,
+                self.decimal_policy,
+            ),
+            "target": checksum_range(
+                self.target_connections.get(),
+                table,
+                columns,
+                primary_key,
+                key_range,
+                keep_hashes,
+            ),
+        }
+
+        if with_nodes:
+            checksums["sourceNodes"] = source_nodes
+            checksums["nodes"] = checksum_node_range(
+                self.graph, table, primary_key, key_range, keep_hashes
+            )
+
+        return checksums
+
+    def verify_tables(self, tables: list, max_workers: int, max_reported_keys: int):
+        """Verifies the tables and their nodes. The ranges of all tables
+        are checked concurrently, ranges with differences are read again
+        to find the differing keys.
+        Args:
+            tables (list): The table names.
+            max_workers (int): The maximal amount of concurrent ranges.
+            max_reported_keys (int): The maximal amount of reported keys
+            per kind of difference.
+        Returns:
+            tuple: The reports of the tables and of the nodes.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            layouts = dict(zip(tables, executor.map(self.get_table_ranges, tables)))
+            futures = {
+                table: [
+                    executor.submit(
+                        self.verify_range, table, columns, primary_key, key_range, False
+                    )
+                    for key_range in key_ranges
+                ]
+                for table, (columns, primary_key, key_ranges) in layouts.items()
+            }
+            table_reports = []
+            node_reports = []
+
+            for table in tables:
+                columns, primary_key, key_ranges = layouts[table]
+                results = [future.result() for future in futures[table]]
+                pairs = [("table", "source", "target")]
+
+                if self.graph is not None and table in self.neo4j_tables:
+                    pairs.append(("nodes", "sourceNodes", "nodes"))
+
+                for kind, source_kind, target_kind in pairs:
+                    report = create_report(
+                        key_ranges, results, source_kind, target_kind
+                    )
+                    add_differing_keys(
+                        report,
+                        executor.map(
+                            lambda key_range: self.verify_range(
+                                table, columns, primary_key, tuple(key_range), True
+                            ),
+                            report["mismatchedRanges"][:max_reported_keys],
+                        ),
+                        source_kind,
+                        target_kind,
+                        max_reported_keys,
+                    )
+
+                    if kind == "table":
+                        table_reports.append({"table": table, **report})
+                    else:
+                        report["nodes"] = self.graph.count_nodes(table)
+                        report["passed"] = (
+                            report["passed"] and report["nodes"] == report["sourceRows"]
+                        )
+                        node_reports.append({"label": table, **report})
+
+        return table_reports, node_reports
+
+    def get_relationship_ranges(self, table: str, mn_information: dict):
+        """Gets the columns and the primary key ranges of a m:n table.
+        Args:
+            table (str): The m:n table name.
+            mn_information (dict): See migration.create_neo4j_m_to_n_dict.
+        Returns:
+            tuple: The column names and the ranges.
+        """
+        connection = self.source_connections.get()
+        cursor = connection.cursor()
+        columns = get_columns(cursor, table)
+        cursor.close()
+        bounds = get_key_bounds(
+            connection, table, mn_information["primaryKeyAttribute"]
+        )
+        return columns, get_key_ranges([bounds], self.range_size)
+
+    def verify_relationship_range(
+        self,
+        table: str,
+        columns: list,
+        mn_information: dict,
+        key_range: tuple,
+        keep_hashes,
+    ):
+        """Computes the checksums of the relationships of a primary key range.
+        Args:
+            table (str): The m:n table name.
+            columns (list): The column names of the table.
+            mn_information (dict): See migration.create_neo4j_m_to_n_dict.
+            key_range (tuple): The first key and the key after the range.
+            keep_hashes (bool): See RangeChecksum.
+        Returns:
+            dict: Dictionary of the format {"source": <value>,
+            "relationships": <value>} of RangeChecksums.
+        """
+        return {
+            "source": checksum_relationship_source_range(
+                self.source_connections.get(),
+                table,
+                columns,
+                mn_information,
+                key_range,
+                keep_hashes,
+                self.decimal_policy,
+            ),
+            "relationships": checksum_relationship_range(
+                self.graph, mn_information, key_range, keep_hashes
+            ),
+        }
+
+    def verify_relationships(
+        self, mn_tables_dict: dict, max_workers: int, max_reported_keys: int
+    ):
+        """Verifies the relationships of the m:n tables: the relationship counts
+        against the row counts and, range by range, the checksums of the node
+        keys and properties of the relationships against the source rows.
+        Args:
+            mn_tables_dict (dict): See migration.mn_tables_dict.
+            max_workers (int): The maximal amount of concurrent ranges.
+            max_reported_keys (int): The maximal amount of reported keys
+            per kind of difference.
+        Returns:
+            list: The reports of the relationships.
+        """
+        reports = []
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            layouts = {
+                table: executor.submit(
+                    self.get_relationship_ranges, table, mn_information
+                )
+                for table, mn_information in mn_tables_dict.items()
+            }
+            layouts = {table: future.result() for table, future in layouts.items()}
+            futures = {
+                table: [
+                    executor.submit(
+                        self.verify_relationship_range,
+                        table,
+                        columns,
+                        mn_tables_dict[table],
+                        key_range,
+                        False,
+                    )
+                    for key_range in key_ranges
+                ]
+                for table, (columns, key_ranges) in layouts.items()
+            }
+
+            for table, mn_information in mn_tables_dict.items():
+                columns, key_ranges = layouts[table]
+                results = [future.result() for future in futures[table]]
+                report = create_report(key_ranges, results, "source", "relationships")
+                add_differing_keys(
+                    report,
+                    executor.map(
+                        lambda key_range: self.verify_relationship_range(
+                            table, columns, mn_information, tuple(key_range), True
+                        ),
+                        report["mismatchedRanges"][:max_reported_keys],
+                    ),
+                    "source",
+                    "relationships",
+                    max_reported_keys,
+                )
+                relationship_name = mn_information["relationshipName"]
+                # Relationships outside of the source key ranges are only counted
+                report["relationships"] = self.graph.count_relationships(
+                    relationship_name
+                )
+                report["passed"] = (
+                    report["passed"] and report["relationships"] == report["sourceRows"]
+                )
+                reports.append(
+                    {"relationship": relationship_name, "table": table, **report}
+                )
+
+        return reports
+
+    def close(self):
+        """Closes the connections of the worker threads."""
+        self.source_connections.close()
+        self.target_connections.close()
+
+
+def add_differing_keys(
+    report: dict,
+    rechecks,
+    source_kind: str,
+    target_kind: str,
+    max_reported_keys: int,
+):
+    """Adds the differing keys of the mismatched ranges to a report.
+    Args:
+        report (dict): The report (see create_report).
+        rechecks (_type_): The results of the mismatched ranges with kept hashes.
+        source_kind (str): The key of the source checksums in the results.
+        target_kind (str): The key of the migrated checksums in the results.
+        max_reported_keys (int): The maximal amount of reported keys
+        per kind of difference.
+    """
+    for key in ["missingKeys", "extraKeys", "changedKeys"]:
+        report[key] = []
+
+    for result in rechecks:
+        keys = get_differing_keys(result[source_kind], result[target_kind])
+
+        for key, values in keys.items():
+            report[key] = (report[key] + values)[:max_reported_keys]
+
+
+def create_report(key_ranges: list, results: list, source_kind: str, target_kind: str):
+    """Combines the range checksums of a table to its report.
+    Args:
+        key_ranges (list): The primary key ranges.
+        results (list): The results of Verifier.verify_range per range.
+        source_kind (str): The key of the source checksums in the results.
+        target_kind (str): The key of the migrated checksums in the results.
+    Returns:
+        dict: The report.
+    """
+    sources = [result[source_kind] for result in results]
+    targets = [result[target_kind] for result in results]
+    source_checksums = [el.get_checksum() for el in sources]
+    target_checksums = [el.get_checksum() for el in targets]
+    source_checksum = sum(source_checksums) & checksum_mask
+    target_checksum = sum(target_checksums) & checksum_mask
+    mismatched = [
+        list(key_range)
+        for key_range, source, target, source_sum, target_sum in zip(
+            key_ranges, sources, targets, source_checksums, target_checksums
+        )
+        if (source.count, source_sum) != (target.count, target_sum)
+    ]
+    return {
+        "ranges": len(key_ranges),
+        "sourceRows": sum(el.count for el in sources),
+        "targetRows": sum(el.count for el in targets),
+        "sourceChecksum": f"{source_checksum:016x}",
+        "targetChecksum": f"{target_checksum:016x}",
+        "mismatchedRanges": mismatched,
+        "passed": len(mismatched) == 0,
+    }
+
+
+def run_verification(
+    source,
+    target,
+    graph,
+    tables: list,
+    neo4j_tables: list,
+    mn_tables_dict: dict,
+    report_path: str,
+    range_size=10000,
+    max_workers=4,
+    max_reported_keys=100,
+    decimal_policy=DECIMAL_AS_FLOAT,
+):
+    """Compares the new database and the graph with the old database and
+    writes a JSON report. For every table the row counts and order-independent
+    checksums of the copied columns are compared, for every Neo4j node name the
+    node counts and checksums of the node properties, and for every m:n table
+    the relationship counts and checksums of the node keys and properties of
+    the relationships. The integer primary keys are checked in ranges.
+    Args:
+        source (_type_): The backend of the old database (see adapters.OdbcBackend).
+        target (_type_): The backend of the new database (see adapters.OdbcBackend).
+        graph (_type_): The graph store (see adapters.Neo4jGraph).
+        None skips the graph checks.
+        tables (list): The table names.
+        neo4j_tables (list): The tables that are migrated to Neo4j nodes.
+        mn_tables_dict (dict): See migration.mn_tables_dict.
+        report_path (str): The path of the JSON report.
+        range_size (int, optional): The amount of primary keys per range.
+        Defaults to 10000.
+        max_workers (int, optional): The maximal amount of concurrent ranges.
+        Defaults to 4.
+        max_reported_keys (int, optional): The maximal amount of reported keys
+        per table and kind of difference. Defaults to 100.
+        decimal_policy (str, optional): See cypher_builder.to_neo4j_value.
+        Defaults to DECIMAL_AS_FLOAT.
+    Raises:
+        ValueError: Is thrown if range_size is not positive.
+    Returns:
+        dict: The report.
+    """
+    if range_size <= 0:
+        raise ValueError("range_size must be positive!")
+
+    start = time.perf_counter()
+    verifier = Verifier(source, target, graph, neo4j_tables, range_size, decimal_policy)
+
+    try:
+        table_reports, node_reports = verifier.verify_tables(
+            tables, max_workers, max_reported_keys
+        )
+        relationship_reports = []
+
+        if graph is not None:
+            relationship_reports = verifier.verify_relationships(
+                mn_tables_dict, max_workers, max_reported_keys
+            )
+    finally:
+        verifier.close()
+
+    checks = table_reports + node_reports + relationship_reports
+    report = {
+        "passed": all(el["passed"] for el in checks),
+        "seconds": round(time.perf_counter() - start, 3),
+        "rangeSize": range_size,
+        "tables": table_reports,
+        "nodes": node_reports,
+        "relationships": relationship_reports,
+    }
+
+    with open(report_path, "w") as file:
+        json.dump(report, file, indent=2, default=str)
+
+    for name, reports in [
+        ("table", table_reports),
+        ("label", node_reports),
+        ("relationship", relationship_reports),
+    ]:
+        for el in reports:
+            if not el["passed"]:
+                log(f"Verification of {name} {el[name]} failed.", WARNING)
+
+    passed = len([el for el in checks if el["passed"]])
+    log(
+        f"Verification {'passed' if report['passed'] else 'failed'}: "
+        f"{passed} of {len(checks)} checks passed in {report['seconds']:.2f}s, "
+        f"report written to {report_path}."
+    )
+    return report